@@ -0,0 +1,167 @@
+import datetime
+import statistics
+import time
+import tracemalloc
+from decimal import Decimal
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from cars.catalog import sync_catalog
+from cars.models import Car, CarBrand, CarModel
+from users.models import User, UserBalance
+from utils.money import to_kopecks
+
+from .billing import bill_active_bookings
+from .models import Booking
+
+
+# Розмір пакета для масових вставок синтетичного автопарку
+BULK_BATCH_SIZE = 2000
+
+
+def generate_fleet(users, cars, bookings, balance=Decimal("100000.00"), price_per_minute=Decimal("2.50")):
+    """
+    Створює синтетичний автопарк масовими вставками.
+
+    Створюються users користувачів з балансом, cars автомобілів та bookings активних бронювань.
+    Бронювання рівномірно розподіляються між користувачами та автомобілями.
+
+    Args:
+        users: Кількість користувачів (кожен отримує UserBalance).
+        cars: Кількість автомобілів.
+        bookings: Кількість активних бронювань.
+        balance: Початковий баланс кожного користувача.
+        price_per_minute: Ціна хвилини оренди кожного автомобіля.
+
+    Returns:
+        dict: Кількість створених користувачів, автомобілів і бронювань.
+    """
+    now = timezone.now()
+    today = now.date()
+    offset = User.objects.count()
+
+    brand, _ = CarBrand.objects.get_or_create(name="Benchmark")
+    model, _ = CarModel.objects.get_or_create(brand=brand, name="Fleet")
+
+    User.objects.bulk_create(
+        (
+            User(
+                username=f"bench{offset + index}",
+                email=f"bench{offset + index}@example.com",
+                password="!",
+            )
+            for index in range(users)
+        ),
+        batch_size=BULK_BATCH_SIZE,
+    )
+    user_ids = list(
+        User.objects.filter(username__startswith="bench").order_by("-id").values_list("id", flat=True)[:users]
+    )
+    UserBalance.objects.bulk_create(
+        (UserBalance(user_id=user_id, amount_kopecks=to_kopecks(balance)) for user_id in user_ids),
+        batch_size=BULK_BATCH_SIZE,
+    )
+
+    car_offset = Car.objects.count()
+    Car.objects.bulk_create(
+        (
+            Car(
+                model=model,
+                year=2023,
+                license_plate=f"BN{car_offset + index:08d}",
+                color="Сірий",
+                mileage=0,
+                fuel_type="petrol",
+                transmission="automatic",
+                price_per_minute=price_per_minute,
+                seats=5,
+                status="busy",
+                main_photo="car_photos/benchmark.jpg",
+                insurance_valid_until=today + datetime.timedelta(days=365),
+                technical_inspection_valid_until=today + datetime.timedelta(days=365),
+            )
+            for index in range(cars)
+        ),
+        batch_size=BULK_BATCH_SIZE,
+    )
+    car_ids = list(Car.objects.filter(model=model).order_by("-id").values_list("id", flat=True)[:cars])
+    # Масове створення не викликає сигналів, тому записи каталогу створюються окремо
+    sync_catalog(car_ids)
+
+    Booking.objects.bulk_create(
+        (
+            Booking(
+                user_id=user_ids[index % len(user_ids)],
+                car_id=car_ids[index % len(car_ids)],
+                start_time=now,
+                end_time=now + datetime.timedelta(days=1),
+                status="active",
+                total_price=Decimal("0.00"),
+                last_billing_time=now,
+            )
+            for index in range(bookings)
+        ),
+        batch_size=BULK_BATCH_SIZE,
+    )
+
+    return {"users": len(user_ids), "cars": len(car_ids), "bookings": bookings}
+
+def run_billing_benchmark(ticks=3):
+    """
+    Вимірює тривалість тіків білінгу для всіх активних бронювань поточної бази даних.
+
+    Перед кожним тіком усі бронювання стають простроченими на одну хвилину, тому кожен тік списує кошти
+    з усіх активних бронювань. Тривалість вимірюється окремо від кількості запитів і пікової пам'яті,
+    щоб трасування не впливало на час.
+
+    Args:
+        ticks: Кількість тіків для вимірювання часу.
+
+    Returns:
+        dict: Кількість бронювань, час тіків, кількість запитів на бронювання та пікова пам'ять.
+    """
+    active = Booking.objects.filter(status="active")
+    size = active.count()
+    wall_times = []
+
+    for _ in range(ticks):
+        now = _make_bookings_due(active)
+        started = time.perf_counter()
+        bill_active_bookings(now)
+        wall_times.append(time.perf_counter() - started)
+
+    now = _make_bookings_due(active)
+    tracemalloc.start()
+    with CaptureQueriesContext(connection) as queries:
+        stats = bill_active_bookings(now)
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "active_rentals": size,
+        "billed": stats["billed"],
+        "wall_time_s": {
+            "min": min(wall_times),
+            "median": statistics.median(wall_times),
+            "max": max(wall_times),
+        },
+        "queries": len(queries),
+        "queries_per_booking": len(queries) / size if size else 0,
+        "peak_memory_mb": peak_memory / (1024 * 1024),
+    }
+
+def _make_bookings_due(bookings):
+    """
+    Зсуває час останнього білінгу всіх бронювань на хвилину назад.
+
+    Args:
+        bookings: QuerySet активних бронювань.
+
+    Returns:
+        datetime: Момент білінгу для наступного тіку.
+    """
+    now = timezone.now()
+    bookings.update(last_billing_time=now - datetime.timedelta(minutes=1, seconds=1))
+    return now
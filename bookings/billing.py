@@ -0,0 +1,460 @@
+import datetime
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import BigIntegerField, Case, DurationField, F, PositiveIntegerField, Value, When
+from django.utils import timezone
+
+from cars.catalog import release_cars
+from users.ledger import ledger_tail, record_balance_change, record_balance_changes
+from users.models import BalanceLedgerEntry, UserBalance
+from utils.money import format_kopecks, from_kopecks, kopecks_expression, to_kopecks
+
+from .models import Booking
+
+
+# Поля, які завантажуються одним запитом для кожної порції бронювань
+BILLING_FIELDS = (
+    "id",
+    "user_id",
+    "car_id",
+    "last_billing_time",
+    "billing_mode",
+    "hold_kopecks",
+    "runway_minutes",
+    "price_kopecks",
+)
+
+
+def bill_active_bookings(now=None, bookings=None, booking_ids=None, heartbeat=None):
+    """
+    Пакетний білінг активних бронювань.
+
+    Бронювання обробляються порціями за зростанням id. Для кожної порції виконується один запит,
+    який завантажує бронювання разом з ціною автомобіля та запасом хвилин, розрахунок
+    ведеться в пам'яті, а зміни застосовуються кількома масовими UPDATE-запитами.
+
+    Args:
+        now: Момент білінгу (за замовчуванням - поточний час).
+        bookings: QuerySet бронювань для обробки (за замовчуванням - усі активні бронювання).
+        booking_ids: Список id бронювань для обробки (наприклад, вибраних з черги білінгу).
+        heartbeat: Функція, яка викликається після кожної порції; якщо вона повертає False
+            (блокування запуску втрачене), обробка решти порцій припиняється.
+
+    Returns:
+        dict: Статистика білінгу (оброблено, списано, завершено, хвилини, сума, чи перервано обробку).
+    """
+    now = now or timezone.now()
+    if bookings is None:
+        bookings = Booking.objects.all()
+    # Ціна хвилини читається одразу в копійках, тому весь розрахунок - цілочисельний
+    bookings = bookings.filter(status="active").order_by("id").annotate(
+        price_kopecks=kopecks_expression("car__price_per_minute")
+    )
+
+    stats = {"processed": 0, "billed": 0, "completed": 0, "minutes": 0, "amount_kopecks": 0, "aborted": False}
+    for chunk in _iter_chunks(bookings, booking_ids):
+        # Порція вибирається в транзакції її білінгу, тому рядки бронювань заблоковані до фіксації змін
+        with transaction.atomic():
+            chunk_stats = _bill_chunk(list(chunk), now)
+
+        for key, value in chunk_stats.items():
+            stats[key] += value
+
+        if heartbeat is not None and not heartbeat():
+            stats["aborted"] = True
+            break
+
+    stats["amount"] = format_kopecks(stats["amount_kopecks"])
+    return stats
+
+def merge_billing_stats(results):
+    """
+    Об'єднати статистику білінгу кількох шардів.
+
+    Args:
+        results: Список словників статистики, повернених bill_active_bookings.
+
+    Returns:
+        dict: Сумарна статистика білінгу.
+    """
+    totals = {"processed": 0, "billed": 0, "completed": 0, "minutes": 0, "amount_kopecks": 0}
+    for result in results:
+        for key in totals:
+            totals[key] += result[key]
+
+    totals["amount"] = format_kopecks(totals["amount_kopecks"])
+    totals["aborted"] = any(result.get("aborted") for result in results)
+    return totals
+
+def _iter_chunks(bookings, booking_ids):
+    """
+    Генерує запити порцій бронювань розміром BILLING_CHUNK_SIZE.
+
+    Запит порції виконується викликачем у транзакції білінгу порції з блокуванням рядків
+    (SELECT ... FOR UPDATE SKIP LOCKED), тому два запуски білінгу, які перекрилися (наприклад, без
+    блокування запуску в Redis), не списують кошти за ті самі хвилини двічі: бронювання, які обробляє
+    інший запуск, пропускаються, а після фіксації його змін час останнього білінгу вже зсунутий.
+
+    Args:
+        bookings: QuerySet бронювань, відсортований за id.
+        booking_ids: Список id бронювань або None для обходу всього QuerySet.
+
+    Yields:
+        QuerySet: Невиконаний запит порції, який повертає словники з полями BILLING_FIELDS.
+    """
+    chunk_size = settings.BILLING_CHUNK_SIZE
+    bookings = bookings.select_for_update(skip_locked=True, of=("self",))
+
+    if booking_ids is not None:
+        booking_ids = sorted(booking_ids)
+        for start in range(0, len(booking_ids), chunk_size):
+            yield bookings.filter(id__in=booking_ids[start:start + chunk_size]).values(*BILLING_FIELDS)
+        return
+
+    last_id = 0
+    while True:
+        chunk = bookings.filter(id__gt=last_id).values(*BILLING_FIELDS)[:chunk_size]
+        yield chunk
+        # Порція вже виконана викликачем, тому рядки читаються з кешу QuerySet без повторного запиту
+        rows = list(chunk)
+        if len(rows) < chunk_size:
+            return
+        last_id = rows[-1]["id"]
+
+def _bill_chunk(rows, now):
+    """
+    Розрахувати та застосувати білінг для однієї порції бронювань.
+
+    Бронювання в режимі "minute" списують кошти за кожну повну хвилину. Бронювання в режимі "accrual"
+    лише порівнюють накопичену вартість із заблокованою сумою і потребують запису тільки тоді,
+    коли заблоковану суму потрібно збільшити або оренду примусово завершити.
+
+    Якщо запасу хвилин (runway_minutes) усіх бронювань користувача в порції вистачає на списання,
+    кошти списуються без читання балансу. Баланси завантажуються одним запитом лише для користувачів,
+    у яких запас невідомий або майже вичерпаний, і для них запас після білінгу розраховується заново.
+
+    Args:
+        rows: Список словників з полями BILLING_FIELDS.
+        now: Момент білінгу.
+
+    Returns:
+        dict: Статистика обробки порції.
+    """
+    balances = {}  # Поточний баланс користувача з урахуванням попередніх списань у порції
+    holds = {}  # Поточна заблокована сума користувача з урахуванням змін у порції
+    debits = defaultdict(int)  # Сума списання в копійках для кожного користувача
+    hold_changes = defaultdict(int)  # Зміна заблокованої суми в копійках для кожного користувача
+    billed = defaultdict(list)  # Кількість хвилин -> id бронювань
+    topped_up = {}  # id бронювання -> сума в копійках, на яку збільшено блокування
+    settled = []  # Бронювання в режимі накопичення, примусово завершені з розрахунком
+    completed = []  # Бронювання, які потрібно примусово завершити
+    released_cars = []  # Автомобілі, які звільняються
+    stats = {"processed": len(rows), "billed": 0, "completed": 0, "minutes": 0, "amount_kopecks": 0}
+
+    # Визначити бронювання, які потребують запису, та користувачів, для яких потрібно перевірити баланс
+    due = []  # (бронювання, кількість хвилин)
+    checked_users = set()  # Користувачі, запасу хвилин яких може не вистачити
+    for row in rows:
+        if row["billing_mode"] == "accrual":
+            minutes = accrued_minutes(row["last_billing_time"], now)
+
+            # Накопичена вартість ще покривається заблокованою сумою - запис не потрібен
+            if not row["price_kopecks"] or row["price_kopecks"] * minutes < row["hold_kopecks"]:
+                continue
+            checked_users.add(row["user_id"])
+        else:
+            # Розрахувати неоплачені хвилини; якщо це перший білінг, почати з поточного моменту
+            minutes = accrued_minutes(row["last_billing_time"], now) if row["last_billing_time"] else 1
+            if minutes <= 0:
+                continue
+            if row["runway_minutes"] is None or minutes > row["runway_minutes"]:
+                checked_users.add(row["user_id"])
+        due.append((row, minutes))
+
+    # Завантажити фактичні баланси (знімок плюс неущільнені записи журналу) одним запитом
+    if checked_users:
+        for user_id, amount, held in UserBalance.objects.filter(user_id__in=checked_users).values_list(
+            "user_id",
+            F("amount_kopecks") + ledger_tail("amount_kopecks"),
+            F("held_kopecks") + ledger_tail("held_kopecks"),
+        ):
+            balances[user_id] = amount
+            holds[user_id] = held
+
+    for row, minutes in due:
+        user_id = row["user_id"]
+        price = row["price_kopecks"]
+        amount_to_bill = price * minutes
+
+        # Запасу хвилин вистачає - списати без перевірки балансу
+        if user_id not in checked_users:
+            debits[user_id] += amount_to_bill
+            billed[minutes].append(row["id"])
+            stats["billed"] += 1
+            stats["minutes"] += minutes
+            stats["amount_kopecks"] += amount_to_bill
+            continue
+
+        # Якщо у користувача немає балансу, завершити бронювання
+        if user_id not in balances:
+            completed.append(row["id"])
+            released_cars.append(row["car_id"])
+            continue
+
+        balance = balances[user_id]
+        held = holds[user_id]
+
+        if row["billing_mode"] == "accrual":
+            top_up = min(balance - held, hold_for(price))
+            if top_up >= price:
+                # Збільшити блокування ще щонайменше на одну хвилину
+                holds[user_id] = held + top_up
+                hold_changes[user_id] += top_up
+                topped_up[row["id"]] = top_up
+            else:
+                # Коштів для продовження немає - списати накопичену вартість і завершити оренду.
+                # Блокування цієї оренди знімається, тому воно входить у доступну для розрахунку суму
+                charge = settlement_charge(amount_to_bill, balance - held + row["hold_kopecks"])
+                balances[user_id] = balance - charge
+                holds[user_id] = held - row["hold_kopecks"]
+                debits[user_id] += charge
+                hold_changes[user_id] -= row["hold_kopecks"]
+                settled.append((row["id"], minutes, charge))
+                completed.append(row["id"])
+                released_cars.append(row["car_id"])
+                stats["billed"] += 1
+                stats["minutes"] += minutes
+                stats["amount_kopecks"] += charge
+            continue
+
+        # Перевірити, чи достатньо вільних коштів (суми, заблоковані під оренди в режимі накопичення, не витрачаються)
+        if balance - held >= amount_to_bill:
+            balances[user_id] = balance - amount_to_bill
+            debits[user_id] += amount_to_bill
+            billed[minutes].append(row["id"])
+            stats["billed"] += 1
+            stats["minutes"] += minutes
+            stats["amount_kopecks"] += amount_to_bill
+        else:
+            # Недостатньо коштів - завершити бронювання
+            completed.append(row["id"])
+            released_cars.append(row["car_id"])
+
+    stats["completed"] = len(completed)
+
+    # Записати списання та зміни заблокованих сум у журнал балансу одним запитом для всіх користувачів порції
+    if debits or hold_changes:
+        record_balance_changes(
+            BalanceLedgerEntry(
+                user_id=user_id,
+                amount_kopecks=-debits.get(user_id, 0),
+                held_kopecks=hold_changes.get(user_id, 0),
+                description="Оплата оренди",
+            )
+            for user_id in set(debits) | set(hold_changes)
+        )
+
+    # Оновити час останнього білінгу, кількість оплачуваних хвилин та запас хвилин.
+    # Час білінгу зсувається рівно на оплачені хвилини, тому неповна хвилина не губиться,
+    # незалежно від того, наскільки пізно після настання терміну бронювання було оброблено.
+    if billed:
+        billed_minutes = Case(
+            *[When(id__in=ids, then=Value(minutes)) for minutes, ids in billed.items()],
+            output_field=PositiveIntegerField(),
+        )
+        Booking.objects.filter(id__in=[pk for ids in billed.values() for pk in ids]).update(
+            last_billing_time=Case(
+                When(last_billing_time__isnull=True, then=Value(now)),
+                default=F("last_billing_time") + Case(
+                    *[When(id__in=ids, then=Value(datetime.timedelta(minutes=minutes)))
+                      for minutes, ids in billed.items()],
+                    output_field=DurationField(),
+                ),
+            ),
+            minutes_billed=F("minutes_billed") + billed_minutes,
+            runway_minutes=Case(
+                When(runway_minutes__gt=billed_minutes, then=F("runway_minutes") - billed_minutes),
+                When(runway_minutes__isnull=False, then=Value(0)),
+                default=Value(None),
+                output_field=PositiveIntegerField(),
+            ),
+            updated_at=now,
+        )
+
+    # Збільшити блокування для оренд у режимі накопичення
+    if topped_up:
+        Booking.objects.filter(id__in=topped_up).update(
+            hold_kopecks=F("hold_kopecks") + Case(
+                *[When(id=booking_id, then=Value(amount)) for booking_id, amount in topped_up.items()],
+                output_field=BigIntegerField(),
+            ),
+            updated_at=now,
+        )
+
+    # Розрахунок примусово завершених оренд у режимі накопичення (рідкісна подія, тому по одному запиту)
+    for booking_id, minutes, charge in settled:
+        Booking.objects.filter(id=booking_id).update(
+            minutes_billed=F("minutes_billed") + minutes,
+            total_price=from_kopecks(charge),
+            hold_kopecks=0,
+        )
+
+    # Примусово завершити бронювання та звільнити автомобілі
+    if completed:
+        Booking.objects.filter(id__in=completed).update(status="completed", end_time=now, updated_at=now)
+        release_cars(released_cars, now)
+
+    # Розрахувати заново запас хвилин користувачів, баланс яких перевірявся
+    if checked_users:
+        refresh_runway(checked_users)
+
+    return stats
+
+def accrued_minutes(last_billing_time, now):
+    """
+    Повертає кількість повних хвилин оренди, накопичених з моменту останнього білінгу.
+
+    Args:
+        last_billing_time: Час останнього білінгу бронювання.
+        now: Поточний момент.
+
+    Returns:
+        int: Кількість повних хвилин.
+    """
+    if not last_billing_time:
+        return 0
+    return max(0, int((now - last_billing_time).total_seconds() / 60))
+
+def hold_for(price_kopecks):
+    """
+    Повертає суму блокування для оренди в режимі накопичення.
+
+    Args:
+        price_kopecks: Ціна хвилини оренди автомобіля в копійках.
+
+    Returns:
+        int: Вартість BILLING_ACCRUAL_HOLD_MINUTES хвилин оренди в копійках.
+    """
+    return price_kopecks * settings.BILLING_ACCRUAL_HOLD_MINUTES
+
+def accrued_kopecks(user_id, now=None):
+    """
+    Повертає вартість активних оренд користувача в режимі накопичення, яка ще не списана з балансу.
+
+    Args:
+        user_id: Ідентифікатор користувача.
+        now: Поточний момент (за замовчуванням - поточний час).
+
+    Returns:
+        int: Накопичена вартість оренд у копійках.
+    """
+    now = now or timezone.now()
+    bookings = Booking.objects.filter(user_id=user_id, status="active", billing_mode="accrual").values_list(
+        kopecks_expression("car__price_per_minute"), "last_billing_time"
+    )
+
+    return sum(price * accrued_minutes(last_billing_time, now) for price, last_billing_time in bookings)
+
+def settlement_charge(amount_kopecks, available_kopecks):
+    """
+    Повертає суму розрахунку оренди в режимі накопичення при її завершенні.
+
+    Накопичена вартість списується в межах доступної суми: якщо її не вистачає, списується весь залишок.
+    Суми, заблоковані під інші оренди користувача, для розрахунку недоступні.
+
+    Args:
+        amount_kopecks: Накопичена вартість оренди в копійках.
+        available_kopecks: Вільний баланс користувача разом із блокуванням цієї оренди в копійках.
+
+    Returns:
+        int: Сума списання в копійках.
+    """
+    return max(0, min(amount_kopecks, available_kopecks))
+
+def settle_accrual(booking, minutes, available_kopecks, description="Оплата оренди"):
+    """
+    Розраховує оренду в режимі накопичення при завершенні так само, як примусове завершення білінгом:
+    списує накопичену вартість у межах доступної суми та знімає блокування одним записом журналу.
+
+    Args:
+        booking: Бронювання, що завершується (поля оновлюються в пам'яті, без збереження).
+        minutes: Кількість хвилин, за які розраховується оренда.
+        available_kopecks: Вільний баланс користувача разом із блокуванням цієї оренди в копійках.
+        description: Опис запису журналу балансу.
+
+    Returns:
+        int: Списана сума в копійках.
+    """
+    charge = settlement_charge(to_kopecks(booking.car.price_per_minute) * minutes, available_kopecks)
+    if charge or booking.hold_kopecks:
+        record_balance_change(
+            booking.user_id,
+            amount_kopecks=-charge,
+            held_kopecks=-booking.hold_kopecks,
+            description=description
+        )
+    booking.minutes_billed += minutes
+    booking.total_price = from_kopecks(charge)
+    booking.hold_kopecks = 0
+    return charge
+
+def place_hold(booking, balance):
+    """
+    Блокує суму на балансі користувача під оренду в режимі накопичення.
+
+    Args:
+        booking: Бронювання, для якого блокується сума (ще не збережене).
+        balance: Баланс користувача.
+
+    Returns:
+        int: Заблокована сума в копійках.
+    """
+    hold = max(0, min(balance.get_available_kopecks(), hold_for(to_kopecks(booking.car.price_per_minute))))
+    if hold:
+        record_balance_change(booking.user_id, held_kopecks=hold, description="Блокування під оренду")
+    booking.hold_kopecks = hold
+    return hold
+
+def refresh_runway(user_ids):
+    """
+    Розраховує запас хвилин для активних оренд користувачів у режимі "minute".
+
+    Запас - це кількість хвилин, на яку вільного балансу користувача (фактичний баланс без сум, заблокованих
+    під оренди в режимі накопичення) вистачить для оплати всіх його активних оренд одночасно (вільний
+    баланс / сумарна ціна хвилини оренд). Оренди одного користувача мають однаковий запас. Якщо балансу
+    немає, запас стає невідомим.
+
+    Args:
+        user_ids: Ітерабельний об'єкт id користувачів.
+    """
+    rows = Booking.objects.filter(status="active", billing_mode="minute", user_id__in=user_ids).values_list(
+        "id",
+        "user_id",
+        kopecks_expression("car__price_per_minute"),
+        F("user__balance__amount_kopecks") + ledger_tail("amount_kopecks", "user_id")
+        - F("user__balance__held_kopecks") - ledger_tail("held_kopecks", "user_id"),
+    )
+
+    burn_rates = defaultdict(int)  # Сумарна ціна хвилини оренд користувача в копійках
+    user_bookings = defaultdict(list)  # id користувача -> id бронювань
+    balances = {}
+    for booking_id, user_id, price, balance in rows:
+        burn_rates[user_id] += price
+        user_bookings[user_id].append(booking_id)
+        balances[user_id] = balance
+
+    runways = defaultdict(list)  # Запас хвилин -> id бронювань
+    for user_id, booking_ids in user_bookings.items():
+        balance, burn_rate = balances[user_id], burn_rates[user_id]
+        runway = max(0, balance // burn_rate) if balance is not None and burn_rate else None
+        runways[runway].extend(booking_ids)
+
+    if runways:
+        Booking.objects.filter(id__in=[pk for ids in runways.values() for pk in ids]).update(
+            runway_minutes=Case(
+                *[When(id__in=ids, then=Value(runway)) for runway, ids in runways.items()],
+                output_field=PositiveIntegerField(),
+            ),
+        )
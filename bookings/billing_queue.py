@@ -0,0 +1,285 @@
+import datetime
+import logging
+import math
+
+from django.conf import settings
+from redis import RedisError
+
+from utils.money import kopecks_expression, to_kopecks
+from utils.redis_client import get_redis
+from utils.redis_lease import RedisLease
+
+
+logger = logging.getLogger(__name__)
+
+# Відсортована множина Redis: елемент "<id бронювання>:<id користувача>", оцінка - час наступного списання
+BILLING_QUEUE_KEY = "billing:due"
+
+# Блокування, яке не дозволяє двом запускам білінгу виконуватися одночасно
+BILLING_LEASE_KEY = "billing:lease"
+
+# Хеш Redis зі статистикою запусків білінгу (пропущені та затягнуті запуски)
+BILLING_RUNS_KEY = "billing:runs"
+
+
+def queue_member(booking_id, user_id):
+    """Формує елемент черги для бронювання"""
+    return f"{booking_id}:{user_id}"
+
+def booking_due_time(last_billing_time, billing_mode="minute", hold_kopecks=0, price_kopecks=0):
+    """
+    Обчислює момент, коли бронювання потрібно обробити білінгом наступного разу.
+
+    Бронювання в режимі "minute" обробляються щохвилини, а в режимі "accrual" - лише тоді,
+    коли накопичена вартість досягне заблокованої суми.
+
+    Args:
+        last_billing_time: Час останнього білінгу бронювання.
+        billing_mode: Режим білінгу бронювання.
+        hold_kopecks: Заблокована сума в копійках (для режиму "accrual").
+        price_kopecks: Ціна хвилини оренди в копійках (для режиму "accrual").
+
+    Returns:
+        datetime | None: Час наступної обробки або None, якщо бронювання потрібно обробити негайно.
+    """
+    if last_billing_time is None:
+        return None
+
+    minutes = 1
+    if billing_mode == "accrual" and price_kopecks:
+        minutes = max(1, math.ceil(hold_kopecks / price_kopecks))
+    return last_billing_time + datetime.timedelta(minutes=minutes)
+
+def schedule_bookings(entries, *, only_new=False):
+    """
+    Додає бронювання до черги білінгу або оновлює час їх наступної обробки.
+
+    Args:
+        entries: Ітерабельний об'єкт кортежів (id бронювання, id користувача, час наступної обробки або None).
+        only_new: Якщо True, не змінювати час для бронювань, які вже є в черзі.
+
+    Returns:
+        bool: True, якщо черга оновлена, False - якщо черга вимкнена або Redis недоступний.
+    """
+    if not settings.BILLING_QUEUE_ENABLED:
+        return False
+
+    # Бронювання без часу наступної обробки потрібно обробити негайно
+    mapping = {
+        queue_member(booking_id, user_id): due_at.timestamp() if due_at else 0
+        for booking_id, user_id, due_at in entries
+    }
+    if not mapping:
+        return True
+
+    try:
+        get_redis().zadd(BILLING_QUEUE_KEY, mapping, nx=only_new)
+    except RedisError:
+        logger.exception("Не вдалося оновити чергу білінгу")
+        return False
+    return True
+
+def schedule_booking(booking):
+    """
+    Додає бронювання до черги білінгу.
+
+    Args:
+        booking: Активне бронювання.
+
+    Returns:
+        bool: True, якщо черга оновлена.
+    """
+    due_at = booking_due_time(
+        booking.last_billing_time, booking.billing_mode, booking.hold_kopecks, to_kopecks(booking.car.price_per_minute)
+    )
+    return schedule_bookings([(booking.id, booking.user_id, due_at)])
+
+def schedule_active_bookings(bookings, *, only_new=False):
+    """
+    Додає до черги білінгу активні бронювання з QuerySet.
+
+    Args:
+        bookings: QuerySet бронювань.
+        only_new: Якщо True, не змінювати час для бронювань, які вже є в черзі.
+
+    Returns:
+        bool: True, якщо черга оновлена.
+    """
+    rows = bookings.filter(status="active").values_list(
+        "id",
+        "user_id",
+        "last_billing_time",
+        "billing_mode",
+        "hold_kopecks",
+        kopecks_expression("car__price_per_minute"),
+    )
+    return schedule_bookings(
+        (
+            (booking_id, user_id, booking_due_time(last_billing_time, billing_mode, hold_kopecks, price_kopecks))
+            for booking_id, user_id, last_billing_time, billing_mode, hold_kopecks, price_kopecks in rows.iterator()
+        ),
+        only_new=only_new,
+    )
+
+def unschedule_booking(booking):
+    """
+    Видаляє бронювання з черги білінгу.
+
+    Args:
+        booking: Бронювання, яке завершується.
+
+    Returns:
+        bool: True, якщо черга оновлена.
+    """
+    if not settings.BILLING_QUEUE_ENABLED:
+        return False
+
+    try:
+        get_redis().zrem(BILLING_QUEUE_KEY, queue_member(booking.id, booking.user_id))
+    except RedisError:
+        logger.exception("Не вдалося видалити бронювання %s з черги білінгу", booking.id)
+        return False
+    return True
+
+def pop_due_bookings(now):
+    """
+    Атомарно вибирає з черги всі бронювання, для яких настав час списання.
+
+    Args:
+        now: Поточний момент білінгу.
+
+    Returns:
+        list | None: Список кортежів (id бронювання, id користувача) або None,
+        якщо черга вимкнена чи Redis недоступний і потрібно переглянути всі активні бронювання.
+    """
+    if not settings.BILLING_QUEUE_ENABLED:
+        return None
+
+    score = now.timestamp()
+    try:
+        pipeline = get_redis().pipeline(transaction=True)
+        pipeline.zrangebyscore(BILLING_QUEUE_KEY, "-inf", score)
+        pipeline.zremrangebyscore(BILLING_QUEUE_KEY, "-inf", score)
+        members, _ = pipeline.execute()
+    except RedisError:
+        logger.exception("Не вдалося прочитати чергу білінгу")
+        return None
+
+    due = []
+    for member in members:
+        booking_id, user_id = member.split(":")
+        due.append((int(booking_id), int(user_id)))
+    return due
+
+def acquire_billing_lease():
+    """
+    Отримує блокування запуску білінгу.
+
+    Якщо Redis недоступний, запуск продовжується без блокування: від повторного списання за ті самі
+    хвилини при перекритті запусків захищає блокування рядків бронювань у транзакції порції.
+
+    Returns:
+        str | None: Токен власника блокування або None, якщо попередній запуск ще не завершився.
+    """
+    lease = RedisLease(BILLING_LEASE_KEY, settings.BILLING_LEASE_TTL)
+    if not settings.BILLING_LEASE_ENABLED:
+        return lease.token
+
+    try:
+        if not lease.acquire():
+            return None
+    except RedisError:
+        logger.exception("Не вдалося отримати блокування білінгу, запуск продовжується без нього")
+    return lease.token
+
+def heartbeat_billing_lease(token):
+    """
+    Продовжує блокування запуску білінгу.
+
+    Args:
+        token: Токен власника блокування.
+
+    Returns:
+        bool: True, якщо блокування досі належить цьому запуску або Redis недоступний (обробка
+        продовжується під захистом блокування рядків), False - якщо блокування отримав інший запуск.
+    """
+    if not settings.BILLING_LEASE_ENABLED:
+        return True
+
+    try:
+        return RedisLease(BILLING_LEASE_KEY, settings.BILLING_LEASE_TTL, token).heartbeat()
+    except RedisError:
+        logger.exception("Не вдалося продовжити блокування білінгу")
+        return True
+
+def release_billing_lease(token):
+    """
+    Знімає блокування запуску білінгу.
+
+    Args:
+        token: Токен власника блокування.
+
+    Returns:
+        bool: True, якщо блокування зняте.
+    """
+    if not settings.BILLING_LEASE_ENABLED:
+        return True
+
+    try:
+        return RedisLease(BILLING_LEASE_KEY, settings.BILLING_LEASE_TTL, token).release()
+    except RedisError:
+        logger.exception("Не вдалося зняти блокування білінгу")
+        return False
+
+def record_skipped_run(now):
+    """
+    Записує пропущений запуск білінгу (попередній запуск ще тривав).
+
+    Пропущені хвилини не втрачаються: наступний запуск списує їх за один прохід, оскільки кількість
+    хвилин обчислюється від часу останнього білінгу кожного бронювання.
+
+    Args:
+        now: Момент пропущеного запуску.
+    """
+    logger.warning("Запуск білінгу о %s пропущено: попередній запуск ще триває", now.isoformat())
+    if not settings.BILLING_LEASE_ENABLED:
+        return
+
+    try:
+        pipeline = get_redis().pipeline()
+        pipeline.hincrby(BILLING_RUNS_KEY, "skipped", 1)
+        pipeline.hset(BILLING_RUNS_KEY, "last_skipped_at", now.isoformat())
+        pipeline.execute()
+    except RedisError:
+        logger.exception("Не вдалося записати пропущений запуск білінгу")
+
+def record_finished_run(started_at, finished_at):
+    """
+    Записує завершений запуск білінгу та позначає його як затягнутий, якщо він тривав довше за інтервал запуску.
+
+    Args:
+        started_at: Момент початку запуску.
+        finished_at: Момент завершення запуску.
+
+    Returns:
+        bool: True, якщо запуск тривав довше за BILLING_POLL_INTERVAL.
+    """
+    duration = (finished_at - started_at).total_seconds()
+    overrun = duration > settings.BILLING_POLL_INTERVAL
+    if overrun:
+        logger.warning("Запуск білінгу о %s тривав %.1f с", started_at.isoformat(), duration)
+    if not settings.BILLING_LEASE_ENABLED:
+        return overrun
+
+    try:
+        pipeline = get_redis().pipeline()
+        pipeline.hset(BILLING_RUNS_KEY, mapping={
+            "last_started_at": started_at.isoformat(),
+            "last_duration": duration,
+        })
+        if overrun:
+            pipeline.hincrby(BILLING_RUNS_KEY, "overrun", 1)
+        pipeline.execute()
+    except RedisError:
+        logger.exception("Не вдалося записати статистику запуску білінгу")
+    return overrun
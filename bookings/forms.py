@@ -42,7 +42,7 @@ class BookingStartRentalForm(forms.Form):
 
             min_required = car.price_per_minute * 60
 
-            if balance.amount < min_required:
+            if balance.get_available_amount() < min_required:
                 raise ValidationError(f"Недостатньо коштів на балансі. Мінімальний необхідний баланс: {min_required} ₴")
 
         return cleaned_data
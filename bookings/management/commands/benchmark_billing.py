@@ -0,0 +1,89 @@
+import json
+import subprocess
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from bookings.benchmark import generate_fleet, run_billing_benchmark
+
+
+class Command(BaseCommand):
+    """
+    Бенчмарк хвилинного білінгу на синтетичному автопарку.
+
+    Команда створює окрему тестову базу даних (робоча база не змінюється), для кожного розміру
+    автопарку масово створює користувачів з балансом, автомобілі та активні бронювання, вимірює тіки
+    білінгу і записує результати в JSON для порівняння між комітами.
+
+    Приклади:
+        python manage.py benchmark_billing --settings=carsharing.settings_for_tests
+        python manage.py benchmark_billing --sizes 1000 10000 50000 --output bench_postgres.json
+    """
+
+    help = "Вимірює швидкість хвилинного білінгу на синтетичному автопарку"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes", nargs="+", type=int, default=[1000, 10000, 50000],
+            help="Кількість активних оренд для кожного прогону"
+        )
+        parser.add_argument(
+            "--users", type=int, default=None,
+            help="Кількість користувачів (за замовчуванням - половина кількості оренд)"
+        )
+        parser.add_argument(
+            "--cars", type=int, default=None,
+            help="Кількість автомобілів (за замовчуванням - по одному на оренду)"
+        )
+        parser.add_argument("--ticks", type=int, default=3, help="Кількість тіків білінгу для вимірювання часу")
+        parser.add_argument("--output", default="billing_benchmark.json", help="Файл для запису результатів")
+
+    def handle(self, *args, **options):
+        old_database_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+
+        try:
+            results = []
+            for size in options["sizes"]:
+                call_command("flush", interactive=False, verbosity=0)
+                fleet = generate_fleet(
+                    users=options["users"] or max(1, size // 2),
+                    cars=options["cars"] or size,
+                    bookings=size,
+                )
+                result = run_billing_benchmark(ticks=options["ticks"])
+                result["fleet"] = fleet
+                results.append(result)
+
+                self.stdout.write(
+                    f"{size} оренд: {result['wall_time_s']['median']:.3f} с на тік, "
+                    f"{result['queries_per_booking']:.4f} запитів на оренду, "
+                    f"{result['peak_memory_mb']:.1f} МБ пікової пам'яті"
+                )
+        finally:
+            connection.creation.destroy_test_db(old_database_name, verbosity=0)
+
+        report = {
+            "created_at": timezone.now().isoformat(),
+            "commit": self._git_commit(),
+            "database": connection.vendor,
+            "chunk_size": settings.BILLING_CHUNK_SIZE,
+            "ticks": options["ticks"],
+            "results": results,
+        }
+        with open(options["output"], "w", encoding="utf-8") as output:
+            json.dump(report, output, ensure_ascii=False, indent=2)
+
+        self.stdout.write(self.style.SUCCESS(f"Результати записано у {options['output']}"))
+
+    def _git_commit(self):
+        """Повертає хеш поточного коміту або None, якщо git недоступний"""
+        try:
+            return subprocess.check_output(
+                ["git", "rev-parse", "HEAD"], cwd=settings.BASE_DIR, stderr=subprocess.DEVNULL, text=True
+            ).strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
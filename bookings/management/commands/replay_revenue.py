@@ -0,0 +1,109 @@
+import csv
+import datetime
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from bookings.models import Booking
+from bookings.revenue import REPLAY_CHUNK_SIZE, replay_revenue
+from cars.models import Car
+
+
+class Command(BaseCommand):
+    """
+    Відтворення виручки завершених оренд за різними тарифами.
+
+    Команда потоково завантажує завершені бронювання в масиви NumPy, векторизовано відтворює хвилинний
+    білінг за поточними цінами та за кожним заданим тарифом і виводить таблиці виручки за автомобілями
+    та за годинами доби разом із прогнозом виручки на добу.
+
+    Приклади:
+        python manage.py replay_revenue --since 2025-01-01 --multiplier 0.9 1.1
+        python manage.py replay_revenue --price 2.50 3.00 --csv reports/
+    """
+
+    help = "Відтворює виручку завершених оренд за різними тарифами"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--since", help="Початкова дата оренд (YYYY-MM-DD)")
+        parser.add_argument("--until", help="Кінцева дата оренд включно (YYYY-MM-DD)")
+        parser.add_argument(
+            "--multiplier", nargs="+", type=float, default=[],
+            help="Множники поточних цін хвилини для порівняння"
+        )
+        parser.add_argument(
+            "--price", nargs="+", type=float, default=[],
+            help="Фіксовані ціни хвилини для всіх автомобілів для порівняння"
+        )
+        parser.add_argument("--chunk-size", type=int, default=REPLAY_CHUNK_SIZE, help="Розмір порції бронювань")
+        parser.add_argument("--csv", help="Каталог для запису таблиць у форматі CSV")
+
+    def handle(self, *args, **options):
+        tariffs = [("поточний", 1.0, None)]
+        tariffs += [(f"x{multiplier:g}", multiplier, None) for multiplier in options["multiplier"]]
+        tariffs += [(f"{price:.2f} ₴/хв", 1.0, price) for price in options["price"]]
+
+        bookings = Booking.objects.filter(status="completed")
+        if options["since"]:
+            bookings = bookings.filter(start_time__gte=self._parse_date(options["since"]))
+        if options["until"]:
+            bookings = bookings.filter(
+                start_time__lt=self._parse_date(options["until"]) + datetime.timedelta(days=1)
+            )
+
+        report = replay_revenue(bookings, tariffs, chunk_size=options["chunk_size"])
+        plates = dict(
+            Car.objects.filter(id__in=[row["car_id"] for row in report["per_car"]])
+            .values_list("id", "license_plate")
+        )
+
+        car_header = ["Автомобіль", "Оренд", "Хвилин"] + report["tariffs"]
+        car_rows = [
+            [plates.get(row["car_id"], row["car_id"]), row["bookings"], row["minutes"]] + row["revenue"]
+            for row in report["per_car"]
+        ]
+        hour_header = ["Година"] + report["tariffs"] + [f"прогноз {name}" for name in report["tariffs"]]
+        hour_rows = [
+            [f"{row['hour']:02d}:00"] + row["revenue"] + row["forecast"]
+            for row in report["per_hour"]
+        ]
+
+        self.stdout.write(
+            f"Оренд: {report['bookings']}, хвилин: {report['minutes']}, днів: {report['days']}"
+        )
+        for name, total in zip(report["tariffs"], report["total"]):
+            self.stdout.write(f"Виручка ({name}): {total:.2f} ₴")
+
+        self.stdout.write("\nВиручка за автомобілями")
+        self._write_table(car_header, car_rows)
+        self.stdout.write("\nВиручка за годинами доби")
+        self._write_table(hour_header, hour_rows)
+
+        if options["csv"]:
+            os.makedirs(options["csv"], exist_ok=True)
+            self._write_csv(os.path.join(options["csv"], "revenue_per_car.csv"), car_header, car_rows)
+            self._write_csv(os.path.join(options["csv"], "revenue_per_hour.csv"), hour_header, hour_rows)
+            self.stdout.write(self.style.SUCCESS(f"Таблиці записано у {options['csv']}"))
+
+    def _parse_date(self, value):
+        """Перетворює рядок YYYY-MM-DD на початок доби за локальним часом"""
+        try:
+            date = datetime.datetime.strptime(value, "%Y-%m-%d")
+        except ValueError:
+            raise CommandError(f"Некоректна дата: {value}")
+        return timezone.make_aware(date)
+
+    def _write_table(self, header, rows):
+        """Виводить таблицю з вирівняними стовпцями"""
+        cells = [[str(value) for value in row] for row in [header] + rows]
+        widths = [max(len(row[index]) for row in cells) for index in range(len(header))]
+        for row in cells:
+            self.stdout.write("  ".join(value.rjust(width) for value, width in zip(row, widths)))
+
+    def _write_csv(self, path, header, rows):
+        """Записує таблицю у файл CSV"""
+        with open(path, "w", encoding="utf-8", newline="") as output:
+            writer = csv.writer(output)
+            writer.writerow(header)
+            writer.writerows(rows)
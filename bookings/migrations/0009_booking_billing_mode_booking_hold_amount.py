@@ -0,0 +1,24 @@
+# Generated by Django 5.2 on 2026-10-18 12:22
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0008_alter_booking_status_alter_bookinghistory_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='billing_mode',
+            field=models.CharField(choices=[('minute', 'Щохвилинне списання'), ('accrual', 'Накопичення з розрахунком при завершенні')], default='minute', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='hold_amount',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=10),
+        ),
+    ]
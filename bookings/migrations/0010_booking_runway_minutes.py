@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 12:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0009_booking_billing_mode_booking_hold_amount'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='runway_minutes',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2 on 2026-10-18 12:33
+
+from django.db import migrations, models
+from django.db.models.functions import Cast, Round
+
+
+def amounts_to_kopecks(apps, schema_editor):
+    """Переносить заблоковані суми в гривнях у поле в копійках"""
+    apps.get_model("bookings", "Booking").objects.update(
+        hold_kopecks=Cast(Round(models.F("hold_amount") * 100), models.BigIntegerField()),
+    )
+
+def kopecks_to_amounts(apps, schema_editor):
+    """Переносить заблоковані суми в копійках назад у поле в гривнях"""
+    apps.get_model("bookings", "Booking").objects.update(
+        hold_amount=models.F("hold_kopecks") / 100.0,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0010_booking_runway_minutes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='hold_kopecks',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.RunPython(amounts_to_kopecks, kopecks_to_amounts),
+        migrations.RemoveField(
+            model_name='booking',
+            name='hold_amount',
+        ),
+    ]
@@ -0,0 +1,86 @@
+# Generated by Django 5.2 on 2026-10-18 13:07
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0011_booking_hold_kopecks_and_more'),
+        ('cars', '0015_zone_zonecell'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CarDailyMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('trips', models.PositiveIntegerField(default=0)),
+                ('located_trips', models.PositiveIntegerField(default=0)),
+                ('minutes', models.PositiveIntegerField(default=0)),
+                ('distance_km', models.FloatField(default=0)),
+                ('max_distance_km', models.FloatField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DailyDisplacementCell',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('cell', models.CharField(max_length=12)),
+                ('pickups', models.PositiveIntegerField(default=0)),
+                ('returns', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='analytics_processed',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='pickup_latitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='pickup_longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='return_latitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='return_longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='trip_distance_km',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(condition=models.Q(('analytics_processed', False), ('status', 'completed')), fields=['end_time'], name='booking_analytics_pending_idx'),
+        ),
+        migrations.AddField(
+            model_name='cardailymovement',
+            name='car',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_movements', to='cars.car'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='dailydisplacementcell',
+            unique_together={('date', 'cell')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='cardailymovement',
+            unique_together={('date', 'car')},
+        ),
+    ]
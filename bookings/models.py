@@ -4,6 +4,8 @@ from django.core.exceptions import ValidationError
 from django.db import models
 from django.utils import timezone
 
+from utils.money import money_property
+
 
 class Booking(models.Model):
     """Модель для бронювання автомобілів"""
@@ -16,6 +18,11 @@ class Booking(models.Model):
         ("cancelled", "Скасовано")
     ]
 
+    BILLING_MODE_CHOICES = [
+        ("minute", "Щохвилинне списання"),
+        ("accrual", "Накопичення з розрахунком при завершенні")
+    ]
+
     user = models.ForeignKey(
         "users.User",
         on_delete=models.CASCADE,
@@ -34,6 +41,17 @@ class Booking(models.Model):
     # Локації
     pickup_location = models.CharField(max_length=255, blank=True)  # Локація, де забирають автомобіль
     return_location = models.CharField(max_length=255, blank=True)  # Локація, де повертають автомобіль
+    pickup_latitude = models.FloatField(null=True, blank=True)  # Широта місця отримання
+    pickup_longitude = models.FloatField(null=True, blank=True)  # Довгота місця отримання
+    return_latitude = models.FloatField(null=True, blank=True)  # Широта місця повернення
+    return_longitude = models.FloatField(null=True, blank=True)  # Довгота місця повернення
+    trip_distance_km = models.FloatField(
+        null=True,
+        blank=True
+    )  # Відстань між місцями отримання та повернення в кілометрах (заповнюється аналітикою поїздок)
+    analytics_processed = models.BooleanField(
+        default=False
+    )  # Чи врахована завершена оренда в денній аналітиці поїздок
 
     # Статус та інформація
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending")  # Статус бронювання
@@ -46,6 +64,29 @@ class Booking(models.Model):
     # Інформація про оплату
     last_billing_time = models.DateTimeField(null=True, blank=True)  # Час останнього виставлення рахунку
     minutes_billed = models.PositiveIntegerField(default=0)  # Кількість хвилин, за які виставлено рахунок
+    billing_mode = models.CharField(
+        max_length=20,
+        choices=BILLING_MODE_CHOICES,
+        default="minute"
+    )  # Режим білінгу, з яким розпочато оренду
+    hold_kopecks = models.BigIntegerField(
+        default=0
+    )  # Сума в копійках, заблокована на балансі під оренду в режимі накопичення
+    runway_minutes = models.PositiveIntegerField(
+        null=True,
+        blank=True
+    )  # На скільки хвилин оренди вистачить балансу користувача (None - невідомо)
+
+    hold_amount = money_property("hold_kopecks")  # Заблокована сума в гривнях
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["end_time"],
+                condition=models.Q(status="completed", analytics_processed=False),
+                name="booking_analytics_pending_idx"
+            ),  # Пошук завершених оренд, ще не врахованих в аналітиці поїздок
+        ]
 
     def __str__(self):
         return f"Booking {self.id} - {self.car} ({self.status})"
@@ -101,3 +142,47 @@ class BookingHistory(models.Model):
 
     def __str__(self):
         return f"History {self.booking.id} - {self.status} ({self.timestamp})"
+
+class CarDailyMovement(models.Model):
+    """
+    Модель для денної статистики поїздок автомобіля.
+
+    Заповнюється задачею аналітики поїздок (bookings.trip_analytics) за днем завершення оренди,
+    тому звіти не перераховують бронювання і не розбирають рядки місць отримання та повернення.
+    """
+
+    date = models.DateField()  # День завершення оренд за локальним часом
+    car = models.ForeignKey(
+        "cars.Car",
+        on_delete=models.CASCADE,
+        related_name="daily_movements"
+    )  # Автомобіль
+    trips = models.PositiveIntegerField(default=0)  # Кількість завершених оренд
+    located_trips = models.PositiveIntegerField(default=0)  # Кількість оренд з відомими місцями отримання та повернення
+    minutes = models.PositiveIntegerField(default=0)  # Кількість оплачених хвилин
+    distance_km = models.FloatField(default=0)  # Сумарна відстань між місцями отримання та повернення
+    max_distance_km = models.FloatField(default=0)  # Найбільша відстань однієї оренди
+
+    class Meta:
+        unique_together = ("date", "car")
+
+    def __str__(self):
+        return f"{self.car} за {self.date}: {self.trips} поїздок"
+
+class DailyDisplacementCell(models.Model):
+    """
+    Модель для денної кількості отримань та повернень автомобілів у клітинці геохешу.
+
+    Різниця між поверненнями та отриманнями показує, де автомобілі накопичуються, а звідки їх забирають.
+    """
+
+    date = models.DateField()  # День завершення оренд за локальним часом
+    cell = models.CharField(max_length=12)  # Геохеш клітинки
+    pickups = models.PositiveIntegerField(default=0)  # Кількість оренд, розпочатих у клітинці
+    returns = models.PositiveIntegerField(default=0)  # Кількість оренд, завершених у клітинці
+
+    class Meta:
+        unique_together = ("date", "cell")
+
+    def __str__(self):
+        return f"{self.cell} за {self.date}: +{self.returns} / -{self.pickups}"
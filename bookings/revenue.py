@@ -0,0 +1,164 @@
+import datetime
+import itertools
+
+import numpy as np
+from django.utils import timezone
+
+
+# Кількість бронювань, які завантажуються з бази даних і обробляються за один крок
+REPLAY_CHUNK_SIZE = 50000
+
+MINUTES_PER_DAY = 24 * 60
+
+# Початок відліку локального часу в хвилинах
+LOCAL_EPOCH = datetime.datetime(1970, 1, 1)
+
+
+def local_minute(value):
+    """
+    Повертає кількість хвилин від початку відліку до моменту value за локальним часом.
+
+    Args:
+        value: Момент часу з часовою зоною.
+
+    Returns:
+        int: Номер хвилини за локальним часом.
+    """
+    local = timezone.localtime(value).replace(tzinfo=None)
+    return int((local - LOCAL_EPOCH).total_seconds()) // 60
+
+def iter_booking_arrays(bookings, chunk_size=REPLAY_CHUNK_SIZE):
+    """
+    Потоково завантажує бронювання порціями у масиви NumPy.
+
+    Args:
+        bookings: QuerySet завершених бронювань.
+        chunk_size: Кількість бронювань у порції.
+
+    Yields:
+        dict: Масиви car_id, start_minute (локальна хвилина початку), minutes (оплачені хвилини)
+        та price (ціна хвилини автомобіля).
+    """
+    rows = bookings.values_list(
+        "car_id", "start_time", "end_time", "minutes_billed", "car__price_per_minute"
+    ).iterator(chunk_size=chunk_size)
+
+    while True:
+        chunk = list(itertools.islice(rows, chunk_size))
+        if not chunk:
+            return
+
+        car_ids, starts, ends, minutes_billed, prices = zip(*chunk)
+        start_minutes = np.fromiter((local_minute(start) for start in starts), dtype=np.int64, count=len(chunk))
+        end_minutes = np.fromiter(
+            (local_minute(end) if end else local_minute(start) for start, end in zip(starts, ends)),
+            dtype=np.int64,
+            count=len(chunk),
+        )
+        minutes = np.array(minutes_billed, dtype=np.int64)
+
+        # Якщо оплачені хвилини не записані, використати тривалість оренди
+        minutes = np.where(minutes > 0, minutes, np.maximum(end_minutes - start_minutes, 0))
+
+        yield {
+            "car_id": np.array(car_ids, dtype=np.int64),
+            "start_minute": start_minutes,
+            "minutes": minutes,
+            "price": np.array(prices, dtype=np.float64),
+        }
+
+def tariff_prices(prices, tariffs):
+    """
+    Розраховує ціну хвилини кожного бронювання для кожного тарифу.
+
+    Args:
+        prices: Масив поточних цін хвилини бронювань.
+        tariffs: Список тарифів (назва, множник ціни, фіксована ціна хвилини або None).
+
+    Returns:
+        numpy.ndarray: Матриця цін розміром (кількість тарифів, кількість бронювань).
+    """
+    multipliers = np.array([multiplier for _, multiplier, _ in tariffs], dtype=np.float64)
+    flat_prices = np.array([np.nan if price is None else price for _, _, price in tariffs], dtype=np.float64)
+
+    return np.where(
+        np.isnan(flat_prices)[:, None],
+        prices[None, :] * multipliers[:, None],
+        flat_prices[:, None],
+    )
+
+def replay_revenue(bookings, tariffs, chunk_size=REPLAY_CHUNK_SIZE):
+    """
+    Векторизовано відтворює хвилинний білінг завершених бронювань за різними тарифами.
+
+    Кожне бронювання розгортається в окремі оплачені хвилини, тому виручка розподіляється між годинами доби
+    так само, як її списував би хвилинний білінг. Прогноз на добу - середня виручка за кожну годину доби
+    за дні, у які були оренди.
+
+    Args:
+        bookings: QuerySet завершених бронювань.
+        tariffs: Список тарифів (назва, множник ціни, фіксована ціна хвилини або None).
+        chunk_size: Кількість бронювань у порції.
+
+    Returns:
+        dict: Назви тарифів, загальна статистика, таблиці виручки за автомобілями та за годинами доби.
+    """
+    tariff_count = len(tariffs)
+    hourly = np.zeros((tariff_count, 24))
+    car_bookings = np.zeros(0, dtype=np.int64)
+    car_minutes = np.zeros(0, dtype=np.int64)
+    car_revenue = np.zeros((tariff_count, 0))
+    days = set()
+
+    for chunk in iter_booking_arrays(bookings, chunk_size):
+        car_ids, minutes = chunk["car_id"], chunk["minutes"]
+        prices = tariff_prices(chunk["price"], tariffs)
+
+        # Розширити масиви автомобілів, якщо в порції є більші id
+        size = max(len(car_minutes), int(car_ids.max()) + 1)
+        if size > len(car_minutes):
+            car_bookings = np.pad(car_bookings, (0, size - len(car_bookings)))
+            car_minutes = np.pad(car_minutes, (0, size - len(car_minutes)))
+            car_revenue = np.pad(car_revenue, ((0, 0), (0, size - car_revenue.shape[1])))
+
+        car_bookings += np.bincount(car_ids, minlength=size)
+        car_minutes += np.bincount(car_ids, weights=minutes, minlength=size).astype(np.int64)
+        for index in range(tariff_count):
+            car_revenue[index] += np.bincount(car_ids, weights=prices[index] * minutes, minlength=size)
+
+        # Розгорнути бронювання в окремі оплачені хвилини
+        booking_index = np.repeat(np.arange(len(minutes)), minutes)
+        offsets = np.arange(len(booking_index)) - np.repeat(np.cumsum(minutes) - minutes, minutes)
+        minute_times = chunk["start_minute"][booking_index] + offsets
+        hours = (minute_times // 60) % 24
+        for index in range(tariff_count):
+            hourly[index] += np.bincount(hours, weights=prices[index][booking_index], minlength=24)
+        days.update(np.unique(minute_times // MINUTES_PER_DAY).tolist())
+
+    day_count = len(days)
+    forecast = hourly / day_count if day_count else np.zeros_like(hourly)
+
+    return {
+        "tariffs": [name for name, _, _ in tariffs],
+        "bookings": int(car_bookings.sum()),
+        "minutes": int(car_minutes.sum()),
+        "days": day_count,
+        "total": [round(float(value), 2) for value in car_revenue.sum(axis=1)],
+        "per_car": [
+            {
+                "car_id": int(car_id),
+                "bookings": int(car_bookings[car_id]),
+                "minutes": int(car_minutes[car_id]),
+                "revenue": [round(float(value), 2) for value in car_revenue[:, car_id]],
+            }
+            for car_id in np.flatnonzero(car_bookings)
+        ],
+        "per_hour": [
+            {
+                "hour": hour,
+                "revenue": [round(float(value), 2) for value in hourly[:, hour]],
+                "forecast": [round(float(value), 2) for value in forecast[:, hour]],
+            }
+            for hour in range(24)
+        ],
+    }
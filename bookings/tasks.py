@@ -1,80 +1,162 @@
-from decimal import Decimal
+from collections import defaultdict
+from functools import partial
 
-from django.db import transaction
+from celery import chord
+from django.conf import settings
+from django.db.models.functions import Mod
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 
 from carsharing.celery import app
 
+from .billing import bill_active_bookings, merge_billing_stats
+from .billing_queue import (
+    acquire_billing_lease,
+    heartbeat_billing_lease,
+    pop_due_bookings,
+    record_finished_run,
+    record_skipped_run,
+    release_billing_lease,
+    schedule_active_bookings,
+)
 from .models import Booking
+from .trip_analytics import update_trip_analytics
 
 
 @app.task
 def process_minute_billing():
     """
-    Обробка білінгу для активних бронювань.
+    Координатор білінгу для активних бронювань.
 
-    Ця задача виконує списання коштів за хвилини використання автомобіля для всіх активних бронювань.
-    Перевіряє баланс користувача та автоматично завершує бронювання при нестачі коштів.
+    Ця задача запускається планувальником кожні BILLING_POLL_INTERVAL секунд і вибирає з черги білінгу
+    в Redis лише ті бронювання, для яких настав час списання. Вибрані бронювання розподіляються між
+    BILLING_SHARDS шардами (за остачею від ділення id користувача, щоб усі бронювання одного користувача
+    та його баланс оброблялися одним воркером), і для кожного непорожнього шарду запускається підзадача
+    у вигляді групи Celery. Після завершення всіх шардів їхня статистика збирається задачею
+    collect_billing_stats. Якщо черга вимкнена або Redis недоступний, кожен шард переглядає всі свої
+    активні бронювання.
+
+    Запуск утримує блокування в Redis від вибору бронювань до збору статистики шардів. Якщо попередній
+    запуск ще не завершився, поточний пропускається і записується як пропущений; пропущені хвилини
+    списуються наступним запуском за один прохід. Якщо Redis недоступний, запуск виконується без
+    блокування, а від повторного списання захищає блокування рядків бронювань у транзакції порції.
 
     Args:
         Немає прямих аргументів, оскільки це Celery-задача, яка викликається планувальником.
 
     Returns:
-        None: Функція не повертає значення, але оновлює стан бронювань, автомобілів і
-        балансів користувачів у базі даних.
+        str | None: Ідентифікатор задачі, яка збере статистику шардів, або None, якщо запуск пропущено
+        чи списувати нічого.
     """
     now = timezone.now()
-    active_bookings = Booking.objects.filter(
-        status="active"
-    )
-
-    for booking in active_bookings:
-        with transaction.atomic():
-            # Отримати баланс користувача
-            try:
-                user_balance = booking.user.balance
-            except:
-                # Якщо у користувача немає балансу, завершити бронювання
-                booking.status = "completed"
-                booking.end_time = now
-                booking.save()
-
-                # Оновити статус автомобіля
-                car = booking.car
-                car.status = "available"
-                car.save()
-                continue
-
-            # Розрахувати неоплачені хвилини
-            if booking.last_billing_time:
-                time_diff = now - booking.last_billing_time
-                minutes_to_bill = int(time_diff.total_seconds() / 60)
-            else:
-                # Якщо це перший білінг, почати з поточного моменту
-                minutes_to_bill = 1
-                booking.last_billing_time = now
-
-            if minutes_to_bill > 0:
-                # Вартість неоплачених хвилин
-                amount_to_bill = booking.car.price_per_minute * Decimal(str(minutes_to_bill))
-
-                # Перевірити, чи достатньо коштів
-                if user_balance.amount >= amount_to_bill:
-                    # Списати гроші
-                    user_balance.amount -= amount_to_bill
-                    user_balance.save()
-
-                    # Оновити час останнього білінгу та кількість оплачуваних хвилин
-                    booking.last_billing_time = now
-                    booking.minutes_billed += minutes_to_bill
-                    booking.save()
-                else:
-                    # Недостатньо коштів - завершити бронювання
-                    booking.status = "completed"
-                    booking.end_time = now
-                    booking.save()
-
-                    # Оновити статус автомобіля
-                    car = booking.car
-                    car.status = "available"
-                    car.save()
+    shards = settings.BILLING_SHARDS
+
+    lease_token = acquire_billing_lease()
+    if lease_token is None:
+        record_skipped_run(now)
+        return None
+
+    due = pop_due_bookings(now)
+
+    if due is None:
+        header = [process_billing_shard.s(shard, shards, now.isoformat(), None, lease_token) for shard in range(shards)]
+    else:
+        shard_bookings = defaultdict(list)
+        for booking_id, user_id in due:
+            shard_bookings[user_id % shards].append(booking_id)
+        header = [
+            process_billing_shard.s(shard, shards, now.isoformat(), booking_ids, lease_token)
+            for shard, booking_ids in sorted(shard_bookings.items())
+        ]
+
+    if not header:
+        release_billing_lease(lease_token)
+        return None
+
+    result = chord(header)(collect_billing_stats.s(now.isoformat(), lease_token))
+    return result.id
+
+@app.task
+def process_billing_shard(shard, shards, now, booking_ids=None, lease_token=None):
+    """
+    Обробка білінгу для одного шарду активних бронювань.
+
+    Виконує списання коштів за хвилини використання автомобіля для бронювань шарду.
+    Перевіряє баланс користувача та автоматично завершує бронювання при нестачі коштів.
+    Бронювання, вибрані з черги, після білінгу повертаються до неї з часом наступного списання.
+
+    Args:
+        shard: Номер шарду (від 0 до shards - 1).
+        shards: Загальна кількість шардів.
+        now: Момент білінгу у форматі ISO 8601, спільний для всіх шардів.
+        booking_ids: Список id бронювань шарду, вибраних з черги білінгу (None - усі активні бронювання шарду).
+        lease_token: Токен блокування запуску білінгу, яке продовжується після кожної порції.
+            Якщо блокування втрачене, обробка шарду припиняється, щоб не списати кошти двічі.
+
+    Returns:
+        dict: Статистика білінгу шарду (оброблено, списано, завершено, хвилини, сума, чи перервано обробку).
+    """
+    if booking_ids is None:
+        bookings = Booking.objects.annotate(shard=Mod("user_id", shards)).filter(shard=shard)
+    else:
+        bookings = Booking.objects.all()
+
+    heartbeat = partial(heartbeat_billing_lease, lease_token) if lease_token is not None else None
+    stats = bill_active_bookings(parse_datetime(now), bookings, booking_ids, heartbeat)
+
+    # Повернути до черги бронювання, які залишилися активними
+    if booking_ids is not None:
+        chunk_size = settings.BILLING_CHUNK_SIZE
+        for start in range(0, len(booking_ids), chunk_size):
+            schedule_active_bookings(Booking.objects.filter(id__in=booking_ids[start:start + chunk_size]))
+
+    stats["shard"] = shard
+    return stats
+
+@app.task
+def collect_billing_stats(results, now, lease_token=None):
+    """
+    Збір статистики білінгу з усіх шардів та завершення запуску.
+
+    Args:
+        results: Список статистик, повернених задачами process_billing_shard.
+        now: Момент білінгу у форматі ISO 8601.
+        lease_token: Токен блокування запуску білінгу, яке потрібно зняти.
+
+    Returns:
+        dict: Сумарна статистика білінгу та статистика кожного шарду.
+    """
+    if lease_token is not None:
+        release_billing_lease(lease_token)
+
+    stats = merge_billing_stats(results)
+    stats["billing_time"] = now
+    stats["overrun"] = record_finished_run(parse_datetime(now), timezone.now())
+    stats["shards"] = sorted(results, key=lambda result: result["shard"])
+    return stats
+
+@app.task
+def rebuild_billing_queue():
+    """
+    Відновлення черги білінгу в Redis.
+
+    Додає до черги активні бронювання, яких у ній немає (наприклад, після очищення Redis або
+    зміни статусу через панель адміністратора). Час списання бронювань, які вже є в черзі, не змінюється.
+
+    Returns:
+        bool: True, якщо черга оновлена.
+    """
+    return schedule_active_bookings(Booking.objects.all(), only_new=True)
+
+@app.task
+def refresh_trip_analytics():
+    """
+    Додавання нових завершених оренд до денної аналітики поїздок.
+
+    Розбирає місця отримання та повернення нових завершених оренд, векторизовано обчислює відстані поїздок
+    і перераховує денну статистику автомобілів та карту переміщень за дні, в яких з'явилися нові оренди.
+
+    Returns:
+        dict: Кількість оброблених оренд, перерахованих днів та оренд у цих днях.
+    """
+    return update_trip_analytics()
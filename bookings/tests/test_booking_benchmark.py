@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+from django.test import TestCase, override_settings
+
+from bookings.benchmark import generate_fleet, run_billing_benchmark
+from bookings.models import Booking
+from cars.models import Car
+from users.models import UserBalance
+
+
+class BillingBenchmarkTest(TestCase):
+    """Тести бенчмарку білінгу"""
+
+    def test_generate_fleet_creates_active_rentals(self):
+        """Тест масового створення синтетичного автопарку"""
+        fleet = generate_fleet(users=3, cars=4, bookings=6)
+
+        self.assertEqual(fleet, {"users": 3, "cars": 4, "bookings": 6})
+        self.assertEqual(UserBalance.objects.count(), 3)
+        self.assertEqual(Car.objects.count(), 4)
+        self.assertEqual(Booking.objects.filter(status="active").count(), 6)
+
+    @override_settings(BILLING_CHUNK_SIZE=2)
+    def test_run_billing_benchmark_bills_every_rental(self):
+        """Тест вимірювання тіку білінгу для всіх активних оренд"""
+        generate_fleet(users=2, cars=5, bookings=5)
+
+        result = run_billing_benchmark(ticks=1)
+
+        self.assertEqual(result["active_rentals"], 5)
+        self.assertEqual(result["billed"], 5)
+        self.assertGreater(result["queries"], 0)
+        self.assertLess(result["queries_per_booking"], 5)
+        self.assertGreater(result["peak_memory_mb"], 0)
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+import datetime
+import os
+import tempfile
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from bookings.models import Booking
+from bookings.revenue import replay_revenue
+from cars.models import Car, CarBrand, CarModel
+from users.models import User
+
+
+class RevenueReplayTest(TestCase):
+    """Тести відтворення виручки за тарифами"""
+
+    def setUp(self):
+        """Налаштування тестового середовища"""
+        self.user = User.objects.create_user(
+            username="revenueuser",
+            email="revenue@example.com",
+            password="testpassword123"
+        )
+        model = CarModel.objects.create(brand=CarBrand.objects.create(name="RevenueBrand"), name="RevenueModel")
+        self.cars = [
+            Car.objects.create(
+                model=model,
+                year=2023,
+                license_plate=license_plate,
+                color="Сірий",
+                mileage=1000,
+                fuel_type="petrol",
+                transmission="automatic",
+                price_per_minute=price,
+                seats=5,
+                insurance_valid_until=timezone.now().date() + datetime.timedelta(days=365),
+                technical_inspection_valid_until=timezone.now().date() + datetime.timedelta(days=365),
+                main_photo="car_photos/test.jpg"
+            )
+            for license_plate, price in (("RV0001RV", Decimal("2.00")), ("RV0002RV", Decimal("1.00")))
+        ]
+        # Оренда через межу годин: 30 хвилин о 10:xx та 30 хвилин об 11:xx
+        self.create_completed_booking(self.cars[0], datetime.datetime(2025, 3, 10, 10, 30), 60)
+        # Оренда іншого дня: 60 хвилин о 10:xx
+        self.create_completed_booking(self.cars[1], datetime.datetime(2025, 3, 11, 10, 0), 60)
+
+    def create_completed_booking(self, car, start, minutes):
+        """Створити завершене бронювання з початком start за локальним часом (в обхід перевірки часу початку)"""
+        start_time = timezone.make_aware(start)
+        Booking.objects.bulk_create([
+            Booking(
+                user=self.user,
+                car=car,
+                start_time=start_time,
+                end_time=start_time + datetime.timedelta(minutes=minutes),
+                status="completed",
+                minutes_billed=minutes,
+                total_price=car.price_per_minute * minutes
+            )
+        ])
+
+    def test_replay_distributes_minutes_between_hours(self):
+        """Тест розподілу виручки між годинами доби за оплаченими хвилинами"""
+        report = replay_revenue(Booking.objects.filter(status="completed"), [("поточний", 1.0, None)], chunk_size=1)
+
+        hours = {row["hour"]: row for row in report["per_hour"]}
+        self.assertEqual(report["bookings"], 2)
+        self.assertEqual(report["minutes"], 120)
+        self.assertEqual(report["days"], 2)
+        self.assertEqual(report["total"], [180.0])
+        self.assertEqual(hours[10]["revenue"], [120.0])
+        self.assertEqual(hours[11]["revenue"], [60.0])
+        self.assertEqual(hours[10]["forecast"], [60.0])
+        self.assertEqual(hours[9]["revenue"], [0.0])
+
+    def test_replay_applies_tariffs(self):
+        """Тест відтворення виручки за множником та фіксованою ціною хвилини"""
+        tariffs = [("поточний", 1.0, None), ("x1.5", 1.5, None), ("3.00", 1.0, 3.0)]
+
+        report = replay_revenue(Booking.objects.filter(status="completed"), tariffs)
+
+        per_car = {row["car_id"]: row for row in report["per_car"]}
+        self.assertEqual(report["total"], [180.0, 270.0, 360.0])
+        self.assertEqual(per_car[self.cars[0].id]["revenue"], [120.0, 180.0, 180.0])
+        self.assertEqual(per_car[self.cars[1].id]["revenue"], [60.0, 90.0, 180.0])
+
+    def test_command_writes_tables(self):
+        """Тест виведення таблиць та запису CSV командою"""
+        output = StringIO()
+        with tempfile.TemporaryDirectory() as directory:
+            call_command(
+                "replay_revenue", "--since", "2025-03-11", "--multiplier", "2", "--csv", directory, stdout=output
+            )
+
+            self.assertTrue(os.path.exists(os.path.join(directory, "revenue_per_car.csv")))
+            self.assertTrue(os.path.exists(os.path.join(directory, "revenue_per_hour.csv")))
+
+        self.assertIn("Оренд: 1", output.getvalue())
+        self.assertIn("Виручка (x2): 120.00 ₴", output.getvalue())
+        self.assertIn("RV0002RV", output.getvalue())
@@ -0,0 +1,526 @@
+# -*- coding: utf-8 -*-
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from redis import RedisError
+
+from bookings.billing import refresh_runway
+from bookings.billing_queue import BILLING_QUEUE_KEY, BILLING_RUNS_KEY, booking_due_time, pop_due_bookings
+from bookings.models import Booking
+from bookings.tasks import collect_billing_stats, process_billing_shard, process_minute_billing
+from cars.models import Car, CarBrand, CarCatalogEntry, CarModel
+from users.models import User, UserBalance
+
+
+class BillingTestCase(TestCase):
+    """Базовий клас тестів білінгу з допоміжними методами"""
+
+    def setUp(self):
+        """Налаштування тестового середовища"""
+        self.user = User.objects.create_user(
+            username="billinguser",
+            email="billing@example.com",
+            password="testpassword123"
+        )
+        self.brand = CarBrand.objects.create(name="BillingBrand")
+        self.model = CarModel.objects.create(brand=self.brand, name="BillingModel")
+        self.balance = UserBalance.objects.create(user=self.user, amount=Decimal("100.00"))
+
+    def create_car(self, license_plate, price_per_minute=Decimal("2.50")):
+        """Створити тестовий автомобіль"""
+        return Car.objects.create(
+            model=self.model,
+            year=2023,
+            license_plate=license_plate,
+            color="Сірий",
+            mileage=1000,
+            fuel_type="petrol",
+            transmission="automatic",
+            price_per_minute=price_per_minute,
+            seats=5,
+            insurance_valid_until=timezone.now().date() + timedelta(days=365),
+            technical_inspection_valid_until=timezone.now().date() + timedelta(days=365),
+            main_photo="car_photos/test.jpg"
+        )
+
+    def create_active_booking(self, car, minutes_ago, user=None, billing_mode="minute", hold_amount=Decimal("0.00")):
+        """Створити активне бронювання, останній білінг якого був minutes_ago хвилин тому"""
+        now = timezone.now()
+        booking = Booking.objects.create(
+            user=user or self.user,
+            car=car,
+            start_time=now,
+            end_time=now + timedelta(days=1),
+            status="active",
+            total_price=Decimal("0.00"),
+            last_billing_time=now,
+            billing_mode=billing_mode,
+            hold_amount=hold_amount
+        )
+        Booking.objects.filter(pk=booking.pk).update(
+            last_billing_time=now - timedelta(minutes=minutes_ago, seconds=5)
+        )
+        return booking
+
+    def run_billing(self, shard=0, shards=1):
+        """Запустити білінг одного шарду"""
+        return process_billing_shard(shard, shards, timezone.now().isoformat())
+
+class MinuteBillingTaskTest(BillingTestCase):
+    """Тести задачі хвилинного білінгу"""
+
+    def test_billing_debits_balance(self):
+        """Тест списання коштів за неоплачені хвилини"""
+        booking = self.create_active_booking(self.create_car("AA0001AA"), minutes_ago=2)
+
+        stats = self.run_billing()
+
+        booking.refresh_from_db()
+        self.balance.refresh_from_db()
+        self.assertEqual(self.balance.get_amount(), Decimal("95.00"))
+        self.assertEqual(booking.minutes_billed, 2)
+        self.assertEqual(booking.status, "active")
+        self.assertEqual(stats["billed"], 1)
+        self.assertEqual(stats["amount"], "5.00")
+
+    def test_billing_advances_last_billing_time_by_billed_minutes(self):
+        """Тест зсуву часу білінгу рівно на оплачені хвилини без втрати неповної хвилини"""
+        booking = self.create_active_booking(self.create_car("AA0007AA"), minutes_ago=2)
+        booking.refresh_from_db()
+        previous_billing_time = booking.last_billing_time
+
+        self.run_billing()
+
+        booking.refresh_from_db()
+        self.assertEqual(booking.last_billing_time, previous_billing_time + timedelta(minutes=2))
+
+    def test_billing_skips_bookings_without_full_minute(self):
+        """Тест відсутності списання, якщо не минула повна хвилина"""
+        booking = self.create_active_booking(self.create_car("AA0002AA"), minutes_ago=0)
+
+        self.run_billing()
+
+        booking.refresh_from_db()
+        self.balance.refresh_from_db()
+        self.assertEqual(self.balance.get_amount(), Decimal("100.00"))
+        self.assertEqual(booking.minutes_billed, 0)
+
+    def test_billing_completes_booking_on_insufficient_funds(self):
+        """Тест примусового завершення бронювання при нестачі коштів"""
+        car = self.create_car("AA0003AA", price_per_minute=Decimal("60.00"))
+        booking = self.create_active_booking(car, minutes_ago=2)
+
+        stats = self.run_billing()
+
+        booking.refresh_from_db()
+        car.refresh_from_db()
+        self.balance.refresh_from_db()
+        self.assertEqual(booking.status, "completed")
+        self.assertIsNotNone(booking.end_time)
+        self.assertEqual(car.status, "available")
+        self.assertEqual(self.balance.get_amount(), Decimal("100.00"))
+        self.assertEqual(stats["completed"], 1)
+
+    def test_billing_does_not_spend_held_amount(self):
+        """Тест завершення оренди в режимі "minute", якщо вільних коштів без заблокованої суми не вистачає"""
+        self.balance.held_amount = Decimal("60.00")
+        self.balance.save()
+        car = self.create_car("AA0014AA", price_per_minute=Decimal("30.00"))
+        booking = self.create_active_booking(car, minutes_ago=2)
+
+        stats = self.run_billing()
+
+        booking.refresh_from_db()
+        self.balance.refresh_from_db()
+        self.assertEqual(booking.status, "completed")
+        self.assertEqual(self.balance.get_amount(), Decimal("100.00"))
+        self.assertEqual(stats["billed"], 0)
+
+    def test_billing_completion_invalidates_map_tiles(self):
+        """Тест скидання тайлів карти та оновлення каталогу для автомобілів, звільнених білінгом"""
+        car = self.create_car("AA0013AA", price_per_minute=Decimal("60.00"))
+        car.current_latitude = 50.45
+        car.current_longitude = 30.52
+        car.save()
+        self.create_active_booking(car, minutes_ago=2)
+
+        with mock.patch("cars.catalog.invalidate_car_tiles") as invalidate:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.run_billing()
+
+        invalidate.assert_called_once_with([(50.45, 30.52)], {"busy", "available"})
+        self.assertEqual(CarCatalogEntry.objects.get(pk=car.pk).status, "available")
+
+    def test_billing_completes_booking_without_balance(self):
+        """Тест завершення бронювання користувача без балансу"""
+        user = User.objects.create_user(
+            username="nobalance",
+            email="nobalance@example.com",
+            password="testpassword123"
+        )
+        car = self.create_car("AA0004AA")
+        booking = self.create_active_booking(car, minutes_ago=1, user=user)
+
+        self.run_billing()
+
+        booking.refresh_from_db()
+        car.refresh_from_db()
+        self.assertEqual(booking.status, "completed")
+        self.assertEqual(car.status, "available")
+
+    def test_billing_applies_bookings_of_one_user_sequentially(self):
+        """Тест послідовного списання для кількох бронювань одного користувача"""
+        first = self.create_active_booking(self.create_car("AA0005AA", Decimal("30.00")), minutes_ago=2)
+        second = self.create_active_booking(self.create_car("AA0006AA", Decimal("30.00")), minutes_ago=2)
+
+        self.run_billing()
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.balance.refresh_from_db()
+        self.assertEqual(first.status, "active")
+        self.assertEqual(first.minutes_billed, 2)
+        self.assertEqual(second.status, "completed")
+        self.assertEqual(self.balance.get_amount(), Decimal("40.00"))
+
+    @override_settings(BILLING_CHUNK_SIZE=2)
+    def test_billing_query_count_does_not_depend_on_chunk_rows(self):
+        """Тест кількості запитів: кілька масових запитів на порцію замість запитів на кожне бронювання"""
+        for index in range(4):
+            self.create_active_booking(self.create_car(f"AB{index:04d}AB", Decimal("1.00")), minutes_ago=1)
+
+        # 2 порції x (вибірка + списання + оновлення бронювань + 2 savepoints) + остання порожня вибірка
+        # з 2 savepoints, а також читання балансу та розрахунок запасу хвилин (вибірка + оновлення) лише
+        # в першій порції: у другій порції запас хвилин уже відомий
+        with self.assertNumQueries(16):
+            stats = self.run_billing()
+
+        self.balance.refresh_from_db()
+        self.assertEqual(stats["billed"], 4)
+        self.assertEqual(self.balance.get_amount(), Decimal("96.00"))
+
+    def test_shards_partition_bookings_by_user(self):
+        """Тест розподілу бронювань між шардами за користувачем"""
+        users = [self.user]
+        for index in range(3):
+            user = User.objects.create_user(
+                username=f"sharduser{index}",
+                email=f"shard{index}@example.com",
+                password="testpassword123"
+            )
+            UserBalance.objects.create(user=user, amount=Decimal("100.00"))
+            users.append(user)
+        for index, user in enumerate(users):
+            self.create_active_booking(self.create_car(f"AC{index:04d}AC", Decimal("1.00")), minutes_ago=1, user=user)
+
+        results = [self.run_billing(shard, 2) for shard in range(2)]
+
+        self.assertEqual([result["processed"] for result in results], [2, 2])
+        self.assertEqual(sum(result["billed"] for result in results), 4)
+        self.assertEqual(self.run_billing(0, 1)["billed"], 0)
+
+    def test_collect_billing_stats_merges_shards(self):
+        """Тест збору статистики шардів"""
+        results = [
+            {
+                "shard": 1, "processed": 3, "billed": 2, "completed": 1, "minutes": 2,
+                "amount_kopecks": 500, "amount": "5.00",
+            },
+            {
+                "shard": 0, "processed": 1, "billed": 1, "completed": 0, "minutes": 3,
+                "amount_kopecks": 750, "amount": "7.50",
+            },
+        ]
+
+        stats = collect_billing_stats(results, "2025-01-01T00:00:00+00:00")
+
+        self.assertEqual(stats["processed"], 4)
+        self.assertEqual(stats["billed"], 3)
+        self.assertEqual(stats["completed"], 1)
+        self.assertEqual(stats["minutes"], 5)
+        self.assertEqual(stats["amount"], "12.50")
+        self.assertEqual([result["shard"] for result in stats["shards"]], [0, 1])
+
+    @override_settings(BILLING_SHARDS=3)
+    def test_coordinator_dispatches_one_subtask_per_shard(self):
+        """Тест запуску координатором групи підзадач по одній на шард"""
+        with mock.patch("bookings.tasks.chord") as chord_mock:
+            process_minute_billing()
+
+        header = list(chord_mock.call_args.args[0])
+        self.assertEqual([signature.args[:2] for signature in header], [(0, 3), (1, 3), (2, 3)])
+        self.assertEqual(len({signature.args[2] for signature in header}), 1)
+
+@override_settings(BILLING_QUEUE_ENABLED=True, BILLING_SHARDS=2)
+class BillingQueueTest(BillingTestCase):
+    """Тести черги білінгу в Redis"""
+
+    def setUp(self):
+        """Налаштування тестового середовища"""
+        super().setUp()
+        patcher = mock.patch("bookings.billing_queue.get_redis")
+        self.redis = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+
+    def test_pop_due_bookings_parses_members(self):
+        """Тест вибору бронювань, для яких настав час списання"""
+        self.redis.pipeline.return_value.execute.return_value = [["5:7", "9:2"], 2]
+
+        due = pop_due_bookings(timezone.now())
+
+        self.assertEqual(due, [(5, 7), (9, 2)])
+        self.redis.pipeline.return_value.zremrangebyscore.assert_called_once()
+
+    def test_pop_due_bookings_falls_back_when_redis_unavailable(self):
+        """Тест перегляду всіх бронювань, якщо Redis недоступний"""
+        self.redis.pipeline.return_value.execute.side_effect = RedisError
+
+        self.assertIsNone(pop_due_bookings(timezone.now()))
+
+    def test_coordinator_dispatches_only_due_bookings(self):
+        """Тест розподілу між шардами лише тих бронювань, для яких настав час списання"""
+        self.redis.pipeline.return_value.execute.return_value = [["5:7", "9:2", "11:4"], 3]
+
+        with mock.patch("bookings.tasks.chord") as chord_mock:
+            process_minute_billing()
+
+        header = list(chord_mock.call_args.args[0])
+        self.assertEqual([(signature.args[0], signature.args[3]) for signature in header], [(0, [9, 11]), (1, [5])])
+
+    def test_coordinator_skips_tick_without_due_bookings(self):
+        """Тест відсутності підзадач, якщо списувати нічого"""
+        self.redis.pipeline.return_value.execute.return_value = [[], 0]
+
+        with mock.patch("bookings.tasks.chord") as chord_mock:
+            self.assertIsNone(process_minute_billing())
+
+        chord_mock.assert_not_called()
+
+    def test_shard_reschedules_bookings_that_stay_active(self):
+        """Тест повернення до черги бронювань, які залишилися активними після білінгу"""
+        active = self.create_active_booking(self.create_car("AD0001AD", Decimal("1.00")), minutes_ago=1)
+        completed = self.create_active_booking(self.create_car("AD0002AD", Decimal("500.00")), minutes_ago=1)
+
+        process_billing_shard(0, 1, timezone.now().isoformat(), [active.id, completed.id])
+
+        active.refresh_from_db()
+        mapping = self.redis.zadd.call_args.args[1]
+        self.assertEqual(self.redis.zadd.call_args.args[0], BILLING_QUEUE_KEY)
+        self.assertEqual(mapping, {
+            f"{active.id}:{self.user.id}": (active.last_billing_time + timedelta(minutes=1)).timestamp()
+        })
+
+@override_settings(BILLING_LEASE_ENABLED=True)
+class BillingLeaseTest(BillingTestCase):
+    """Тести блокування запуску білінгу"""
+
+    def setUp(self):
+        """Налаштування тестового середовища"""
+        super().setUp()
+        redis_patcher = mock.patch("utils.redis_lease.get_redis")
+        self.redis = redis_patcher.start().return_value
+        self.addCleanup(redis_patcher.stop)
+        runs_patcher = mock.patch("bookings.billing_queue.get_redis", return_value=self.redis)
+        runs_patcher.start()
+        self.addCleanup(runs_patcher.stop)
+
+    def test_coordinator_skips_run_while_previous_holds_lease(self):
+        """Тест пропуску запуску, поки попередній запуск утримує блокування"""
+        self.redis.set.return_value = None
+
+        with mock.patch("bookings.tasks.chord") as chord_mock:
+            self.assertIsNone(process_minute_billing())
+
+        chord_mock.assert_not_called()
+        self.redis.pipeline.return_value.hincrby.assert_called_once_with(BILLING_RUNS_KEY, "skipped", 1)
+
+    def test_coordinator_passes_lease_token_to_shards(self):
+        """Тест передачі токена блокування шардам і задачі збору статистики"""
+        self.redis.set.return_value = True
+
+        with mock.patch("bookings.tasks.chord") as chord_mock:
+            process_minute_billing()
+
+        token = self.redis.set.call_args.args[1]
+        header = list(chord_mock.call_args.args[0])
+        self.assertTrue(all(signature.args[4] == token for signature in header))
+        self.assertEqual(chord_mock.return_value.call_args.args[0].args[1], token)
+
+    def test_coordinator_runs_without_lease_while_redis_is_down(self):
+        """Тест запуску білінгу без блокування, коли Redis недоступний"""
+        self.redis.set.side_effect = RedisError
+
+        with mock.patch("bookings.tasks.chord") as chord_mock:
+            process_minute_billing()
+
+        chord_mock.assert_called_once()
+        self.redis.pipeline.return_value.hincrby.assert_not_called()
+
+    @override_settings(BILLING_CHUNK_SIZE=1)
+    def test_shard_continues_while_redis_is_down(self):
+        """Тест продовження обробки шарду, коли блокування неможливо продовжити через недоступність Redis"""
+        self.redis.eval.side_effect = RedisError
+        for index in range(3):
+            self.create_active_booking(self.create_car(f"AG{index:04d}AG", Decimal("1.00")), minutes_ago=1)
+
+        stats = process_billing_shard(0, 1, timezone.now().isoformat(), None, "token")
+
+        self.assertFalse(stats["aborted"])
+        self.assertEqual(stats["billed"], 3)
+
+    @override_settings(BILLING_CHUNK_SIZE=1)
+    def test_shard_stops_when_lease_is_lost(self):
+        """Тест припинення обробки шарду після втрати блокування"""
+        self.redis.eval.return_value = 0
+        for index in range(3):
+            self.create_active_booking(self.create_car(f"AE{index:04d}AE", Decimal("1.00")), minutes_ago=1)
+
+        stats = process_billing_shard(0, 1, timezone.now().isoformat(), None, "token")
+
+        self.assertTrue(stats["aborted"])
+        self.assertEqual(stats["billed"], 1)
+
+    def test_collect_billing_stats_releases_lease_and_records_overrun(self):
+        """Тест зняття блокування та запису затягнутого запуску"""
+        started_at = (timezone.now() - timedelta(minutes=2)).isoformat()
+
+        stats = collect_billing_stats([], started_at, "token")
+
+        self.assertTrue(stats["overrun"])
+        self.assertEqual(self.redis.eval.call_args.args[2:4], ("billing:lease", "token"))
+        self.redis.pipeline.return_value.hincrby.assert_called_once_with(BILLING_RUNS_KEY, "overrun", 1)
+
+class AccrualBillingTest(BillingTestCase):
+    """Тести білінгу в режимі накопичення"""
+
+    def setUp(self):
+        """Налаштування тестового середовища"""
+        super().setUp()
+        self.car = self.create_car("AF0001AF", Decimal("1.00"))
+        self.balance.held_amount = Decimal("60.00")
+        self.balance.save()
+
+    def test_billing_does_not_write_while_hold_covers_accrued_cost(self):
+        """Тест відсутності записів, поки заблокована сума покриває накопичену вартість"""
+        booking = self.create_active_booking(
+            self.car, minutes_ago=30, billing_mode="accrual", hold_amount=Decimal("60.00")
+        )
+
+        # Неповна порція завершує обхід: вибірка порції та 2 savepoints - без жодного UPDATE
+        with self.assertNumQueries(3):
+            stats = self.run_billing()
+
+        booking.refresh_from_db()
+        self.balance.refresh_from_db()
+        self.assertEqual(stats["billed"], 0)
+        self.assertEqual(self.balance.get_amount(), Decimal("100.00"))
+        self.assertEqual(booking.minutes_billed, 0)
+        self.assertEqual(self.balance.get_current_amount(), Decimal("70.00"))
+
+    def test_billing_tops_up_exhausted_hold(self):
+        """Тест збільшення блокування, коли накопичена вартість досягла заблокованої суми"""
+        booking = self.create_active_booking(
+            self.car, minutes_ago=61, billing_mode="accrual", hold_amount=Decimal("60.00")
+        )
+
+        self.run_billing()
+
+        booking.refresh_from_db()
+        self.balance.refresh_from_db()
+        self.assertEqual(booking.status, "active")
+        self.assertEqual(booking.hold_amount, Decimal("100.00"))
+        self.assertEqual(self.balance.get_held_amount(), Decimal("100.00"))
+        self.assertEqual(self.balance.get_amount(), Decimal("100.00"))
+
+    def test_billing_settles_and_completes_when_hold_cannot_be_topped_up(self):
+        """Тест розрахунку та завершення оренди, коли коштів для продовження немає"""
+        self.balance.held_amount = Decimal("100.00")
+        self.balance.save()
+        booking = self.create_active_booking(
+            self.car, minutes_ago=101, billing_mode="accrual", hold_amount=Decimal("100.00")
+        )
+
+        stats = self.run_billing()
+
+        booking.refresh_from_db()
+        self.balance.refresh_from_db()
+        self.car.refresh_from_db()
+        self.assertEqual(booking.status, "completed")
+        self.assertEqual(booking.minutes_billed, 101)
+        self.assertEqual(booking.total_price, Decimal("100.00"))
+        self.assertEqual(booking.hold_amount, Decimal("0.00"))
+        self.assertEqual(self.balance.get_amount(), Decimal("0.00"))
+        self.assertEqual(self.balance.get_held_amount(), Decimal("0.00"))
+        self.assertEqual(self.car.status, "available")
+        self.assertEqual(stats["completed"], 1)
+
+    def test_accrual_booking_is_due_when_hold_is_exhausted(self):
+        """Тест часу наступної обробки оренди в режимі накопичення"""
+        now = timezone.now()
+
+        self.assertEqual(booking_due_time(now, "accrual", 6000, 250), now + timedelta(minutes=24))
+        self.assertEqual(booking_due_time(now, "accrual", 0, 250), now + timedelta(minutes=1))
+        self.assertEqual(booking_due_time(now), now + timedelta(minutes=1))
+
+
+class RunwayTest(BillingTestCase):
+    """Тести запасу хвилин оренди"""
+
+    def setUp(self):
+        """Налаштування тестового середовища"""
+        super().setUp()
+        self.car = self.create_car("AR0001AR", Decimal("2.00"))
+
+    def test_refresh_runway_divides_balance_by_total_price_per_minute(self):
+        """Тест розрахунку запасу хвилин для всіх оренд користувача"""
+        first = self.create_active_booking(self.car, minutes_ago=0)
+        second = self.create_active_booking(self.create_car("AR0002AR", Decimal("3.00")), minutes_ago=0)
+
+        refresh_runway([self.user.id])
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.runway_minutes, 20)
+        self.assertEqual(second.runway_minutes, 20)
+
+    def test_billing_skips_balance_check_for_bookings_with_runway(self):
+        """Тест списання без читання балансу для оренд із достатнім запасом хвилин"""
+        booking = self.create_active_booking(self.car, minutes_ago=2)
+        Booking.objects.filter(pk=booking.pk).update(runway_minutes=50)
+
+        # Savepoint, вибірка порції, списання, оновлення бронювання та savepoint
+        with self.assertNumQueries(5):
+            stats = self.run_billing()
+
+        booking.refresh_from_db()
+        self.assertEqual(stats["billed"], 1)
+        self.assertEqual(booking.runway_minutes, 48)
+        self.assertEqual(self.balance.get_amount(), Decimal("96.00"))
+
+    def test_billing_checks_balance_when_runway_is_exhausted(self):
+        """Тест перевірки балансу та завершення оренди, коли запасу хвилин не вистачає"""
+        self.balance.amount = Decimal("3.00")
+        self.balance.save()
+        booking = self.create_active_booking(self.car, minutes_ago=2)
+        Booking.objects.filter(pk=booking.pk).update(runway_minutes=1)
+
+        stats = self.run_billing()
+
+        booking.refresh_from_db()
+        self.assertEqual(stats["completed"], 1)
+        self.assertEqual(booking.status, "completed")
+        self.assertEqual(self.balance.get_amount(), Decimal("3.00"))
+
+    def test_top_up_refreshes_runway(self):
+        """Тест оновлення запасу хвилин після поповнення балансу"""
+        booking = self.create_active_booking(self.car, minutes_ago=0)
+        self.client.login(username="billinguser", password="testpassword123")
+
+        self.client.post(reverse("balance"), {"amount": "100.00"})
+
+        booking.refresh_from_db()
+        self.assertEqual(booking.runway_minutes, 100)
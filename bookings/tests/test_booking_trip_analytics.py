@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+import datetime
+from decimal import Decimal
+
+import numpy as np
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from bookings.models import Booking, CarDailyMovement, DailyDisplacementCell
+from bookings.trip_analytics import movement_report, parse_location, update_trip_analytics
+from cars.models import Car, CarBrand, CarModel
+from users.models import User
+from utils.geo import encode_geohash, haversine_km
+
+
+class TripAnalyticsTest(TestCase):
+    """Тести аналітики поїздок за місцями отримання та повернення"""
+
+    def setUp(self):
+        """Налаштування тестового середовища"""
+        self.user = User.objects.create_user(
+            username="tripuser",
+            email="trip@example.com",
+            password="testpassword123"
+        )
+        model = CarModel.objects.create(brand=CarBrand.objects.create(name="TripBrand"), name="TripModel")
+        self.cars = [
+            Car.objects.create(
+                model=model,
+                year=2023,
+                license_plate=license_plate,
+                color="Сірий",
+                mileage=1000,
+                fuel_type="petrol",
+                transmission="automatic",
+                price_per_minute=Decimal("2.00"),
+                seats=5,
+                insurance_valid_until=timezone.now().date() + datetime.timedelta(days=365),
+                technical_inspection_valid_until=timezone.now().date() + datetime.timedelta(days=365),
+                main_photo="car_photos/test.jpg"
+            )
+            for license_plate in ("TR0001TR", "TR0002TR")
+        ]
+
+    def create_completed_booking(self, car, start, minutes, **locations):
+        """Створити завершене бронювання з початком start за локальним часом (в обхід перевірки часу початку)"""
+        start_time = timezone.make_aware(start)
+        return Booking.objects.bulk_create([
+            Booking(
+                user=self.user,
+                car=car,
+                start_time=start_time,
+                end_time=start_time + datetime.timedelta(minutes=minutes),
+                status="completed",
+                minutes_billed=minutes,
+                total_price=car.price_per_minute * minutes,
+                **locations
+            )
+        ])[0]
+
+    def test_parse_location(self):
+        """Тест розбору рядка місця"""
+        self.assertEqual(parse_location("50.45,30.52"), (50.45, 30.52))
+        for value in ("", "50.45", "abc,def", "95,30", None):
+            self.assertTrue(np.isnan(parse_location(value)).all(), value)
+
+    def test_trip_distances_match_haversine(self):
+        """Тест збігу відстаней між парами точок з відстанями від однієї точки"""
+        latitudes = np.array([50.40, 50.50, 50.45])
+        longitudes = np.array([30.40, 30.60, 30.52])
+        expected = haversine_km(50.45, 30.52, latitudes, longitudes)
+        result = haversine_km(np.full(3, 50.45), np.full(3, 30.52), latitudes, longitudes)
+        np.testing.assert_allclose(result, expected)
+        np.testing.assert_allclose(expected[2], 0.0)
+        self.assertTrue(np.isnan(haversine_km([np.nan], [30.0], [50.0], [30.0])[0]))
+
+    def test_update_parses_locations_once_and_aggregates_days(self):
+        """Тест розбору рядків місць, обчислення відстаней та денної статистики"""
+        legacy = self.create_completed_booking(
+            self.cars[0], datetime.datetime(2025, 3, 10, 10, 0), 30,
+            pickup_location="50.45,30.52", return_location="50.46,30.52"
+        )
+        numeric = self.create_completed_booking(
+            self.cars[0], datetime.datetime(2025, 3, 10, 12, 0), 20,
+            pickup_latitude=50.46, pickup_longitude=30.52, return_latitude=50.48, return_longitude=30.52
+        )
+        self.create_completed_booking(self.cars[1], datetime.datetime(2025, 3, 11, 9, 0), 15, pickup_location="bad")
+
+        stats = update_trip_analytics(batch_size=2)
+        self.assertEqual(stats, {"processed": 3, "days": 2, "trips": 3})
+
+        legacy.refresh_from_db()
+        numeric.refresh_from_db()
+        self.assertEqual((legacy.pickup_latitude, legacy.return_latitude), (50.45, 50.46))
+        self.assertAlmostEqual(legacy.trip_distance_km, 1.112, places=3)
+        self.assertAlmostEqual(numeric.trip_distance_km, 2.224, places=3)
+        self.assertEqual(Booking.objects.filter(analytics_processed=True).count(), 3)
+
+        movement = CarDailyMovement.objects.get(car=self.cars[0], date=datetime.date(2025, 3, 10))
+        self.assertEqual((movement.trips, movement.located_trips, movement.minutes), (2, 2, 50))
+        self.assertAlmostEqual(movement.distance_km, 3.336, places=3)
+        self.assertAlmostEqual(movement.max_distance_km, 2.224, places=3)
+        movement = CarDailyMovement.objects.get(car=self.cars[1], date=datetime.date(2025, 3, 11))
+        self.assertEqual((movement.trips, movement.located_trips, movement.distance_km), (1, 0, 0))
+
+        cell = encode_geohash(50.46, 30.52, 6)
+        displacement = DailyDisplacementCell.objects.get(date=datetime.date(2025, 3, 10), cell=cell)
+        self.assertEqual((displacement.pickups, displacement.returns), (1, 1))
+
+        # Повторний запуск нічого не перераховує, нова оренда перераховує лише свій день
+        self.assertEqual(update_trip_analytics(), {"processed": 0, "days": 0, "trips": 0})
+        self.create_completed_booking(
+            self.cars[1], datetime.datetime(2025, 3, 10, 18, 0), 10,
+            pickup_latitude=50.48, pickup_longitude=30.52, return_latitude=50.45, return_longitude=30.52
+        )
+        self.assertEqual(update_trip_analytics(), {"processed": 1, "days": 1, "trips": 3})
+        self.assertEqual(CarDailyMovement.objects.filter(date=datetime.date(2025, 3, 10)).count(), 2)
+
+        report = movement_report(datetime.date(2025, 3, 1), datetime.date(2025, 3, 31))
+        self.assertEqual(report["totals"]["trips"], 4)
+        self.assertEqual(report["per_car"][0]["car_id"], self.cars[0].id)
+        self.assertEqual([row["trips"] for row in report["per_day"]], [3, 1])
+        net = {row["cell"]: row["net"] for row in report["cells"]}
+        self.assertEqual(net[encode_geohash(50.45, 30.52, 6)], 0)
+
+    def test_analytics_view_is_staff_only(self):
+        """Тест доступу до сторінки аналітики поїздок"""
+        url = reverse("trip-analytics")
+        self.client.login(username="tripuser", password="testpassword123")
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get(url, {"days": 7})
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, "trip_analytics.html")
+        self.assertEqual(response.context["days"], 7)
@@ -7,7 +7,7 @@ from django.urls import reverse
 from django.utils import timezone
 
 from bookings.models import Booking
-from cars.models import Car, CarBrand, CarModel
+from cars.models import Car, CarBrand, CarModel, Zone
 from users.models import User, UserBalance
 
 
@@ -116,6 +116,147 @@ class BookingViewsTest(TestCase):
         self.assertEqual(response.status_code, 302)
         self.assertEqual(self.booking.status, "completed")
 
+    def test_end_rental_post_settles_accrual_rental(self):
+        """Тест розрахунку та зняття блокування при завершенні оренди в режимі накопичення"""
+        self.booking.start_time = timezone.now() - timedelta(hours=1)
+        self.booking.end_time = None
+        self.booking.status = "active"
+        self.booking.billing_mode = "accrual"
+        self.booking.hold_amount = Decimal("150.00")
+        self.booking.save()
+        Booking.objects.filter(pk=self.booking.pk).update(last_billing_time=timezone.now() - timedelta(minutes=10))
+        UserBalance.objects.filter(user=self.user).update(held_kopecks=15000)
+
+        self.client.login(username="viewuser", password="testpassword123")
+        url = reverse("end-rental", args=[self.booking.id])
+        self.client.post(url, {"confirm_end": True})
+
+        self.booking.refresh_from_db()
+        balance = UserBalance.objects.get(user=self.user)
+        self.assertEqual(self.booking.status, "completed")
+        self.assertEqual(self.booking.hold_amount, Decimal("0.00"))
+        self.assertEqual(balance.get_held_amount(), Decimal("0.00"))
+        self.assertEqual(balance.get_amount(), Decimal("475.00"))
+
+    def test_end_rental_does_not_spend_held_amount(self):
+        """Тест відсутності списання за оренду в режимі "minute" із сум, заблокованих під інші оренди"""
+        self.booking.start_time = timezone.now() - timedelta(hours=1)
+        self.booking.end_time = None
+        self.booking.status = "active"
+        self.booking.save()
+        Booking.objects.filter(pk=self.booking.pk).update(last_billing_time=timezone.now() - timedelta(minutes=10))
+        UserBalance.objects.filter(user=self.user).update(amount_kopecks=5000, held_kopecks=3000)
+
+        self.client.login(username="viewuser", password="testpassword123")
+        self.client.post(reverse("end-rental", args=[self.booking.id]), {"confirm_end": True})
+
+        self.booking.refresh_from_db()
+        self.assertEqual(self.booking.status, "completed")
+        self.assertEqual(UserBalance.objects.get(user=self.user).get_amount(), Decimal("50.00"))
+
+    def test_end_rental_settles_accrual_rental_with_short_balance(self):
+        """Тест списання залишку балансу при завершенні оренди в режимі накопичення, якщо балансу не вистачає"""
+        self.booking.start_time = timezone.now() - timedelta(hours=1)
+        self.booking.end_time = None
+        self.booking.status = "active"
+        self.booking.billing_mode = "accrual"
+        self.booking.hold_amount = Decimal("20.00")
+        self.booking.save()
+        Booking.objects.filter(pk=self.booking.pk).update(last_billing_time=timezone.now() - timedelta(minutes=10))
+        UserBalance.objects.filter(user=self.user).update(amount_kopecks=2000, held_kopecks=2000)
+
+        self.client.login(username="viewuser", password="testpassword123")
+        self.client.post(reverse("end-rental", args=[self.booking.id]), {"confirm_end": True})
+
+        self.booking.refresh_from_db()
+        balance = UserBalance.objects.get(user=self.user)
+        self.assertEqual(self.booking.status, "completed")
+        self.assertEqual(self.booking.minutes_billed, 10)
+        self.assertEqual(self.booking.total_price, Decimal("20.00"))
+        self.assertEqual(balance.get_amount(), Decimal("0.00"))
+        self.assertEqual(balance.get_held_amount(), Decimal("0.00"))
+
+    def test_end_rental_checks_return_zone(self):
+        """Тест заборони завершення оренди поза зоною повернення та в зоні заборони паркування"""
+        self.booking.start_time = timezone.now() - timedelta(hours=1)
+        self.booking.end_time = None
+        self.booking.status = "active"
+        self.booking.save()
+        Zone.objects.create(
+            name="Центр", kind="service",
+            polygon=[[[30.40, 50.40], [30.60, 50.40], [30.60, 50.50], [30.40, 50.50]]]
+        )
+        Zone.objects.create(
+            name="Майдан", kind="no_parking",
+            polygon=[[[30.51, 50.44], [30.53, 50.44], [30.53, 50.46], [30.51, 50.46]]]
+        )
+
+        self.client.login(username="viewuser", password="testpassword123")
+        url = reverse("end-rental", args=[self.booking.id])
+        for latitude, longitude in [(50.30, 30.50), (50.45, 30.52), (0.0, 0.0)]:
+            response = self.client.post(url, {"confirm_end": True, "latitude": latitude, "longitude": longitude})
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.context["form"].non_field_errors())
+        self.booking.refresh_from_db()
+        self.assertEqual(self.booking.status, "active")
+
+        response = self.client.post(url, {"confirm_end": True, "latitude": 50.42, "longitude": 30.45})
+        self.assertEqual(response.status_code, 302)
+        self.booking.refresh_from_db()
+        self.assertEqual(self.booking.status, "completed")
+        self.assertEqual(self.booking.return_location, "50.42,30.45")
+
+    def test_end_rental_allows_return_with_unknown_location(self):
+        """Тест завершення оренди, якщо місцезнаходження автомобіля невідоме, а координат у формі немає"""
+        self.booking.start_time = timezone.now() - timedelta(hours=1)
+        self.booking.end_time = None
+        self.booking.status = "active"
+        self.booking.save()
+        Zone.objects.create(
+            name="Центр", kind="service",
+            polygon=[[[30.40, 50.40], [30.60, 50.40], [30.60, 50.50], [30.40, 50.50]]]
+        )
+
+        self.client.login(username="viewuser", password="testpassword123")
+        response = self.client.post(reverse("end-rental", args=[self.booking.id]), {"confirm_end": True})
+        self.assertEqual(response.status_code, 302)
+        self.booking.refresh_from_db()
+        self.assertEqual(self.booking.status, "completed")
+
+    def test_staff_can_end_rental_outside_return_zone(self):
+        """Тест завершення оренди адміністратором поза зоною повернення"""
+        self.booking.start_time = timezone.now() - timedelta(hours=1)
+        self.booking.end_time = None
+        self.booking.status = "active"
+        self.booking.save()
+        Zone.objects.create(
+            name="Майдан", kind="no_parking",
+            polygon=[[[30.51, 50.44], [30.53, 50.44], [30.53, 50.46], [30.51, 50.46]]]
+        )
+        User.objects.create_user(username="rentaladmin", email="ra@example.com", password="adminpass", is_staff=True)
+
+        self.client.login(username="rentaladmin", password="adminpass")
+        url = reverse("end-rental", args=[self.booking.id])
+        response = self.client.post(url, {"confirm_end": True, "latitude": 50.45, "longitude": 30.52})
+        self.assertEqual(response.status_code, 302)
+        self.booking.refresh_from_db()
+        self.assertEqual(self.booking.status, "completed")
+        self.assertEqual(self.booking.return_location, "50.45,30.52")
+
+    def test_end_rental_keeps_zero_coordinates(self):
+        """Тест збереження нульових координат місця повернення"""
+        self.booking.start_time = timezone.now() - timedelta(hours=1)
+        self.booking.end_time = None
+        self.booking.status = "active"
+        self.booking.save()
+
+        self.client.login(username="viewuser", password="testpassword123")
+        url = reverse("end-rental", args=[self.booking.id])
+        self.client.post(url, {"confirm_end": True, "latitude": 0, "longitude": 0})
+        self.booking.refresh_from_db()
+        self.assertEqual(self.booking.status, "completed")
+        self.assertEqual((self.booking.return_latitude, self.booking.return_longitude), (0.0, 0.0))
+
 class BookingPermissionsTest(TestCase):
     """Тести прав доступу до бронювань"""
 
@@ -0,0 +1,263 @@
+import datetime
+import math
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Sum
+from django.utils import timezone
+
+from utils.geo import encode_geohashes, geohash_bounds, haversine_km
+
+from .models import Booking, CarDailyMovement, DailyDisplacementCell
+from .revenue import LOCAL_EPOCH, MINUTES_PER_DAY, local_minute
+
+
+# Поля оренди, які потрібні для розбору місць та обчислення відстані
+LOCATION_FIELDS = (
+    "pickup_latitude", "pickup_longitude", "return_latitude", "return_longitude",
+)
+
+
+def parse_location(value):
+    """
+    Розбирає місце у форматі "широта,довгота".
+
+    Args:
+        value: Рядок з координатами.
+
+    Returns:
+        tuple: Широта та довгота (NaN, якщо рядок порожній або некоректний).
+    """
+    try:
+        latitude, longitude = (float(part) for part in value.split(","))
+    except (AttributeError, ValueError):
+        return math.nan, math.nan
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        return math.nan, math.nan
+    return latitude, longitude
+
+def local_day(value):
+    """Повертає номер дня від початку відліку за локальним часом"""
+    return local_minute(value) // MINUTES_PER_DAY
+
+def day_date(day):
+    """Повертає дату дня з номером day"""
+    return LOCAL_EPOCH.date() + datetime.timedelta(days=day)
+
+def day_start(day):
+    """Повертає початок дня з номером day за локальним часом"""
+    return timezone.make_aware(datetime.datetime.combine(day_date(day), datetime.time.min))
+
+def process_completed_bookings(batch_size=None):
+    """
+    Розбирає місця отримання та повернення нових завершених оренд і обчислює відстані поїздок.
+
+    Рядки "широта,довгота" розбираються лише для оренд без числових координат (записаних до їх появи),
+    після чого оренда позначається врахованою і більше не обробляється. Оренди обробляються пакетами,
+    кожен пакет - окремою транзакцією.
+
+    Args:
+        batch_size: Кількість оренд в одному пакеті (за замовчуванням - TRIP_ANALYTICS_BATCH_SIZE).
+
+    Returns:
+        tuple: Кількість оброблених оренд та множина номерів днів їх завершення.
+    """
+    batch_size = batch_size or settings.TRIP_ANALYTICS_BATCH_SIZE
+    processed = 0
+    days = set()
+
+    while True:
+        with transaction.atomic():
+            bookings = list(
+                Booking.objects.select_for_update()
+                .filter(status="completed", analytics_processed=False)
+                .order_by("id")
+                .only("id", "end_time", "pickup_location", "return_location", *LOCATION_FIELDS)[:batch_size]
+            )
+            if not bookings:
+                return processed, days
+
+            coordinates = np.array(
+                [[getattr(booking, field) for field in LOCATION_FIELDS] for booking in bookings],
+                dtype=float,
+            ).reshape(len(bookings), 4)
+            for index, booking in enumerate(bookings):
+                if booking.pickup_latitude is None or booking.pickup_longitude is None:
+                    coordinates[index, :2] = parse_location(booking.pickup_location)
+                if booking.return_latitude is None or booking.return_longitude is None:
+                    coordinates[index, 2:] = parse_location(booking.return_location)
+            distances = haversine_km(*coordinates.T)
+
+            for booking, values, distance in zip(bookings, coordinates.tolist(), distances.tolist()):
+                for field, value in zip(LOCATION_FIELDS, values):
+                    setattr(booking, field, None if math.isnan(value) else value)
+                booking.trip_distance_km = None if math.isnan(distance) else round(distance, 3)
+                booking.analytics_processed = True
+                if booking.end_time:
+                    days.add(local_day(booking.end_time))
+
+            Booking.objects.bulk_update(bookings, [*LOCATION_FIELDS, "trip_distance_km", "analytics_processed"])
+            processed += len(bookings)
+
+def aggregate_days(days):
+    """
+    Перераховує денну статистику автомобілів та клітинок переміщень за заданими днями.
+
+    Оренди днів завантажуються одним запитом у масиви NumPy, групуються за днем та автомобілем
+    (або днем та клітинкою геохешу) і записуються замість попередньої статистики цих днів.
+
+    Args:
+        days: Номери днів за локальним часом.
+
+    Returns:
+        int: Кількість оренд, врахованих у статистиці.
+    """
+    days = sorted(days)
+    if not days:
+        return 0
+
+    rows = list(
+        Booking.objects.filter(
+            status="completed",
+            analytics_processed=True,
+            end_time__gte=day_start(days[0]),
+            end_time__lt=day_start(days[-1] + 1),
+        ).values_list("car_id", "end_time", "minutes_billed", "trip_distance_km", *LOCATION_FIELDS)
+        .iterator(chunk_size=settings.TRIP_ANALYTICS_BATCH_SIZE)
+    )
+    dates = [day_date(day) for day in days]
+    movements = []
+    cells = []
+
+    if rows:
+        car_ids, end_times, minutes, distances, *coordinates = zip(*rows)
+        day_numbers = np.fromiter((local_day(end_time) for end_time in end_times), dtype=np.int64, count=len(rows))
+        selected = np.isin(day_numbers, days)
+        day_numbers = day_numbers[selected]
+        car_ids = np.array(car_ids, dtype=np.int64)[selected]
+        minutes = np.array(minutes, dtype=np.int64)[selected]
+        distances = np.array(distances, dtype=float)[selected]
+        pickup_latitudes, pickup_longitudes, return_latitudes, return_longitudes = (
+            np.array(values, dtype=float)[selected] for values in coordinates
+        )
+        located = ~np.isnan(distances)
+        known_distances = np.nan_to_num(distances)
+
+        # Статистика автомобілів за днями
+        keys, inverse = np.unique(np.column_stack([day_numbers, car_ids]), axis=0, return_inverse=True)
+        inverse = inverse.ravel()
+        trips = np.bincount(inverse, minlength=len(keys))
+        located_trips = np.bincount(inverse, weights=located, minlength=len(keys))
+        total_minutes = np.bincount(inverse, weights=minutes, minlength=len(keys))
+        total_distances = np.bincount(inverse, weights=known_distances, minlength=len(keys))
+        max_distances = np.zeros(len(keys))
+        np.maximum.at(max_distances, inverse, known_distances)
+
+        movements = [
+            CarDailyMovement(
+                date=day_date(int(day)),
+                car_id=int(car_id),
+                trips=int(trips[index]),
+                located_trips=int(located_trips[index]),
+                minutes=int(total_minutes[index]),
+                distance_km=round(float(total_distances[index]), 3),
+                max_distance_km=round(float(max_distances[index]), 3),
+            )
+            for index, (day, car_id) in enumerate(keys.tolist())
+        ]
+
+        # Отримання та повернення за днями та клітинками геохешу
+        counts = {}
+        for field, latitudes, longitudes in (
+            ("pickups", pickup_latitudes, pickup_longitudes),
+            ("returns", return_latitudes, return_longitudes),
+        ):
+            known = ~np.isnan(latitudes) & ~np.isnan(longitudes)
+            if not known.any():
+                continue
+            geohashes = encode_geohashes(latitudes[known], longitudes[known], settings.TRIP_HEATMAP_PRECISION)
+            keys, values = np.unique(
+                np.char.add(np.char.add(day_numbers[known].astype(str), ":"), geohashes), return_counts=True
+            )
+            for key, count in zip(keys.tolist(), values.tolist()):
+                counts.setdefault(key, {"pickups": 0, "returns": 0})[field] = count
+
+        for key, count in sorted(counts.items()):
+            day, cell = key.split(":")
+            cells.append(DailyDisplacementCell(date=day_date(int(day)), cell=cell, **count))
+
+    with transaction.atomic():
+        CarDailyMovement.objects.filter(date__in=dates).delete()
+        DailyDisplacementCell.objects.filter(date__in=dates).delete()
+        CarDailyMovement.objects.bulk_create(movements, batch_size=1000)
+        DailyDisplacementCell.objects.bulk_create(cells, batch_size=1000)
+    return sum(movement.trips for movement in movements)
+
+def update_trip_analytics(batch_size=None):
+    """
+    Додає нові завершені оренди до денної аналітики поїздок.
+
+    Перший запуск обробляє всю історію оренд, наступні - лише оренди, завершені після попереднього запуску;
+    статистика перераховується лише за дні, в яких з'явилися нові оренди.
+
+    Args:
+        batch_size: Кількість оренд в одному пакеті (за замовчуванням - TRIP_ANALYTICS_BATCH_SIZE).
+
+    Returns:
+        dict: Кількість оброблених оренд, перерахованих днів та оренд у цих днях.
+    """
+    processed, days = process_completed_bookings(batch_size)
+    return {"processed": processed, "days": len(days), "trips": aggregate_days(days)}
+
+def movement_report(since, until):
+    """
+    Збирає аналітику поїздок за період з денної статистики.
+
+    Args:
+        since: Перший день періоду.
+        until: Останній день періоду включно.
+
+    Returns:
+        dict: Підсумки періоду, статистика за днями, автомобілями та клітинки карти переміщень.
+    """
+    movements = CarDailyMovement.objects.filter(date__gte=since, date__lte=until)
+    totals = movements.aggregate(
+        trips=Sum("trips"), located_trips=Sum("located_trips"), minutes=Sum("minutes"), distance_km=Sum("distance_km")
+    )
+    totals = {key: value or 0 for key, value in totals.items()}
+    totals["average_km"] = totals["distance_km"] / totals["located_trips"] if totals["located_trips"] else 0
+
+    per_car = list(
+        movements.values("car_id", "car__license_plate", "car__model__name", "car__model__brand__name")
+        .annotate(
+            trips=Sum("trips"),
+            located_trips=Sum("located_trips"),
+            minutes=Sum("minutes"),
+            distance_km=Sum("distance_km"),
+            max_distance_km=Max("max_distance_km"),
+        )
+        .order_by("-distance_km", "car_id")
+    )
+    for row in per_car:
+        row["average_km"] = row["distance_km"] / row["located_trips"] if row["located_trips"] else 0
+
+    per_day = list(
+        movements.values("date").annotate(trips=Sum("trips"), distance_km=Sum("distance_km")).order_by("date")
+    )
+
+    cells = []
+    for row in (
+        DailyDisplacementCell.objects.filter(date__gte=since, date__lte=until)
+        .values("cell").annotate(pickups=Sum("pickups"), returns=Sum("returns")).order_by("cell")
+    ):
+        south, west, north, east = geohash_bounds(row["cell"])
+        cells.append({
+            "cell": row["cell"],
+            "bounds": [[south, west], [north, east]],
+            "pickups": row["pickups"],
+            "returns": row["returns"],
+            "net": row["returns"] - row["pickups"],
+        })
+
+    return {"totals": totals, "per_car": per_car, "per_day": per_day, "cells": cells}
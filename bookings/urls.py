@@ -18,4 +18,7 @@ urlpatterns = [
 
     # Список завершених бронювань
     path("completed/", views.CompletedBookingsView.as_view(), name="completed-bookings"),
+
+    # Аналітика поїздок для адміністратора
+    path("analytics/", views.TripAnalyticsView.as_view(), name="trip-analytics"),
 ]
@@ -1,16 +1,27 @@
 import datetime
 from decimal import Decimal
 
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.contrib.auth.mixins import LoginRequiredMixin
+from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.http import HttpResponseForbidden
 from django.shortcuts import get_object_or_404, redirect, render
 from django.utils import timezone
 from django.views.generic import ListView, View
 
+from cars.changes import latest_change_id
+from cars.location_history import booking_track
+from cars.zones import return_location_error
+from users.ledger import record_balance_change
+from users.models import UserBalance
+from utils.money import from_kopecks, to_kopecks
+
+from .billing import accrued_minutes, place_hold, refresh_runway, settle_accrual
+from .billing_queue import schedule_booking, unschedule_booking
 from .forms import BookingEndRentalForm, BookingStartRentalForm
 from .models import Booking, BookingHistory
+from .trip_analytics import movement_report
 
 
 @login_required
@@ -45,13 +56,16 @@ def start_rental(request):
             pickup_lng = form.cleaned_data.get("longitude")
             now = timezone.now()
             pickup_location = ""
-            if pickup_lat and pickup_lng:
+            if pickup_lat is not None and pickup_lng is not None:
                 pickup_location = f"{pickup_lat},{pickup_lng}"
-                car.current_latitude = str(pickup_lat)
-                car.current_longitude = str(pickup_lng)
+                car.current_latitude = pickup_lat
+                car.current_longitude = pickup_lng
+                car.location_updated_at = now
                 car.save()
+            else:
+                pickup_lat = pickup_lng = None
 
-            booking = Booking.objects.create(
+            booking = Booking(
                 user=user,
                 car=car,
                 start_time=now,
@@ -60,8 +74,15 @@ def start_rental(request):
                 last_billing_time=now,
                 minutes_billed=0,
                 total_price=Decimal("0.00"),
-                pickup_location=pickup_location
+                pickup_location=pickup_location,
+                pickup_latitude=pickup_lat,
+                pickup_longitude=pickup_lng,
+                billing_mode=settings.BILLING_MODE
             )
+            # У режимі накопичення заблокувати суму на балансі замість щохвилинного списання
+            if booking.billing_mode == "accrual":
+                place_hold(booking, user.balance)
+            booking.save()
             BookingHistory.objects.create(
                 booking=booking,
                 status="active",
@@ -69,6 +90,9 @@ def start_rental(request):
             )
             car.status = "busy"
             car.save()
+            # Запас хвилин залежить від усіх активних оренд користувача
+            refresh_runway([user.id])
+            schedule_booking(booking)
             messages.success(request, f"Оренда автомобіля {car} успішно розпочата!")
             return redirect("booking-detail", pk=booking.id)
     else:
@@ -83,13 +107,20 @@ def start_rental(request):
 
         form = BookingStartRentalForm(user=request.user, initial=initial_data)
 
-    return render(request, "start_rental.html", {"form": form})
+    return render(request, "start_rental.html", {
+        "form": form,
+        "nearest_limit": settings.NEAREST_MAX_LIMIT
+    })
 
 @login_required
 def end_rental(request, pk):
     """
     Обробка завершення оренди автомобіля.
 
+    Місце повернення перевіряється за зонами обслуговування: поза зонами повернення та в зонах
+    заборони паркування оренду завершити не можна. Якщо місцезнаходження невідоме, а також для
+    адміністратора перевірка не виконується, щоб оренду завжди можна було завершити.
+
     Args:
         request: Об'єкт запиту Django, що містить дані форми та інформацію про користувача.
         pk: Первинний ключ бронювання, яке потрібно завершити.
@@ -110,42 +141,67 @@ def end_rental(request, pk):
             now = timezone.now()
             return_lat = form.cleaned_data.get("latitude")
             return_lng = form.cleaned_data.get("longitude")
-            if return_lat and return_lng:
+            # Перевірити місце повернення за зонами (без координат з форми - останнє місцезнаходження автомобіля).
+            # Адміністратор може завершити оренду будь-де (наприклад, евакуйованого чи несправного автомобіля)
+            if request.user.is_staff:
+                zone_error = None
+            elif return_lat is not None and return_lng is not None:
+                zone_error = return_location_error(return_lat, return_lng)
+            else:
+                zone_error = return_location_error(booking.car.current_latitude, booking.car.current_longitude)
+            if zone_error:
+                form.add_error(None, zone_error)
+                return render(request, "end_rental.html", {
+                    "booking": booking,
+                    "form": form
+                })
+            if return_lat is not None and return_lng is not None:
                 booking.return_location = f"{return_lat},{return_lng}"
+                booking.return_latitude = return_lat
+                booking.return_longitude = return_lng
                 car = booking.car
-                car.current_latitude = str(return_lat)
-                car.current_longitude = str(return_lng)
+                car.current_latitude = return_lat
+                car.current_longitude = return_lng
+                car.location_updated_at = now
                 car.save()
-            time_diff = now - booking.last_billing_time
-            minutes_to_bill = max(1, int(time_diff.total_seconds() / 60))
-            if minutes_to_bill > 0:
-                amount_to_bill = booking.car.price_per_minute * Decimal(str(minutes_to_bill))
-                try:
-                    balance = booking.user.balance
-                    if balance.amount >= amount_to_bill:
-                        balance.amount -= amount_to_bill
-                        balance.save()
-                        from payments.models import Payment, PaymentTransaction
-                        payment = Payment.objects.create(
-                            user=booking.user,
-                            amount=amount_to_bill,
-                            payment_provider="internal",
-                            status="completed"
-                        )
-                        PaymentTransaction.objects.create(
-                            user=booking.user,
-                            payment=payment,
-                            amount=amount_to_bill,
-                            transaction_type="booking",
-                            description=f"Оплата оренди автомобіля {booking.car}",
-                            balance_after=balance.amount
-                        )
-                except:
-                    pass
+            minutes_to_bill = max(1, accrued_minutes(booking.last_billing_time, now))
+            price_kopecks = to_kopecks(booking.car.price_per_minute)
+            amount_to_bill = price_kopecks * minutes_to_bill
+            try:
+                balance_kopecks, held_kopecks = booking.user.balance.get_ledger_totals()
+            except UserBalance.DoesNotExist:
+                balance_kopecks = held_kopecks = 0
+            # Суми, заблоковані під інші оренди в режимі накопичення, для оплати недоступні
+            available_kopecks = balance_kopecks - held_kopecks
+            description = f"Оплата оренди автомобіля {booking.car}"
+            if booking.billing_mode == "accrual":
+                # Списати накопичену вартість у межах доступної суми та зняти блокування, як при примусовому
+                # завершенні (блокування цієї оренди знімається, тому воно входить у доступну суму)
+                charge = settle_accrual(booking, minutes_to_bill, available_kopecks + booking.hold_kopecks, description)
+            else:
+                charge = amount_to_bill if available_kopecks >= amount_to_bill else 0
+                if charge:
+                    record_balance_change(booking.user_id, amount_kopecks=-charge, description=description)
                 booking.minutes_billed += minutes_to_bill
+                booking.total_price = from_kopecks(price_kopecks * booking.minutes_billed)
+            if charge:
+                from payments.models import Payment, PaymentTransaction
+                payment = Payment.objects.create(
+                    user=booking.user,
+                    amount_kopecks=charge,
+                    payment_provider="internal",
+                    status="completed"
+                )
+                PaymentTransaction.objects.create(
+                    user=booking.user,
+                    payment=payment,
+                    amount_kopecks=charge,
+                    transaction_type="booking",
+                    description=description,
+                    balance_after_kopecks=balance_kopecks - charge
+                )
             booking.status = "completed"
             booking.end_time = now
-            booking.total_price = booking.car.price_per_minute * Decimal(str(booking.minutes_billed))
             booking.save()
             BookingHistory.objects.create(
                 booking=booking,
@@ -158,6 +214,8 @@ def end_rental(request, pk):
             car = booking.car
             car.status = "available"
             car.save()
+            refresh_runway([booking.user_id])
+            unschedule_booking(booking)
             messages.success(request, (
                 f"Оренду успішно завершено. "
                 f"Всього використано: {booking.minutes_billed} хвилин. "
@@ -195,6 +253,21 @@ class ActiveBookingsView(LoginRequiredMixin, ListView):
             end_time__gte=now
         ).order_by("end_time")
 
+    def get_context_data(self, **kwargs):
+        """
+        Додає до контексту версію журналу змін автомобілів для потоку змін.
+
+        Args:
+            self: Екземпляр класу.
+            **kwargs: Додаткові іменовані аргументи.
+
+        Returns:
+            dict: Контекст з версією журналу змін.
+        """
+        context = super().get_context_data(**kwargs)
+        context["changes_version"] = latest_change_id()
+        return context
+
 class CompletedBookingsView(LoginRequiredMixin, ListView):
     """Представлення для відображення списку завершених бронювань користувача"""
     model = Booking
@@ -228,7 +301,8 @@ class BookingDetailView(LoginRequiredMixin, View):
             pk: Первинний ключ бронювання, деталі якого потрібно отримати.
 
         Returns:
-            HttpResponse: Відображення сторінки з деталями бронювання або відповідь з забороною доступу.
+            HttpResponse: Відображення сторінки з деталями бронювання, історією змін та маршрутом поїздки
+            або відповідь з забороною доступу.
         """
         booking = get_object_or_404(Booking, pk=pk)
         if not request.user.is_staff and booking.user != request.user:
@@ -236,5 +310,51 @@ class BookingDetailView(LoginRequiredMixin, View):
         history = BookingHistory.objects.filter(booking=booking).order_by("-timestamp")
         return render(request, "booking_detail.html", {
             "booking": booking,
-            "history": history
+            "history": history,
+            "track": booking_track(booking)
+        })
+
+class TripAnalyticsView(UserPassesTestMixin, View):
+    """Представлення для адміністратора з аналітикою поїздок та картою переміщень автомобілів"""
+
+    def test_func(self):
+        """
+        Перевіряє, чи користувач має права адміністратора.
+
+        Returns:
+            bool: True, якщо користувач є адміністратором, інакше False.
+        """
+        return self.request.user.is_staff
+
+    def get(self, request):
+        """
+        Показати аналітику поїздок за останні дні.
+
+        Дані беруться з денної статистики, яку заповнює задача refresh_trip_analytics, тому сторінка
+        не перераховує бронювання. Параметр days задає кількість днів (від 1 до 366).
+
+        Args:
+            self: Екземпляр класу.
+            request: Об'єкт запиту Django.
+
+        Returns:
+            HttpResponse: Відображення сторінки з підсумками, статистикою автомобілів та картою переміщень.
+        """
+        try:
+            days = int(request.GET.get("days", settings.TRIP_ANALYTICS_DEFAULT_DAYS))
+        except ValueError:
+            days = settings.TRIP_ANALYTICS_DEFAULT_DAYS
+        days = min(max(days, 1), 366)
+
+        until = timezone.localdate()
+        since = until - datetime.timedelta(days=days - 1)
+        report = movement_report(since, until)
+        return render(request, "trip_analytics.html", {
+            "days": days,
+            "since": since,
+            "until": until,
+            "totals": report["totals"],
+            "per_car": report["per_car"],
+            "per_day": report["per_day"],
+            "cells": report["cells"]
         })
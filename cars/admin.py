@@ -1,6 +1,7 @@
 from django.contrib import admin
 
-from .models import Car, CarBrand, CarModel, CarPhoto, CarReview
+from .models import Car, CarBrand, CarModel, CarPhoto, CarReview, Zone
+from .text_search import car_text_index
 
 
 class CarModelInline(admin.TabularInline):
@@ -35,6 +36,13 @@ class CarAdmin(admin.ModelAdmin):
     search_fields = ("license_plate", "model__name", "model__brand__name")  # Поля для пошуку
     inlines = [CarPhotoInline, CarReviewInline]  # Вбудовані моделі для фотографій та відгуків
 
+    def get_search_results(self, request, queryset, search_term):
+        """Шукати автомобілі індексом текстового пошуку замість LIKE-запитів за search_fields"""
+        if not search_term.strip():
+            return queryset, False
+        car_ids = [car["id"] for car in car_text_index.search(search_term)]
+        return queryset.filter(id__in=car_ids), False
+
     def get_brand(self, obj):
         """Отримати назву бренду автомобіля"""
         return obj.model.brand.name
@@ -58,8 +66,16 @@ class CarReviewAdmin(admin.ModelAdmin):
     search_fields = ("car__license_plate", "user__username")  # Поля для пошуку
     readonly_fields = ("created_at",)  # Поля лише для читання
 
+class ZoneAdmin(admin.ModelAdmin):
+    """Адмін-панель для зон обслуговування"""
+    list_display = ("name", "kind", "is_active", "grid_precision", "updated_at")  # Поля для відображення у списку
+    list_filter = ("kind", "is_active")  # Фільтри для списку
+    search_fields = ("name",)  # Поля для пошуку
+    readonly_fields = ("south", "west", "north", "east", "grid_precision", "updated_at")  # Поля лише для читання
+
 # Реєстрація моделей у панелі адміністратора
 admin.site.register(CarBrand, CarBrandAdmin)
 admin.site.register(CarModel, CarModelAdmin)
 admin.site.register(Car, CarAdmin)
 admin.site.register(CarReview, CarReviewAdmin)
+admin.site.register(Zone, ZoneAdmin)
@@ -0,0 +1,60 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+from django.utils.translation import get_language
+
+
+def card_cache_key(template_name, entry, variant):
+    """
+    Повертає ключ кешу HTML-картки автомобіля.
+
+    Ключ містить id автомобіля та версію запису каталогу (updated_at), яка змінюється лише при зміні
+    полів картки (cars.catalog.CARD_FIELDS), тому змінена картка читається за новим ключем без явного
+    видалення старої, а зміна місцезнаходження автомобіля картку не скидає. Мова також входить у ключ,
+    бо від неї залежить формат чисел у картці.
+
+    Args:
+        template_name: Шаблон картки.
+        entry: Запис каталогу автомобілів.
+        variant: Рядок з контекстом картки, від якого залежить розмітка (наприклад, права адміністратора).
+
+    Returns:
+        str: Ключ кешу.
+    """
+    return (
+        f"car-card:{settings.CAR_CARD_CACHE_VERSION}:{get_language()}:{template_name}:{variant}:"
+        f"{entry.pk}:{entry.updated_at.timestamp()}"
+    )
+
+def render_car_cards(entries, template_name, context=None):
+    """
+    Повертає HTML-картки автомобілів сторінки, рендерячи лише відсутні в кеші.
+
+    Картки всієї сторінки читаються з кешу одним запитом get_many, відсутні картки рендеряться
+    шаблоном і записуються в кеш одним запитом set_many.
+
+    Args:
+        entries: Записи каталогу автомобілів сторінки.
+        template_name: Шаблон картки (отримує запис як car та контекст context).
+        context: Додатковий контекст шаблону, спільний для всіх карток (входить у ключ кешу).
+
+    Returns:
+        list: HTML-картки в порядку записів.
+    """
+    context = context or {}
+    variant = "&".join(f"{name}={value}" for name, value in sorted(context.items()))
+    keys = [card_cache_key(template_name, entry, variant) for entry in entries]
+    cached = cache.get_many(keys) if keys else {}
+
+    cards = []
+    missing = {}
+    for entry, key in zip(entries, keys):
+        card = cached.get(key)
+        if card is None:
+            card = missing[key] = render_to_string(template_name, {"car": entry, **context})
+        cards.append(mark_safe(card))
+
+    if missing:
+        cache.set_many(missing, settings.CAR_CARD_CACHE_TIMEOUT)
+    return cards
@@ -0,0 +1,155 @@
+from decimal import Decimal
+from functools import partial
+
+from django.db import transaction
+from django.db.models import Avg
+from django.utils import timezone
+
+from .changes import record_car_changes
+from .models import Car, CarCatalogEntry, CarReview
+from .search import invalidate_search
+from .telemetry import LOCATION_FIELDS
+from .tiles import invalidate_car_tiles
+
+
+# Поля запису каталогу та відповідні поля автомобіля
+CATALOG_FIELDS = {
+    "brand_id": "model__brand_id",
+    "model_id": "model_id",
+    "brand_name": "model__brand__name",
+    "model_name": "model__name",
+    "year": "year",
+    "license_plate": "license_plate",
+    "color": "color",
+    "fuel_type": "fuel_type",
+    "transmission": "transmission",
+    "seats": "seats",
+    "has_air_conditioning": "has_air_conditioning",
+    "has_gps": "has_gps",
+    "has_child_seat": "has_child_seat",
+    "status": "status",
+    "price_per_minute": "price_per_minute",
+    "rating": "rating",
+    "thumbnail_url": "main_photo",
+    "current_latitude": "current_latitude",
+    "current_longitude": "current_longitude",
+    "geohash": "geohash",
+    "location_updated_at": "location_updated_at",
+}
+
+# Поля запису каталогу, які показуються в HTML-картці автомобіля: лише їх зміна змінює версію запису (updated_at)
+CARD_FIELDS = tuple(field for field in CATALOG_FIELDS if field not in LOCATION_FIELDS)
+
+# Кількість автомобілів в одному запиті при повній перебудові каталогу
+CATALOG_BATCH_SIZE = 1000
+
+
+def catalog_entries(cars):
+    """
+    Будує записи каталогу для автомобілів двома запитами.
+
+    Версія запису (updated_at) змінюється лише тоді, коли змінилися поля картки (CARD_FIELDS), тому
+    збереження автомобіля, яке змінює тільки місцезнаходження, не скидає закешовану картку.
+
+    Args:
+        cars: QuerySet автомобілів.
+
+    Returns:
+        list: Незбережені об'єкти CarCatalogEntry.
+    """
+    storage = Car._meta.get_field("main_photo").storage
+    now = timezone.now()
+    rows = list(cars.values("id", *CATALOG_FIELDS.values()))
+    stored = {
+        car_id: (card, updated_at)
+        for car_id, *card, updated_at in CarCatalogEntry.objects.filter(
+            car_id__in=[car["id"] for car in rows]
+        ).values_list("car_id", *CARD_FIELDS, "updated_at")
+    }
+
+    entries = []
+    for car in rows:
+        values = {field: car[source] for field, source in CATALOG_FIELDS.items()}
+        values["thumbnail_url"] = storage.url(car["main_photo"]) if car["main_photo"] else ""
+        card, updated_at = stored.get(car["id"], (None, now))
+        if card != [values[field] for field in CARD_FIELDS]:
+            updated_at = now
+        entries.append(CarCatalogEntry(car_id=car["id"], updated_at=updated_at, **values))
+    return entries
+
+def sync_catalog(car_ids=None):
+    """
+    Оновлює записи каталогу автомобілів за даними автомобілів, їх моделей та марок.
+
+    Записи вставляються або оновлюються одним запитом INSERT ... ON CONFLICT на порцію автомобілів,
+    записи видалених автомобілів видаляються каскадно разом з автомобілями.
+
+    Args:
+        car_ids: Id автомобілів (None - всі автомобілі).
+
+    Returns:
+        int: Кількість оновлених записів.
+    """
+    cars = Car.objects.order_by("id")
+    if car_ids is not None:
+        cars = cars.filter(id__in=list(car_ids))
+
+    synced = 0
+    last_id = 0
+    while True:
+        entries = catalog_entries(cars.filter(id__gt=last_id)[:CATALOG_BATCH_SIZE])
+        if not entries:
+            return synced
+        CarCatalogEntry.objects.bulk_create(
+            entries,
+            update_conflicts=True,
+            unique_fields=["car"],
+            update_fields=[*CATALOG_FIELDS, "updated_at"],
+        )
+        synced += len(entries)
+        last_id = entries[-1].car_id
+
+def update_rating(car_id):
+    """
+    Перераховує середній рейтинг відгуків автомобіля в автомобілі та записі каталогу.
+
+    Args:
+        car_id: Id автомобіля.
+    """
+    average = CarReview.objects.filter(car_id=car_id).aggregate(Avg("rating"))["rating__avg"] or 0
+    rating = Decimal(average).quantize(Decimal("0.01"))
+    Car.objects.filter(id=car_id).update(rating=rating)
+    CarCatalogEntry.objects.filter(car_id=car_id).update(rating=rating, updated_at=timezone.now())
+
+def release_cars(car_ids, now=None):
+    """
+    Звільняє автомобілі масовим оновленням з тими самими побічними ефектами, що й Car.save.
+
+    Статус автомобілів і записів каталогу оновлюється двома запитами, зміни записуються в журнал змін,
+    а тайли карти, фасети пошуку та індекси автомобілів у пам'яті процесів оновлюються після фіксації
+    транзакції.
+
+    Args:
+        car_ids: Id автомобілів, які звільняються.
+        now: Момент звільнення (за замовчуванням - поточний час).
+    """
+    from .signals import cars_changed
+
+    car_ids = list(car_ids)
+    if not car_ids:
+        return
+
+    now = now or timezone.now()
+    released = list(
+        Car.objects.filter(id__in=car_ids).values_list("id", "current_latitude", "current_longitude", "status")
+    )
+    Car.objects.filter(id__in=car_ids).update(status="available", updated_at=now)
+    CarCatalogEntry.objects.filter(car_id__in=car_ids).update(status="available", updated_at=now)
+    record_car_changes([(car_id, "available", latitude, longitude) for car_id, latitude, longitude, _ in released])
+
+    # Скинути тайли карти, на яких звільнені автомобілі змінили статус
+    locations = [(latitude, longitude) for _, latitude, longitude, _ in released]
+    statuses = {status for _, _, _, status in released} | {"available"}
+    transaction.on_commit(partial(invalidate_car_tiles, locations, statuses))
+    transaction.on_commit(invalidate_search)
+    cars_changed(car_ids)
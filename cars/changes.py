@@ -0,0 +1,185 @@
+import asyncio
+import datetime
+import json
+import time
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Car, CarChange
+
+
+def record_car_changes(changes):
+    """
+    Записує зміни статусу та місцезнаходження автомобілів у журнал одним запитом.
+
+    Викликається в тій самій транзакції, що й зміна автомобілів, тому журнал не розходиться з даними.
+
+    Args:
+        changes: Список (car_id, статус або None для видаленого автомобіля, широта, довгота).
+    """
+    if not changes:
+        return
+    CarChange.objects.bulk_create([
+        CarChange(car_id=car_id, status=status or "", latitude=latitude, longitude=longitude)
+        for car_id, status, latitude, longitude in changes
+    ])
+
+def latest_change_id():
+    """
+    Повертає версію журналу змін - номер останнього запису.
+
+    Returns:
+        int: Номер останнього запису (0, якщо журнал порожній).
+    """
+    return CarChange.objects.order_by("-id").values_list("id", flat=True).first() or 0
+
+def prune_changes(now=None, batch_size=None):
+    """
+    Видаляє записи журналу змін, старші за CAR_CHANGES_RETENTION секунд, пакетами.
+
+    Args:
+        now: Поточний момент (за замовчуванням - timezone.now()).
+        batch_size: Кількість записів, які видаляються одним запитом (за замовчуванням - CAR_CHANGES_BATCH_SIZE).
+
+    Returns:
+        int: Кількість видалених записів.
+    """
+    now = now or timezone.now()
+    batch_size = batch_size or settings.CAR_CHANGES_BATCH_SIZE
+    cutoff = now - datetime.timedelta(seconds=settings.CAR_CHANGES_RETENTION)
+    deleted = 0
+
+    while True:
+        ids = list(
+            CarChange.objects.filter(created_at__lt=cutoff).order_by("id").values_list("id", flat=True)[:batch_size]
+        )
+        if not ids:
+            return deleted
+        deleted += CarChange.objects.filter(id__in=ids).delete()[0]
+
+def format_event(event, data, event_id=None):
+    """
+    Формує подію server-sent events.
+
+    Args:
+        event: Назва події.
+        data: Дані події, які серіалізуються в JSON.
+        event_id: Ідентифікатор події, який браузер передасть у заголовку Last-Event-ID при перепідключенні.
+
+    Returns:
+        str: Текст події.
+    """
+    lines = [f"event: {event}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"data: {json.dumps(data, ensure_ascii=False)}")
+    return "\n".join(lines) + "\n\n"
+
+def contiguous_changes(rows, cursor):
+    """
+    Відбирає записи журналу, номери яких ідуть підряд після курсора.
+
+    Пропуск у номерах означає транзакцію, яка отримала номер, але ще не зафіксована (або відкочена).
+    Записи після пропуску не віддаються, інакше курсор клієнта перескочить запис, який з'явиться пізніше.
+
+    Args:
+        rows: Записи журналу в порядку зростання номера.
+        cursor: Номер останнього отриманого клієнтом запису.
+
+    Returns:
+        list: Записи до першого пропуску.
+    """
+    contiguous = []
+    for row in rows:
+        if row["id"] != cursor + 1:
+            break
+        contiguous.append(row)
+        cursor = row["id"]
+    return contiguous
+
+def changes_payload(rows, version):
+    """
+    Формує дані події зі змінами автомобілів, залишаючи лише останню зміну кожного автомобіля.
+
+    Args:
+        rows: Записи журналу в порядку зростання номера.
+        version: Версія журналу, до якої клієнт отримав усі зміни.
+
+    Returns:
+        dict: Версія та список змінених автомобілів.
+    """
+    statuses = dict(Car.STATUS_CHOICES)
+    cars = {}
+    for row in rows:
+        cars.pop(row["car_id"], None)
+        cars[row["car_id"]] = {
+            "id": row["car_id"],
+            "status": row["status"] or None,
+            "status_display": statuses.get(row["status"], row["status"]),
+            "lat": row["latitude"],
+            "lng": row["longitude"],
+        }
+    return {"version": version, "cars": list(cars.values())}
+
+async def change_stream(cursor, car_ids=None):
+    """
+    Асинхронний генератор потоку змін автомобілів у форматі server-sent events.
+
+    Кожні CAR_CHANGES_POLL_INTERVAL секунд з журналу читаються записи, новіші за курсор, і клієнту
+    надсилається подія changes з останньою зміною кожного автомобіля. Якщо курсор старший за журнал
+    (записи вже видалені) або новіший за нього, надсилається подія reset з поточною версією: клієнт має
+    заново завантажити дані. Через CAR_CHANGES_STREAM_TIMEOUT секунд потік закривається, і браузер
+    перепідключається з останньою версією.
+
+    Args:
+        cursor: Версія, яку вже має клієнт.
+        car_ids: Множина id автомобілів, зміни яких потрібні (або None для всіх автомобілів).
+
+    Yields:
+        str: Події server-sent events.
+    """
+    yield f"retry: {settings.CAR_CHANGES_RETRY_MS}\n\n"
+
+    first_id = await CarChange.objects.order_by("id").values_list("id", flat=True).afirst()
+    last_id = await CarChange.objects.order_by("-id").values_list("id", flat=True).afirst() or 0
+    if (first_id is not None and cursor < first_id - 1) or cursor > last_id:
+        yield format_event("reset", {"version": last_id}, last_id)
+        return
+
+    started = last_sent = time.monotonic()
+    gap_seen_at = None
+
+    while True:
+        rows = [
+            row async for row in CarChange.objects.filter(id__gt=cursor).order_by("id").values(
+                "id", "car_id", "status", "latitude", "longitude"
+            )[:settings.CAR_CHANGES_BATCH_SIZE]
+        ]
+        contiguous = contiguous_changes(rows, cursor)
+        now = time.monotonic()
+
+        # Пропуск, який не заповнився за CAR_CHANGES_GAP_TIMEOUT секунд, - відкочена транзакція
+        if len(contiguous) < len(rows):
+            gap_seen_at = gap_seen_at or now
+            if now - gap_seen_at >= settings.CAR_CHANGES_GAP_TIMEOUT:
+                contiguous = rows
+                gap_seen_at = None
+        else:
+            gap_seen_at = None
+
+        if contiguous:
+            cursor = contiguous[-1]["id"]
+            if car_ids is not None:
+                contiguous = [row for row in contiguous if row["car_id"] in car_ids]
+            if contiguous:
+                yield format_event("changes", changes_payload(contiguous, cursor), cursor)
+                last_sent = now
+
+        if now - started >= settings.CAR_CHANGES_STREAM_TIMEOUT:
+            return
+        if now - last_sent >= settings.CAR_CHANGES_HEARTBEAT:
+            # Коментар не дає проксі закрити з'єднання без даних
+            yield ": ping\n\n"
+            last_sent = now
+        await asyncio.sleep(settings.CAR_CHANGES_POLL_INTERVAL)
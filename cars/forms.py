@@ -58,8 +58,12 @@ class CarForm(forms.ModelForm):
             "has_bluetooth": forms.CheckboxInput(attrs={"class": "form-check-input"}),
             "has_usb": forms.CheckboxInput(attrs={"class": "form-check-input"}),
             "status": forms.Select(attrs={"class": "form-select"}),
-            "current_latitude": forms.TextInput(attrs={"class": "form-control"}),
-            "current_longitude": forms.TextInput(attrs={"class": "form-control"}),
+            "current_latitude": forms.NumberInput(
+                attrs={"class": "form-control", "step": "0.000001", "min": "-90", "max": "90"}
+            ),
+            "current_longitude": forms.NumberInput(
+                attrs={"class": "form-control", "step": "0.000001", "min": "-180", "max": "180"}
+            ),
             "main_photo": forms.FileInput(attrs={"class": "form-control"}),
             "insurance_valid_until": forms.DateInput(attrs={"class": "form-control", "type": "date"}),
             "technical_inspection_valid_until": forms.DateInput(attrs={"class": "form-control", "type": "date"}),
@@ -106,13 +110,15 @@ class CarReviewForm(forms.ModelForm):
 class CarLocationForm(forms.Form):
     """Форма для оновлення місцезнаходження автомобіля"""
 
-    latitude = forms.CharField(
-        max_length=255,
-        widget=forms.TextInput(attrs={"class": "form-control"})
+    latitude = forms.FloatField(
+        min_value=-90,
+        max_value=90,
+        widget=forms.NumberInput(attrs={"class": "form-control", "step": "0.000001"})
     )
-    longitude = forms.CharField(
-        max_length=255,
-        widget=forms.TextInput(attrs={"class": "form-control"})
+    longitude = forms.FloatField(
+        min_value=-180,
+        max_value=180,
+        widget=forms.NumberInput(attrs={"class": "form-control", "step": "0.000001"})
     )
 
 class CarStatusForm(forms.Form):
@@ -136,7 +142,7 @@ class CarFilterForm(forms.Form):
     )
 
     model = forms.ModelChoiceField(
-        queryset=CarModel.objects.all(),
+        queryset=CarModel.objects.select_related("brand"),
         required=False,
         empty_label="Усі моделі",
         widget=forms.Select(attrs={"class": "form-select"})
@@ -192,3 +198,31 @@ class CarFilterForm(forms.Form):
         required=False,
         widget=forms.CheckboxInput(attrs={"class": "form-check-input"})
     )
+
+    def filters(self):
+        """
+        Повертає нормалізовані фільтри форми для фасетного пошуку.
+
+        Returns:
+            dict: Непорожні фільтри (порожній словник, якщо форма некоректна).
+        """
+        from .search import normalize_filters
+
+        return normalize_filters(self.cleaned_data) if self.is_valid() else {}
+
+    def set_facet_counts(self, facets):
+        """
+        Додає до варіантів вибору кількість автомобілів, які будуть знайдені при виборі варіанта.
+
+        Args:
+            facets: Кількості за значеннями фасетів (результат cars.search.search_cars).
+        """
+        brands = facets["brand"]
+        self.fields["brand"].label_from_instance = lambda brand: f"{brand.name} ({brands.get(brand.pk, 0)})"
+        for name in ("fuel_type", "transmission", "status"):
+            counts = facets[name]
+            self.fields[name].choices = [
+                (value, f"{label} ({counts.get(value, 0)})" if value else label)
+                for value, label in self.fields[name].choices
+            ]
+        self.seat_counts = sorted(facets["seats"].items())
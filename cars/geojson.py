@@ -0,0 +1,146 @@
+from django.conf import settings
+from django.db.models import Avg, Count, Q
+from django.db.models.functions import Substr
+from django.urls import reverse
+
+from utils.geo import cluster_precision
+
+from .models import Car, CarCatalogEntry
+
+
+# Поля каталогу автомобілів, які потрібні для маркера на карті
+CAR_FEATURE_FIELDS = (
+    "car_id", "current_latitude", "current_longitude", "status", "license_plate", "color",
+    "fuel_type", "price_per_minute", "thumbnail_url", "model_name", "brand_name", "location_updated_at",
+)
+
+
+def map_cars(status=None, brand_id=None):
+    """
+    Відбирає автомобілі з відомим місцезнаходженням за фільтрами карти.
+
+    Args:
+        status: Статус автомобілів (або None для всіх статусів).
+        brand_id: Ідентифікатор марки (або None для всіх марок).
+
+    Returns:
+        QuerySet: Відфільтровані записи каталогу автомобілів.
+    """
+    cars = CarCatalogEntry.objects.exclude(geohash="")
+
+    # Фільтрація по статусу, якщо вказано
+    if status:
+        cars = cars.filter(status=status)
+
+    # Фільтрація по марці, якщо вказано
+    if brand_id:
+        cars = cars.filter(brand_id=brand_id)
+
+    return cars
+
+def car_features(cars):
+    """
+    Будує об'єкти GeoJSON для окремих автомобілів одним запитом до каталогу автомобілів.
+
+    Args:
+        cars: QuerySet записів каталогу автомобілів з відомим місцезнаходженням.
+
+    Returns:
+        list: Об'єкти GeoJSON Feature з точкою автомобіля та даними для спливаючого вікна.
+    """
+    fuel_types = dict(Car.FUEL_CHOICES)
+    statuses = dict(Car.STATUS_CHOICES)
+    features = []
+
+    for car in cars.values(*CAR_FEATURE_FIELDS):
+        features.append({
+            "type": "Feature",
+            "geometry": {
+                "type": "Point",
+                "coordinates": [car["current_longitude"], car["current_latitude"]],
+            },
+            "properties": {
+                "kind": "car",
+                "id": car["car_id"],
+                "title": f"{car['brand_name']} {car['model_name']}",
+                "license_plate": car["license_plate"],
+                "color": car["color"],
+                "fuel_type": fuel_types.get(car["fuel_type"], car["fuel_type"]),
+                "status": car["status"],
+                "status_display": statuses.get(car["status"], car["status"]),
+                "price_per_minute": str(car["price_per_minute"]),
+                "photo": car["thumbnail_url"] or None,
+                "url": reverse("car-detail", args=[car["car_id"]]),
+                "location_time": car["location_updated_at"].timestamp() if car["location_updated_at"] else None,
+            },
+        })
+    return features
+
+def cluster_features(cars, precision):
+    """
+    Групує автомобілі за клітинками геохешу на боці бази даних.
+
+    Args:
+        cars: QuerySet записів каталогу автомобілів з відомим місцезнаходженням.
+        precision: Кількість символів геохешу для групування.
+
+    Returns:
+        list: Об'єкти GeoJSON Feature з центром кластера та кількістю автомобілів.
+    """
+    clusters = (
+        cars.order_by()
+        .annotate(cell=Substr("geohash", 1, precision))
+        .values("cell")
+        .annotate(
+            count=Count("car_id"),
+            available=Count("car_id", filter=Q(status="available")),
+            latitude=Avg("current_latitude"),
+            longitude=Avg("current_longitude"),
+        )
+    )
+
+    return [
+        {
+            "type": "Feature",
+            "geometry": {
+                "type": "Point",
+                "coordinates": [cluster["longitude"], cluster["latitude"]],
+            },
+            "properties": {
+                "kind": "cluster",
+                "cell": cluster["cell"],
+                "count": cluster["count"],
+                "available": cluster["available"],
+            },
+        }
+        for cluster in clusters
+    ]
+
+def map_feature_collection(cars, zoom):
+    """
+    Повертає автомобілі видимої області карти як GeoJSON.
+
+    Якщо автомобілів в області не більше MAP_MAX_MARKERS або масштаб не менший за MAP_CLUSTER_MAX_ZOOM,
+    повертаються окремі автомобілі, інакше - кластери з кількістю автомобілів у клітинках геохешу.
+
+    Args:
+        cars: QuerySet записів каталогу автомобілів видимої області з застосованими фільтрами.
+        zoom: Масштаб карти.
+
+    Returns:
+        dict: GeoJSON FeatureCollection з кількістю автомобілів та ознакою кластеризації.
+    """
+    count = cars.count()
+    clustered = count > settings.MAP_MAX_MARKERS and zoom < settings.MAP_CLUSTER_MAX_ZOOM
+
+    if clustered:
+        features = cluster_features(cars, cluster_precision(zoom))
+    else:
+        features = car_features(cars.order_by("car_id")[:settings.MAP_MAX_MARKERS])
+
+    return {
+        "type": "FeatureCollection",
+        "features": features,
+        "count": count,
+        "clustered": clustered,
+    }
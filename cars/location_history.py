@@ -0,0 +1,253 @@
+import datetime
+import zlib
+from collections import defaultdict
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from bookings.models import Booking
+
+from .models import Car, CarLocationChunk
+
+
+# Координати зберігаються цілими мільйонними частками градуса (близько 0.1 м)
+COORDINATE_SCALE = 1_000_000
+
+# Перша точка порції зберігається повністю (int64), решта - різницями з попередньою точкою (int32)
+FIRST_POINT_DTYPE = np.dtype("<i8")
+DELTA_DTYPE = np.dtype("<i4")
+
+
+def encode_track(times, latitudes, longitudes):
+    """
+    Стискає послідовність точок маршруту.
+
+    Час округлюється до секунд, координати - до мільйонних часток градуса. Різниці між сусідніми
+    точками маленькі, тому після запису по стовпцях (усі різниці часу, потім широти, потім довготи)
+    вони добре стискаються zlib.
+
+    Args:
+        times: Час точок у секундах Unix у порядку зростання.
+        latitudes: Широти точок.
+        longitudes: Довготи точок.
+
+    Returns:
+        bytes: Стиснуті дані порції.
+    """
+    values = np.column_stack([
+        np.round(np.asarray(times, dtype=float)),
+        np.round(np.asarray(latitudes, dtype=float) * COORDINATE_SCALE),
+        np.round(np.asarray(longitudes, dtype=float) * COORDINATE_SCALE),
+    ]).astype(np.int64)
+
+    deltas = np.diff(values, axis=0).T.astype(DELTA_DTYPE)
+    return zlib.compress(values[0].astype(FIRST_POINT_DTYPE).tobytes() + deltas.tobytes())
+
+def decode_track(data, count):
+    """
+    Розпаковує послідовність точок маршруту, стиснуту encode_track.
+
+    Args:
+        data: Стиснуті дані порції.
+        count: Кількість точок у порції.
+
+    Returns:
+        tuple: Масиви numpy з часом у секундах Unix, широтами та довготами.
+    """
+    raw = zlib.decompress(bytes(data))
+    header = 3 * FIRST_POINT_DTYPE.itemsize
+    first = np.frombuffer(raw[:header], dtype=FIRST_POINT_DTYPE)
+    deltas = np.frombuffer(raw[header:], dtype=DELTA_DTYPE).reshape(3, count - 1).T
+
+    values = np.cumsum(np.vstack([first, deltas.astype(np.int64)]), axis=0)
+    return values[:, 0], values[:, 1] / COORDINATE_SCALE, values[:, 2] / COORDINATE_SCALE
+
+def thin_track(times, resolution):
+    """
+    Вибирає точки для проріджування маршруту.
+
+    Залишається перша точка кожного інтервалу resolution секунд та остання точка маршруту.
+
+    Args:
+        times: Масив часу точок у секундах Unix у порядку зростання.
+        resolution: Інтервал проріджування в секундах.
+
+    Returns:
+        numpy.ndarray: Булева маска точок, які залишаються.
+    """
+    buckets = times // resolution
+    keep = np.ones(len(times), dtype=bool)
+    keep[1:] = buckets[1:] != buckets[:-1]
+    keep[-1] = True
+    return keep
+
+def track_bookings(car_points):
+    """
+    Знаходить оренди, під час яких записані точки автомобілів, одним запитом.
+
+    Args:
+        car_points: Словник {car_id: список (час, широта, довгота)}, відсортованих за часом.
+
+    Returns:
+        dict: Словник {car_id: список (початок, кінець або None, id оренди)}.
+    """
+    start = min(points[0][0] for points in car_points.values())
+    end = max(points[-1][0] for points in car_points.values())
+    bookings = Booking.objects.filter(
+        Q(status="active") | Q(status="completed", end_time__gte=start),
+        car_id__in=list(car_points),
+        start_time__lte=end,
+    ).values_list("car_id", "start_time", "end_time", "status", "id")
+
+    intervals = defaultdict(list)
+    for car_id, start_time, end_time, status, booking_id in bookings:
+        # Активна оренда триває до фактичного завершення, а не до запланованого часу
+        intervals[car_id].append((start_time, end_time if status == "completed" else None, booking_id))
+    return intervals
+
+def store_history(points, chunk_points=None):
+    """
+    Записує точки телеметрії в історію місцезнаходження порціями.
+
+    Точки групуються за автомобілем та орендою, під час якої вони записані; кожна група розбивається
+    на порції не більше chunk_points точок. Точки невідомих автомобілів пропускаються.
+
+    Args:
+        points: Список (car_id, широта, довгота, час).
+        chunk_points: Найбільша кількість точок у порції (за замовчуванням - LOCATION_HISTORY_CHUNK_POINTS).
+
+    Returns:
+        int: Кількість записаних порцій.
+    """
+    chunk_points = chunk_points or settings.LOCATION_HISTORY_CHUNK_POINTS
+    car_points = defaultdict(list)
+    for car_id, latitude, longitude, timestamp in points:
+        car_points[car_id].append((timestamp, latitude, longitude))
+
+    known = set(Car.objects.filter(id__in=list(car_points)).values_list("id", flat=True))
+    car_points = {car_id: sorted(car_points[car_id]) for car_id in sorted(known)}
+    if not car_points:
+        return 0
+    intervals = track_bookings(car_points)
+
+    chunks = []
+    for car_id, track in car_points.items():
+        # Розбити маршрут на послідовні групи точок однієї оренди
+        groups = []
+        for point in track:
+            booking_id = next(
+                (
+                    booking_id for start, end, booking_id in intervals.get(car_id, [])
+                    if start <= point[0] and (end is None or point[0] <= end)
+                ),
+                None,
+            )
+            if groups and groups[-1][0] == booking_id and len(groups[-1][1]) < chunk_points:
+                groups[-1][1].append(point)
+            else:
+                groups.append((booking_id, [point]))
+
+        for booking_id, group in groups:
+            times, latitudes, longitudes = zip(*group)
+            chunks.append(CarLocationChunk(
+                car_id=car_id,
+                booking_id=booking_id,
+                start_time=times[0],
+                end_time=times[-1],
+                point_count=len(group),
+                data=encode_track([timestamp.timestamp() for timestamp in times], latitudes, longitudes),
+            ))
+
+    CarLocationChunk.objects.bulk_create(chunks)
+    return len(chunks)
+
+def load_track(chunks):
+    """
+    Збирає маршрут з порцій історії місцезнаходження.
+
+    Args:
+        chunks: QuerySet порцій історії.
+
+    Returns:
+        tuple: Масиви numpy з часом у секундах Unix, широтами та довготами в порядку зростання часу.
+    """
+    parts = [
+        decode_track(data, count)
+        for data, count in chunks.order_by("start_time", "id").values_list("data", "point_count")
+    ]
+    if not parts:
+        return np.empty(0, dtype=np.int64), np.empty(0), np.empty(0)
+
+    times, latitudes, longitudes = (np.concatenate(column) for column in zip(*parts))
+    order = np.argsort(times, kind="stable")
+    return times[order], latitudes[order], longitudes[order]
+
+def booking_track(booking, max_points=None):
+    """
+    Повертає маршрут оренди для відтворення на карті.
+
+    Args:
+        booking: Бронювання.
+        max_points: Найбільша кількість точок (за замовчуванням - LOCATION_HISTORY_REPLAY_POINTS);
+            довший маршрут рівномірно проріджується.
+
+    Returns:
+        list: Точки [широта, довгота, час у секундах Unix].
+    """
+    max_points = max_points or settings.LOCATION_HISTORY_REPLAY_POINTS
+    times, latitudes, longitudes = load_track(booking.location_chunks.all())
+    if len(times) > max_points:
+        indexes = np.unique(np.linspace(0, len(times) - 1, max_points).round().astype(int))
+        times, latitudes, longitudes = times[indexes], latitudes[indexes], longitudes[indexes]
+
+    return [
+        [latitude, longitude, timestamp]
+        for latitude, longitude, timestamp in zip(latitudes.tolist(), longitudes.tolist(), times.tolist())
+    ]
+
+def downsample_history(now=None, batch_size=None):
+    """
+    Проріджує історію місцезнаходження, старішу за LOCATION_HISTORY_DOWNSAMPLE_AFTER днів.
+
+    У кожній непрорідженій порції залишається перша точка кожного інтервалу LOCATION_HISTORY_RESOLUTION
+    секунд. Порції обробляються пакетами, кожен пакет - окремою транзакцією.
+
+    Args:
+        now: Поточний момент (за замовчуванням - timezone.now()).
+        batch_size: Кількість порцій в одному пакеті (за замовчуванням - LOCATION_HISTORY_BATCH_SIZE).
+
+    Returns:
+        dict: Кількість оброблених порцій та кількість точок до і після проріджування.
+    """
+    now = now or timezone.now()
+    batch_size = batch_size or settings.LOCATION_HISTORY_BATCH_SIZE
+    resolution = settings.LOCATION_HISTORY_RESOLUTION
+    cutoff = now - datetime.timedelta(days=settings.LOCATION_HISTORY_DOWNSAMPLE_AFTER)
+    stats = {"chunks": 0, "points_before": 0, "points_after": 0}
+
+    while True:
+        with transaction.atomic():
+            chunks = list(
+                CarLocationChunk.objects.select_for_update()
+                .filter(resolution=0, end_time__lt=cutoff)
+                .order_by("id")
+                .only("id", "point_count", "data")[:batch_size]
+            )
+            if not chunks:
+                return stats
+
+            for chunk in chunks:
+                times, latitudes, longitudes = decode_track(chunk.data, chunk.point_count)
+                keep = thin_track(times, resolution)
+                stats["points_before"] += chunk.point_count
+
+                chunk.data = encode_track(times[keep], latitudes[keep], longitudes[keep])
+                chunk.point_count = int(keep.sum())
+                chunk.resolution = resolution
+                stats["points_after"] += chunk.point_count
+
+            CarLocationChunk.objects.bulk_update(chunks, ["data", "point_count", "resolution"])
+            stats["chunks"] += len(chunks)
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from cars.catalog import sync_catalog
+
+
+class Command(BaseCommand):
+    """
+    Перебудова каталогу автомобілів.
+
+    Каталог оновлюється разом з автомобілями, моделями, марками та відгуками, а команда потрібна після
+    змін в обхід моделей (масове завантаження, ручні SQL-запити) або зміни адреси медіафайлів (MEDIA_URL).
+
+    Приклади:
+        python manage.py rebuild_car_catalog
+        python manage.py rebuild_car_catalog --car 12 15
+    """
+
+    help = "Перебудовує денормалізований каталог автомобілів"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--car", nargs="+", type=int, help="Id автомобілів (за замовчуванням - всі автомобілі)")
+
+    def handle(self, *args, **options):
+        synced = sync_catalog(options["car"])
+        self.stdout.write(self.style.SUCCESS(f"Оновлено записів каталогу: {synced}"))
@@ -0,0 +1,41 @@
+# Generated by Django 5.2 on 2026-10-18 12:10
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0008_alter_car_mileage'),
+    ]
+
+    operations = [
+        # Старі текстові координати залишаються до завершення перенесення даних
+        migrations.RenameField(
+            model_name='car',
+            old_name='current_latitude',
+            new_name='legacy_latitude',
+        ),
+        migrations.RenameField(
+            model_name='car',
+            old_name='current_longitude',
+            new_name='legacy_longitude',
+        ),
+        migrations.AddField(
+            model_name='car',
+            name='current_latitude',
+            field=models.FloatField(blank=True, null=True, validators=[django.core.validators.MinValueValidator(-90), django.core.validators.MaxValueValidator(90)]),
+        ),
+        migrations.AddField(
+            model_name='car',
+            name='current_longitude',
+            field=models.FloatField(blank=True, null=True, validators=[django.core.validators.MinValueValidator(-180), django.core.validators.MaxValueValidator(180)]),
+        ),
+        migrations.AddField(
+            model_name='car',
+            name='geohash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=12),
+            preserve_default=False,
+        ),
+    ]
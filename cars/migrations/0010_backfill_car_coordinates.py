@@ -0,0 +1,77 @@
+# Generated by Django 5.2 on 2026-10-18 12:12
+
+from django.db import migrations, transaction
+
+from utils.geo import encode_geohash
+
+
+# Кількість автомобілів, які оновлюються в одній транзакції
+BACKFILL_BATCH_SIZE = 1000
+
+
+def parse_coordinate(value, limit):
+    """Перетворює текстову координату на число або None, якщо вона некоректна"""
+    try:
+        coordinate = float(str(value).strip().replace(",", "."))
+    except ValueError:
+        return None
+    if coordinate != coordinate or abs(coordinate) > limit:
+        return None
+    return coordinate
+
+
+def iter_car_batches(apps, schema_editor, *fields):
+    """Повертає автомобілі порціями за зростанням id, кожну порцію - в окремій транзакції"""
+    Car = apps.get_model('cars', 'Car')
+    alias = schema_editor.connection.alias
+    last_id = 0
+    while True:
+        with transaction.atomic(using=alias):
+            cars = list(
+                Car.objects.using(alias).filter(id__gt=last_id).order_by('id').only('id', *fields)[:BACKFILL_BATCH_SIZE]
+            )
+            if not cars:
+                return
+            yield Car, cars
+        last_id = cars[-1].id
+
+
+def backfill_coordinates(apps, schema_editor):
+    for Car, cars in iter_car_batches(apps, schema_editor, 'legacy_latitude', 'legacy_longitude'):
+        for car in cars:
+            latitude = parse_coordinate(car.legacy_latitude, 90)
+            longitude = parse_coordinate(car.legacy_longitude, 180)
+            if latitude is None or longitude is None:
+                car.current_latitude = car.current_longitude = None
+                car.geohash = ''
+            else:
+                car.current_latitude = latitude
+                car.current_longitude = longitude
+                car.geohash = encode_geohash(latitude, longitude)
+        Car.objects.using(schema_editor.connection.alias).bulk_update(
+            cars, ['current_latitude', 'current_longitude', 'geohash']
+        )
+
+
+def restore_legacy_coordinates(apps, schema_editor):
+    for Car, cars in iter_car_batches(apps, schema_editor, 'current_latitude', 'current_longitude'):
+        for car in cars:
+            car.legacy_latitude = '' if car.current_latitude is None else str(car.current_latitude)
+            car.legacy_longitude = '' if car.current_longitude is None else str(car.current_longitude)
+        Car.objects.using(schema_editor.connection.alias).bulk_update(
+            cars, ['legacy_latitude', 'legacy_longitude']
+        )
+
+
+class Migration(migrations.Migration):
+
+    # Порції оновлюються в окремих транзакціях, щоб не блокувати таблицю автомобілів на весь час перенесення
+    atomic = False
+
+    dependencies = [
+        ('cars', '0009_car_geohash_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_coordinates, restore_legacy_coordinates),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2 on 2026-10-18 12:14
+
+from django.db import migrations, models
+
+
+GEOHASH_INDEX = models.Index(fields=['geohash'], name='car_geohash_idx', opclasses=['varchar_pattern_ops'])
+
+
+def create_geohash_index(apps, schema_editor):
+    Car = apps.get_model('cars', 'Car')
+    if schema_editor.connection.vendor == 'postgresql':
+        # Індекс будується без блокування запису в таблицю автомобілів
+        schema_editor.add_index(Car, GEOHASH_INDEX, concurrently=True)
+    else:
+        schema_editor.add_index(Car, GEOHASH_INDEX)
+
+
+def drop_geohash_index(apps, schema_editor):
+    Car = apps.get_model('cars', 'Car')
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.remove_index(Car, GEOHASH_INDEX, concurrently=True)
+    else:
+        schema_editor.remove_index(Car, GEOHASH_INDEX)
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('cars', '0010_backfill_car_coordinates'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='car',
+            name='legacy_latitude',
+        ),
+        migrations.RemoveField(
+            model_name='car',
+            name='legacy_longitude',
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='car',
+                    index=GEOHASH_INDEX,
+                ),
+            ],
+            database_operations=[
+                migrations.RunPython(create_geohash_index, drop_geohash_index),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 12:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0011_remove_car_legacy_latitude_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='car',
+            name='location_updated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
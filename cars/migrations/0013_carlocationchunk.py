@@ -0,0 +1,31 @@
+# Generated by Django 5.2 on 2026-10-18 12:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0011_booking_hold_kopecks_and_more'),
+        ('cars', '0012_car_location_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CarLocationChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_time', models.DateTimeField()),
+                ('end_time', models.DateTimeField()),
+                ('point_count', models.PositiveIntegerField()),
+                ('resolution', models.PositiveIntegerField(default=0)),
+                ('data', models.BinaryField()),
+                ('booking', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='location_chunks', to='bookings.booking')),
+                ('car', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='location_chunks', to='cars.car')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['car', 'start_time'], name='car_location_chunk_time_idx'), models.Index(condition=models.Q(('resolution', 0)), fields=['end_time'], name='car_location_chunk_raw_idx')],
+            },
+        ),
+    ]
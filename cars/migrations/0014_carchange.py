@@ -0,0 +1,24 @@
+# Generated by Django 5.2 on 2026-10-18 12:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0013_carlocationchunk'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CarChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('car_id', models.PositiveBigIntegerField()),
+                ('status', models.CharField(blank=True, max_length=20)),
+                ('latitude', models.FloatField(blank=True, null=True)),
+                ('longitude', models.FloatField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2 on 2026-10-18 13:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0014_carchange'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Zone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('kind', models.CharField(choices=[('service', 'Зона повернення'), ('airport', 'Аеропорт'), ('no_parking', 'Заборона паркування')], default='service', max_length=20)),
+                ('polygon', models.JSONField()),
+                ('is_active', models.BooleanField(default=True)),
+                ('south', models.FloatField(default=0, editable=False)),
+                ('west', models.FloatField(default=0, editable=False)),
+                ('north', models.FloatField(default=0, editable=False)),
+                ('east', models.FloatField(default=0, editable=False)),
+                ('grid_precision', models.PositiveSmallIntegerField(default=0, editable=False)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ZoneCell',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cell', models.CharField(max_length=12)),
+                ('boundary', models.BooleanField(default=False)),
+                ('zone', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cells', to='cars.zone')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['cell'], name='zone_cell_idx')],
+            },
+        ),
+    ]
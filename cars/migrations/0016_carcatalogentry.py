@@ -0,0 +1,93 @@
+# Generated by Django 5.2 on 2026-10-18 13:23
+
+import django.db.models.deletion
+from django.core.files.storage import default_storage
+from django.db import migrations, models
+
+
+# Кількість автомобілів, записи каталогу яких створюються одним запитом
+POPULATE_BATCH_SIZE = 1000
+
+
+def populate_catalog(apps, schema_editor):
+    """Створює записи каталогу для наявних автомобілів порціями за зростанням id"""
+    Car = apps.get_model('cars', 'Car')
+    CarCatalogEntry = apps.get_model('cars', 'CarCatalogEntry')
+    alias = schema_editor.connection.alias
+    last_id = 0
+    while True:
+        cars = list(
+            Car.objects.using(alias).filter(id__gt=last_id).select_related('model__brand').order_by('id')
+            [:POPULATE_BATCH_SIZE]
+        )
+        if not cars:
+            return
+        CarCatalogEntry.objects.using(alias).bulk_create([
+            CarCatalogEntry(
+                car_id=car.id,
+                brand_id=car.model.brand_id,
+                model_id=car.model_id,
+                brand_name=car.model.brand.name,
+                model_name=car.model.name,
+                year=car.year,
+                license_plate=car.license_plate,
+                color=car.color,
+                fuel_type=car.fuel_type,
+                transmission=car.transmission,
+                seats=car.seats,
+                has_air_conditioning=car.has_air_conditioning,
+                has_gps=car.has_gps,
+                has_child_seat=car.has_child_seat,
+                status=car.status,
+                price_per_minute=car.price_per_minute,
+                rating=car.rating,
+                thumbnail_url=default_storage.url(car.main_photo.name) if car.main_photo else '',
+                current_latitude=car.current_latitude,
+                current_longitude=car.current_longitude,
+                geohash=car.geohash,
+                location_updated_at=car.location_updated_at,
+            )
+            for car in cars
+        ])
+        last_id = cars[-1].id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0015_zone_zonecell'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CarCatalogEntry',
+            fields=[
+                ('car', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='catalog_entry', serialize=False, to='cars.car')),
+                ('brand_name', models.CharField(max_length=100)),
+                ('model_name', models.CharField(max_length=100)),
+                ('year', models.PositiveIntegerField()),
+                ('license_plate', models.CharField(max_length=20)),
+                ('color', models.CharField(max_length=50)),
+                ('fuel_type', models.CharField(choices=[('petrol', 'Бензин'), ('diesel', 'Дизель'), ('electric', 'Електричний'), ('hybrid', 'Гібрид')], max_length=20)),
+                ('transmission', models.CharField(choices=[('manual', 'Механічна'), ('automatic', 'Автоматична')], max_length=20)),
+                ('seats', models.PositiveSmallIntegerField()),
+                ('has_air_conditioning', models.BooleanField(default=False)),
+                ('has_gps', models.BooleanField(default=False)),
+                ('has_child_seat', models.BooleanField(default=False)),
+                ('status', models.CharField(choices=[('available', 'Доступний'), ('busy', 'Зайнятий'), ('maintenance', 'На обслуговуванні'), ('inactive', 'Неактивний')], max_length=20)),
+                ('price_per_minute', models.DecimalField(decimal_places=2, max_digits=6)),
+                ('rating', models.DecimalField(decimal_places=2, default=0, max_digits=3)),
+                ('thumbnail_url', models.CharField(blank=True, max_length=500)),
+                ('current_latitude', models.FloatField(blank=True, null=True)),
+                ('current_longitude', models.FloatField(blank=True, null=True)),
+                ('geohash', models.CharField(blank=True, max_length=12)),
+                ('location_updated_at', models.DateTimeField(blank=True, null=True)),
+                ('brand', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='cars.carbrand')),
+                ('model', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='cars.carmodel')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'car'], name='catalog_status_idx'), models.Index(fields=['geohash'], name='catalog_geohash_idx', opclasses=['varchar_pattern_ops'])],
+            },
+        ),
+        migrations.RunPython(populate_catalog, migrations.RunPython.noop),
+    ]
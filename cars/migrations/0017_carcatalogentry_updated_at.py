@@ -0,0 +1,19 @@
+# Generated by Django 5.2 on 2026-10-18 13:28
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0016_carcatalogentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='carcatalogentry',
+            name='updated_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
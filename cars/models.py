@@ -1,7 +1,11 @@
 from decimal import Decimal
 
+from django.core.exceptions import ValidationError
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.db import models, transaction
+from django.utils import timezone
+
+from utils.geo import bbox_geohashes, encode_geohash, normalize_polygon
 
 
 class CarBrand(models.Model):
@@ -29,6 +33,49 @@ class CarModel(models.Model):
     def __str__(self):
         return f"{self.brand.name} {self.name}"
 
+class CarQuerySet(models.QuerySet):
+    """Набір запитів для автомобілів з просторовими фільтрами"""
+
+    def in_cell(self, geohash):
+        """
+        Автомобілі, які знаходяться в клітинці геохешу.
+
+        Args:
+            geohash: Геохеш клітинки (префікс геохешу автомобіля).
+
+        Returns:
+            QuerySet: Автомобілі в клітинці.
+        """
+        return self.filter(geohash__startswith=geohash)
+
+    def in_bbox(self, south, west, north, east):
+        """
+        Автомобілі, які знаходяться в прямокутній області.
+
+        Спочатку область покривається клітинками геохешу, щоб база даних відібрала кандидатів за індексом,
+        а потім кандидати перевіряються за точними координатами.
+
+        Args:
+            south: Південна межа області.
+            west: Західна межа області.
+            north: Північна межа області.
+            east: Східна межа області.
+
+        Returns:
+            QuerySet: Автомобілі в області.
+        """
+        cells = models.Q()
+        for geohash in bbox_geohashes(south, west, north, east):
+            cells |= models.Q(geohash__startswith=geohash)
+
+        return self.filter(
+            cells,
+            current_latitude__gte=south,
+            current_latitude__lte=north,
+            current_longitude__gte=west,
+            current_longitude__lte=east,
+        )
+
 class Car(models.Model):
     """Модель для автомобілів"""
 
@@ -90,8 +137,24 @@ class Car(models.Model):
 
     # Статус і місцезнаходження
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="available")  # Статус автомобіля
-    current_latitude = models.CharField(max_length=255, blank=True)  # Поточна широта автомобіля
-    current_longitude = models.CharField(max_length=255, blank=True)  # Поточна довгота автомобіля
+    current_latitude = models.FloatField(
+        null=True,
+        blank=True,
+        validators=[
+            MinValueValidator(-90),
+            MaxValueValidator(90)
+        ]
+    )  # Поточна широта автомобіля
+    current_longitude = models.FloatField(
+        null=True,
+        blank=True,
+        validators=[
+            MinValueValidator(-180),
+            MaxValueValidator(180)
+        ]
+    )  # Поточна довгота автомобіля
+    geohash = models.CharField(max_length=12, blank=True, editable=False)  # Геохеш поточного місцезнаходження
+    location_updated_at = models.DateTimeField(null=True, blank=True)  # Час, якого стосується поточне місцезнаходження
 
     # Медіа
     main_photo = models.ImageField(upload_to="car_photos/")  # Головне фото автомобіля
@@ -105,9 +168,113 @@ class Car(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)  # Дата створення запису
     updated_at = models.DateTimeField(auto_now=True)  # Дата останнього оновлення запису
 
+    # Поля, від яких залежать маркери та кластери в тайлах карти
+    MAP_FIELDS = (
+        "current_latitude", "current_longitude", "status", "license_plate", "color",
+        "fuel_type", "price_per_minute", "main_photo", "model_id",
+    )
+
+    objects = CarQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Пошук за префіксом геохешу (LIKE 'префікс%') для областей та клітинок карти
+            models.Index(fields=["geohash"], name="car_geohash_idx", opclasses=["varchar_pattern_ops"]),
+        ]
+
     def __str__(self):
         return f"{self.model} ({self.license_plate})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Запам'ятати стан автомобіля на карті, щоб порівняти його під час збереження
+        instance._map_state = instance.map_state() if set(cls.MAP_FIELDS) <= set(field_names) else None
+        return instance
+
+    def map_state(self):
+        """
+        Повертає значення полів автомобіля, які показуються на карті.
+
+        Returns:
+            tuple: Значення полів MAP_FIELDS.
+        """
+        return tuple(
+            self.main_photo.name if field == "main_photo" else getattr(self, field)
+            for field in self.MAP_FIELDS
+        )
+
+    def save(self, *args, **kwargs):
+        from .search import invalidate_search
+
+        # Оновити геохеш разом з координатами, щоб просторові запити бачили актуальне місцезнаходження
+        if self.current_latitude is not None and self.current_longitude is not None:
+            self.current_latitude = float(self.current_latitude)
+            self.current_longitude = float(self.current_longitude)
+            self.geohash = encode_geohash(self.current_latitude, self.current_longitude)
+        else:
+            self.geohash = ""
+
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and {"current_latitude", "current_longitude"} & set(update_fields):
+            kwargs["update_fields"] = set(update_fields) | {"geohash"}
+
+        # Скинути тайли карти лише тоді, коли змінилося те, що показується на карті
+        previous = getattr(self, "_map_state", None)
+        if previous is None and self.pk:
+            previous = Car.objects.filter(pk=self.pk).values_list(*self.MAP_FIELDS).first()
+
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            current = self.map_state()
+            # Записати зміну статусу або місцезнаходження в журнал змін разом зі збереженням автомобіля
+            if previous is None or previous[:3] != current[:3]:
+                self.record_change()
+
+        if previous != current:
+            self.invalidate_map_tiles(previous, current)
+        self._map_state = current
+        # Фасети пошуку залежать від марки, палива, трансмісії, місць та статусу автомобіля
+        transaction.on_commit(invalidate_search)
+
+    def delete(self, *args, **kwargs):
+        from .search import invalidate_search
+
+        self.invalidate_map_tiles(self.map_state())
+        transaction.on_commit(invalidate_search)
+        with transaction.atomic():
+            self.record_change(deleted=True)
+            return super().delete(*args, **kwargs)
+
+    def record_change(self, *, deleted=False):
+        """
+        Записує поточний статус та місцезнаходження автомобіля в журнал змін.
+
+        Args:
+            deleted: Чи видаляється автомобіль.
+        """
+        from .changes import record_car_changes
+
+        if deleted:
+            record_car_changes([(self.pk, None, None, None)])
+        else:
+            record_car_changes([(self.pk, self.status, self.current_latitude, self.current_longitude)])
+
+    def invalidate_map_tiles(self, *states):
+        """
+        Видаляє з кешу тайли карти, які містять автомобіль у заданих станах, після фіксації транзакції.
+        Індекси автомобілів у пам'яті процесів оновлюються обробниками сигналів (cars.signals).
+
+        Args:
+            *states: Стани автомобіля (результати map_state() або None для нового автомобіля).
+        """
+        from .tiles import invalidate_car_tiles
+
+        states = [state for state in states if state]
+        locations = [state[:2] for state in states]
+        statuses = [state[2] for state in states]
+        transaction.on_commit(lambda: invalidate_car_tiles(locations, statuses))
+
 class CarPhoto(models.Model):
     """Модель для додаткових фотографій автомобілів"""
 
@@ -141,3 +308,184 @@ class CarReview(models.Model):
 
     def __str__(self):
         return f"Відгук від {self.user.username} для {self.car}"
+
+class CarCatalogEntry(models.Model):
+    """
+    Денормалізований запис каталогу автомобілів для списків, карти та API.
+
+    Один плаский рядок на автомобіль з назвами марки та моделі, рейтингом і адресою фото, тому списки
+    читаються однією таблицею без з'єднань. Запис оновлюється в тій самій транзакції, що й автомобіль,
+    модель, марка або відгук (cars.catalog та cars.signals).
+    """
+
+    car = models.OneToOneField(
+        Car,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="catalog_entry"
+    )  # Автомобіль
+    brand = models.ForeignKey(CarBrand, on_delete=models.CASCADE, related_name="+")  # Марка (для фільтрації)
+    model = models.ForeignKey(CarModel, on_delete=models.CASCADE, related_name="+")  # Модель (для фільтрації)
+    brand_name = models.CharField(max_length=100)  # Назва марки
+    model_name = models.CharField(max_length=100)  # Назва моделі
+    year = models.PositiveIntegerField()  # Рік випуску
+    license_plate = models.CharField(max_length=20)  # Номерний знак
+    color = models.CharField(max_length=50)  # Колір
+    fuel_type = models.CharField(max_length=20, choices=Car.FUEL_CHOICES)  # Тип палива
+    transmission = models.CharField(max_length=20, choices=Car.TRANSMISSION_CHOICES)  # Тип трансмісії
+    seats = models.PositiveSmallIntegerField()  # Кількість місць
+    has_air_conditioning = models.BooleanField(default=False)  # Наявність кондиціонера
+    has_gps = models.BooleanField(default=False)  # Наявність GPS
+    has_child_seat = models.BooleanField(default=False)  # Наявність дитячого крісла
+    status = models.CharField(max_length=20, choices=Car.STATUS_CHOICES)  # Статус
+    price_per_minute = models.DecimalField(max_digits=6, decimal_places=2)  # Вартість за хвилину
+    rating = models.DecimalField(max_digits=3, decimal_places=2, default=0)  # Середній рейтинг відгуків
+    thumbnail_url = models.CharField(max_length=500, blank=True)  # Адреса головного фото
+    current_latitude = models.FloatField(null=True, blank=True)  # Широта поточного місцезнаходження
+    current_longitude = models.FloatField(null=True, blank=True)  # Довгота поточного місцезнаходження
+    geohash = models.CharField(max_length=12, blank=True)  # Геохеш поточного місцезнаходження
+    location_updated_at = models.DateTimeField(null=True, blank=True)  # Час поточного місцезнаходження
+    # Версія картки автомобіля: змінюється разом з полями, які показуються в картці (не з місцезнаходженням)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    objects = CarQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "car"], name="catalog_status_idx"),  # Доступні автомобілі за id
+            models.Index(fields=["geohash"], name="catalog_geohash_idx", opclasses=["varchar_pattern_ops"]),
+        ]
+
+    def __str__(self):
+        return f"{self.brand_name} {self.model_name} ({self.license_plate})"
+
+class CarLocationChunk(models.Model):
+    """
+    Модель для стиснутої порції історії місцезнаходження автомобіля.
+
+    Точки зберігаються не окремими рядками, а послідовністю різниць між сусідніми точками,
+    стиснутою zlib (див. cars.location_history), тому маршрут поїздки читається кількома рядками.
+    """
+
+    car = models.ForeignKey(
+        Car,
+        on_delete=models.CASCADE,
+        related_name="location_chunks"
+    )  # Автомобіль, якому належать точки
+    booking = models.ForeignKey(
+        "bookings.Booking",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="location_chunks"
+    )  # Оренда, під час якої записані точки (порожня - автомобіль без оренди)
+    start_time = models.DateTimeField()  # Час першої точки
+    end_time = models.DateTimeField()  # Час останньої точки
+    point_count = models.PositiveIntegerField()  # Кількість точок у порції
+    resolution = models.PositiveIntegerField(default=0)  # Інтервал проріджування в секундах (0 - всі точки)
+    data = models.BinaryField()  # Стиснуті різниці часу та координат
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["car", "start_time"], name="car_location_chunk_time_idx"),
+            models.Index(
+                fields=["end_time"],
+                condition=models.Q(resolution=0),
+                name="car_location_chunk_raw_idx"
+            ),  # Пошук непроріджених порцій для задачі проріджування
+        ]
+
+    def __str__(self):
+        return f"Історія {self.car} з {self.start_time} ({self.point_count} точок)"
+
+class CarChange(models.Model):
+    """
+    Модель для журналу змін статусу та місцезнаходження автомобілів.
+
+    Номер запису є версією: клієнти потоку змін передають номер останнього отриманого запису
+    і отримують лише новіші зміни (див. cars.changes).
+    """
+
+    car_id = models.PositiveBigIntegerField()  # Автомобіль (без зовнішнього ключа, щоб зберегти запис про видалення)
+    status = models.CharField(max_length=20, blank=True)  # Статус після зміни (порожній - автомобіль видалено)
+    latitude = models.FloatField(null=True, blank=True)  # Широта після зміни
+    longitude = models.FloatField(null=True, blank=True)  # Довгота після зміни
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)  # Час зміни
+
+    def __str__(self):
+        return f"Зміна {self.id} автомобіля {self.car_id}"
+
+class Zone(models.Model):
+    """
+    Модель для зони обслуговування: дозволеної зони повернення, аеропорту або зони заборони паркування.
+
+    Під час збереження багатокутник зони розкладається на клітинки геохешу (ZoneCell), тому перевірка
+    точки здебільшого зводиться до пошуку клітинки, а точна перевірка багатокутника потрібна лише
+    для клітинок на межі зони (див. cars.zones).
+    """
+
+    KIND_CHOICES = (
+        ("service", "Зона повернення"),
+        ("airport", "Аеропорт"),
+        ("no_parking", "Заборона паркування"),
+    )
+
+    name = models.CharField(max_length=100)  # Назва зони
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, default="service")  # Тип зони
+    polygon = models.JSONField()  # Кільця багатокутника у форматі GeoJSON Polygon: [[[довгота, широта], ...], ...]
+    is_active = models.BooleanField(default=True)  # Чи діє зона
+    south = models.FloatField(editable=False, default=0)  # Південна межа зони
+    west = models.FloatField(editable=False, default=0)  # Західна межа зони
+    north = models.FloatField(editable=False, default=0)  # Північна межа зони
+    east = models.FloatField(editable=False, default=0)  # Східна межа зони
+    grid_precision = models.PositiveSmallIntegerField(editable=False, default=0)  # Точність геохешу клітинок зони
+    updated_at = models.DateTimeField(auto_now=True)  # Дата останнього оновлення
+
+    def __str__(self):
+        return f"{self.name} ({self.get_kind_display()})"
+
+    def clean(self):
+        try:
+            self.polygon = normalize_polygon(self.polygon)
+        except ValueError as error:
+            raise ValidationError({"polygon": str(error)})
+
+    def save(self, *args, **kwargs):
+        from .zones import invalidate_zones, rebuild_zone_cells
+
+        self.polygon = normalize_polygon(self.polygon)
+        longitudes = [point[0] for ring in self.polygon for point in ring]
+        latitudes = [point[1] for ring in self.polygon for point in ring]
+        self.south, self.north = min(latitudes), max(latitudes)
+        self.west, self.east = min(longitudes), max(longitudes)
+
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            rebuild_zone_cells(self)
+        transaction.on_commit(invalidate_zones)
+
+    def delete(self, *args, **kwargs):
+        from .zones import invalidate_zones
+
+        transaction.on_commit(invalidate_zones)
+        return super().delete(*args, **kwargs)
+
+class ZoneCell(models.Model):
+    """
+    Модель для клітинки геохешу, яку покриває зона.
+
+    Клітинка лежить або цілком усередині зони, або на її межі (boundary) - тоді точка клітинки
+    перевіряється за багатокутником зони. Клітинки поза зоною не зберігаються.
+    """
+
+    zone = models.ForeignKey(Zone, on_delete=models.CASCADE, related_name="cells")  # Зона
+    cell = models.CharField(max_length=12)  # Геохеш клітинки
+    boundary = models.BooleanField(default=False)  # Чи проходить через клітинку межа зони
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["cell"], name="zone_cell_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.zone} - {self.cell}"
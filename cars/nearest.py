@@ -0,0 +1,234 @@
+import logging
+import math
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+from redis import RedisError
+
+from utils.geo import EARTH_RADIUS_KM, haversine_km
+from utils.redis_client import get_redis
+
+from .models import Car
+
+
+logger = logging.getLogger(__name__)
+
+# Відсортована множина Redis зі зміненими автомобілями: елемент - id автомобіля, оцінка - час зміни
+CAR_CHANGES_KEY = "cars:changes"
+
+# Довжина одного градуса меридіана в кілометрах
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+# Запас часу при читанні змін, щоб не пропустити зміну, записану одночасно з попереднім оновленням індексу
+CHANGES_OVERLAP = 1.0
+
+
+def mark_cars_changed(car_ids):
+    """
+    Позначає автомобілі зміненими для оновлення індексів автомобілів в усіх процесах
+    (індексу найближчих автомобілів та індексу текстового пошуку).
+
+    Викликається після фіксації транзакції, яка змінила автомобілі.
+
+    Args:
+        car_ids: Ітерабельний об'єкт id автомобілів.
+    """
+    car_ids = [car_id for car_id in car_ids if car_id]
+    if not settings.NEAREST_INDEX_CHANGES_ENABLED or not car_ids:
+        return
+
+    now = time.time()
+    try:
+        pipeline = get_redis().pipeline()
+        pipeline.zadd(CAR_CHANGES_KEY, dict.fromkeys(car_ids, now))
+        # Старіші зміни не потрібні: індекс, який їх не бачив, перебудовується повністю
+        pipeline.zremrangebyscore(CAR_CHANGES_KEY, "-inf", now - settings.NEAREST_INDEX_REBUILD_INTERVAL)
+        pipeline.execute()
+    except RedisError:
+        logger.exception("Не вдалося записати зміни автомобілів для індексів автомобілів")
+
+def changed_car_ids(since):
+    """
+    Повертає id автомобілів, позначених зміненими з моменту since.
+
+    Args:
+        since: Час у секундах від початку епохи.
+
+    Returns:
+        list | None: Список id або None, якщо зміни недоступні і індекс потрібно перебудувати.
+    """
+    if not settings.NEAREST_INDEX_CHANGES_ENABLED:
+        return None
+    try:
+        return [int(car_id) for car_id in get_redis().zrangebyscore(CAR_CHANGES_KEY, since - CHANGES_OVERLAP, "+inf")]
+    except RedisError:
+        logger.exception("Не вдалося прочитати зміни автомобілів для індексів автомобілів")
+        return None
+
+def ring_cells(row, column, ring):
+    """
+    Повертає клітинки сітки на межі квадрата з центром у клітинці (row, column).
+
+    Args:
+        row: Рядок центральної клітинки.
+        column: Стовпець центральної клітинки.
+        ring: Відстань межі від центральної клітинки в клітинках (0 - сама центральна клітинка).
+
+    Returns:
+        list: Пари (рядок, стовпець).
+    """
+    if ring == 0:
+        return [(row, column)]
+    cells = []
+    for cell_column in range(column - ring, column + ring + 1):
+        cells += [(row - ring, cell_column), (row + ring, cell_column)]
+    for cell_row in range(row - ring + 1, row + ring):
+        cells += [(cell_row, column - ring), (cell_row, column + ring)]
+    return cells
+
+class NearestCarsIndex:
+    """
+    Просторовий індекс доступних автомобілів у пам'яті процесу.
+
+    Автомобілі розкладаються по клітинках регулярної сітки розміром NEAREST_INDEX_CELL градусів.
+    Пошук переглядає кільця клітинок навколо точки, доки знайдені автомобілі гарантовано ближчі
+    за непереглянуті клітинки, тому не залежить від розміру парку.
+
+    Індекс оновлюється не частіше ніж раз на NEAREST_INDEX_REFRESH_INTERVAL секунд: з бази даних
+    читаються лише автомобілі, позначені зміненими (mark_cars_changed), а раз на
+    NEAREST_INDEX_REBUILD_INTERVAL секунд або при недоступності Redis індекс перебудовується повністю.
+    """
+
+    def __init__(self, cell_size=None):
+        self.cell_size = cell_size or settings.NEAREST_INDEX_CELL
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Очищує індекс, щоб наступний пошук перебудував його повністю"""
+        self.positions = {}  # {car_id: (широта, довгота)}
+        self.cells = {}  # {(рядок, стовпець): множина id автомобілів}
+        self.built_at = None
+        self.synced_at = None
+
+    def cell(self, latitude, longitude):
+        """Повертає рядок та стовпець клітинки сітки, яка містить точку"""
+        return math.floor(latitude / self.cell_size), math.floor(longitude / self.cell_size)
+
+    def remove(self, car_id):
+        """Видаляє автомобіль з індексу"""
+        position = self.positions.pop(car_id, None)
+        if position is None:
+            return
+        cell = self.cell(*position)
+        self.cells[cell].discard(car_id)
+        if not self.cells[cell]:
+            del self.cells[cell]
+
+    def put(self, car_id, status, latitude, longitude):
+        """Додає, переміщує або видаляє автомобіль відповідно до його статусу та місцезнаходження"""
+        self.remove(car_id)
+        if status != "available" or latitude is None or longitude is None:
+            return
+        self.positions[car_id] = (latitude, longitude)
+        self.cells.setdefault(self.cell(latitude, longitude), set()).add(car_id)
+
+    def rebuild(self, now):
+        """Завантажує всі доступні автомобілі з відомим місцезнаходженням одним запитом"""
+        cars = Car.objects.filter(status="available").exclude(geohash="").values_list(
+            "id", "status", "current_latitude", "current_longitude"
+        )
+        self.reset()
+        for car in cars:
+            self.put(*car)
+        self.built_at = self.synced_at = now
+
+    def refresh(self):
+        """Оновлює індекс, якщо з часу останнього оновлення минуло NEAREST_INDEX_REFRESH_INTERVAL секунд"""
+        now = time.time()
+        if self.synced_at is not None and now - self.synced_at < settings.NEAREST_INDEX_REFRESH_INTERVAL:
+            return
+
+        if self.built_at is None or now - self.built_at >= settings.NEAREST_INDEX_REBUILD_INTERVAL:
+            self.rebuild(now)
+            return
+
+        car_ids = changed_car_ids(self.synced_at)
+        if car_ids is None:
+            self.rebuild(now)
+            return
+
+        if car_ids:
+            changed = dict.fromkeys(car_ids, (None, None, None))
+            changed.update({
+                car[0]: car[1:]
+                for car in Car.objects.filter(id__in=car_ids).values_list(
+                    "id", "status", "current_latitude", "current_longitude"
+                )
+            })
+            # Видалені автомобілі отримують порожній статус і видаляються з індексу
+            for car_id, (status, latitude, longitude) in changed.items():
+                self.put(car_id, status, latitude, longitude)
+        self.synced_at = now
+
+    def distances(self, latitude, longitude, car_ids):
+        """Обчислює відстані від точки до автомобілів індексу в кілометрах"""
+        coordinates = np.array([self.positions[car_id] for car_id in car_ids])
+        return haversine_km(latitude, longitude, coordinates[:, 0], coordinates[:, 1])
+
+    def nearest(self, latitude, longitude, limit, max_distance=None):
+        """
+        Знаходить найближчі доступні автомобілі.
+
+        Args:
+            latitude: Широта точки в градусах.
+            longitude: Довгота точки в градусах.
+            limit: Найбільша кількість автомобілів.
+            max_distance: Найбільша відстань у кілометрах (за замовчуванням - NEAREST_MAX_DISTANCE_KM).
+
+        Returns:
+            list: Пари (id автомобіля, відстань у кілометрах) у порядку зростання відстані.
+        """
+        max_distance = max_distance or settings.NEAREST_MAX_DISTANCE_KM
+        with self.lock:
+            self.refresh()
+            if not self.positions:
+                return []
+
+            row, column = self.cell(latitude, longitude)
+            # Найбільше кільце клітинок, у якому ще можуть бути автомобілі в межах max_distance
+            cos_latitude = max(math.cos(math.radians(min(abs(latitude) + max_distance / KM_PER_DEGREE, 90))), 1e-6)
+            max_ring = math.ceil(max_distance / (KM_PER_DEGREE * self.cell_size * cos_latitude))
+
+            candidates = []
+            distances = np.empty(0)
+            for ring in range(max_ring + 1):
+                # Якщо в кільці більше клітинок, ніж заповнених клітинок в індексі, дешевше переглянути всі автомобілі
+                if 8 * ring > len(self.cells):
+                    candidates = list(self.positions)
+                    distances = self.distances(latitude, longitude, candidates)
+                    break
+
+                found = [
+                    car_id for cell in ring_cells(row, column, ring) for car_id in self.cells.get(cell, ())
+                ]
+                if found:
+                    candidates += found
+                    distances = np.concatenate([distances, self.distances(latitude, longitude, found)])
+
+                # Автомобілі в непереглянутих клітинках віддалені щонайменше на ring клітинок
+                ring_distance = ring * self.cell_size * KM_PER_DEGREE * cos_latitude
+                if len(candidates) >= limit and np.partition(distances, limit - 1)[limit - 1] <= ring_distance:
+                    break
+
+        order = np.argsort(distances, kind="stable")[:limit]
+        return [
+            (candidates[index], float(distances[index]))
+            for index in order
+            if distances[index] <= max_distance
+        ]
+
+# Індекс поточного процесу
+nearest_index = NearestCarsIndex()
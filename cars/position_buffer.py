@@ -0,0 +1,234 @@
+import datetime
+import logging
+
+from django.conf import settings
+from redis import RedisError, ResponseError
+
+from utils.redis_client import get_redis
+
+from .location_history import store_history
+from .telemetry import apply_positions
+
+
+logger = logging.getLogger(__name__)
+
+# Хеш Redis з останнім місцезнаходженням автомобілів: поле - id автомобіля, значення - "широта,довгота,час"
+POSITION_BUFFER_KEY = "cars:positions"
+
+# Множина Redis з id автомобілів, місцезнаходження яких ще не записане в базу даних
+POSITION_DIRTY_KEY = "cars:positions:dirty"
+
+# Множина id автомобілів, які записуються в базу даних поточним скиданням буфера
+POSITION_FLUSHING_KEY = "cars:positions:flushing"
+
+# Список Redis з усіма точками телеметрії для історії місцезнаходження: "car_id,широта,довгота,час"
+HISTORY_BUFFER_KEY = "cars:history"
+
+# Список точок, які записуються в історію поточним пакуванням
+HISTORY_PACKING_KEY = "cars:history:packing"
+
+# Записати місцезнаходження, лише якщо воно новіше за буферизоване, і позначити автомобіль для скидання
+BUFFER_SCRIPT = """
+local buffered = 0
+for i = 1, #ARGV, 2 do
+    local current = redis.call("hget", KEYS[1], ARGV[i])
+    local timestamp = tonumber(string.match(ARGV[i + 1], "([^,]+)$"))
+    if not current or timestamp > tonumber(string.match(current, "([^,]+)$")) then
+        redis.call("hset", KEYS[1], ARGV[i], ARGV[i + 1])
+        redis.call("sadd", KEYS[2], ARGV[i])
+        buffered = buffered + 1
+    end
+end
+return buffered
+"""
+
+
+def encode_position(latitude, longitude, timestamp):
+    """Формує значення буфера для місцезнаходження автомобіля"""
+    return f"{latitude!r},{longitude!r},{timestamp.timestamp()!r}"
+
+def decode_position(value):
+    """Розбирає значення буфера на широту, довготу та час"""
+    latitude, longitude, timestamp = value.split(",")
+    return (
+        float(latitude),
+        float(longitude),
+        datetime.datetime.fromtimestamp(float(timestamp), tz=datetime.timezone.utc),
+    )
+
+def buffer_positions(positions):
+    """
+    Записує місцезнаходження автомобілів у буфер Redis одним запитом.
+
+    Args:
+        positions: Словник {car_id: (широта, довгота, час)}.
+
+    Returns:
+        int | None: Кількість записаних місцезнаходжень (старіші за буферизовані пропускаються)
+        або None, якщо буфер вимкнений чи Redis недоступний і місцезнаходження потрібно записати в базу даних.
+    """
+    if not settings.TELEMETRY_BUFFER_ENABLED:
+        return None
+    if not positions:
+        return 0
+
+    args = []
+    for car_id, (latitude, longitude, timestamp) in positions.items():
+        args += [car_id, encode_position(latitude, longitude, timestamp)]
+
+    try:
+        return get_redis().eval(BUFFER_SCRIPT, 2, POSITION_BUFFER_KEY, POSITION_DIRTY_KEY, *args)
+    except RedisError:
+        logger.exception("Не вдалося записати місцезнаходження автомобілів у буфер")
+        return None
+
+def live_positions(car_ids):
+    """
+    Повертає буферизоване місцезнаходження автомобілів.
+
+    Args:
+        car_ids: Список id автомобілів.
+
+    Returns:
+        dict: Словник {car_id: (широта, довгота, час)} для автомобілів, які є в буфері
+        (порожній, якщо буфер вимкнений чи Redis недоступний).
+    """
+    if not settings.TELEMETRY_BUFFER_ENABLED or not car_ids:
+        return {}
+
+    try:
+        values = get_redis().hmget(POSITION_BUFFER_KEY, car_ids)
+    except RedisError:
+        logger.exception("Не вдалося прочитати буфер місцезнаходження автомобілів")
+        return {}
+    return {car_id: decode_position(value) for car_id, value in zip(car_ids, values) if value}
+
+def with_live_positions(collection):
+    """
+    Підставляє буферизоване місцезнаходження автомобілів у GeoJSON карти.
+
+    Буферизоване місцезнаходження використовується, лише якщо воно новіше за записане в базу даних
+    (наприклад, місцезнаходження, вказане адміністратором, не перезаписується старішою телеметрією).
+
+    Args:
+        collection: GeoJSON FeatureCollection з автомобілями та кластерами.
+
+    Returns:
+        dict: GeoJSON FeatureCollection з актуальним місцезнаходженням автомобілів.
+    """
+    car_ids = [
+        feature["properties"]["id"] for feature in collection["features"] if feature["properties"]["kind"] == "car"
+    ]
+    live = live_positions(car_ids)
+    if not live:
+        return collection
+
+    features = []
+    for feature in collection["features"]:
+        properties = feature["properties"]
+        position = live.get(properties["id"]) if properties["kind"] == "car" else None
+        if position and (properties["location_time"] is None or position[2].timestamp() > properties["location_time"]):
+            latitude, longitude, timestamp = position
+            feature = {
+                **feature,
+                "geometry": {"type": "Point", "coordinates": [longitude, latitude]},
+                "properties": {**properties, "location_time": timestamp.timestamp()},
+            }
+        features.append(feature)
+    return {**collection, "features": features}
+
+def flush_positions(chunk_size=None):
+    """
+    Записує буферизоване місцезнаходження змінених автомобілів у базу даних пакетними UPDATE-запитами.
+
+    Множина змінених автомобілів атомарно перейменовується, тому нові звіти під час скидання потрапляють
+    у наступне скидання. Якщо запис у базу даних не вдався, множина залишається і повторно обробляється
+    наступним скиданням.
+
+    Args:
+        chunk_size: Кількість автомобілів в одному UPDATE (за замовчуванням - TELEMETRY_CHUNK_SIZE).
+
+    Returns:
+        dict: Кількість оновлених автомобілів, застарілих записів та записів невідомих автомобілів.
+    """
+    stats = {"updated": 0, "stale": 0, "unknown": 0}
+    if not settings.TELEMETRY_BUFFER_ENABLED:
+        return stats
+
+    redis = get_redis()
+    if not redis.exists(POSITION_FLUSHING_KEY):
+        try:
+            redis.renamenx(POSITION_DIRTY_KEY, POSITION_FLUSHING_KEY)
+        except ResponseError:
+            # Множини змінених автомобілів немає - з часу останнього скидання звітів не було
+            return stats
+
+    car_ids = sorted(int(car_id) for car_id in redis.smembers(POSITION_FLUSHING_KEY))
+    positions = live_positions(car_ids)
+    if positions:
+        stats = apply_positions(positions, chunk_size)
+    redis.delete(POSITION_FLUSHING_KEY)
+    return stats
+
+def buffer_history(points):
+    """
+    Додає точки телеметрії до буфера історії місцезнаходження в Redis одним запитом.
+
+    Args:
+        points: Список коректних точок (car_id, широта, довгота, час).
+
+    Returns:
+        int | None: Кількість записаних точок або None, якщо буфер вимкнений чи Redis недоступний
+        і точки потрібно записати в історію одразу.
+    """
+    if not settings.TELEMETRY_BUFFER_ENABLED:
+        return None
+    if not points:
+        return 0
+
+    values = [
+        f"{car_id},{encode_position(latitude, longitude, timestamp)}"
+        for car_id, latitude, longitude, timestamp in points
+    ]
+    try:
+        get_redis().rpush(HISTORY_BUFFER_KEY, *values)
+    except RedisError:
+        logger.exception("Не вдалося записати точки телеметрії в буфер історії")
+        return None
+    return len(values)
+
+def pack_history(chunk_points=None):
+    """
+    Записує буферизовані точки телеметрії в історію місцезнаходження стиснутими порціями.
+
+    Список точок атомарно перейменовується, тому нові звіти під час пакування потрапляють у наступне
+    пакування. Якщо запис у базу даних не вдався, список залишається і повторно обробляється наступним
+    пакуванням.
+
+    Args:
+        chunk_points: Найбільша кількість точок у порції (за замовчуванням - LOCATION_HISTORY_CHUNK_POINTS).
+
+    Returns:
+        dict: Кількість запакованих точок та записаних порцій.
+    """
+    stats = {"points": 0, "chunks": 0}
+    if not settings.TELEMETRY_BUFFER_ENABLED:
+        return stats
+
+    redis = get_redis()
+    if not redis.exists(HISTORY_PACKING_KEY):
+        try:
+            redis.renamenx(HISTORY_BUFFER_KEY, HISTORY_PACKING_KEY)
+        except ResponseError:
+            # Буфера історії немає - з часу останнього пакування звітів не було
+            return stats
+
+    points = []
+    for value in redis.lrange(HISTORY_PACKING_KEY, 0, -1):
+        car_id, position = value.split(",", 1)
+        points.append((int(car_id), *decode_position(position)))
+
+    stats["points"] = len(points)
+    stats["chunks"] = store_history(points, chunk_points) if points else 0
+    redis.delete(HISTORY_PACKING_KEY)
+    return stats
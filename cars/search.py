@@ -0,0 +1,177 @@
+import hashlib
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+
+from .models import CarCatalogEntry
+
+
+# Ключ кешу з версією пошуку: змінюється при зміні автомобілів, тому закешовані фасети старих версій не читаються
+CAR_SEARCH_VERSION_KEY = "car-search:version"
+
+# Фасети пошуку та поля каталогу автомобілів, за якими рахується кількість
+FACET_FIELDS = {
+    "brand": "brand_id",
+    "fuel_type": "fuel_type",
+    "transmission": "transmission",
+    "seats": "seats",
+    "status": "status",
+}
+
+# Фільтри, які звужують значення фасетів: назва фільтра - (фасет, порівняння)
+FACET_FILTERS = {
+    "brand": ("brand", "exact"),
+    "fuel_type": ("fuel_type", "exact"),
+    "transmission": ("transmission", "exact"),
+    "status": ("status", "exact"),
+    "min_seats": ("seats", "gte"),
+}
+
+# Фільтри, які не мають фасетів, і відповідні умови запиту
+BASE_FILTERS = {
+    "model": "model_id",
+    "min_year": "year__gte",
+    "max_year": "year__lte",
+    "has_air_conditioning": "has_air_conditioning",
+    "has_gps": "has_gps",
+    "has_child_seat": "has_child_seat",
+}
+
+
+def search_version():
+    """
+    Повертає поточну версію пошуку автомобілів для ключів кешу.
+
+    Returns:
+        int: Версія пошуку.
+    """
+    version = cache.get(CAR_SEARCH_VERSION_KEY)
+    if version is None:
+        cache.add(CAR_SEARCH_VERSION_KEY, time.time_ns(), None)
+        version = cache.get(CAR_SEARCH_VERSION_KEY, time.time_ns())
+    return version
+
+def invalidate_search():
+    """Змінює версію пошуку, після чого фасети обчислюються заново"""
+    cache.set(CAR_SEARCH_VERSION_KEY, time.time_ns(), None)
+
+def normalize_filters(cleaned_data):
+    """
+    Нормалізує дані форми фільтрації автомобілів.
+
+    Порожні значення відкидаються, а об'єкти моделей замінюються їх id, тому однакові фільтри
+    дають однаковий ключ кешу незалежно від порядку та порожніх параметрів запиту.
+
+    Args:
+        cleaned_data: Очищені дані форми CarFilterForm.
+
+    Returns:
+        dict: Непорожні фільтри зі значеннями простих типів.
+    """
+    filters = {}
+    for name, value in cleaned_data.items():
+        if value is None or value == "" or value is False:
+            continue
+        filters[name] = value.pk if hasattr(value, "pk") else value
+    return filters
+
+def car_lookups(filters):
+    """
+    Перетворює фільтри на умови запиту каталогу автомобілів.
+
+    Args:
+        filters: Нормалізовані фільтри.
+
+    Returns:
+        dict: Умови для одного виклику filter().
+    """
+    lookups = {lookup: filters[name] for name, lookup in BASE_FILTERS.items() if name in filters}
+    for name, (facet, comparison) in FACET_FILTERS.items():
+        if name in filters:
+            lookups[f"{FACET_FIELDS[facet]}__{comparison}"] = filters[name]
+    return lookups
+
+def facet_rows(filters):
+    """
+    Повертає кількість автомобілів для кожного поєднання значень фасетів одним агрегатним запитом.
+
+    Запит враховує лише фільтри без фасетів, тому результат кешується за ними і спільний для всіх
+    поєднань фільтрів фасетів; кількість для кожного фасета рахується з цих рядків без запитів.
+
+    Args:
+        filters: Нормалізовані фільтри.
+
+    Returns:
+        list: Рядки (id марки, тип палива, трансмісія, кількість місць, статус, кількість автомобілів).
+    """
+    base = {name: filters[name] for name in BASE_FILTERS if name in filters}
+    normalized = "&".join(f"{name}={value}" for name, value in sorted(base.items()))
+    key = f"car-search:{search_version()}:{hashlib.md5(normalized.encode()).hexdigest()}"
+
+    rows = cache.get(key)
+    if rows is None:
+        rows = list(
+            CarCatalogEntry.objects.filter(**car_lookups(base))
+            .order_by()
+            .values_list(*FACET_FIELDS.values())
+            .annotate(count=Count("car_id"))
+        )
+        cache.set(key, rows, settings.CAR_SEARCH_CACHE_TIMEOUT)
+    return rows
+
+def row_matches(values, filters, skip=None):
+    """
+    Перевіряє, чи відповідає поєднання значень фасетів фільтрам.
+
+    Args:
+        values: Словник {фасет: значення}.
+        filters: Нормалізовані фільтри.
+        skip: Фасет, фільтр якого не враховується (для кількостей значень цього фасета).
+
+    Returns:
+        bool: True, якщо поєднання відповідає всім фільтрам фасетів, крім skip.
+    """
+    for name, (facet, comparison) in FACET_FILTERS.items():
+        if name not in filters or facet == skip:
+            continue
+        value = values[facet]
+        if comparison == "exact" and value != filters[name]:
+            return False
+        if comparison == "gte" and (value is None or value < filters[name]):
+            return False
+    return True
+
+def search_cars(filters):
+    """
+    Виконує фасетний пошук автомобілів.
+
+    Кількість для значень кожного фасета рахується з урахуванням усіх фільтрів, крім фільтра
+    самого фасета, тому бічна панель показує, скільки автомобілів буде знайдено при виборі значення.
+
+    Args:
+        filters: Нормалізовані фільтри.
+
+    Returns:
+        dict: Умови запиту сторінки (lookups), кількість знайдених автомобілів (total)
+        та кількості за значеннями фасетів (facets).
+    """
+    facets = {facet: Counter() for facet in FACET_FIELDS}
+    total = 0
+
+    for row in facet_rows(filters):
+        values = dict(zip(FACET_FIELDS, row[:-1]))
+        count = row[-1]
+        if row_matches(values, filters):
+            total += count
+        for facet in FACET_FIELDS:
+            if row_matches(values, filters, skip=facet):
+                facets[facet][values[facet]] += count
+
+    return {
+        "lookups": car_lookups(filters),
+        "total": total,
+        "facets": {facet: dict(counts) for facet, counts in facets.items()},
+    }
@@ -0,0 +1,79 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .catalog import sync_catalog, update_rating
+from .models import Car, CarBrand, CarCatalogEntry, CarModel, CarReview
+from .nearest import mark_cars_changed
+from .text_search import car_text_index
+from .tiles import invalidate_car_tiles
+
+
+def cars_changed(car_ids):
+    """
+    Оновлює індекси автомобілів у пам'яті процесів після фіксації транзакції.
+
+    Текстовий індекс поточного процесу оновлюється одразу, а індекси інших процесів (і індекс
+    найближчих автомобілів) отримують зміни зі списку змінених автомобілів.
+
+    Args:
+        car_ids: Id змінених або видалених автомобілів.
+    """
+    car_ids = [car_id for car_id in car_ids if car_id]
+    if car_ids:
+        transaction.on_commit(partial(car_text_index.update, car_ids))
+        transaction.on_commit(partial(mark_cars_changed, car_ids))
+
+def invalidate_entry_tiles(entries):
+    """
+    Скидає тайли карти, на яких показуються автомобілі записів каталогу, після фіксації транзакції.
+
+    Args:
+        entries: QuerySet записів каталогу, дані яких на карті змінилися (наприклад, назва марки чи моделі).
+    """
+    cars = list(entries.values_list("current_latitude", "current_longitude", "status"))
+    if cars:
+        locations = [(latitude, longitude) for latitude, longitude, _ in cars]
+        statuses = {status for _, _, status in cars}
+        transaction.on_commit(partial(invalidate_car_tiles, locations, statuses))
+
+@receiver(post_save, sender=Car)
+def car_saved(sender, instance, **kwargs):
+    """Оновлює запис каталогу збереженого автомобіля в тій самій транзакції та позначає автомобіль зміненим"""
+    sync_catalog([instance.pk])
+    cars_changed([instance.pk])
+
+@receiver(post_delete, sender=Car)
+def car_deleted(sender, instance, **kwargs):
+    """Позначає видалений автомобіль зміненим (запис каталогу видаляється каскадно)"""
+    cars_changed([instance.pk])
+
+@receiver(post_save, sender=CarModel)
+def car_model_changed(sender, instance, created, **kwargs):
+    """Оновлює каталог та текст автомобілів моделі після зміни її назви або марки"""
+    if not created:
+        CarCatalogEntry.objects.filter(model=instance).update(
+            model_name=instance.name,
+            brand_id=instance.brand_id,
+            brand_name=instance.brand.name,
+            updated_at=timezone.now(),
+        )
+        invalidate_entry_tiles(CarCatalogEntry.objects.filter(model=instance))
+        cars_changed(Car.objects.filter(model=instance).values_list("id", flat=True))
+
+@receiver(post_save, sender=CarBrand)
+def car_brand_changed(sender, instance, created, **kwargs):
+    """Оновлює каталог та текст автомобілів марки після зміни її назви"""
+    if not created:
+        CarCatalogEntry.objects.filter(brand=instance).update(brand_name=instance.name, updated_at=timezone.now())
+        invalidate_entry_tiles(CarCatalogEntry.objects.filter(brand=instance))
+        cars_changed(Car.objects.filter(model__brand=instance).values_list("id", flat=True))
+
+@receiver(post_save, sender=CarReview)
+@receiver(post_delete, sender=CarReview)
+def car_review_changed(sender, instance, **kwargs):
+    """Перераховує рейтинг автомобіля в автомобілі та каталозі після зміни або видалення відгуку"""
+    update_rating(instance.car_id)
@@ -0,0 +1,52 @@
+from carsharing.celery import app
+
+from .changes import prune_changes
+from .location_history import downsample_history
+from .position_buffer import flush_positions, pack_history
+
+
+@app.task
+def flush_car_positions():
+    """
+    Скидання буфера місцезнаходження автомобілів у базу даних.
+
+    Телеметрія записує місцезнаходження лише в Redis, а ця задача кожні TELEMETRY_FLUSH_INTERVAL секунд
+    записує останнє місцезнаходження змінених автомобілів у базу даних пакетними UPDATE-запитами.
+
+    Returns:
+        dict: Кількість оновлених автомобілів, застарілих записів та записів невідомих автомобілів.
+    """
+    return flush_positions()
+
+@app.task
+def pack_location_history():
+    """
+    Пакування буферизованих точок телеметрії в історію місцезнаходження.
+
+    Точки накопичуються в Redis, а ця задача кожні LOCATION_HISTORY_PACK_INTERVAL секунд записує їх
+    стиснутими порціями по автомобілях та орендах, а не окремим рядком на кожну точку.
+
+    Returns:
+        dict: Кількість запакованих точок та записаних порцій.
+    """
+    return pack_history()
+
+@app.task
+def downsample_location_history():
+    """
+    Проріджування старої історії місцезнаходження автомобілів.
+
+    Returns:
+        dict: Кількість оброблених порцій та кількість точок до і після проріджування.
+    """
+    return downsample_history()
+
+@app.task
+def prune_car_changes():
+    """
+    Видалення записів журналу змін автомобілів, старших за CAR_CHANGES_RETENTION секунд.
+
+    Returns:
+        int: Кількість видалених записів.
+    """
+    return prune_changes()
@@ -0,0 +1,223 @@
+import datetime
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, CharField, DateTimeField, FloatField, OuterRef, Q, Subquery, Value, When
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from utils.geo import encode_geohash
+
+from .changes import record_car_changes
+from .models import Car, CarCatalogEntry
+from .nearest import mark_cars_changed
+from .tiles import invalidate_car_tiles
+
+
+# Наскільки час точки може випереджати час сервера (розбіжність годинників автомобіля)
+MAX_CLOCK_SKEW = datetime.timedelta(minutes=1)
+
+# Найбільша кількість помилок окремих точок, які повертаються у відповіді
+MAX_REPORTED_ERRORS = 100
+
+# Поля місцезнаходження, які копіюються з автомобіля в каталог автомобілів
+LOCATION_FIELDS = ("current_latitude", "current_longitude", "geohash", "location_updated_at")
+
+
+def parse_timestamp(value):
+    """
+    Перетворює час точки телеметрії на datetime з часовою зоною.
+
+    Args:
+        value: Час у секундах Unix або рядок ISO 8601.
+
+    Returns:
+        datetime: Час точки.
+
+    Raises:
+        ValueError: Якщо час має неправильний формат.
+    """
+    if isinstance(value, bool):
+        raise ValueError("Некоректний час")
+    if isinstance(value, (int, float)):
+        try:
+            return datetime.datetime.fromtimestamp(value, tz=datetime.timezone.utc)
+        except (OverflowError, OSError, ValueError):
+            raise ValueError("Некоректний час")
+
+    try:
+        timestamp = parse_datetime(value) if isinstance(value, str) else None
+    except ValueError:
+        timestamp = None
+    if timestamp is None:
+        raise ValueError("Некоректний час")
+    if timezone.is_naive(timestamp):
+        timestamp = timezone.make_aware(timestamp, datetime.timezone.utc)
+    return timestamp
+
+def parse_point(point, now):
+    """
+    Перевіряє одну точку телеметрії.
+
+    Args:
+        point: Словник з ключами car_id, lat, lng та timestamp.
+        now: Поточний момент.
+
+    Returns:
+        tuple: Ідентифікатор автомобіля, широта, довгота та час точки.
+
+    Raises:
+        ValueError: Якщо точка некоректна.
+    """
+    try:
+        car_id = point["car_id"]
+        latitude, longitude, timestamp = point["lat"], point["lng"], point["timestamp"]
+    except (KeyError, TypeError):
+        raise ValueError("Точка має містити car_id, lat, lng та timestamp")
+
+    try:
+        latitude = float(latitude)
+        longitude = float(longitude)
+    except (TypeError, ValueError):
+        raise ValueError("Координати мають бути числами")
+    timestamp = parse_timestamp(timestamp)
+
+    if not isinstance(car_id, int) or isinstance(car_id, bool) or car_id <= 0:
+        raise ValueError("Некоректний car_id")
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        raise ValueError("Координати поза допустимими межами")
+    if timestamp > now + MAX_CLOCK_SKEW:
+        raise ValueError("Час точки в майбутньому")
+    return car_id, latitude, longitude, timestamp
+
+def parse_points(points, now=None):
+    """
+    Перевіряє пакет точок телеметрії.
+
+    Args:
+        points: Список словників з ключами car_id, lat, lng та timestamp.
+        now: Поточний момент (за замовчуванням - timezone.now()).
+
+    Returns:
+        tuple: Список коректних точок (car_id, широта, довгота, час) та список помилок {"index", "error"}.
+    """
+    now = now or timezone.now()
+    parsed = []
+    errors = []
+
+    for index, point in enumerate(points):
+        try:
+            parsed.append(parse_point(point, now))
+        except ValueError as error:
+            errors.append({"index": index, "error": str(error)})
+
+    return parsed, errors
+
+def latest_positions(parsed):
+    """
+    Залишає найновішу точку кожного автомобіля.
+
+    Args:
+        parsed: Список коректних точок (car_id, широта, довгота, час).
+
+    Returns:
+        dict: Словник {car_id: (широта, довгота, час)}.
+    """
+    positions = {}
+    for car_id, latitude, longitude, timestamp in parsed:
+        current = positions.get(car_id)
+        if current is None or timestamp > current[2]:
+            positions[car_id] = (latitude, longitude, timestamp)
+    return positions
+
+def apply_positions(positions, chunk_size=None):
+    """
+    Записує місцезнаходження автомобілів пакетними UPDATE-запитами.
+
+    Точка застосовується лише тоді, коли вона новіша за збережене місцезнаходження автомобіля. Ця умова
+    перевіряється в самому UPDATE, тому одночасні пакети не перезапишуть новіші координати старішими.
+    Поле updated_at не змінюється: час місцезнаходження зберігається в location_updated_at.
+
+    Args:
+        positions: Словник {car_id: (широта, довгота, час)}.
+        chunk_size: Кількість автомобілів в одному UPDATE (за замовчуванням - TELEMETRY_CHUNK_SIZE).
+
+    Returns:
+        dict: Кількість оновлених автомобілів, застарілих точок та точок невідомих автомобілів.
+    """
+    chunk_size = chunk_size or settings.TELEMETRY_CHUNK_SIZE
+    stats = {"updated": 0, "stale": 0, "unknown": 0}
+    car_ids = sorted(positions)
+
+    for start in range(0, len(car_ids), chunk_size):
+        chunk = car_ids[start:start + chunk_size]
+        cars = {
+            car["id"]: car
+            for car in Car.objects.filter(id__in=chunk).values(
+                "id", "current_latitude", "current_longitude", "status", "location_updated_at"
+            )
+        }
+        stats["unknown"] += len(chunk) - len(cars)
+
+        fresh = [
+            car_id for car_id in chunk
+            if car_id in cars and (
+                cars[car_id]["location_updated_at"] is None
+                or cars[car_id]["location_updated_at"] < positions[car_id][2]
+            )
+        ]
+        stats["stale"] += len(cars) - len(fresh)
+        if not fresh:
+            continue
+
+        def case(values, output_field):
+            return Case(
+                *[When(id=car_id, then=Value(values[car_id])) for car_id in fresh],
+                output_field=output_field,
+            )
+
+        latitudes = {car_id: positions[car_id][0] for car_id in fresh}
+        longitudes = {car_id: positions[car_id][1] for car_id in fresh}
+        timestamps = {car_id: positions[car_id][2] for car_id in fresh}
+        geohashes = {car_id: encode_geohash(latitudes[car_id], longitudes[car_id]) for car_id in fresh}
+
+        with transaction.atomic():
+            updated = Car.objects.filter(
+                Q(location_updated_at__isnull=True) | Q(location_updated_at__lt=case(timestamps, DateTimeField())),
+                id__in=fresh,
+            ).update(
+                current_latitude=case(latitudes, FloatField()),
+                current_longitude=case(longitudes, FloatField()),
+                geohash=case(geohashes, CharField()),
+                location_updated_at=case(timestamps, DateTimeField()),
+            )
+            # Скопіювати записане місцезнаходження в каталог автомобілів у тій самій транзакції
+            CarCatalogEntry.objects.filter(car_id__in=fresh).update(**{
+                field: Subquery(Car.objects.filter(id=OuterRef("car_id")).values(field))
+                for field in LOCATION_FIELDS
+            })
+
+            # Записати нове місцезнаходження в журнал змін; якщо частину автомобілів одночасно оновив
+            # інший пакет, записати фактичне місцезнаходження з бази даних
+            if updated == len(fresh):
+                changes = [
+                    (car_id, cars[car_id]["status"], latitudes[car_id], longitudes[car_id]) for car_id in fresh
+                ]
+            else:
+                changes = list(Car.objects.filter(id__in=fresh).values_list(
+                    "id", "status", "current_latitude", "current_longitude"
+                ))
+            record_car_changes(changes)
+
+        # Скинути тайли карти старих та нових місцезнаходжень після фіксації транзакції
+        locations = [(cars[car_id]["current_latitude"], cars[car_id]["current_longitude"]) for car_id in fresh]
+        locations += [(latitudes[car_id], longitudes[car_id]) for car_id in fresh]
+        statuses = {cars[car_id]["status"] for car_id in fresh}
+        transaction.on_commit(partial(invalidate_car_tiles, locations, statuses))
+        transaction.on_commit(partial(mark_cars_changed, fresh))
+
+        stats["updated"] += updated
+        stats["stale"] += len(fresh) - updated
+
+    return stats
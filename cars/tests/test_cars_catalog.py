@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.template.loader import render_to_string
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from cars.models import Car, CarBrand, CarCatalogEntry, CarModel, CarReview
+from users.models import User
+
+
+class CarCatalogTest(TestCase):
+    """Тести денормалізованого каталогу автомобілів"""
+
+    def setUp(self):
+        """Налаштування тестового середовища"""
+        self.user = User.objects.create_user(
+            username="cataloguser",
+            email="catalog@example.com",
+            password="testpassword123"
+        )
+        self.brand = CarBrand.objects.create(name="Mazda")
+        self.model = CarModel.objects.create(brand=self.brand, name="CX-5")
+        self.cars = [
+            Car.objects.create(
+                model=self.model,
+                year=2021,
+                license_plate=f"CT{index:04d}CT",
+                color="Червоний",
+                mileage=1000,
+                fuel_type="petrol",
+                transmission="automatic",
+                price_per_minute=Decimal("3.00"),
+                seats=5,
+                current_latitude=50.45 + index / 100,
+                current_longitude=30.52,
+                insurance_valid_until=date.today() + timedelta(days=365),
+                technical_inspection_valid_until=date.today() + timedelta(days=365),
+                main_photo="car_photos/test.jpg"
+            )
+            for index in range(3)
+        ]
+
+    def test_car_save_and_delete_update_catalog(self):
+        """Тест створення, оновлення та видалення запису каталогу разом з автомобілем"""
+        car = self.cars[0]
+        entry = CarCatalogEntry.objects.get(pk=car.pk)
+        self.assertEqual((entry.brand_name, entry.model_name, entry.brand_id), ("Mazda", "CX-5", self.brand.id))
+        self.assertEqual(entry.thumbnail_url, car.main_photo.url)
+        self.assertEqual(entry.geohash, car.geohash)
+
+        car.status = "maintenance"
+        car.price_per_minute = Decimal("4.50")
+        car.save()
+        entry.refresh_from_db()
+        self.assertEqual((entry.status, entry.price_per_minute), ("maintenance", Decimal("4.50")))
+
+        car.delete()
+        self.assertFalse(CarCatalogEntry.objects.filter(pk=car.pk).exists())
+
+    def test_model_and_brand_changes_update_catalog(self):
+        """Тест оновлення назв у каталозі при перейменуванні моделі та марки"""
+        self.brand.name = "Mazda Motor"
+        self.brand.save()
+        other_brand = CarBrand.objects.create(name="Ford")
+        self.model.name = "Kuga"
+        self.model.brand = other_brand
+        self.model.save()
+
+        self.assertEqual(
+            set(CarCatalogEntry.objects.values_list("brand_id", "brand_name", "model_name")),
+            {(other_brand.id, "Ford", "Kuga")}
+        )
+
+    def test_model_and_brand_changes_invalidate_map_tiles(self):
+        """Тест скидання тайлів карти з назвами автомобілів при перейменуванні моделі та марки"""
+        locations = [(car.current_latitude, car.current_longitude) for car in self.cars]
+        for instance in (self.model, self.brand):
+            with mock.patch("cars.signals.invalidate_car_tiles") as invalidate:
+                with self.captureOnCommitCallbacks(execute=True):
+                    instance.name = f"{instance.name} New"
+                    instance.save()
+            invalidate.assert_called_once_with(locations, {"available"})
+
+    def test_reviews_update_rating(self):
+        """Тест перерахунку рейтингу автомобіля та каталогу при зміні відгуків"""
+        car = self.cars[1]
+        other = User.objects.create_user(username="reviewer", email="reviewer@example.com", password="pass12345")
+        CarReview.objects.create(car=car, user=self.user, rating=5, comment="Чудово")
+        review = CarReview.objects.create(car=car, user=other, rating=4, comment="Добре")
+        self.assertEqual(CarCatalogEntry.objects.get(pk=car.pk).rating, Decimal("4.50"))
+        self.assertEqual(Car.objects.get(pk=car.pk).rating, Decimal("4.50"))
+
+        review.delete()
+        self.assertEqual(CarCatalogEntry.objects.get(pk=car.pk).rating, Decimal("5.00"))
+
+    def test_list_reads_catalog_in_constant_queries(self):
+        """Тест списку та карти автомобілів одним запитом до каталогу незалежно від кількості автомобілів"""
+        url = reverse("available-cars")
+        self.client.get(url)
+        # Агрегатний запит фасетів (без кешу в тестах), запит сторінки та варіанти марок і моделей форми
+        with self.assertNumQueries(4):
+            response = self.client.get(url)
+        self.assertEqual([car.pk for car in response.context["cars"]], [car.pk for car in self.cars])
+        self.assertContains(response, '<h5 class="card-title">Mazda CX-5</h5>', count=3)
+
+        response = self.client.get(reverse("cars-map-api"), {"bbox": "30.4,50.4,30.6,50.6", "zoom": 16})
+        self.assertEqual(response.json()["features"][0]["properties"]["title"], "Mazda CX-5")
+
+    def test_rebuild_command(self):
+        """Тест перебудови каталогу після змін в обхід моделей"""
+        Car.objects.filter(pk=self.cars[2].pk).update(color="Чорний")
+        CarCatalogEntry.objects.filter(pk=self.cars[0].pk).delete()
+
+        output = StringIO()
+        call_command("rebuild_car_catalog", stdout=output)
+        self.assertIn("3", output.getvalue())
+        self.assertEqual(CarCatalogEntry.objects.count(), 3)
+        self.assertEqual(CarCatalogEntry.objects.get(pk=self.cars[2].pk).color, "Чорний")
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class CarCardCacheTest(TestCase):
+    """Тести кешу HTML-карток автомобілів у списках"""
+
+    def setUp(self):
+        """Налаштування тестового середовища"""
+        cache.clear()
+        # Кеш у пам'яті спільний для всіх тестів процесу, тому закешовані фасети не мають потрапити в інші тести
+        self.addCleanup(cache.clear)
+        self.brand = CarBrand.objects.create(name="Kia")
+        model = CarModel.objects.create(brand=self.brand, name="Ceed")
+        self.cars = [
+            Car.objects.create(
+                model=model,
+                year=2022,
+                license_plate=f"KC{index:04d}KC",
+                color="Синій",
+                mileage=1000,
+                fuel_type="diesel",
+                transmission="manual",
+                price_per_minute=Decimal("2.50"),
+                seats=5,
+                insurance_valid_until=date.today() + timedelta(days=365),
+                technical_inspection_valid_until=date.today() + timedelta(days=365),
+                main_photo="car_photos/test.jpg"
+            )
+            for index in range(3)
+        ]
+
+    def rendered_cards(self, url):
+        """Запит списку з підрахунком відрендерених карток"""
+        with mock.patch("cars.cards.render_to_string", side_effect=render_to_string) as render:
+            response = self.client.get(url)
+        self.assertEqual(len(response.context["car_cards"]), 3)
+        return response, render.call_count
+
+    def test_only_changed_cards_are_rendered(self):
+        """Тест рендерингу лише змінених карток після першого запиту"""
+        url = reverse("available-cars")
+        self.assertEqual(self.rendered_cards(url)[1], 3)
+        response, rendered = self.rendered_cards(url)
+        self.assertEqual(rendered, 0)
+        self.assertContains(response, '<h5 class="card-title">Kia Ceed</h5>', count=3)
+
+        car = self.cars[1]
+        car.price_per_minute = Decimal("3.75")
+        car.save()
+        response, rendered = self.rendered_cards(url)
+        self.assertEqual(rendered, 1)
+        self.assertContains(response, "3,75 ₴/хв", count=1)
+
+        # Перейменування марки змінює версію всіх її карток
+        self.brand.name = "KIA"
+        self.brand.save()
+        response, rendered = self.rendered_cards(url)
+        self.assertEqual(rendered, 3)
+        self.assertContains(response, '<h5 class="card-title">KIA Ceed</h5>', count=3)
+
+    def test_location_change_keeps_cached_card(self):
+        """Тест збереження версії запису каталогу та закешованої картки при зміні лише місцезнаходження"""
+        url = reverse("available-cars")
+        self.assertEqual(self.rendered_cards(url)[1], 3)
+
+        car = self.cars[0]
+        updated_at = CarCatalogEntry.objects.get(pk=car.pk).updated_at
+        car.current_latitude = 50.45
+        car.current_longitude = 30.52
+        car.save()
+        entry = CarCatalogEntry.objects.get(pk=car.pk)
+        self.assertEqual((entry.geohash, entry.updated_at), (car.geohash, updated_at))
+        self.assertEqual(self.rendered_cards(url)[1], 0)
+
+    def test_staff_cards_are_cached_separately(self):
+        """Тест окремих карток для адміністратора з кнопками керування автомобілем"""
+        url = reverse("car-list")
+        self.assertNotContains(self.rendered_cards(url)[0], reverse("car-update", args=[self.cars[0].pk]))
+
+        User.objects.create_user(
+            username="cardadmin", email="cardadmin@example.com", password="adminpass", is_staff=True
+        )
+        self.client.login(username="cardadmin", password="adminpass")
+        response, rendered = self.rendered_cards(url)
+        self.assertEqual(rendered, 3)
+        self.assertContains(response, reverse("car-update", args=[self.cars[0].pk]))
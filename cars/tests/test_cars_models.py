@@ -6,6 +6,7 @@ from django.test import TestCase
 
 from cars.models import Car, CarBrand, CarModel, CarPhoto, CarReview
 from users.models import User
+from utils.geo import bbox_geohashes, encode_geohash, geohash_bounds
 
 
 class CarBrandModelTest(TestCase):
@@ -65,6 +66,74 @@ class CarModelTest(TestCase):
         expected_str = f"{self.model} ({car.license_plate})"
         self.assertEqual(str(car), expected_str)
 
+class CarLocationTest(TestCase):
+    """Тести числових координат та геохешу автомобіля"""
+
+    def setUp(self):
+        """Налаштування тестового середовища"""
+        self.model = CarModel.objects.create(brand=CarBrand.objects.create(name="GeoBrand"), name="GeoModel")
+        self.kyiv_car = self.create_car("GE0001OB", 50.4501, 30.5234)
+        self.lviv_car = self.create_car("GE0002OB", 49.8397, 24.0297)
+        self.unknown_car = self.create_car("GE0003OB", None, None)
+
+    def create_car(self, license_plate, latitude, longitude):
+        """Створити автомобіль з заданими координатами"""
+        return Car.objects.create(
+            model=self.model,
+            year=2023,
+            license_plate=license_plate,
+            color="Сірий",
+            mileage=1000,
+            fuel_type="petrol",
+            transmission="automatic",
+            price_per_minute=Decimal("2.00"),
+            seats=5,
+            current_latitude=latitude,
+            current_longitude=longitude,
+            main_photo="car_photos/test.jpg",
+            insurance_valid_until=date.today() + timedelta(days=365),
+            technical_inspection_valid_until=date.today() + timedelta(days=365)
+        )
+
+    def test_geohash_encoding(self):
+        """Тест кодування координат у геохеш та меж клітинки"""
+        self.assertEqual(encode_geohash(57.64911, 10.40744, 11), "u4pruydqqvj")
+        south, west, north, east = geohash_bounds("u8vxn")
+        self.assertTrue(south <= 50.4501 <= north)
+        self.assertTrue(west <= 30.5234 <= east)
+
+    def test_save_maintains_geohash(self):
+        """Тест оновлення геохешу при збереженні координат"""
+        self.assertEqual(self.kyiv_car.geohash, "u8vxn84mn")
+        self.assertEqual(self.unknown_car.geohash, "")
+
+        self.kyiv_car.current_latitude = "49.8397"
+        self.kyiv_car.current_longitude = "24.0297"
+        self.kyiv_car.save(update_fields=["current_latitude", "current_longitude"])
+        self.kyiv_car.refresh_from_db()
+        self.assertEqual(self.kyiv_car.current_latitude, 49.8397)
+        self.assertEqual(self.kyiv_car.geohash, self.lviv_car.geohash)
+
+        self.kyiv_car.current_latitude = None
+        self.kyiv_car.save()
+        self.assertEqual(self.kyiv_car.geohash, "")
+
+    def test_bbox_geohashes_cover_area(self):
+        """Тест покриття області клітинками геохешу"""
+        cells = bbox_geohashes(50.40, 30.45, 50.50, 30.60)
+
+        self.assertTrue(0 < len(cells) <= 32)
+        self.assertTrue(any(self.kyiv_car.geohash.startswith(cell) for cell in cells))
+        self.assertFalse(any(self.lviv_car.geohash.startswith(cell) for cell in cells))
+        self.assertEqual(bbox_geohashes(-90, -180, 90, 180), [])
+
+    def test_spatial_queries(self):
+        """Тест пошуку автомобілів в області та в клітинці геохешу"""
+        self.assertEqual(list(Car.objects.in_bbox(50.40, 30.45, 50.50, 30.60)), [self.kyiv_car])
+        self.assertEqual(list(Car.objects.in_bbox(50.40, 30.55, 50.50, 30.60)), [])
+        self.assertEqual(list(Car.objects.in_bbox(49, 23, 51, 31).order_by("id")), [self.kyiv_car, self.lviv_car])
+        self.assertEqual(list(Car.objects.in_cell(self.lviv_car.geohash[:5])), [self.lviv_car])
+
 class CarPhotoModelTest(TestCase):
     """Тести моделі CarPhoto"""
 
@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from cars.models import Car, CarBrand, CarCatalogEntry, CarModel
+from cars.search import search_cars
+from cars.text_search import CarTextIndex, car_text_index, normalize_words
+from users.models import User
+
+
+class CarSearchTest(TestCase):
+    """Тести фасетного пошуку автомобілів"""
+
+    def setUp(self):
+        """Налаштування тестового середовища"""
+        self.toyota = CarBrand.objects.create(name="Toyota")
+        self.skoda = CarBrand.objects.create(name="Skoda")
+        corolla = CarModel.objects.create(brand=self.toyota, name="Corolla")
+        octavia = CarModel.objects.create(brand=self.skoda, name="Octavia")
+        cars = [
+            (corolla, "petrol", "automatic", 5, "available"),
+            (corolla, "hybrid", "automatic", 5, "available"),
+            (corolla, "hybrid", "automatic", 7, "busy"),
+            (octavia, "diesel", "manual", 5, "available"),
+            (octavia, "petrol", "manual", 5, "maintenance"),
+        ]
+        for index, (model, fuel_type, transmission, seats, status) in enumerate(cars):
+            Car.objects.create(
+                model=model,
+                year=2020 + index,
+                license_plate=f"SR{index:04d}SR",
+                color="Білий",
+                mileage=1000,
+                fuel_type=fuel_type,
+                transmission=transmission,
+                price_per_minute=Decimal("2.00"),
+                seats=seats,
+                status=status,
+                insurance_valid_until=date.today() + timedelta(days=365),
+                technical_inspection_valid_until=date.today() + timedelta(days=365),
+                main_photo="car_photos/test.jpg"
+            )
+
+    def test_facet_counts_ignore_own_filter(self):
+        """Тест кількостей фасетів: кожен фасет враховує всі фільтри, крім власного"""
+        result = search_cars({"brand": self.toyota.id, "fuel_type": "hybrid"})
+        self.assertEqual(result["total"], 2)
+        self.assertEqual(result["facets"]["brand"], {self.toyota.id: 2})
+        self.assertEqual(result["facets"]["fuel_type"], {"petrol": 1, "hybrid": 2})
+        self.assertEqual(result["facets"]["seats"], {5: 1, 7: 1})
+        self.assertEqual(CarCatalogEntry.objects.filter(**result["lookups"]).count(), 2)
+
+        result = search_cars({"min_seats": 6, "max_year": 2023})
+        self.assertEqual(result["total"], 1)
+        self.assertEqual(result["facets"]["seats"], {5: 3, 7: 1})
+        self.assertEqual(result["facets"]["status"], {"busy": 1})
+
+    @override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+    def test_facets_are_cached_until_cars_change(self):
+        """Тест кешування фасетів за фільтрами без фасетів та скидання кешу при зміні автомобіля"""
+        self.assertEqual(search_cars({})["total"], 5)
+        with self.assertNumQueries(0):
+            self.assertEqual(search_cars({"status": "available", "brand": self.skoda.id})["total"], 1)
+
+        car = Car.objects.get(license_plate="SR0004SR")
+        car.status = "available"
+        with self.captureOnCommitCallbacks(execute=True):
+            car.save()
+        self.assertEqual(search_cars({"status": "available", "brand": self.skoda.id})["total"], 2)
+
+    def test_list_view_uses_facet_counts(self):
+        """Тест списку автомобілів з кількостями фасетів та кількістю знайдених автомобілів"""
+        response = self.client.get(reverse("car-list"), {"transmission": "automatic"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context["cars"]), 3)
+        self.assertEqual(response.context["found_cars"], 3)
+        self.assertEqual(response.context["total_cars"], 5)
+        self.assertEqual(response.context["available_cars"], 3)
+        self.assertEqual(response.context["facets"]["transmission"], {"automatic": 3, "manual": 2})
+        self.assertContains(response, "Toyota (3)")
+
+        response = self.client.get(reverse("available-cars"), {"brand": self.skoda.id})
+        self.assertEqual([car.license_plate for car in response.context["cars"]], ["SR0003SR"])
+        self.assertEqual(response.context["facets"]["brand"], {self.toyota.id: 2, self.skoda.id: 1})
+
+class CarTextSearchTest(TestCase):
+    """Тести текстового пошуку автомобілів індексом у пам'яті процесу"""
+
+    def setUp(self):
+        """Налаштування тестового середовища"""
+        self.brand = CarBrand.objects.create(name="Volkswagen")
+        passat = CarModel.objects.create(brand=self.brand, name="Passat")
+        leaf = CarModel.objects.create(brand=CarBrand.objects.create(name="Nissan"), name="Leaf")
+        cars = [
+            (passat, "Сірий", "AA 1234 BB"),
+            (passat, "Чорний", "KA7788AE"),
+            (leaf, "Білий", "ВС4321АХ"),
+        ]
+        self.cars = [
+            Car.objects.create(
+                model=model,
+                year=2022,
+                license_plate=license_plate,
+                color=color,
+                mileage=1000,
+                fuel_type="petrol",
+                transmission="automatic",
+                price_per_minute=Decimal("2.00"),
+                seats=5,
+                insurance_valid_until=date.today() + timedelta(days=365),
+                technical_inspection_valid_until=date.today() + timedelta(days=365),
+                main_photo="car_photos/test.jpg"
+            )
+            for model, color, license_plate in cars
+        ]
+        car_text_index.reset()
+
+    def found(self, query, index=car_text_index):
+        """Id автомобілів, знайдених за запитом"""
+        return sorted(car["id"] for car in index.search(query))
+
+    def test_search_by_parts_of_words(self):
+        """Тест пошуку за частинами марки, моделі, кольору та номерного знака"""
+        first, second, third = (car.id for car in self.cars)
+        self.assertEqual(self.found("volks"), [first, second])
+        self.assertEqual(self.found("wag pas"), [first, second])
+        self.assertEqual(self.found("сір"), [first])
+        self.assertEqual(self.found("1234"), [first])
+        self.assertEqual(self.found("a1234b"), [first])
+        self.assertEqual(self.found("7788"), [second])
+        # Кириличні літери номерного знака збігаються з латинськими
+        self.assertEqual(self.found("bc43"), [third])
+        self.assertEqual(self.found("АА12"), [first])
+        self.assertEqual(self.found("n"), [third])
+        self.assertEqual(self.found("passat білий"), [])
+        self.assertEqual(self.found(" - "), [])
+
+    def test_prefix_matches_rank_first(self):
+        """Тест порядку результатів: спочатку автомобілі, слово яких починається з запиту"""
+        index = CarTextIndex()
+        index.built_at = index.synced_at = time.time()
+        index.put(1, "Ford", "Transit", 2020, "Білий", "AA0001AA", "available")
+        index.put(2, "Ford", "Ranger", 2020, "Білий", "AA0002AA", "available")
+        self.assertEqual([car["id"] for car in index.search("ran")], [2, 1])
+        self.assertEqual([car["id"] for car in index.search("ran", limit=1)], [2])
+        # Запит з одного або двох символів шукає лише за початком слів
+        self.assertEqual([car["id"] for car in index.search("ra")], [2])
+
+    def test_index_matches_substring_search(self):
+        """Тест збігу результатів індексу з перебором слів усіх автомобілів"""
+        index = CarTextIndex()
+        documents = {
+            car.id: normalize_words(f"{car.model.brand.name} {car.model.name} {car.year} {car.color}")
+            + normalize_words(car.license_plate) + ["".join(normalize_words(car.license_plate))]
+            for car in self.cars
+        }
+        for query in ("a", "aa", "ss", "ssa", "20", "022", "b", "ий", "x", "eaf", "2022 ni", "ka77 e"):
+            # Частини запиту з одного або двох символів збігаються лише з початком слова
+            expected = sorted(
+                car_id for car_id, words in documents.items()
+                if all(
+                    any(word.startswith(token) if len(token) < 3 else token in word for word in words)
+                    for token in normalize_words(query)
+                )
+            )
+            self.assertEqual(self.found(query, index), expected, query)
+
+    def test_signals_update_index(self):
+        """Тест оновлення індексу при зміні та видаленні автомобілів і перейменуванні марки"""
+        self.assertEqual(len(self.found("volkswagen")), 2)
+
+        self.brand.name = "VW"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.brand.save()
+        self.assertEqual(self.found("volkswagen"), [])
+        self.assertEqual(len(self.found("vw")), 2)
+
+        car = self.cars[0]
+        car.color = "Зелений"
+        with self.captureOnCommitCallbacks(execute=True):
+            car.save()
+        self.assertEqual(self.found("зел"), [car.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            car.delete()
+        self.assertEqual(self.found("зел"), [])
+
+    def test_search_api(self):
+        """Тест API підказок пошуку без запитів до бази даних після побудови індексу"""
+        url = reverse("cars-search-api")
+        self.client.get(url, {"q": "leaf"})
+        with self.assertNumQueries(0):
+            response = self.client.get(url, {"q": "leaf"})
+        results = response.json()["results"]
+        self.assertEqual([result["license_plate"] for result in results], ["ВС4321АХ"])
+        self.assertEqual(results[0]["label"], "Nissan Leaf (2022)")
+        self.assertEqual(results[0]["url"], reverse("car-detail", args=[self.cars[2].id]))
+
+        self.assertEqual(len(self.client.get(url, {"q": "passat", "limit": 1}).json()["results"]), 1)
+        self.assertEqual(self.client.get(url, {"q": "passat", "limit": "x"}).status_code, 400)
+
+    def test_admin_search_uses_index(self):
+        """Тест пошуку автомобілів в адмін-панелі"""
+        User.objects.create_superuser(username="searchadmin", email="admin@example.com", password="adminpass")
+        self.client.login(username="searchadmin", password="adminpass")
+        response = self.client.get(reverse("admin:cars_car_changelist"), {"q": "7788"})
+        self.assertEqual(list(response.context["cl"].result_list), [self.cars[1]])
@@ -0,0 +1,328 @@
+# -*- coding: utf-8 -*-
+import json
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from redis import RedisError, ResponseError
+
+from bookings.models import Booking
+from cars.location_history import booking_track, decode_track, downsample_history, encode_track, store_history
+from cars.models import Car, CarBrand, CarCatalogEntry, CarLocationChunk, CarModel
+from cars.position_buffer import (
+    HISTORY_BUFFER_KEY,
+    HISTORY_PACKING_KEY,
+    POSITION_BUFFER_KEY,
+    POSITION_DIRTY_KEY,
+    POSITION_FLUSHING_KEY,
+    encode_position,
+    flush_positions,
+)
+from cars.tasks import flush_car_positions, pack_location_history
+from cars.telemetry import apply_positions
+from users.models import User
+from utils.geo import encode_geohash
+
+
+@override_settings(TELEMETRY_TOKEN="telemetry-secret")
+class TelemetryTestCase(TestCase):
+    """Базовий клас тестів телеметрії з допоміжними методами"""
+
+    def setUp(self):
+        """Налаштування тестового середовища"""
+        self.model = CarModel.objects.create(
+            brand=CarBrand.objects.create(name="TelemetryBrand"), name="TelemetryModel"
+        )
+        self.cars = [
+            Car.objects.create(
+                model=self.model,
+                year=2023,
+                license_plate=f"TM000{index}TM",
+                color="Сірий",
+                mileage=1000,
+                fuel_type="petrol",
+                transmission="automatic",
+                price_per_minute=Decimal("2.00"),
+                seats=5,
+                insurance_valid_until=date.today() + timedelta(days=365),
+                technical_inspection_valid_until=date.today() + timedelta(days=365),
+                main_photo="car_photos/test.jpg"
+            )
+            for index in range(3)
+        ]
+        self.now = timezone.now()
+
+    def post_points(self, points, token="telemetry-secret"):
+        """Надіслати пакет точок телеметрії"""
+        return self.client.post(
+            reverse("telemetry-ingest"),
+            data=json.dumps({"points": points}),
+            content_type="application/json",
+            headers={"X-Telemetry-Token": token}
+        )
+
+    def point(self, car, latitude, longitude, seconds_ago=0):
+        """Точка телеметрії автомобіля з часом seconds_ago секунд тому"""
+        return {
+            "car_id": car.id,
+            "lat": latitude,
+            "lng": longitude,
+            "timestamp": (self.now - timedelta(seconds=seconds_ago)).timestamp(),
+        }
+
+class TelemetryIngestTest(TelemetryTestCase):
+    """Тести пакетного прийому телеметрії автомобілів"""
+
+    def test_ingest_applies_batch_with_constant_queries(self):
+        """Тест застосування пакета точок двома запитами на порцію автомобілів"""
+        points = [self.point(car, 50.0 + index, 30.0, seconds_ago=30) for index, car in enumerate(self.cars)]
+        points += [
+            self.point(self.cars[0], 50.45, 30.52, seconds_ago=1),
+            self.point(self.cars[0], 0, 0, seconds_ago=60),
+        ]
+
+        # Вибірка автомобілів порції, UPDATE автомобілів, UPDATE каталогу та запис у журнал змін
+        # у точці збереження, а для історії - вибірка автомобілів, оренд та один INSERT
+        with self.assertNumQueries(9):
+            response = self.post_points(points)
+
+        data = response.json()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((data["received"], data["accepted"], data["updated"]), (5, 3, 3))
+        car = Car.objects.get(pk=self.cars[0].pk)
+        self.assertEqual((car.current_latitude, car.current_longitude), (50.45, 30.52))
+        self.assertEqual(car.geohash, encode_geohash(50.45, 30.52))
+        self.assertEqual(car.location_updated_at.timestamp(), points[3]["timestamp"])
+        entry = CarCatalogEntry.objects.get(pk=self.cars[0].pk)
+        self.assertEqual((entry.current_latitude, entry.current_longitude, entry.geohash), (50.45, 30.52, car.geohash))
+        self.assertEqual(entry.location_updated_at, car.location_updated_at)
+
+    def test_older_points_and_unknown_cars_are_skipped(self):
+        """Тест пропуску точок, старіших за збережене місцезнаходження, та невідомих автомобілів"""
+        apply_positions({self.cars[0].id: (50.45, 30.52, self.now)})
+
+        stats = apply_positions({
+            self.cars[0].id: (49.0, 24.0, self.now - timedelta(minutes=1)),
+            self.cars[1].id: (49.0, 24.0, self.now),
+            999999: (49.0, 24.0, self.now),
+        }, chunk_size=1)
+
+        self.assertEqual(stats, {"updated": 1, "stale": 1, "unknown": 1})
+        self.assertEqual(Car.objects.get(pk=self.cars[0].pk).current_latitude, 50.45)
+        self.assertEqual(Car.objects.in_bbox(48.9, 23.9, 49.1, 24.1).get(), self.cars[1])
+
+    def test_ingest_rejects_invalid_requests(self):
+        """Тест відхилення запитів без токена, з некоректним тілом та завеликих пакетів"""
+        self.assertEqual(self.post_points([], token="wrong").status_code, 403)
+        with override_settings(TELEMETRY_TOKEN=""):
+            self.assertEqual(self.post_points([], token="").status_code, 403)
+
+        response = self.client.post(
+            reverse("telemetry-ingest"), data="{", content_type="application/json",
+            headers={"X-Telemetry-Token": "telemetry-secret"}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get(reverse("telemetry-ingest")).status_code, 405)
+
+        with override_settings(TELEMETRY_MAX_POINTS=2):
+            response = self.post_points([self.point(self.cars[0], 50, 30)] * 3)
+        self.assertEqual(response.status_code, 413)
+
+@override_settings(TELEMETRY_BUFFER_ENABLED=True)
+class PositionBufferTest(TelemetryTestCase):
+    """Тести буфера місцезнаходження автомобілів у Redis"""
+
+    def setUp(self):
+        """Налаштування тестового середовища"""
+        super().setUp()
+        patcher = mock.patch("cars.position_buffer.get_redis")
+        self.redis = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+
+    def test_ingest_writes_only_to_buffer(self):
+        """Тест запису телеметрії в буфер без запитів до бази даних"""
+        self.redis.eval.return_value = 1
+        point = self.point(self.cars[0], 50.45, 30.52)
+
+        with self.assertNumQueries(0):
+            response = self.post_points([point, self.point(self.cars[0], 49.0, 24.0, seconds_ago=5)])
+
+        self.assertEqual(response.json()["buffered"], 1)
+        args = self.redis.eval.call_args.args
+        self.assertEqual(args[2:4], (POSITION_BUFFER_KEY, POSITION_DIRTY_KEY))
+        self.assertEqual(args[4:], (self.cars[0].id, encode_position(50.45, 30.52, self.now)))
+        self.assertEqual(self.redis.rpush.call_args.args[0], HISTORY_BUFFER_KEY)
+        self.assertEqual(len(self.redis.rpush.call_args.args), 3)
+        self.assertFalse(CarLocationChunk.objects.exists())
+        self.assertIsNone(Car.objects.get(pk=self.cars[0].pk).current_latitude)
+
+    def test_ingest_falls_back_to_database_when_redis_unavailable(self):
+        """Тест запису телеметрії в базу даних, якщо Redis недоступний"""
+        self.redis.eval.side_effect = RedisError
+
+        response = self.post_points([self.point(self.cars[0], 50.45, 30.52)])
+
+        self.assertEqual(response.json()["updated"], 1)
+        self.assertEqual(Car.objects.get(pk=self.cars[0].pk).current_latitude, 50.45)
+
+    def test_flush_writes_buffered_positions(self):
+        """Тест скидання буфера в базу даних без зміни updated_at"""
+        updated_at = Car.objects.get(pk=self.cars[0].pk).updated_at
+        self.redis.exists.return_value = False
+        self.redis.smembers.return_value = {str(self.cars[0].id), str(self.cars[1].id)}
+        self.redis.hmget.return_value = [encode_position(50.45, 30.52, self.now), None]
+
+        stats = flush_car_positions()
+
+        self.redis.renamenx.assert_called_once_with(POSITION_DIRTY_KEY, POSITION_FLUSHING_KEY)
+        self.redis.delete.assert_called_once_with(POSITION_FLUSHING_KEY)
+        self.assertEqual(stats["updated"], 1)
+        car = Car.objects.get(pk=self.cars[0].pk)
+        self.assertEqual((car.current_latitude, car.current_longitude), (50.45, 30.52))
+        self.assertEqual(car.updated_at, updated_at)
+
+    def test_flush_without_changes(self):
+        """Тест скидання буфера, коли з часу останнього скидання звітів не було"""
+        self.redis.exists.return_value = False
+        self.redis.renamenx.side_effect = ResponseError("no such key")
+
+        self.assertEqual(flush_positions(), {"updated": 0, "stale": 0, "unknown": 0})
+        self.redis.hmget.assert_not_called()
+
+    def test_pack_history_writes_chunks(self):
+        """Тест пакування буфера історії в стиснуті порції"""
+        self.redis.exists.return_value = False
+        self.redis.lrange.return_value = [
+            f"{self.cars[0].id},{encode_position(50.45, 30.52, self.now - timedelta(seconds=5))}",
+            f"{self.cars[0].id},{encode_position(50.46, 30.53, self.now)}",
+            f"999999,{encode_position(50.0, 30.0, self.now)}",
+        ]
+
+        self.assertEqual(pack_location_history(), {"points": 3, "chunks": 1})
+
+        self.redis.renamenx.assert_called_once_with(HISTORY_BUFFER_KEY, HISTORY_PACKING_KEY)
+        self.redis.delete.assert_called_once_with(HISTORY_PACKING_KEY)
+        chunk = CarLocationChunk.objects.get()
+        self.assertEqual((chunk.car_id, chunk.point_count), (self.cars[0].id, 2))
+
+    def test_map_reads_live_positions(self):
+        """Тест підстановки буферизованого місцезнаходження у відповідь API карти"""
+        apply_positions({self.cars[0].id: (50.45, 30.52, self.now - timedelta(minutes=1))})
+        self.redis.hmget.return_value = [encode_position(50.4502, 30.5235, self.now)]
+
+        response = self.client.get(reverse("cars-map-api"), {"bbox": "30.45,50.40,30.60,50.50", "zoom": 15})
+        self.assertEqual(response.json()["features"][0]["geometry"]["coordinates"], [30.5235, 50.4502])
+
+        # Старіше за базу даних місцезнаходження з буфера не використовується
+        self.redis.hmget.return_value = [encode_position(49.0, 24.0, self.now - timedelta(minutes=5))]
+        response = self.client.get(reverse("car-api-detail", args=[self.cars[0].pk]))
+        self.assertEqual(response.json()["current_latitude"], 50.45)
+
+class LocationHistoryTest(TelemetryTestCase):
+    """Тести стиснутої історії місцезнаходження автомобілів"""
+
+    def setUp(self):
+        """Налаштування тестового середовища"""
+        super().setUp()
+        self.user = User.objects.create_user(
+            username="historyuser", email="history@example.com", password="testpassword123"
+        )
+        self.booking = Booking.objects.bulk_create([Booking(
+            user=self.user,
+            car=self.cars[0],
+            start_time=self.now - timedelta(minutes=10),
+            status="active",
+            total_price=Decimal("0.00"),
+        )])[0]
+
+    def route(self, seconds, step=1):
+        """Маршрут з точкою кожні step секунд протягом seconds секунд, що закінчується зараз"""
+        return [
+            (self.cars[0].id, 50.45 + index * 1e-5, 30.52 - index * 1e-5, self.now - timedelta(seconds=seconds - index))
+            for index in range(0, seconds, step)
+        ]
+
+    def test_track_round_trip_is_compact(self):
+        """Тест точного відновлення маршруту та розміру стиснутих даних"""
+        times = [1700000000 + index for index in range(1000)]
+        latitudes = [50.45 + index * 1e-5 for index in range(1000)]
+        longitudes = [30.52 - index * 1e-5 for index in range(1000)]
+
+        data = encode_track(times, latitudes, longitudes)
+        decoded_times, decoded_latitudes, decoded_longitudes = decode_track(data, 1000)
+
+        self.assertEqual(decoded_times.tolist(), times)
+        self.assertEqual(decoded_latitudes.round(6).tolist(), [round(value, 6) for value in latitudes])
+        self.assertEqual(decoded_longitudes.round(6).tolist(), [round(value, 6) for value in longitudes])
+        # Три числа з плаваючою комою на точку займали б 24 000 байтів
+        self.assertLess(len(data), 1000)
+        self.assertEqual(decode_track(encode_track([times[0]], [50.45], [30.52]), 1)[1].tolist(), [50.45])
+
+    def test_ingest_links_points_to_booking(self):
+        """Тест запису всіх точок пакета в історію з прив'язкою до активної оренди"""
+        points = [
+            self.point(self.cars[0], 50.45, 30.52, seconds_ago=20 * 60),
+            self.point(self.cars[0], 50.46, 30.53, seconds_ago=5 * 60),
+            self.point(self.cars[0], 50.47, 30.54, seconds_ago=60),
+            self.point(self.cars[1], 49.0, 24.0),
+        ]
+        self.post_points(points)
+
+        chunks = CarLocationChunk.objects.order_by("car_id", "start_time")
+        self.assertEqual(
+            [(chunk.car_id, chunk.booking_id, chunk.point_count) for chunk in chunks],
+            [(self.cars[0].id, None, 1), (self.cars[0].id, self.booking.id, 2), (self.cars[1].id, None, 1)],
+        )
+        self.assertEqual(booking_track(self.booking), [
+            [50.46, 30.53, round(points[1]["timestamp"])],
+            [50.47, 30.54, round(points[2]["timestamp"])],
+        ])
+
+    def test_store_history_splits_long_tracks(self):
+        """Тест розбиття довгого маршруту на порції та рівномірного проріджування для відтворення"""
+        self.assertEqual(store_history(self.route(250), chunk_points=100), 3)
+
+        self.assertEqual(
+            list(CarLocationChunk.objects.order_by("start_time").values_list("point_count", flat=True)),
+            [100, 100, 50],
+        )
+        track = booking_track(self.booking, max_points=50)
+        self.assertEqual(len(track), 50)
+        self.assertEqual(track[-1][2], round(self.now.timestamp()) - 1)
+
+    def test_booking_detail_shows_track(self):
+        """Тест відображення маршруту поїздки на сторінці оренди"""
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("booking-detail", args=[self.booking.pk]))
+        self.assertNotContains(response, "track-map")
+
+        store_history(self.route(60, step=10))
+        response = self.client.get(reverse("booking-detail", args=[self.booking.pk]))
+        self.assertContains(response, 'id="track-data"')
+        self.assertEqual(len(response.context["track"]), 6)
+
+    @override_settings(LOCATION_HISTORY_DOWNSAMPLE_AFTER=7, LOCATION_HISTORY_RESOLUTION=30)
+    def test_downsample_old_history(self):
+        """Тест проріджування лише старої історії"""
+        store_history(self.route(600, step=5))
+        recent = CarLocationChunk.objects.get()
+        old_points = [
+            (car_id, latitude, longitude, timestamp - timedelta(days=8))
+            for car_id, latitude, longitude, timestamp in self.route(600, step=5)
+        ]
+        store_history(old_points)
+
+        stats = downsample_history(batch_size=1)
+
+        old = CarLocationChunk.objects.exclude(pk=recent.pk).get()
+        self.assertEqual((stats["chunks"], stats["points_before"], stats["points_after"]), (1, 120, old.point_count))
+        self.assertEqual(old.resolution, 30)
+        # Перша точка кожного 30-секундного інтервалу та остання точка маршруту
+        self.assertIn(old.point_count, (21, 22))
+        times, latitudes, longitudes = decode_track(old.data, old.point_count)
+        self.assertEqual(times[-1], round(old_points[-1][3].timestamp()))
+        self.assertEqual(CarLocationChunk.objects.get(pk=recent.pk).resolution, 0)
+        self.assertEqual(downsample_history()["chunks"], 0)
@@ -1,15 +1,27 @@
 # -*- coding: utf-8 -*-
+import json
 from datetime import date, timedelta
 from decimal import Decimal
 from io import BytesIO
+from unittest import mock
 
+import numpy as np
+from asgiref.sync import async_to_sync
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from django.utils import timezone
 from PIL import Image
 
-from cars.models import Car, CarBrand, CarModel
+from cars.catalog import sync_catalog
+from cars.changes import contiguous_changes, latest_change_id, prune_changes
+from cars.models import Car, CarBrand, CarCatalogEntry, CarChange, CarModel
+from cars.nearest import CAR_CHANGES_KEY, NearestCarsIndex, nearest_index
+from cars.telemetry import apply_positions
+from cars.tiles import tile_cache_key
+from utils.geo import encode_geohash, haversine_km, point_tile
 
 
 User = get_user_model()
@@ -87,6 +99,73 @@ class CarViewsTest(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertTemplateUsed(response, "cars_map.html")
 
+    def test_cars_map_api(self):
+        """Тест API карти з окремими автомобілями видимої області"""
+        self.car.current_latitude = 50.4501
+        self.car.current_longitude = 30.5234
+        self.car.save()
+
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse("cars-map-api"), {"bbox": "30.45,50.40,30.60,50.50", "zoom": 14})
+        data = response.json()
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(data["clustered"])
+        self.assertEqual(data["count"], 1)
+        feature = data["features"][0]
+        self.assertEqual(feature["geometry"]["coordinates"], [30.5234, 50.4501])
+        self.assertEqual(feature["properties"]["title"], "TestBrand TestModel")
+        self.assertEqual(feature["properties"]["url"], reverse("car-detail", args=[self.car.pk]))
+
+        response = self.client.get(reverse("cars-map-api"), {"bbox": "24.00,49.80,24.10,49.90", "zoom": 14})
+        self.assertEqual(response.json()["features"], [])
+
+        response = self.client.get(reverse("cars-map-api"), {"bbox": "30.45,50.40,30.60,50.50", "status": "busy"})
+        self.assertEqual(response.json()["count"], 0)
+
+    @override_settings(MAP_MAX_MARKERS=1)
+    def test_cars_map_api_clusters(self):
+        """Тест кластеризації автомобілів при великій кількості в області"""
+        self.car.current_latitude = 50.4501
+        self.car.current_longitude = 30.5234
+        self.car.save()
+        for index, (latitude, longitude) in enumerate(((50.4502, 30.5235), (49.8397, 24.0297))):
+            Car.objects.create(
+                model=self.model,
+                year=2023,
+                license_plate=f"MAP{index}",
+                color="Red",
+                mileage=10000,
+                fuel_type="petrol",
+                transmission="manual",
+                price_per_minute=Decimal("2.50"),
+                seats=5,
+                status="busy",
+                current_latitude=latitude,
+                current_longitude=longitude,
+                insurance_valid_until=date.today() + timedelta(days=365),
+                technical_inspection_valid_until=date.today() + timedelta(days=365),
+                main_photo="car_photos/test.jpg"
+            )
+
+        response = self.client.get(reverse("cars-map-api"), {"bbox": "22,44,40,52", "zoom": 8})
+        data = response.json()
+        self.assertTrue(data["clustered"])
+        clusters = sorted(feature["properties"]["count"] for feature in data["features"])
+        self.assertEqual(clusters, [1, 2])
+        kyiv = next(feature for feature in data["features"] if feature["properties"]["count"] == 2)
+        self.assertEqual(kyiv["properties"]["available"], 1)
+        self.assertEqual(kyiv["properties"]["cell"], self.car.geohash[:4])
+
+        response = self.client.get(reverse("cars-map-api"), {"bbox": "30.52,50.45,30.53,50.46", "zoom": 18})
+        self.assertFalse(response.json()["clustered"])
+
+    def test_cars_map_api_invalid_bbox(self):
+        """Тест відповіді API карти на некоректну область"""
+        response = self.client.get(reverse("cars-map-api"), {"bbox": "30,50"})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(reverse("cars-map-api"), {"bbox": "30.45,50.40,30.60,50.50", "zoom": "x"})
+        self.assertEqual(response.status_code, 400)
+
     def test_get_car_api_view(self):
         """Тест API отримання автомобіля"""
         response = self.client.get(reverse("car-api-detail", args=[self.car.pk]))
@@ -152,3 +231,304 @@ class CarPhotoViewsTest(TestCase):
             main_photo=get_test_image()
         )
 
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class CarMapTileTest(TestCase):
+    """Тести кешу тайлів карти та їх скидання при зміні автомобілів"""
+
+    def setUp(self):
+        cache.clear()
+        self.admin_user = User.objects.create_superuser(
+            username="tileadmin", email="tileadmin@example.com", password="adminpass"
+        )
+        self.model = CarModel.objects.create(brand=CarBrand.objects.create(name="TileBrand"), name="TileModel")
+        self.kyiv_car = self.create_car("TILE1", 50.4501, 30.5234)
+        self.lviv_car = self.create_car("TILE2", 49.8397, 24.0297)
+        self.kyiv_tile = point_tile(50.4501, 30.5234, 12)
+        self.lviv_tile = point_tile(49.8397, 24.0297, 12)
+
+    def create_car(self, license_plate, latitude, longitude):
+        """Створити автомобіль з заданими координатами"""
+        return Car.objects.create(
+            model=self.model,
+            year=2023,
+            license_plate=license_plate,
+            color="Red",
+            mileage=10000,
+            fuel_type="petrol",
+            transmission="manual",
+            price_per_minute=Decimal("2.50"),
+            seats=5,
+            current_latitude=latitude,
+            current_longitude=longitude,
+            insurance_valid_until=date.today() + timedelta(days=365),
+            technical_inspection_valid_until=date.today() + timedelta(days=365),
+            main_photo="car_photos/test.jpg"
+        )
+
+    def get_tile(self, tile, **params):
+        """Отримати тайл масштабу 12 через API"""
+        return self.client.get(reverse("cars-map-tile", args=[12, *tile]), params)
+
+    def test_tile_is_served_from_cache(self):
+        """Тест повторного отримання тайла з кешу без запитів до бази даних"""
+        response = self.get_tile(self.kyiv_tile)
+        self.assertEqual([feature["properties"]["id"] for feature in response.json()["features"]], [self.kyiv_car.id])
+
+        with self.assertNumQueries(0):
+            response = self.get_tile(self.kyiv_tile)
+        self.assertEqual(response.json()["count"], 1)
+        self.assertEqual(self.get_tile(self.kyiv_tile, status="busy").json()["count"], 0)
+
+    def test_location_change_invalidates_only_affected_tiles(self):
+        """Тест скидання лише тих тайлів, які містять старе та нове місцезнаходження"""
+        self.get_tile(self.kyiv_tile)
+        self.get_tile(self.lviv_tile)
+        far_tile = point_tile(46.4825, 30.7233, 12)
+        self.get_tile(far_tile)
+
+        self.client.login(username="tileadmin", password="adminpass")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse("update-car-location", args=[self.kyiv_car.pk]),
+                {"latitude": "49.8398", "longitude": "24.0298"}
+            )
+
+        self.assertIsNone(cache.get(tile_cache_key(12, *self.kyiv_tile)))
+        self.assertIsNone(cache.get(tile_cache_key(12, *self.lviv_tile)))
+        self.assertIsNotNone(cache.get(tile_cache_key(12, *far_tile)))
+        self.assertEqual(self.get_tile(self.lviv_tile).json()["count"], 2)
+        self.assertEqual(self.get_tile(self.kyiv_tile).json()["count"], 0)
+
+    def test_status_change_invalidates_status_tiles(self):
+        """Тест скидання тайлів старого та нового статусу при зміні статусу"""
+        self.get_tile(self.kyiv_tile, status="available")
+        self.get_tile(self.kyiv_tile, status="maintenance")
+        self.get_tile(self.kyiv_tile, status="busy")
+
+        self.client.login(username="tileadmin", password="adminpass")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("change-car-status", args=[self.kyiv_car.pk]), {"status": "maintenance"})
+
+        self.assertIsNone(cache.get(tile_cache_key(12, *self.kyiv_tile, "available")))
+        self.assertIsNone(cache.get(tile_cache_key(12, *self.kyiv_tile, "maintenance")))
+        self.assertIsNotNone(cache.get(tile_cache_key(12, *self.kyiv_tile, "busy")))
+        self.assertEqual(self.get_tile(self.kyiv_tile, status="maintenance").json()["count"], 1)
+
+    def test_unrelated_save_keeps_tiles(self):
+        """Тест збереження автомобіля без змін на карті без скидання тайлів"""
+        self.get_tile(self.kyiv_tile)
+
+        car = Car.objects.get(pk=self.kyiv_car.pk)
+        car.rating = Decimal("4.50")
+        with self.captureOnCommitCallbacks(execute=True):
+            car.save()
+
+        self.assertIsNotNone(cache.get(tile_cache_key(12, *self.kyiv_tile)))
+
+    def test_invalid_tile(self):
+        """Тест відповіді API на тайл поза межами масштабу та некоректний статус"""
+        self.assertEqual(self.client.get(reverse("cars-map-tile", args=[2, 4, 0])).status_code, 404)
+        self.assertEqual(self.get_tile(self.kyiv_tile, status="unknown").status_code, 400)
+
+class NearestCarsTest(TestCase):
+    """Тести пошуку найближчих доступних автомобілів"""
+
+    def setUp(self):
+        """Налаштування тестового середовища"""
+        self.model = CarModel.objects.create(brand=CarBrand.objects.create(name="NearBrand"), name="NearModel")
+        random = np.random.default_rng(17)
+        latitudes = 50.45 + random.uniform(-0.2, 0.2, 80)
+        longitudes = 30.52 + random.uniform(-0.3, 0.3, 80)
+        self.cars = Car.objects.bulk_create([
+            Car(
+                model=self.model,
+                year=2023,
+                license_plate=f"NR{index:04d}",
+                color="Синій",
+                mileage=1000,
+                fuel_type="petrol",
+                transmission="automatic",
+                price_per_minute=Decimal("2.00"),
+                seats=5,
+                current_latitude=float(latitude),
+                current_longitude=float(longitude),
+                geohash=encode_geohash(float(latitude), float(longitude)),
+                status="maintenance" if index % 10 == 0 else "available",
+                insurance_valid_until=date.today() + timedelta(days=365),
+                technical_inspection_valid_until=date.today() + timedelta(days=365),
+                main_photo="car_photos/test.jpg"
+            )
+            for index, (latitude, longitude) in enumerate(zip(latitudes, longitudes))
+        ])
+        # Масове створення не викликає сигналів, тому каталог автомобілів заповнюється окремо
+        sync_catalog()
+        nearest_index.reset()
+
+    def brute_force(self, latitude, longitude, limit):
+        """Найближчі доступні автомобілі повним перебором"""
+        cars = [car for car in self.cars if car.status == "available"]
+        distances = haversine_km(
+            latitude, longitude,
+            np.array([car.current_latitude for car in cars]), np.array([car.current_longitude for car in cars])
+        )
+        return [cars[index].id for index in np.argsort(distances)[:limit]]
+
+    def test_index_matches_brute_force(self):
+        """Тест збігу результатів сітки з повним перебором для різних точок та розмірів клітинки"""
+        for cell_size in (0.005, 0.05, 1.0):
+            index = NearestCarsIndex(cell_size=cell_size)
+            for latitude, longitude in [(50.45, 30.52), (50.3, 30.2), (50.7, 30.9), (51.5, 31.5)]:
+                found = index.nearest(latitude, longitude, 7, max_distance=1000)
+                self.assertEqual([car_id for car_id, _ in found], self.brute_force(latitude, longitude, 7))
+
+        self.assertEqual(NearestCarsIndex().nearest(40.0, 20.0, 5), [])
+
+    @override_settings(NEAREST_INDEX_CHANGES_ENABLED=True, NEAREST_INDEX_REFRESH_INTERVAL=0)
+    def test_index_applies_only_changed_cars(self):
+        """Тест оновлення індексу лише зміненими автомобілями"""
+        patcher = mock.patch("cars.nearest.get_redis")
+        redis = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+
+        index = NearestCarsIndex()
+        nearest = index.nearest(50.45, 30.52, 1)[0][0]
+
+        car = Car.objects.get(pk=nearest)
+        car.status = "busy"
+        with self.captureOnCommitCallbacks(execute=True):
+            car.save()
+        redis.pipeline.return_value.zadd.assert_called_once_with(CAR_CHANGES_KEY, {nearest: mock.ANY})
+
+        # Зі списку змін читаються лише змінені автомобілі, без повної перебудови індексу
+        redis.zrangebyscore.return_value = [str(nearest)]
+        with self.assertNumQueries(1):
+            found = index.nearest(50.45, 30.52, 1)
+        self.assertNotEqual(found[0][0], nearest)
+        self.assertNotIn(nearest, index.positions)
+
+    def test_nearest_api(self):
+        """Тест API найближчих автомобілів"""
+        response = self.client.get(reverse("cars-nearest-api"), {"lat": 50.45, "lng": 30.52, "limit": 3})
+
+        features = response.json()["features"]
+        self.assertEqual([feature["properties"]["id"] for feature in features], self.brute_force(50.45, 30.52, 3))
+        distances = [feature["properties"]["distance_km"] for feature in features]
+        self.assertEqual(distances, sorted(distances))
+
+        self.assertEqual(self.client.get(reverse("cars-nearest-api"), {"lat": 50.45}).status_code, 400)
+        self.assertEqual(self.client.get(reverse("cars-nearest-api"), {"lat": 91, "lng": 0}).status_code, 400)
+        self.assertEqual(
+            self.client.get(reverse("cars-nearest-api"), {"lat": 50, "lng": 30, "limit": "x"}).status_code, 400
+        )
+
+    def test_nearest_api_skips_cars_that_became_unavailable(self):
+        """Тест пропуску автомобілів, які стали недоступними після оновлення індексу"""
+        nearest = self.brute_force(50.45, 30.52, 1)[0]
+        self.client.get(reverse("cars-nearest-api"), {"lat": 50.45, "lng": 30.52})
+        # Зміна статусу в обхід сигналів, як у пакетному звільненні автомобілів: індекс ще не оновлений
+        Car.objects.filter(pk=nearest).update(status="busy")
+        CarCatalogEntry.objects.filter(pk=nearest).update(status="busy")
+
+        response = self.client.get(reverse("cars-nearest-api"), {"lat": 50.45, "lng": 30.52, "limit": 1})
+        self.assertEqual(response.json()["features"], [])
+
+@override_settings(CAR_CHANGES_STREAM_TIMEOUT=0)
+class CarChangesTest(TestCase):
+    """Тести журналу та потоку змін автомобілів"""
+
+    def setUp(self):
+        """Налаштування тестового середовища"""
+        self.model = CarModel.objects.create(brand=CarBrand.objects.create(name="LiveBrand"), name="LiveModel")
+        self.cars = [
+            Car.objects.create(
+                model=self.model,
+                year=2023,
+                license_plate=f"LV000{index}LV",
+                color="Білий",
+                mileage=1000,
+                fuel_type="petrol",
+                transmission="automatic",
+                price_per_minute=Decimal("2.00"),
+                seats=5,
+                current_latitude=50.45,
+                current_longitude=30.52,
+                insurance_valid_until=date.today() + timedelta(days=365),
+                technical_inspection_valid_until=date.today() + timedelta(days=365),
+                main_photo="car_photos/test.jpg"
+            )
+            for index in range(2)
+        ]
+        self.version = latest_change_id()
+
+    def read_events(self, **params):
+        """Прочитати потік змін і повернути події (назва, дані)"""
+        async def read():
+            response = await self.async_client.get(reverse("car-changes-stream"), params)
+            self.assertEqual(response["Content-Type"], "text/event-stream")
+            return b"".join([chunk async for chunk in response.streaming_content]).decode()
+
+        events = []
+        for block in async_to_sync(read)().split("\n\n"):
+            # Рядки-коментарі (": ping") не є полями події
+            fields = dict(line.split(": ", 1) for line in block.splitlines() if not line.startswith(":"))
+            if "event" in fields:
+                events.append((fields["event"], json.loads(fields["data"])))
+        return events
+
+    def test_status_and_location_changes_are_logged(self):
+        """Тест запису в журнал лише змін статусу та місцезнаходження"""
+        car = self.cars[0]
+        car.rating = Decimal("4.00")
+        car.save()
+        self.assertEqual(latest_change_id(), self.version)
+
+        car.status = "busy"
+        car.save()
+        apply_positions({car.id: (50.46, 30.53, timezone.now())})
+        car_id = car.id
+        car.delete()
+
+        changes = CarChange.objects.filter(id__gt=self.version).order_by("id")
+        self.assertEqual(
+            [(change.car_id, change.status, change.latitude) for change in changes],
+            [(car_id, "busy", 50.45), (car_id, "busy", 50.46), (car_id, "", None)],
+        )
+
+    def test_stream_sends_latest_change_per_car(self):
+        """Тест потоку змін: лише зміни після версії клієнта, остання зміна кожного автомобіля"""
+        apply_positions({self.cars[0].id: (50.46, 30.53, timezone.now() - timedelta(seconds=5))})
+        apply_positions({self.cars[0].id: (50.47, 30.54, timezone.now())})
+        self.cars[1].status = "maintenance"
+        self.cars[1].save()
+
+        events = self.read_events(since=self.version)
+        self.assertEqual([name for name, _ in events], ["changes"])
+        data = events[0][1]
+        self.assertEqual(data["version"], latest_change_id())
+        self.assertEqual(
+            [(car["id"], car["status"], car["lat"]) for car in data["cars"]],
+            [(self.cars[0].id, "available", 50.47), (self.cars[1].id, "maintenance", 50.45)],
+        )
+
+        events = self.read_events(since=self.version, cars=str(self.cars[1].id))
+        self.assertEqual([car["id"] for car in events[0][1]["cars"]], [self.cars[1].id])
+        self.assertEqual(self.read_events(since=latest_change_id()), [])
+
+    def test_stream_waits_for_uncommitted_changes(self):
+        """Тест зупинки потоку на пропуску в номерах записів журналу"""
+        rows = [{"id": 11}, {"id": 12}, {"id": 14}]
+        self.assertEqual(contiguous_changes(rows, 10), [{"id": 11}, {"id": 12}])
+        self.assertEqual(contiguous_changes(rows, 12), [])
+
+    def test_stream_resets_outdated_clients(self):
+        """Тест події reset для версії, записи після якої вже видалені з журналу"""
+        self.cars[0].status = "busy"
+        self.cars[0].save()
+        with override_settings(CAR_CHANGES_RETENTION=0):
+            self.assertEqual(prune_changes(now=timezone.now() + timedelta(seconds=1), batch_size=1), 3)
+
+        self.cars[0].status = "available"
+        self.cars[0].save()
+        self.assertEqual(self.read_events(since=0), [("reset", {"version": latest_change_id()})])
+        self.assertEqual(self.read_events(since=latest_change_id() + 5)[0][0], "reset")
+        self.assertEqual(self.client.get(reverse("car-changes-stream"), {"since": "x"}).status_code, 400)
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+from django.core.exceptions import ValidationError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from cars.models import Zone, ZoneCell
+from cars.zones import find_zones, return_location_error, zones_at
+from utils.geo import normalize_polygon, point_in_polygon
+
+
+# Зона з вирізом: п'ятикутник навколо центру Києва з прямокутником без обслуговування всередині
+CITY_POLYGON = [
+    [[30.40, 50.40], [30.60, 50.38], [30.65, 50.50], [30.50, 50.55], [30.45, 50.48]],
+    [[30.50, 50.44], [30.55, 50.44], [30.55, 50.47], [30.50, 50.47]],
+]
+
+class ZoneGridTest(TestCase):
+    """Тести сітки клітинок зон"""
+
+    def setUp(self):
+        """Налаштування тестового середовища"""
+        self.zone = Zone.objects.create(name="Київ", kind="service", polygon=CITY_POLYGON)
+
+    def test_polygon_is_normalized(self):
+        """Тест замикання кілець та обчислення меж зони"""
+        self.assertEqual(self.zone.polygon[0][0], self.zone.polygon[0][-1])
+        self.assertEqual(len(self.zone.polygon[1]), 5)
+        self.assertEqual(
+            (self.zone.south, self.zone.west, self.zone.north, self.zone.east), (50.38, 30.40, 50.55, 30.65)
+        )
+        # Клітинок точності 7 більше за ZONE_GRID_MAX_CELLS, тому сітка на рівень грубіша
+        self.assertEqual(self.zone.grid_precision, 6)
+        self.assertTrue(ZoneCell.objects.filter(zone=self.zone, boundary=False).exists())
+
+    def test_grid_matches_exact_test(self):
+        """Тест збігу пошуку за клітинками з точною перевіркою багатокутника"""
+        random = np.random.default_rng(19)
+        for latitude, longitude in zip(random.uniform(50.35, 50.6, 300), random.uniform(30.35, 30.7, 300)):
+            expected = point_in_polygon(latitude, longitude, self.zone.polygon)
+            self.assertEqual(bool(find_zones(latitude, longitude)), expected, (latitude, longitude))
+
+    def test_hole_is_excluded(self):
+        """Тест точки у вирізі зони"""
+        self.assertEqual(find_zones(50.455, 30.525), [])
+        self.assertEqual(find_zones(50.42, 30.50), [{"id": self.zone.id, "name": "Київ", "kind": "service"}])
+
+    @override_settings(ZONE_GRID_MAX_CELLS=50)
+    def test_large_zone_uses_coarser_grid(self):
+        """Тест зменшення точності сітки для зони, яка покривається забагато клітинками"""
+        self.zone.save()
+        self.assertLess(self.zone.grid_precision, 6)
+        self.assertLessEqual(ZoneCell.objects.filter(zone=self.zone).count(), 50)
+        self.assertEqual(len(find_zones(50.42, 30.50)), 1)
+        self.assertEqual(find_zones(50.455, 30.525), [])
+
+    def test_inactive_zone_is_ignored(self):
+        """Тест пропуску зони, яка не діє"""
+        self.zone.is_active = False
+        self.zone.save()
+        self.assertEqual(find_zones(50.42, 30.50), [])
+        self.assertIsNone(return_location_error(50.0, 30.0))
+
+    def test_invalid_polygon(self):
+        """Тест перевірки координат багатокутника"""
+        with self.assertRaises(ValueError):
+            normalize_polygon([[[30.4, 50.4], [30.5, 50.4]]])
+        with self.assertRaises(ValueError):
+            normalize_polygon([[[30.4, 95.0], [30.5, 50.4], [30.5, 50.5]]])
+        zone = Zone(name="Помилка", polygon="не багатокутник")
+        with self.assertRaises(ValidationError):
+            zone.clean()
+
+class ZoneReturnTest(TestCase):
+    """Тести перевірки місця повернення за зонами"""
+
+    def setUp(self):
+        """Налаштування тестового середовища"""
+        Zone.objects.create(name="Київ", kind="service", polygon=CITY_POLYGON)
+        Zone.objects.create(
+            name="Бориспіль", kind="airport",
+            polygon=[[[30.87, 50.33], [30.92, 50.33], [30.92, 50.36], [30.87, 50.36]]]
+        )
+        Zone.objects.create(
+            name="Майдан", kind="no_parking",
+            polygon=[[[30.51, 50.48], [30.53, 50.48], [30.53, 50.49], [30.51, 50.49]]]
+        )
+
+    def test_return_location_error(self):
+        """Тест дозволених та заборонених місць повернення"""
+        self.assertIsNone(return_location_error(50.42, 30.50))
+        self.assertIsNone(return_location_error(50.345, 30.895))
+        self.assertIn("зоні обслуговування", return_location_error(50.0, 30.0))
+        self.assertIn("Майдан", return_location_error(50.485, 30.52))
+        self.assertIsNone(return_location_error(None, None))
+
+    @override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+    def test_membership_is_cached_per_position(self):
+        """Тест кешування належності точки до зон та скидання кешу при зміні зон"""
+        self.assertEqual(len(zones_at(50.42, 30.50)), 1)
+        with self.assertNumQueries(0):
+            self.assertEqual(len(zones_at(50.42, 30.50)), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Zone.objects.filter(kind="service").get().delete()
+        self.assertEqual(zones_at(50.42, 30.50), [])
+
+    def test_zones_api(self):
+        """Тест API зон у форматі GeoJSON"""
+        response = self.client.get(reverse("cars-zones-api"))
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["type"], "FeatureCollection")
+        self.assertEqual(
+            [feature["properties"]["kind"] for feature in data["features"]], ["service", "airport", "no_parking"]
+        )
+        self.assertEqual(data["features"][0]["geometry"]["type"], "Polygon")
@@ -0,0 +1,225 @@
+import heapq
+import threading
+import time
+
+from django.conf import settings
+
+from .models import CarCatalogEntry
+from .nearest import changed_car_ids
+
+
+# Кириличні літери, які на номерних знаках пишуться так само, як латинські (АА1234ВВ = AA1234BB)
+LOOKALIKE_LETTERS = str.maketrans("авеікмнорстух", "abeikmhopctyx")
+
+# Поля каталогу автомобілів, з яких складається текст для пошуку, та поля для показу результату
+CAR_TEXT_FIELDS = ("car_id", "brand_name", "model_name", "year", "color", "license_plate", "status")
+
+
+def normalize_words(value):
+    """
+    Розбиває текст на слова для індексу та запиту.
+
+    Літери переводяться в нижній регістр, кириличні літери номерних знаків - у латинські,
+    а всі символи, крім літер та цифр, вважаються роздільниками.
+
+    Args:
+        value: Текст.
+
+    Returns:
+        list: Слова тексту.
+    """
+    text = str(value).casefold().translate(LOOKALIKE_LETTERS)
+    return "".join(char if char.isalnum() else " " for char in text).split()
+
+def word_grams(word):
+    """
+    Повертає n-грами слова для індексу.
+
+    Префікси слова (з позначкою "^") одразу дають автомобілі, слово яких починається з частини запиту,
+    а триграми знаходять слово за будь-якою його частиною від трьох символів.
+
+    Args:
+        word: Нормалізоване слово.
+
+    Returns:
+        set: N-грами слова.
+    """
+    grams = {f"^{word[:length]}" for length in range(1, len(word) + 1)}
+    grams.update(word[index:index + 3] for index in range(len(word) - 2))
+    return grams
+
+class CarTextIndex:
+    """
+    Інвертований індекс триграм тексту автомобілів у пам'яті процесу.
+
+    Текст автомобіля складається з назви марки, моделі, року, кольору та номерного знака (також без
+    роздільників). Індекс зберігає для кожного префікса та кожної триграми слів множину автомобілів, тому
+    автомобіль знаходиться за будь-якою частиною цих слів без LIKE-запитів до бази даних.
+
+    Індекс будується одним запитом при першому пошуку в процесі. Збереження та видалення автомобілів,
+    моделей і марок одразу оновлюють індекс свого процесу (cars.signals) та позначають автомобілі зміненими
+    (mark_cars_changed), а індекси інших процесів застосовують ці зміни не частіше ніж раз на
+    CAR_TEXT_SEARCH_REFRESH_INTERVAL секунд і перебудовуються повністю раз на NEAREST_INDEX_REBUILD_INTERVAL секунд.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Очищує індекс, щоб наступний пошук перебудував його повністю"""
+        self.documents = {}  # {car_id: (рядок слів, дані для показу)}
+        self.postings = {}  # {n-грама: множина id автомобілів}
+        self.built_at = None
+        self.synced_at = None
+
+    def remove(self, car_id):
+        """Видаляє автомобіль з індексу"""
+        document = self.documents.pop(car_id, None)
+        if document is None:
+            return
+        for gram in {gram for word in document[0].split() for gram in word_grams(word)}:
+            self.postings[gram].discard(car_id)
+            if not self.postings[gram]:
+                del self.postings[gram]
+
+    def put(self, car_id, brand, model, year, color, license_plate, status):
+        """Додає або оновлює автомобіль в індексі"""
+        self.remove(car_id)
+        words = normalize_words(f"{brand} {model} {year} {color} {license_plate}")
+        # Номерний знак також індексується одним словом, щоб його частина знаходилась незалежно від пробілів
+        plate = "".join(normalize_words(license_plate))
+        if plate not in words:
+            words.append(plate)
+        words = tuple(dict.fromkeys(words))
+
+        # Слова з пробілом на початку кожного: збіг з початком слова - пошук " частина" в рядку
+        self.documents[car_id] = ("".join(f" {word}" for word in words), {
+            "id": car_id,
+            "label": f"{brand} {model} ({year})",
+            "license_plate": license_plate,
+            "color": color,
+            "status": status,
+        })
+        for gram in {gram for word in words for gram in word_grams(word)}:
+            self.postings.setdefault(gram, set()).add(car_id)
+
+    def load(self, car_ids=None):
+        """
+        Завантажує автомобілі з каталогу автомобілів одним запитом без з'єднань.
+
+        Args:
+            car_ids: Id автомобілів для оновлення (None - всі автомобілі з повною перебудовою індексу).
+        """
+        cars = CarCatalogEntry.objects.values_list(*CAR_TEXT_FIELDS)
+        if car_ids is not None:
+            cars = cars.filter(car_id__in=car_ids)
+            # Видалені автомобілі не повертаються запитом і видаляються з індексу
+            for car_id in car_ids:
+                self.remove(car_id)
+        else:
+            self.reset()
+        for car in cars:
+            self.put(*car)
+
+    def refresh(self):
+        """Будує індекс при першому пошуку та застосовує зміни автомобілів з інших процесів"""
+        now = time.time()
+        if self.synced_at is not None and now - self.synced_at < settings.CAR_TEXT_SEARCH_REFRESH_INTERVAL:
+            return
+
+        car_ids = None
+        if self.built_at is not None and now - self.built_at < settings.NEAREST_INDEX_REBUILD_INTERVAL:
+            car_ids = changed_car_ids(self.synced_at)
+        if car_ids is None:
+            self.load()
+            self.built_at = now
+        elif car_ids:
+            self.load(car_ids)
+        self.synced_at = now
+
+    def update(self, car_ids):
+        """
+        Оновлює змінені автомобілі в індексі процесу, якщо він уже побудований.
+
+        Args:
+            car_ids: Id змінених або видалених автомобілів.
+        """
+        with self.lock:
+            if self.built_at is not None:
+                self.load(list(car_ids))
+
+    def matches(self, token, within=None):
+        """
+        Знаходить автомобілі, слова яких містять частину запиту.
+
+        Args:
+            token: Нормалізована частина запиту.
+            within: Множина автомобілів, серед яких шукати (None - всі автомобілі).
+
+        Returns:
+            tuple: Множина автомобілів, слово яких починається з token, та множина всіх знайдених автомобілів.
+        """
+        prefixed = self.postings.get(f"^{token}", set())
+        if within is not None:
+            prefixed = prefixed & within
+        if len(token) < 3:
+            # Частина запиту з одного або двох символів шукається лише за початком слів
+            return prefixed, prefixed
+
+        candidates = within
+        grams = {token[index:index + 3] for index in range(len(token) - 2)}
+        # Спочатку найрідші триграми, щоб перетин швидко ставав малим
+        for gram in sorted(grams, key=lambda gram: len(self.postings.get(gram, ()))):
+            found = self.postings.get(gram, set())
+            candidates = found if candidates is None else candidates & found
+            if not candidates:
+                return prefixed, prefixed
+        # Триграми можуть належати різним словам, тому збіг усередині слова перевіряється за рядком слів
+        inside = {car_id for car_id in candidates - prefixed if token in self.documents[car_id][0]}
+        return prefixed, prefixed | inside if inside else prefixed
+
+    def search(self, query, limit=None):
+        """
+        Знаходить автомобілі, слова яких містять усі слова запиту.
+
+        Автомобілі знаходяться перетином множин з індексу без перебору всіх автомобілів. Вище в результатах
+        автомобілі, слова яких починаються з більшої кількості слів запиту, далі - в порядку id.
+
+        Args:
+            query: Текст запиту (частина марки, моделі, кольору або номерного знака).
+            limit: Найбільша кількість результатів (None - всі знайдені автомобілі).
+
+        Returns:
+            list: Дані знайдених автомобілів (id, label, license_plate, color, status).
+        """
+        tokens = list(dict.fromkeys(normalize_words(query)))
+        if not tokens:
+            return []
+
+        with self.lock:
+            self.refresh()
+            found = None
+            prefixed = []
+            # Кожна наступна частина запиту шукається лише серед автомобілів, знайдених за попередніми
+            for token in sorted(tokens, key=lambda token: len(self.postings.get(f"^{token}", ()))):
+                token_prefixed, found = self.matches(token, within=found)
+                if not found:
+                    return []
+                prefixed.append(token_prefixed)
+
+            # Автомобілі, у яких кожне слово запиту - початок слова, без обчислення оцінки кожного автомобіля
+            best = found.intersection(*prefixed)
+            if limit and len(best) >= limit:
+                ranked = heapq.nsmallest(limit, best)
+            else:
+                rest = [
+                    (-sum(car_id in token_prefixed for token_prefixed in prefixed), car_id)
+                    for car_id in found - best
+                ]
+                ranked = sorted(best) + [car_id for _, car_id in sorted(rest)]
+                ranked = ranked[:limit] if limit else ranked
+            return [dict(self.documents[car_id][1]) for car_id in ranked]
+
+# Індекс поточного процесу
+car_text_index = CarTextIndex()
@@ -0,0 +1,71 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from utils.geo import point_tile, tile_bounds
+
+from .geojson import map_cars, map_feature_collection
+
+
+# Префікс ключів кешу тайлів карти
+TILE_CACHE_PREFIX = "map-tile"
+
+
+def tile_cache_key(zoom, x, y, status=None):
+    """
+    Повертає ключ кешу тайла карти.
+
+    Args:
+        zoom: Масштаб тайла.
+        x: Номер стовпця тайла.
+        y: Номер рядка тайла.
+        status: Фільтр статусу автомобілів (або None для всіх статусів).
+
+    Returns:
+        str: Ключ кешу.
+    """
+    return f"{TILE_CACHE_PREFIX}:{zoom}:{x}:{y}:{status or 'all'}"
+
+def get_map_tile(zoom, x, y, status=None):
+    """
+    Повертає автомобілі або кластери тайла карти, обчислюючи тайл лише при відсутності в кеші.
+
+    Args:
+        zoom: Масштаб тайла.
+        x: Номер стовпця тайла.
+        y: Номер рядка тайла.
+        status: Фільтр статусу автомобілів (або None для всіх статусів).
+
+    Returns:
+        dict: GeoJSON FeatureCollection тайла.
+    """
+    key = tile_cache_key(zoom, x, y, status)
+    tile = cache.get(key)
+    if tile is None:
+        cars = map_cars(status).in_bbox(*tile_bounds(zoom, x, y))
+        tile = map_feature_collection(cars, zoom)
+        cache.set(key, tile, settings.MAP_TILE_CACHE_TIMEOUT)
+    return tile
+
+def invalidate_car_tiles(locations, statuses):
+    """
+    Видаляє з кешу тайли всіх масштабів, які містять задані місцезнаходження автомобілів.
+
+    Args:
+        locations: Ітерабельний об'єкт пар (широта, довгота); пари з None пропускаються.
+        statuses: Статуси автомобілів до та після зміни (тайли без фільтра статусу видаляються завжди).
+
+    Returns:
+        int: Кількість видалених ключів кешу.
+    """
+    statuses = {status for status in statuses if status} | {None}
+    keys = set()
+    for latitude, longitude in locations:
+        if latitude is None or longitude is None:
+            continue
+        for zoom in range(settings.MAP_TILE_MAX_ZOOM + 1):
+            x, y = point_tile(float(latitude), float(longitude), zoom)
+            keys.update(tile_cache_key(zoom, x, y, status) for status in statuses)
+
+    if keys:
+        cache.delete_many(list(keys))
+    return len(keys)
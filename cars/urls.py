@@ -6,6 +6,13 @@ from . import views
 urlpatterns = [
     # API для сумісності з JS (для роботи карт тощо)
     path("api/cars/<int:pk>/", views.get_car_api, name="car-api-detail"),
+    path("api/map/", views.cars_map_api, name="cars-map-api"),
+    path("api/map/tiles/<int:zoom>/<int:x>/<int:y>/", views.cars_map_tile_api, name="cars-map-tile"),
+    path("api/changes/", views.car_changes_stream, name="car-changes-stream"),
+    path("api/nearest/", views.cars_nearest_api, name="cars-nearest-api"),
+    path("api/search/", views.cars_search_api, name="cars-search-api"),
+    path("api/zones/", views.cars_zones_api, name="cars-zones-api"),
+    path("api/telemetry/", views.telemetry_ingest_api, name="telemetry-ingest"),
 
     # Представлення для брендів автомобілів
     path("brands/", views.CarBrandListView.as_view(), name="car-brand-list"),
@@ -1,12 +1,24 @@
+import hmac
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
-from django.db.models import Avg
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse, reverse_lazy
+from django.utils import timezone
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
 from django.views.generic import CreateView, DeleteView, DetailView, ListView, UpdateView
 
+from utils.geo import parse_bbox, tile_bounds
+from utils.pagination import CursorPaginationMixin
+
+from .cards import render_car_cards
+from .changes import change_stream, latest_change_id
 from .forms import (
     CarBrandForm,
     CarFilterForm,
@@ -17,7 +29,16 @@ from .forms import (
     CarReviewForm,
     CarStatusForm,
 )
-from .models import Car, CarBrand, CarModel, CarPhoto, CarReview
+from .geojson import car_features, map_cars, map_feature_collection
+from .location_history import store_history
+from .models import Car, CarBrand, CarCatalogEntry, CarModel, CarPhoto, CarReview
+from .nearest import nearest_index
+from .position_buffer import buffer_history, buffer_positions, live_positions, with_live_positions
+from .search import search_cars
+from .telemetry import MAX_REPORTED_ERRORS, apply_positions, latest_positions, parse_points
+from .text_search import car_text_index
+from .tiles import get_map_tile
+from .zones import zone_feature_collection
 
 
 # Функція перевірки адміністратора
@@ -349,91 +370,102 @@ class CarModelDeleteView(UserPassesTestMixin, DeleteView):
         messages.success(request, f"Модель автомобіля '{model.name}' успішно видалена.")
         return super().delete(request, *args, **kwargs)
 
-# Представлення для автомобілів
-class CarListView(ListView):
-    """Представлення для списку автомобілів"""
-    model = Car
-    template_name = "car_list.html"
-    context_object_name = "cars"
-    paginate_by = 10
+# Домішка для списків автомобілів з фасетним пошуком
+class FacetedCarSearchMixin:
+    """
+    Домішка для списків автомобілів з фільтрами CarFilterForm та фасетним пошуком.
+
+    Кількість знайдених автомобілів та кількості за значеннями фасетів береться з одного закешованого
+    агрегатного запиту (cars.search), а сторінки вибираються курсором за id (utils.pagination),
+    тому список не рахує автомобілі окремим запитом. Картки автомобілів читаються з плаского
+    каталогу CarCatalogEntry без з'єднань з моделями та марками, а їх HTML береться з кешу
+    одним запитом для всієї сторінки (cars.cards).
+    """
+    cursor_ordering = ("car_id",)
+    card_template_name = None  # Шаблон картки автомобіля
+    fixed_filters = {}  # Фільтри, які застосовуються завжди
 
     def get_queryset(self):
         """
-        Отримує список автомобілів з можливими фільтрами.
+        Отримує автомобілі за фільтрами форми.
 
         Args:
             self: Екземпляр класу.
 
         Returns:
-            QuerySet: Відфільтрований QuerySet автомобілів.
+            QuerySet: Відфільтрований QuerySet записів каталогу автомобілів.
         """
-        queryset = super().get_queryset()
-
-        # Застосування фільтрів з форми
-        form = CarFilterForm(self.request.GET)
-
-        if form.is_valid():
-            # Фільтр за брендом
-            if form.cleaned_data.get("brand"):
-                queryset = queryset.filter(model__brand=form.cleaned_data["brand"])
-
-            # Фільтр за моделлю
-            if form.cleaned_data.get("model"):
-                queryset = queryset.filter(model=form.cleaned_data["model"])
-
-            # Фільтр за типом палива
-            if form.cleaned_data.get("fuel_type"):
-                queryset = queryset.filter(fuel_type=form.cleaned_data["fuel_type"])
-
-            # Фільтр за типом трансмісії
-            if form.cleaned_data.get("transmission"):
-                queryset = queryset.filter(transmission=form.cleaned_data["transmission"])
+        self.filter_form = CarFilterForm(self.request.GET)
+        self.search = search_cars({**self.filter_form.filters(), **self.fixed_filters})
+        return CarCatalogEntry.objects.filter(**self.search["lookups"])
 
-            # Фільтр за статусом
-            if form.cleaned_data.get("status"):
-                queryset = queryset.filter(status=form.cleaned_data["status"])
+    def get_card_context(self):
+        """
+        Повертає контекст шаблону картки, від якого залежить її розмітка.
 
-            # Фільтр за роком випуску
-            if form.cleaned_data.get("min_year"):
-                queryset = queryset.filter(year__gte=form.cleaned_data["min_year"])
+        Returns:
+            dict: Контекст, спільний для всіх карток сторінки.
+        """
+        return {}
 
-            if form.cleaned_data.get("max_year"):
-                queryset = queryset.filter(year__lte=form.cleaned_data["max_year"])
+    def get_context_data(self, **kwargs):
+        """
+        Додає до контексту форму фільтрації з кількостями автомобілів для варіантів вибору та картки автомобілів.
 
-            # Фільтр за кількістю місць
-            if form.cleaned_data.get("min_seats"):
-                queryset = queryset.filter(seats__gte=form.cleaned_data["min_seats"])
+        Args:
+            self: Екземпляр класу.
+            **kwargs: Додаткові іменовані аргументи.
 
-            # Фільтри за додатковими опціями
-            if form.cleaned_data.get("has_air_conditioning"):
-                queryset = queryset.filter(has_air_conditioning=True)
+        Returns:
+            dict: Контекст з доданою формою фільтрації, фасетами, кількістю знайдених автомобілів
+            та HTML-картками автомобілів сторінки.
+        """
+        context = super().get_context_data(**kwargs)
+        self.filter_form.set_facet_counts(self.search["facets"])
+        context["filter_form"] = self.filter_form
+        context["facets"] = self.search["facets"]
+        context["found_cars"] = self.search["total"]
+        context["car_cards"] = render_car_cards(
+            context["object_list"], self.card_template_name, self.get_card_context()
+        )
+        return context
 
-            if form.cleaned_data.get("has_gps"):
-                queryset = queryset.filter(has_gps=True)
+# Представлення для автомобілів
+class CarListView(FacetedCarSearchMixin, CursorPaginationMixin, ListView):
+    """Представлення для списку автомобілів"""
+    model = CarCatalogEntry
+    template_name = "car_list.html"
+    card_template_name = "car_card.html"
+    context_object_name = "cars"
+    paginate_by = 10
 
-            if form.cleaned_data.get("has_child_seat"):
-                queryset = queryset.filter(has_child_seat=True)
+    def get_card_context(self):
+        """
+        Повертає контекст картки з ознакою адміністратора для кнопок керування автомобілем.
 
-        return queryset
+        Returns:
+            dict: Контекст, спільний для всіх карток сторінки.
+        """
+        return {"is_staff": self.request.user.is_staff}
 
     def get_context_data(self, **kwargs):
         """
-        Додає до контексту форму фільтрації та статистику автомобілів.
+        Додає до контексту статистику всіх автомобілів.
 
         Args:
             self: Екземпляр класу.
             **kwargs: Додаткові іменовані аргументи.
 
         Returns:
-            dict: Контекст з доданою формою фільтрації та статистикою.
+            dict: Контекст з доданою статистикою.
         """
         context = super().get_context_data(**kwargs)
-        context["filter_form"] = CarFilterForm(self.request.GET)
 
-        # Статистика автомобілів
-        context["total_cars"] = Car.objects.count()
-        context["available_cars"] = Car.objects.filter(status="available").count()
-        context["busy_cars"] = Car.objects.filter(status="busy").count()
+        # Статистика автомобілів з фасету статусів без фільтрів (той самий закешований запит)
+        statuses = search_cars({})["facets"]["status"]
+        context["total_cars"] = sum(statuses.values())
+        context["available_cars"] = statuses.get("available", 0)
+        context["busy_cars"] = statuses.get("busy", 0)
 
         return context
 
@@ -607,6 +639,7 @@ def update_car_location(request, pk):
         if form.is_valid():
             car.current_latitude = form.cleaned_data["latitude"]
             car.current_longitude = form.cleaned_data["longitude"]
+            car.location_updated_at = timezone.now()
             car.save()
 
             messages.success(request, f"Местоположение автомобіля '{car.model}' успішно оновлено.")
@@ -813,12 +846,9 @@ def add_car_review(request, pk):
             review = form.save(commit=False)
             review.user = request.user
             review.car = car
+            # Середній рейтинг автомобіля перераховується обробником сигналу (cars.signals)
             review.save()
 
-            # Перераховуємо середній рейтинг автомобіля
-            car.rating = CarReview.objects.filter(car=car).aggregate(Avg("rating"))["rating__avg"] or 0
-            car.save()
-
             messages.success(request, "Ваш відгук успішно додано.")
             return redirect("car-detail", pk=car.pk)
     else:
@@ -851,13 +881,9 @@ def edit_car_review(request, pk):
     if request.method == "POST":
         form = CarReviewForm(request.POST, instance=review, user=request.user)
         if form.is_valid():
+            # Середній рейтинг автомобіля перераховується обробником сигналу (cars.signals)
             form.save()
 
-            # Перераховуємо середній рейтинг автомобіля
-            car = review.car
-            car.rating = CarReview.objects.filter(car=car).aggregate(Avg("rating"))["rating__avg"] or 0
-            car.save()
-
             messages.success(request, "Ваш відгук успішно оновлено.")
             return redirect("car-detail", pk=review.car.pk)
     else:
@@ -893,10 +919,6 @@ def delete_car_review(request, pk):
     if request.method == "POST":
         review.delete()
 
-        # Перераховуємо середній рейтинг автомобіля
-        car.rating = CarReview.objects.filter(car=car).aggregate(Avg("rating"))["rating__avg"] or 0
-        car.save()
-
         messages.success(request, "Відгук успішно видалено.")
         return redirect("car-detail", pk=car.pk)
 
@@ -919,6 +941,11 @@ def get_car_api(request, pk):
     """
     car = get_object_or_404(Car, pk=pk)
 
+    # Підставити буферизоване місцезнаходження, якщо воно новіше за записане в базу даних
+    position = live_positions([car.id]).get(car.id)
+    if position and (car.location_updated_at is None or position[2] > car.location_updated_at):
+        car.current_latitude, car.current_longitude, car.location_updated_at = position
+
     # Створюємо словник з даними автомобіля
     car_data = {
         "id": car.id,
@@ -950,91 +977,251 @@ def get_car_api(request, pk):
     return JsonResponse(car_data)
 
 # Представлення для відображення доступних автомобілів
-class AvailableCarsView(ListView):
+class AvailableCarsView(FacetedCarSearchMixin, CursorPaginationMixin, ListView):
     """Представлення для списку доступних автомобілів"""
-    model = Car
+    model = CarCatalogEntry
     template_name = "available_cars.html"
+    card_template_name = "available_car_card.html"
     context_object_name = "cars"
     paginate_by = 12
+    fixed_filters = {"status": "available"}
 
-    def get_queryset(self):
-        """
-        Отримує список доступних автомобілів з можливими фільтрами.
+# Представлення для відображення карти з автомобілями
+def cars_map_view(request):
+    """
+    Представлення для відображення автомобілів на карті.
 
-        Args:
-            self: Екземпляр класу.
+    Автомобілі завантажуються сторінкою через API тайлів карти лише для видимих тайлів.
 
-        Returns:
-            QuerySet: Відфільтрований QuerySet доступних автомобілів.
-        """
-        queryset = Car.objects.all()
-        self.filter_form = CarFilterForm(self.request.GET)
-        if self.filter_form.is_valid():
-            if self.filter_form.cleaned_data.get("brand"):
-                queryset = queryset.filter(model__brand=self.filter_form.cleaned_data["brand"])
-            if self.filter_form.cleaned_data.get("model"):
-                queryset = queryset.filter(model=self.filter_form.cleaned_data["model"])
-            if self.filter_form.cleaned_data.get("fuel_type"):
-                queryset = queryset.filter(fuel_type=self.filter_form.cleaned_data["fuel_type"])
-            if self.filter_form.cleaned_data.get("transmission"):
-                queryset = queryset.filter(transmission=self.filter_form.cleaned_data["transmission"])
-            if self.filter_form.cleaned_data.get("min_year"):
-                queryset = queryset.filter(year__gte=self.filter_form.cleaned_data["min_year"])
-            if self.filter_form.cleaned_data.get("max_year"):
-                queryset = queryset.filter(year__lte=self.filter_form.cleaned_data["max_year"])
-            if self.filter_form.cleaned_data.get("min_seats"):
-                queryset = queryset.filter(seats__gte=self.filter_form.cleaned_data["min_seats"])
-            if self.filter_form.cleaned_data.get("has_air_conditioning"):
-                queryset = queryset.filter(has_air_conditioning=True)
-            if self.filter_form.cleaned_data.get("has_gps"):
-                queryset = queryset.filter(has_gps=True)
-            if self.filter_form.cleaned_data.get("has_child_seat"):
-                queryset = queryset.filter(has_child_seat=True)
-
-        return queryset.filter(status="available")
+    Args:
+        request: Об'єкт запиту Django.
 
-    def get_context_data(self, **kwargs):
-        """
-        Додає до контексту форму фільтрації.
+    Returns:
+        HttpResponse: Відображення сторінки з картою автомобілів.
+    """
+    return render(request, "cars_map.html", {
+        "brands": CarBrand.objects.all(),
+        "selected_status": request.GET.get("status"),
+        "selected_brand": request.GET.get("brand"),
+        "tile_max_zoom": settings.MAP_TILE_MAX_ZOOM,
+        "changes_version": latest_change_id()
+    })
 
-        Args:
-            self: Екземпляр класу.
-            **kwargs: Додаткові іменовані аргументи.
+def cars_map_api(request):
+    """
+    API для отримання автомобілів видимої області карти у форматі GeoJSON.
 
-        Returns:
-            dict: Контекст з доданою формою фільтрації.
-        """
-        context = super().get_context_data(**kwargs)
-        context["filter_form"] = self.filter_form
-        return context
+    Параметри запиту: bbox (захід,південь,схід,північ), zoom (масштаб карти), status та brand.
+    При великій кількості автомобілів в області повертаються кластери з кількістю автомобілів.
 
-# Представлення для відображення карти з автомобілями
-def cars_map_view(request):
+    Args:
+        request: Об'єкт запиту Django.
+
+    Returns:
+        JsonResponse: GeoJSON FeatureCollection або повідомлення про помилку зі статусом 400.
     """
-    Представлення для відображення автомобілів на карті.
+    try:
+        south, west, north, east = parse_bbox(request.GET.get("bbox"))
+    except ValueError as error:
+        return JsonResponse({"error": str(error)}, status=400)
+
+    try:
+        zoom = int(request.GET.get("zoom", settings.MAP_CLUSTER_MAX_ZOOM))
+    except ValueError:
+        return JsonResponse({"error": "Масштаб має бути цілим числом"}, status=400)
+
+    cars = map_cars(request.GET.get("status"), request.GET.get("brand")).in_bbox(south, west, north, east)
+    return JsonResponse(with_live_positions(map_feature_collection(cars, max(zoom, 0))))
+
+def cars_map_tile_api(request, zoom, x, y):
+    """
+    API для отримання автомобілів або кластерів тайла карти у форматі GeoJSON.
+
+    Тайли з фільтром статусу або без нього беруться з кешу, тайли з фільтром марки обчислюються щоразу.
 
     Args:
         request: Об'єкт запиту Django.
+        zoom: Масштаб тайла.
+        x: Номер стовпця тайла.
+        y: Номер рядка тайла.
 
     Returns:
-        HttpResponse: Відображення сторінки з картою автомобілів.
+        JsonResponse: GeoJSON FeatureCollection тайла або повідомлення про помилку.
     """
-    # Отримуємо всі автомобілі
-    cars = Car.objects.all()
+    if zoom > settings.MAP_TILE_MAX_ZOOM or x >= 2 ** zoom or y >= 2 ** zoom:
+        return JsonResponse({"error": "Тайл не існує"}, status=404)
 
-    # Фільтрація по статусу, якщо вказано
-    status = request.GET.get("status")
-    if status:
-        cars = cars.filter(status=status)
+    status = request.GET.get("status") or None
+    if status and status not in dict(Car.STATUS_CHOICES):
+        return JsonResponse({"error": "Некоректний статус"}, status=400)
 
-    # Фільтрація по марці, якщо вказано
     brand_id = request.GET.get("brand")
     if brand_id:
-        cars = cars.filter(model__brand_id=brand_id)
+        cars = map_cars(status, brand_id).in_bbox(*tile_bounds(zoom, x, y))
+        return JsonResponse(with_live_positions(map_feature_collection(cars, zoom)))
 
-    return render(request, "cars_map.html", {
-        "cars": cars,
-        "brands": CarBrand.objects.all(),
-        "selected_status": status,
-        "selected_brand": brand_id
+    return JsonResponse(with_live_positions(get_map_tile(zoom, x, y, status)))
+
+def cars_nearest_api(request):
+    """
+    API для пошуку найближчих доступних автомобілів у форматі GeoJSON.
+
+    Параметри запиту: lat, lng (точка пошуку) та limit (кількість автомобілів, до NEAREST_MAX_LIMIT).
+    Найближчі автомобілі знаходяться просторовим індексом у пам'яті процесу, а з бази даних читаються
+    лише дані знайдених автомобілів.
+
+    Args:
+        request: Об'єкт запиту Django.
+
+    Returns:
+        JsonResponse: GeoJSON FeatureCollection автомобілів у порядку зростання відстані
+        (властивість distance_km) або повідомлення про помилку зі статусом 400.
+    """
+    try:
+        latitude = float(request.GET["lat"])
+        longitude = float(request.GET["lng"])
+    except (KeyError, ValueError):
+        return JsonResponse({"error": "Параметри lat та lng мають бути числами"}, status=400)
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        return JsonResponse({"error": "Координати поза допустимими межами"}, status=400)
+
+    try:
+        limit = int(request.GET.get("limit", settings.NEAREST_DEFAULT_LIMIT))
+    except ValueError:
+        return JsonResponse({"error": "Кількість автомобілів має бути цілим числом"}, status=400)
+    limit = min(max(limit, 1), settings.NEAREST_MAX_LIMIT)
+
+    distances = dict(nearest_index.nearest(latitude, longitude, limit))
+
+    # Автомобіль міг стати недоступним після останнього оновлення індексу
+    features = car_features(CarCatalogEntry.objects.filter(car_id__in=list(distances), status="available"))
+    for feature in features:
+        feature["properties"]["distance_km"] = round(distances[feature["properties"]["id"]], 3)
+    features.sort(key=lambda feature: feature["properties"]["distance_km"])
+
+    return JsonResponse(with_live_positions({"type": "FeatureCollection", "features": features}))
+
+def cars_search_api(request):
+    """
+    API підказок пошуку автомобілів за текстом.
+
+    Параметри запиту: q (частина марки, моделі, кольору або номерного знака) та limit
+    (кількість автомобілів, до CAR_TEXT_SEARCH_MAX_LIMIT). Автомобілі знаходяться інвертованим
+    індексом у пам'яті процесу без запитів до бази даних (крім побудови та оновлення індексу).
+
+    Args:
+        request: Об'єкт запиту Django.
+
+    Returns:
+        JsonResponse: Знайдені автомобілі з посиланнями на сторінки автомобілів
+        або повідомлення про помилку зі статусом 400.
+    """
+    try:
+        limit = int(request.GET.get("limit", settings.CAR_TEXT_SEARCH_DEFAULT_LIMIT))
+    except ValueError:
+        return JsonResponse({"error": "Кількість автомобілів має бути цілим числом"}, status=400)
+    limit = min(max(limit, 1), settings.CAR_TEXT_SEARCH_MAX_LIMIT)
+
+    results = car_text_index.search(request.GET.get("q", ""), limit)
+    for result in results:
+        result["url"] = reverse("car-detail", kwargs={"pk": result["id"]})
+    return JsonResponse({"results": results})
+
+def cars_zones_api(request):
+    """
+    API для отримання діючих зон обслуговування у форматі GeoJSON.
+
+    Args:
+        request: Об'єкт запиту Django.
+
+    Returns:
+        JsonResponse: GeoJSON FeatureCollection з багатокутниками зон та їх типами.
+    """
+    return JsonResponse(zone_feature_collection())
+
+@require_GET
+async def car_changes_stream(request):
+    """
+    Потік змін статусу та місцезнаходження автомобілів у форматі server-sent events.
+
+    Клієнт передає версію, яку вже має (параметр since або заголовок Last-Event-ID при перепідключенні),
+    і отримує лише автомобілі, змінені після неї. Параметр cars (id через кому) обмежує потік заданими
+    автомобілями. Представлення асинхронне, тому при запуску через ASGI з'єднання не займає потік сервера.
+
+    Args:
+        request: Об'єкт запиту Django.
+
+    Returns:
+        StreamingHttpResponse: Потік подій або JsonResponse з помилкою зі статусом 400.
+    """
+    try:
+        cursor = request.headers.get("Last-Event-ID") or request.GET.get("since")
+        cursor = int(cursor) if cursor else await sync_to_async(latest_change_id)()
+        car_ids = request.GET.get("cars")
+        car_ids = {int(car_id) for car_id in car_ids.split(",")} if car_ids else None
+    except ValueError:
+        return JsonResponse({"error": "Версія та id автомобілів мають бути цілими числами"}, status=400)
+    if cursor < 0:
+        return JsonResponse({"error": "Версія та id автомобілів мають бути цілими числами"}, status=400)
+
+    response = StreamingHttpResponse(change_stream(cursor, car_ids), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    # Заборонити nginx буферизувати потік
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+@csrf_exempt
+@require_POST
+def telemetry_ingest_api(request):
+    """
+    API для пакетного прийому телеметрії автомобілів.
+
+    Тіло запиту - JSON {"points": [{"car_id", "lat", "lng", "timestamp"}, ...]}, де timestamp - секунди Unix
+    або рядок ISO 8601. Автомобіль передає токен у заголовку X-Telemetry-Token. Некоректні точки
+    пропускаються, з решти для кожного автомобіля застосовується лише найновіша точка. Місцезнаходження
+    записуються в буфер Redis, який періодично скидається в базу даних задачею flush_car_positions.
+    Усі коректні точки також додаються до історії місцезнаходження (задача pack_location_history).
+
+    Args:
+        request: Об'єкт запиту Django.
+
+    Returns:
+        JsonResponse: Статистика застосування пакета та помилки окремих точок.
+    """
+    token = settings.TELEMETRY_TOKEN
+    if not token or not hmac.compare_digest(request.headers.get("X-Telemetry-Token", ""), token):
+        return JsonResponse({"error": "Недійсний токен телеметрії"}, status=403)
+
+    try:
+        points = json.loads(request.body)["points"]
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({"error": "Тіло запиту має бути JSON з масивом points"}, status=400)
+    if not isinstance(points, list):
+        return JsonResponse({"error": "Тіло запиту має бути JSON з масивом points"}, status=400)
+    if len(points) > settings.TELEMETRY_MAX_POINTS:
+        return JsonResponse(
+            {"error": f"Пакет не може містити більше {settings.TELEMETRY_MAX_POINTS} точок"},
+            status=413
+        )
+
+    parsed, errors = parse_points(points)
+    positions = latest_positions(parsed)
+
+    # Записати місцезнаходження в буфер Redis, а якщо буфер недоступний - одразу в базу даних
+    buffered = buffer_positions(positions)
+    if buffered is None:
+        stats = apply_positions(positions)
+    else:
+        stats = {"buffered": buffered, "stale": len(positions) - buffered}
+
+    # Усі точки, а не лише найновіші, потрібні для відтворення маршруту
+    if buffer_history(parsed) is None:
+        store_history(parsed)
+
+    return JsonResponse({
+        "received": len(points),
+        "accepted": len(positions),
+        "rejected": len(errors),
+        **stats,
+        "errors": errors[:MAX_REPORTED_ERRORS],
     })
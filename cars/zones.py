@@ -0,0 +1,204 @@
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from utils.geo import encode_geohash, geohash_cell_size, point_in_polygon, polygon_cells
+
+from .models import Zone, ZoneCell
+
+
+# Ключ кешу з версією зон: змінюється при кожній зміні зон, тому закешовані дані старих версій не читаються
+ZONES_VERSION_KEY = "zones:version"
+
+# Типи зон, у яких дозволено завершити оренду
+RETURN_KINDS = ("service", "airport")
+
+
+def zones_version():
+    """
+    Повертає поточну версію зон для ключів кешу.
+
+    Returns:
+        int: Версія зон.
+    """
+    version = cache.get(ZONES_VERSION_KEY)
+    if version is None:
+        cache.add(ZONES_VERSION_KEY, time.time_ns(), None)
+        version = cache.get(ZONES_VERSION_KEY, time.time_ns())
+    return version
+
+def invalidate_zones():
+    """Змінює версію зон, після чого закешовані належності точок до зон та GeoJSON зон обчислюються заново"""
+    cache.set(ZONES_VERSION_KEY, time.time_ns(), None)
+
+def grid_precision(zone):
+    """
+    Підбирає точність геохешу клітинок зони.
+
+    Береться найбільша точність до ZONE_GRID_PRECISION, за якої межі зони покриваються не більше
+    ніж ZONE_GRID_MAX_CELLS клітинками.
+
+    Args:
+        zone: Зона з обчисленими межами.
+
+    Returns:
+        int: Кількість символів геохешу.
+    """
+    precision = settings.ZONE_GRID_PRECISION
+    while precision > 1:
+        height, width = geohash_cell_size(precision)
+        rows = math.floor((zone.north + 90.0) / height) - math.floor((zone.south + 90.0) / height) + 1
+        columns = math.floor((zone.east + 180.0) / width) - math.floor((zone.west + 180.0) / width) + 1
+        if rows * columns <= settings.ZONE_GRID_MAX_CELLS:
+            break
+        precision -= 1
+    return precision
+
+def rebuild_zone_cells(zone):
+    """
+    Перераховує клітинки геохешу, які покриває зона.
+
+    Args:
+        zone: Збережена зона.
+    """
+    precision = grid_precision(zone)
+    inside, boundary = polygon_cells(zone.polygon, precision)
+
+    ZoneCell.objects.filter(zone=zone).delete()
+    ZoneCell.objects.bulk_create(
+        [ZoneCell(zone=zone, cell=cell, boundary=False) for cell in sorted(inside)]
+        + [ZoneCell(zone=zone, cell=cell, boundary=True) for cell in sorted(boundary)],
+        batch_size=1000,
+    )
+    if zone.grid_precision != precision:
+        zone.grid_precision = precision
+        Zone.objects.filter(pk=zone.pk).update(grid_precision=precision)
+
+def find_zones(latitude, longitude):
+    """
+    Знаходить діючі зони, які містять точку.
+
+    Клітинки зон мають різну точність, тому шукаються всі префікси геохешу точки одним запитом.
+    Багатокутники читаються лише для зон, у яких точка потрапила в граничну клітинку.
+
+    Args:
+        latitude: Широта точки в градусах.
+        longitude: Довгота точки в градусах.
+
+    Returns:
+        list: Словники з id, назвою та типом зон у порядку зростання id.
+    """
+    geohash = encode_geohash(latitude, longitude, settings.ZONE_GRID_PRECISION)
+    cells = ZoneCell.objects.filter(
+        cell__in=[geohash[:length] for length in range(1, len(geohash) + 1)],
+        zone__is_active=True,
+    ).values_list("zone_id", "zone__name", "zone__kind", "boundary")
+
+    zones = {}
+    boundary_ids = []
+    for zone_id, name, kind, boundary in cells:
+        zones[zone_id] = {"id": zone_id, "name": name, "kind": kind}
+        if boundary:
+            boundary_ids.append(zone_id)
+
+    if boundary_ids:
+        for zone_id, polygon in Zone.objects.filter(id__in=boundary_ids).values_list("id", "polygon"):
+            if not point_in_polygon(latitude, longitude, polygon):
+                del zones[zone_id]
+
+    return [zones[zone_id] for zone_id in sorted(zones)]
+
+def zones_at(latitude, longitude):
+    """
+    Повертає діючі зони, які містять точку, з кешу.
+
+    Результат кешується для клітинки геохешу, яка зберігається для автомобіля (близько 4.8 x 4.8 м),
+    тому повторні перевірки автомобіля на тому самому місці не звертаються до бази даних.
+
+    Args:
+        latitude: Широта точки в градусах.
+        longitude: Довгота точки в градусах.
+
+    Returns:
+        list: Словники з id, назвою та типом зон.
+    """
+    key = f"zones:{zones_version()}:at:{encode_geohash(latitude, longitude)}"
+    zones = cache.get(key)
+    if zones is None:
+        zones = find_zones(latitude, longitude)
+        cache.set(key, zones, settings.ZONE_CACHE_TIMEOUT)
+    return zones
+
+def active_zone_kinds():
+    """
+    Повертає типи діючих зон з кешу.
+
+    Returns:
+        list: Типи зон, які є серед діючих.
+    """
+    return cache.get_or_set(
+        f"zones:{zones_version()}:kinds",
+        lambda: sorted(set(Zone.objects.filter(is_active=True).values_list("kind", flat=True))),
+        settings.ZONE_CACHE_TIMEOUT,
+    )
+
+def return_location_error(latitude, longitude):
+    """
+    Перевіряє, чи можна завершити оренду в заданій точці.
+
+    Якщо діючих зон немає, оренду можна завершити будь-де. Якщо є зони повернення (зони обслуговування
+    та аеропорти), точка має лежати в одній з них. Точка не може лежати в зоні заборони паркування.
+    Якщо місцезнаходження невідоме, перевірити його неможливо, тому оренду можна завершити: інакше
+    вона залишилася б активною, а хвилини продовжували б списуватися.
+
+    Args:
+        latitude: Широта місця повернення (або None, якщо місцезнаходження невідоме).
+        longitude: Довгота місця повернення (або None, якщо місцезнаходження невідоме).
+
+    Returns:
+        str | None: Повідомлення про помилку або None, якщо оренду можна завершити.
+    """
+    if latitude is None or longitude is None:
+        return None
+    kinds = active_zone_kinds()
+    if not kinds:
+        return None
+
+    zones = zones_at(latitude, longitude)
+    for zone in zones:
+        if zone["kind"] == "no_parking":
+            return f"Паркування в зоні «{zone['name']}» заборонене. Перемістіть автомобіль і спробуйте ще раз."
+
+    if set(kinds) & set(RETURN_KINDS) and not any(zone["kind"] in RETURN_KINDS for zone in zones):
+        return "Автомобіль можна повернути лише в зоні обслуговування. Перемістіть автомобіль і спробуйте ще раз."
+    return None
+
+def zone_feature_collection():
+    """
+    Повертає діючі зони як GeoJSON з кешу.
+
+    Returns:
+        dict: GeoJSON FeatureCollection з багатокутниками зон.
+    """
+    def build():
+        kinds = dict(Zone.KIND_CHOICES)
+        return {
+            "type": "FeatureCollection",
+            "features": [
+                {
+                    "type": "Feature",
+                    "geometry": {"type": "Polygon", "coordinates": zone["polygon"]},
+                    "properties": {
+                        "id": zone["id"],
+                        "name": zone["name"],
+                        "kind": zone["kind"],
+                        "kind_display": kinds.get(zone["kind"], zone["kind"]),
+                    },
+                }
+                for zone in Zone.objects.filter(is_active=True).order_by("id").values("id", "name", "kind", "polygon")
+            ],
+        }
+
+    return cache.get_or_set(f"zones:{zones_version()}:geojson", build, settings.ZONE_CACHE_TIMEOUT)
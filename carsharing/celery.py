@@ -1,6 +1,7 @@
 import os
 
 from celery import Celery
+from decouple import config
 
 
 # Встановлення змінної середовища для налаштувань Django
@@ -18,6 +19,37 @@ app.autodiscover_tasks()
 app.conf.beat_schedule = {
     "process-minute-billing": {
         "task": "bookings.tasks.process_minute_billing",
+        # Кожні кілька секунд вибираються лише бронювання, для яких настав час списання,
+        # тому навантаження рівномірно розподіляється протягом хвилини
+        "schedule": config("BILLING_POLL_INTERVAL", default=10.0, cast=float),
+    },
+    "rebuild-billing-queue": {
+        "task": "bookings.tasks.rebuild_billing_queue",
+        "schedule": 600.0,  # Кожні 10 хвилин
+    },
+    "compact-balance-ledger": {
+        "task": "users.tasks.compact_balance_ledger",
+        "schedule": 60.0,  # Щохвилини
+    },
+    "flush-car-positions": {
+        "task": "cars.tasks.flush_car_positions",
+        # Буферизоване місцезнаходження автомобілів записується в базу даних одним пакетом за інтервал
+        "schedule": config("TELEMETRY_FLUSH_INTERVAL", default=5.0, cast=float),
+    },
+    "pack-location-history": {
+        "task": "cars.tasks.pack_location_history",
+        "schedule": config("LOCATION_HISTORY_PACK_INTERVAL", default=300.0, cast=float),
+    },
+    "prune-car-changes": {
+        "task": "cars.tasks.prune_car_changes",
         "schedule": 60.0,  # Щохвилини
     },
+    "downsample-location-history": {
+        "task": "cars.tasks.downsample_location_history",
+        "schedule": 3600.0,  # Щогодини
+    },
+    "refresh-trip-analytics": {
+        "task": "bookings.tasks.refresh_trip_analytics",
+        "schedule": 900.0,  # Кожні 15 хвилин
+    },
 }
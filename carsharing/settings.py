@@ -137,14 +137,93 @@ LOGIN_REDIRECT_URL = "/accounts/profile/"
 # URL для виходу
 LOGOUT_REDIRECT_URL = "/accounts/login/"
 
+# Підключення до Redis (брокер Celery, кеш та службові структури білінгу)
+REDIS_URL = f"redis://{config('REDIS_HOST')}:{config('REDIS_PORT')}/{config('REDIS_DB')}"
+
 # Налаштування Celery
-CELERY_BROKER_URL = f"redis://{config('REDIS_HOST')}:{config('REDIS_PORT')}/{config('REDIS_DB')}"  # URL брокера завдань
+CELERY_BROKER_URL = REDIS_URL  # URL брокера завдань
 CELERY_RESULT_BACKEND = CELERY_BROKER_URL  # Бекенд для збереження результатів завдань
 CELERY_ACCEPT_CONTENT = ["json"]  # Прийнятний формат даних
 CELERY_TASK_SERIALIZER = "json"  # Серіалізація завдань у формат JSON
 CELERY_RESULT_SERIALIZER = "json"  # Серіалізація результатів у формат JSON
 CELERY_TIMEZONE = "Europe/Kyiv"  # Часовий пояс для завдань
 
+# Налаштування білінгу
+BILLING_CHUNK_SIZE = 500  # Кількість бронювань, які обробляються однією порцією масових запитів
+BILLING_SHARDS = config("BILLING_SHARDS", default=4, cast=int)  # Кількість паралельних шардів білінгу
+BILLING_QUEUE_ENABLED = True  # Вибирати для білінгу лише бронювання з черги Redis, у яких настав час списання
+BILLING_POLL_INTERVAL = config("BILLING_POLL_INTERVAL", default=10.0, cast=float)  # Інтервал запуску білінгу (с)
+BILLING_LEASE_ENABLED = True  # Не запускати білінг, поки попередній запуск утримує блокування в Redis
+BILLING_LEASE_TTL = 120  # Час життя блокування білінгу в секундах (продовжується після кожної порції)
+BILLING_MODE = config("BILLING_MODE", default="minute")  # Режим білінгу нових оренд: "minute" або "accrual"
+BILLING_ACCRUAL_HOLD_MINUTES = 60  # На скільки хвилин оренди блокується сума в режимі накопичення
+LEDGER_COMPACTION_BATCH_SIZE = 5000  # Кількість записів журналу балансу, які ущільнюються за одну транзакцію
+
+# Налаштування карти автомобілів
+MAP_MAX_MARKERS = 300  # Найбільша кількість окремих автомобілів у відповіді API карти (більше - кластери)
+MAP_CLUSTER_MAX_ZOOM = 17  # Масштаб, з якого автомобілі завжди показуються окремо
+MAP_TILE_MAX_ZOOM = 18  # Найбільший масштаб тайлів карти
+MAP_TILE_CACHE_TIMEOUT = 3600  # Час життя тайла карти в кеші (с); тайли також видаляються при зміні автомобілів
+
+# Налаштування телеметрії автомобілів
+# Токен, з яким автомобілі надсилають телеметрію (порожній - прийом вимкнено)
+TELEMETRY_TOKEN = config("TELEMETRY_TOKEN", default="")
+TELEMETRY_MAX_POINTS = 10000  # Найбільша кількість точок в одному запиті телеметрії
+TELEMETRY_CHUNK_SIZE = 500  # Кількість автомобілів, місцезнаходження яких оновлюється одним запитом
+TELEMETRY_BUFFER_ENABLED = True  # Записувати місцезнаходження в буфер Redis і періодично скидати їх у базу даних
+TELEMETRY_FLUSH_INTERVAL = config("TELEMETRY_FLUSH_INTERVAL", default=5.0, cast=float)  # Інтервал скидання буфера (с)
+
+# Налаштування історії місцезнаходження автомобілів
+LOCATION_HISTORY_CHUNK_POINTS = 1000  # Найбільша кількість точок в одній порції історії
+# Інтервал пакування буфера історії (с)
+LOCATION_HISTORY_PACK_INTERVAL = config("LOCATION_HISTORY_PACK_INTERVAL", default=300.0, cast=float)
+LOCATION_HISTORY_DOWNSAMPLE_AFTER = 7  # Через скільки днів історія проріджується
+LOCATION_HISTORY_RESOLUTION = 30  # Інтервал проріджених точок (с)
+LOCATION_HISTORY_BATCH_SIZE = 500  # Кількість порцій, які проріджуються однією транзакцією
+LOCATION_HISTORY_REPLAY_POINTS = 2000  # Найбільша кількість точок маршруту на сторінці оренди
+
+# Налаштування аналітики поїздок
+TRIP_ANALYTICS_BATCH_SIZE = 5000  # Кількість завершених оренд, які обробляються однією транзакцією
+TRIP_HEATMAP_PRECISION = 6  # Точність геохешу клітинок карти переміщень (клітинка приблизно 1.2 x 0.6 км)
+TRIP_ANALYTICS_DEFAULT_DAYS = 30  # За скільки днів показується аналітика за замовчуванням
+
+# Налаштування пошуку найближчих автомобілів
+NEAREST_INDEX_CELL = 0.01  # Розмір клітинки просторового індексу в градусах (близько 1 км)
+NEAREST_INDEX_CHANGES_ENABLED = True  # Оновлювати індекс лише зміненими автомобілями зі списку змін у Redis
+NEAREST_INDEX_REFRESH_INTERVAL = 5  # Як часто індекс процесу застосовує зміни автомобілів (с)
+NEAREST_INDEX_REBUILD_INTERVAL = 300  # Як часто індекс процесу перебудовується повністю (с)
+NEAREST_MAX_DISTANCE_KM = 50  # Найбільша відстань до автомобіля в результатах пошуку (км)
+NEAREST_DEFAULT_LIMIT = 5  # Кількість найближчих автомобілів за замовчуванням
+NEAREST_MAX_LIMIT = 50  # Найбільша кількість найближчих автомобілів в одному запиті
+
+# Налаштування зон обслуговування
+ZONE_GRID_PRECISION = 7  # Найбільша точність геохешу клітинок зон (клітинка приблизно 153 x 153 м)
+ZONE_GRID_MAX_CELLS = 20000  # Найбільша кількість клітинок, якими покривається одна зона (більше - грубіша сітка)
+ZONE_CACHE_TIMEOUT = 3600  # Час життя закешованих належностей точок до зон та GeoJSON зон (с)
+
+# Налаштування фасетного пошуку автомобілів
+CAR_SEARCH_CACHE_TIMEOUT = 300  # Час життя закешованих кількостей фасетів (с); кеш скидається і при зміні автомобілів
+
+# Налаштування текстового пошуку автомобілів (індекс у пам'яті процесу перебудовується повністю раз на
+# NEAREST_INDEX_REBUILD_INTERVAL секунд, як і індекс найближчих автомобілів, бо зміни беруться з того самого списку)
+CAR_TEXT_SEARCH_REFRESH_INTERVAL = 5  # Як часто індекс процесу застосовує зміни автомобілів інших процесів (с)
+CAR_TEXT_SEARCH_DEFAULT_LIMIT = 10  # Кількість підказок пошуку за замовчуванням
+CAR_TEXT_SEARCH_MAX_LIMIT = 50  # Найбільша кількість підказок в одному запиті
+
+# Налаштування кешу карток автомобілів у списках (ключ картки містить версію запису каталогу, тому
+# змінені автомобілі отримують нові ключі, а старі картки видаляються з кешу за часом життя)
+CAR_CARD_CACHE_TIMEOUT = 3600  # Час життя закешованої HTML-картки автомобіля (с)
+CAR_CARD_CACHE_VERSION = 1  # Версія шаблонів карток: збільшується при зміні розмітки карток
+
+# Налаштування потоку змін автомобілів (server-sent events)
+CAR_CHANGES_RETENTION = 600  # Скільки секунд зберігаються записи журналу змін
+CAR_CHANGES_BATCH_SIZE = 1000  # Кількість записів журналу, які читаються або видаляються одним запитом
+CAR_CHANGES_POLL_INTERVAL = 1.0  # Як часто потік перевіряє нові записи журналу (с)
+CAR_CHANGES_GAP_TIMEOUT = 5  # Скільки секунд потік чекає на незафіксований запис перед пропуском номера
+CAR_CHANGES_HEARTBEAT = 15  # Інтервал службових повідомлень у потоці без змін (с)
+CAR_CHANGES_STREAM_TIMEOUT = 300  # Тривалість одного з'єднання потоку, після якої браузер перепідключається (с)
+CAR_CHANGES_RETRY_MS = 1000  # Затримка перепідключення браузера (мс)
+
 # Email налаштування
 EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend" # Використання консолі для відправки електронних листів
 EMAIL_HOST = "localhost" # Хост для SMTP-сервера
@@ -158,7 +237,7 @@ BASE_URL = "http://localhost" # Базовий URL для електронних
 CACHES = {
     "default": {
         "BACKEND": "django.core.cache.backends.redis.RedisCache", # Використання Redis як кешу
-        "LOCATION": f"redis://{config('REDIS_HOST')}:{config('REDIS_PORT')}/{config('REDIS_DB')}", # URL Redis
+        "LOCATION": REDIS_URL, # URL Redis
     }
 }
 
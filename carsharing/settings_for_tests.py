@@ -3,6 +3,10 @@
 # - SQLite як базу даних у пам'яті (вона швидше за інші бази даних).
 # - MD5 для хешування паролів (швидше, але менш безпечно, підходить лише для тестів).
 
+import atexit
+import shutil
+import tempfile
+
 from .settings import *
 
 # Використовуємо SQLite для тестів бо вона швидше
@@ -23,4 +27,19 @@ CACHES = {
     "default": {
         "BACKEND": "django.core.cache.backends.dummy.DummyCache", # Використовуємо DummyCache для тестів
     }
-}
\ No newline at end of file
+}
+
+# Вимкнення черги та блокування білінгу в Redis для тестів (білінг переглядає всі активні бронювання)
+BILLING_QUEUE_ENABLED = False
+BILLING_LEASE_ENABLED = False
+
+# Вимкнення буфера місцезнаходження автомобілів у Redis для тестів (телеметрія записується одразу в базу даних)
+TELEMETRY_BUFFER_ENABLED = False
+
+# Вимкнення списку змін автомобілів у Redis для тестів (індекс найближчих автомобілів перебудовується повністю)
+NEAREST_INDEX_CHANGES_ENABLED = False
+
+# Файли, завантажені під час тестів, записуються в тимчасовий каталог замість media/ проєкту
+# і видаляються після завершення тестів
+MEDIA_ROOT = tempfile.mkdtemp(prefix="carsharing-test-media-")
+atexit.register(shutil.rmtree, MEDIA_ROOT, ignore_errors=True)
@@ -41,7 +41,9 @@ class PaymentTransactionAdmin(admin.ModelAdmin):
         "user",
         "payment",
         "amount",
+        "amount_kopecks",
         "transaction_type",
         "balance_after",
+        "balance_after_kopecks",
         "created_at",
     )  # Поля лише для читання
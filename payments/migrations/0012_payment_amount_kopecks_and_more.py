@@ -0,0 +1,81 @@
+# Generated by Django 5.2 on 2026-10-18 12:33
+
+from django.db import migrations, models
+from django.db.models.functions import Cast, Round
+
+
+def amounts_to_kopecks(apps, schema_editor):
+    """Переносить суми в гривнях у поля в копійках"""
+    apps.get_model("payments", "Payment").objects.update(
+        amount_kopecks=Cast(Round(models.F("amount") * 100), models.BigIntegerField()),
+    )
+    apps.get_model("payments", "PaymentTransaction").objects.update(
+        amount_kopecks=Cast(Round(models.F("amount") * 100), models.BigIntegerField()),
+        balance_after_kopecks=Cast(Round(models.F("balance_after") * 100), models.BigIntegerField()),
+    )
+
+def kopecks_to_amounts(apps, schema_editor):
+    """Переносить суми в копійках назад у поля в гривнях"""
+    apps.get_model("payments", "Payment").objects.update(
+        amount=models.F("amount_kopecks") / 100.0,
+    )
+    apps.get_model("payments", "PaymentTransaction").objects.update(
+        amount=models.F("amount_kopecks") / 100.0,
+        balance_after=models.F("balance_after_kopecks") / 100.0,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0011_alter_paymenttransaction_transaction_type'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='amount_kopecks',
+            field=models.BigIntegerField(default=0),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='paymenttransaction',
+            name='amount_kopecks',
+            field=models.BigIntegerField(default=0),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='paymenttransaction',
+            name='balance_after_kopecks',
+            field=models.BigIntegerField(default=0),
+            preserve_default=False,
+        ),
+        migrations.AlterField(
+            model_name='payment',
+            name='amount',
+            field=models.DecimalField(decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.AlterField(
+            model_name='paymenttransaction',
+            name='amount',
+            field=models.DecimalField(decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.AlterField(
+            model_name='paymenttransaction',
+            name='balance_after',
+            field=models.DecimalField(decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.RunPython(amounts_to_kopecks, kopecks_to_amounts),
+        migrations.RemoveField(
+            model_name='payment',
+            name='amount',
+        ),
+        migrations.RemoveField(
+            model_name='paymenttransaction',
+            name='amount',
+        ),
+        migrations.RemoveField(
+            model_name='paymenttransaction',
+            name='balance_after',
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2 on 2026-10-18 13:12
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0012_payment_amount_kopecks_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='payment_user_cursor_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['-created_at', '-id'], name='payment_cursor_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='paymenttransaction',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='transaction_user_cursor_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='paymenttransaction',
+            index=models.Index(fields=['-created_at', '-id'], name='transaction_cursor_idx'),
+        ),
+    ]
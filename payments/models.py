@@ -2,6 +2,8 @@ from django.contrib.auth import get_user_model
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 
+from utils.money import money_property
+
 
 User = get_user_model()
 
@@ -19,12 +21,20 @@ class Payment(models.Model):
     )
 
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="payments")  # Зв'язок з користувачем
-    amount = models.DecimalField(max_digits=10, decimal_places=2)  # Сума платежу
+    amount_kopecks = models.BigIntegerField()  # Сума платежу в копійках
     payment_provider = models.CharField(max_length=20, choices=PAYMENT_PROVIDER_CHOICES)  # Провайдер платежу
     status = models.CharField(max_length=20, choices=PAYMENT_STATUS_CHOICES, default="pending")  # Статус платежу
     created_at = models.DateTimeField(auto_now_add=True)  # Дата створення платежу
     updated_at = models.DateTimeField(auto_now=True)  # Дата останнього оновлення платежу
 
+    amount = money_property("amount_kopecks")  # Сума платежу в гривнях
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "-created_at", "-id"], name="payment_user_cursor_idx"),  # Платежі користувача
+            models.Index(fields=["-created_at", "-id"], name="payment_cursor_idx"),  # Усі платежі (для адміністратора)
+        ]
+
     def __str__(self):
         return f"{self.user.username} - {self.amount} - {self.payment_provider} - {self.status}"
 
@@ -57,11 +67,22 @@ class PaymentTransaction(models.Model):
         blank=True,
         related_name="transactions"
     )  # Пов'язаний платіж
-    amount = models.DecimalField(max_digits=10, decimal_places=2)  # Сума транзакції
+    amount_kopecks = models.BigIntegerField()  # Сума транзакції в копійках
     transaction_type = models.CharField(max_length=20, choices=TRANSACTION_TYPE_CHOICES)  # Тип транзакції
     description = models.TextField(blank=True)  # Опис транзакції
-    balance_after = models.DecimalField(max_digits=10, decimal_places=2)  # Баланс після транзакції
+    balance_after_kopecks = models.BigIntegerField()  # Баланс після транзакції в копійках
     created_at = models.DateTimeField(auto_now_add=True)  # Дата створення транзакції
 
+    amount = money_property("amount_kopecks")  # Сума транзакції в гривнях
+    balance_after = money_property("balance_after_kopecks")  # Баланс після транзакції в гривнях
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["user", "-created_at", "-id"], name="transaction_user_cursor_idx"
+            ),  # Транзакції користувача
+            models.Index(fields=["-created_at", "-id"], name="transaction_cursor_idx"),  # Усі транзакції
+        ]
+
     def __str__(self):
         return f"{self.user.username} - {self.transaction_type} - {self.amount}"
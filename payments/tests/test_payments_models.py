@@ -5,6 +5,7 @@ from django.contrib.auth import get_user_model
 from django.test import TestCase
 
 from payments.models import LiqPayPayment, Payment, PaymentTransaction
+from utils.money import format_kopecks, from_kopecks, to_kopecks
 
 
 User = get_user_model()
@@ -41,6 +42,32 @@ class PaymentModelTest(TestCase):
         )
         self.assertEqual(str(self.payment), expected_str)
 
+    def test_payment_amount_is_stored_in_kopecks(self):
+        """Тест зберігання суми платежу в копійках"""
+        self.payment.amount = Decimal("12.345")
+        self.payment.save()
+        self.payment.refresh_from_db()
+
+        self.assertEqual(self.payment.amount_kopecks, 1235)
+        self.assertEqual(self.payment.amount, Decimal("12.35"))
+
+class MoneyUtilsTest(TestCase):
+    """Тести перетворення грошових сум у копійки"""
+
+    def test_to_kopecks_rounds_to_nearest_kopeck(self):
+        """Тест округлення суми до копійок"""
+        self.assertEqual(to_kopecks(Decimal("1.15")), 115)
+        self.assertEqual(to_kopecks("0.005"), 1)
+        self.assertEqual(to_kopecks(2), 200)
+        self.assertEqual(to_kopecks(None), 0)
+
+    def test_from_and_format_kopecks(self):
+        """Тест перетворення копійок на суму та рядок"""
+        self.assertEqual(from_kopecks(12345), Decimal("123.45"))
+        self.assertEqual(format_kopecks(12345), "123.45")
+        self.assertEqual(format_kopecks(-5), "-0.05")
+        self.assertEqual(format_kopecks(0), "0.00")
+
 class LiqPayPaymentModelTest(TestCase):
     """Тести моделі LiqPayPayment"""
 
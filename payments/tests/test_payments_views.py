@@ -1,9 +1,11 @@
 # -*- coding: utf-8 -*-
+import datetime
 from decimal import Decimal
 
 from django.contrib.auth import get_user_model
 from django.test import TestCase
 from django.urls import reverse
+from django.utils import timezone
 
 from payments.models import Payment, PaymentTransaction
 
@@ -99,3 +101,58 @@ class TransactionViewsTest(TestCase):
         response = self.client.get(url)
         self.assertEqual(response.status_code, 200)
         self.assertTemplateUsed(response, "transaction_list.html")
+
+    def test_transaction_list_cursor_pagination(self):
+        """Тест курсорної пагінації транзакцій з однаковим часом створення"""
+        PaymentTransaction.objects.bulk_create([
+            PaymentTransaction(
+                user=self.user, amount_kopecks=100, transaction_type="withdrawal", balance_after_kopecks=0
+            )
+            for _ in range(39)
+        ])
+        # Половина транзакцій створена в одну мить, порядок між ними задає id
+        now = timezone.now()
+        ids = list(PaymentTransaction.objects.order_by("id").values_list("id", flat=True))
+        for index, transaction_id in enumerate(ids):
+            PaymentTransaction.objects.filter(id=transaction_id).update(
+                created_at=now - datetime.timedelta(minutes=index // 2 * 2)
+            )
+        expected = list(PaymentTransaction.objects.order_by("-created_at", "-id").values_list("id", flat=True))
+
+        self.client.login(username="transactionuser", password="testpassword123")
+        url = reverse("transaction-list")
+        pages = []
+        params = {"transaction_type": ""}
+        while True:
+            response = self.client.get(url, params)
+            page = response.context["page_obj"]
+            pages.append([transaction.id for transaction in response.context["transactions"]])
+            if not page.has_next():
+                break
+            self.assertContains(response, f"after={page.next_cursor}&transaction_type=")
+            params = {"after": page.next_cursor, "transaction_type": ""}
+        self.assertEqual([len(ids) for ids in pages], [15, 15, 10])
+        self.assertEqual(sum(pages, []), expected)
+
+        # Остання сторінка містить повну кількість записів з кінця списку, далі - рух назад
+        response = self.client.get(url, {"last": 1})
+        self.assertEqual([transaction.id for transaction in response.context["transactions"]], expected[-15:])
+        self.assertFalse(response.context["page_obj"].has_next())
+        response = self.client.get(url, {"before": response.context["page_obj"].previous_cursor})
+        self.assertEqual([transaction.id for transaction in response.context["transactions"]], expected[-30:-15])
+        self.assertTrue(response.context["page_obj"].has_next())
+        response = self.client.get(url, {"before": response.context["page_obj"].previous_cursor})
+        self.assertEqual([transaction.id for transaction in response.context["transactions"]], expected[:10])
+        self.assertFalse(response.context["page_obj"].has_previous())
+
+        self.assertEqual(self.client.get(url, {"after": "не-курсор"}).status_code, 404)
+
+    def test_admin_transaction_money_fields_are_read_only(self):
+        """Тест заборони редагування сум транзакції в адмін-панелі"""
+        User.objects.create_superuser(username="transactionadmin", email="ta@example.com", password="adminpass")
+        self.client.login(username="transactionadmin", password="adminpass")
+        url = reverse("admin:payments_paymenttransaction_change", args=[self.transaction.id])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, 'name="amount_kopecks"')
+        self.assertNotContains(response, 'name="balance_after_kopecks"')
@@ -15,19 +15,24 @@ from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
 from django.views.generic import DetailView, FormView, ListView, View
 
+from bookings.billing import refresh_runway
+from users.ledger import record_balance_change
 from users.models import UserBalance
+from utils.money import format_kopecks, from_kopecks, to_kopecks
+from utils.pagination import CursorPaginationMixin
 
 from .forms import CreatePaymentForm, PaymentFilterForm, TransactionFilterForm
 from .models import LiqPayPayment, Payment, PaymentTransaction
 
 
-class PaymentListView(LoginRequiredMixin, ListView):
+class PaymentListView(LoginRequiredMixin, CursorPaginationMixin, ListView):
     """Представлення списку платежів користувача"""
 
     model = Payment
     template_name = "payment_list.html"
     context_object_name = "payments"
     paginate_by = 10
+    cursor_ordering = ("-created_at", "-id")  # Нові платежі першими, сторінки вибираються за індексом
 
     def get_queryset(self):
         """
@@ -37,7 +42,7 @@ class PaymentListView(LoginRequiredMixin, ListView):
             self: Екземпляр класу.
 
         Returns:
-            QuerySet: Відфільтрований та відсортований QuerySet об'єктів Payment.
+            QuerySet: Відфільтрований QuerySet об'єктів Payment (сортування задає cursor_ordering).
         """
         user = self.request.user
 
@@ -67,7 +72,7 @@ class PaymentListView(LoginRequiredMixin, ListView):
                 date_to = form.cleaned_data["date_to"] + datetime.timedelta(days=1)
                 queryset = queryset.filter(created_at__lte=date_to)
 
-        return queryset.order_by("-created_at")
+        return queryset
 
     def get_context_data(self, **kwargs):
         """
@@ -97,9 +102,9 @@ class PaymentListView(LoginRequiredMixin, ListView):
         # Загальна кількість успішних платежів
         successful_payments = payments.filter(status="completed")
         context["total_successful"] = successful_payments.count()
-        context["total_amount"] = successful_payments.aggregate(
-            total=Sum("amount")
-        )["total"] or 0
+        context["total_amount"] = from_kopecks(successful_payments.aggregate(
+            total=Sum("amount_kopecks")
+        )["total"])
 
         # Статистика за останні 30 днів
         thirty_days_ago = timezone.now() - datetime.timedelta(days=30)
@@ -107,9 +112,9 @@ class PaymentListView(LoginRequiredMixin, ListView):
             created_at__gte=thirty_days_ago
         ).count()
 
-        context["recent_amount"] = successful_payments.filter(
+        context["recent_amount"] = from_kopecks(successful_payments.filter(
             created_at__gte=thirty_days_ago
-        ).aggregate(total=Sum("amount"))["total"] or 0
+        ).aggregate(total=Sum("amount_kopecks"))["total"])
 
         return context
 
@@ -159,7 +164,7 @@ class CreatePaymentView(LoginRequiredMixin, FormView):
         # Створити запис платежу
         payment = Payment.objects.create(
             user=user,
-            amount=amount,
+            amount_kopecks=to_kopecks(amount),
             payment_provider=provider,
             status="pending"
         )
@@ -191,7 +196,7 @@ class CreatePaymentView(LoginRequiredMixin, FormView):
                 "public_key": settings.LIQPAY_PUBLIC_KEY,
                 "version": "3",
                 "action": "pay",
-                "amount": str(payment.amount),
+                "amount": format_kopecks(payment.amount_kopecks),
                 "currency": "UAH",
                 "description": "CarShare Balance Top-up",
                 "order_id": order_id,
@@ -384,26 +389,31 @@ class LiqPayCallbackView(View):
         """
         user = payment.user
         balance, created = UserBalance.objects.get_or_create(user=user)
-        balance.amount += payment.amount
-        balance.save()
+        record_balance_change(
+            user.id,
+            amount_kopecks=payment.amount_kopecks,
+            description="Поповнення балансу через LiqPay"
+        )
+        refresh_runway([user.id])
 
         # Створити запис транзакції
         PaymentTransaction.objects.create(
             user=user,
             payment=payment,
-            amount=payment.amount,
+            amount_kopecks=payment.amount_kopecks,
             transaction_type="deposit",
             description="Поповнення балансу через LiqPay",
-            balance_after=balance.amount
+            balance_after_kopecks=balance.get_ledger_totals()[0]
         )
 
-class TransactionListView(LoginRequiredMixin, ListView):
+class TransactionListView(LoginRequiredMixin, CursorPaginationMixin, ListView):
     """Представлення списку транзакцій"""
 
     model = PaymentTransaction
     template_name = "transaction_list.html"
     context_object_name = "transactions"
     paginate_by = 15
+    cursor_ordering = ("-created_at", "-id")  # Нові транзакції першими, сторінки вибираються за індексом
 
     def get_queryset(self):
         """
@@ -413,7 +423,7 @@ class TransactionListView(LoginRequiredMixin, ListView):
             self: Екземпляр класу.
 
         Returns:
-            QuerySet: Відфільтрований та відсортований QuerySet об'єктів PaymentTransaction.
+            QuerySet: Відфільтрований QuerySet об'єктів PaymentTransaction (сортування задає cursor_ordering).
         """
         user = self.request.user
 
@@ -439,7 +449,7 @@ class TransactionListView(LoginRequiredMixin, ListView):
                 date_to = form.cleaned_data["date_to"] + datetime.timedelta(days=1)
                 queryset = queryset.filter(created_at__lte=date_to)
 
-        return queryset.order_by("-created_at")
+        return queryset
 
     def get_context_data(self, **kwargs):
         """
@@ -469,16 +479,16 @@ class TransactionListView(LoginRequiredMixin, ListView):
 
         # Загальна кількість транзакцій
         context["total_transactions"] = transactions.count()
-        context["total_deposits"] = deposits.aggregate(
-            total=Sum("amount")
-        )["total"] or 0
-        context["total_withdrawals"] = withdrawals.aggregate(
-            total=Sum("amount")
-        )["total"] or 0
+        context["total_deposits"] = from_kopecks(deposits.aggregate(
+            total=Sum("amount_kopecks")
+        )["total"])
+        context["total_withdrawals"] = from_kopecks(withdrawals.aggregate(
+            total=Sum("amount_kopecks")
+        )["total"])
 
         # Поточний баланс
         try:
-            balance = UserBalance.objects.get(user=user).amount
+            balance = UserBalance.objects.get(user=user).get_current_amount()
         except UserBalance.DoesNotExist:
             balance = 0
         context["current_balance"] = balance
@@ -1,7 +1,11 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
+from django.db.models import F
 
-from .models import DriverLicenseVerification, User, UserBalance
+from utils.money import from_kopecks
+
+from .ledger import ledger_tail
+from .models import BalanceLedgerEntry, DriverLicenseVerification, User, UserBalance
 
 
 class CustomUserAdmin(UserAdmin):
@@ -30,9 +34,36 @@ class DriverLicenseVerificationAdmin(admin.ModelAdmin):
 class UserBalanceAdmin(admin.ModelAdmin):
     """Адмін-панель для балансу користувачів"""
 
-    list_display = ("user", "amount")  # Поля для відображення у списку
+    list_display = ("user", "get_ledger_amount", "get_ledger_held_amount")  # Поля для відображення у списку
+
+    def get_queryset(self, request):
+        """Читати фактичний баланс і заблоковану суму (знімок плюс неущільнені записи журналу) одним запитом"""
+        return super().get_queryset(request).annotate(
+            ledger_amount_kopecks=F("amount_kopecks") + ledger_tail("amount_kopecks"),
+            ledger_held_kopecks=F("held_kopecks") + ledger_tail("held_kopecks"),
+        )
+
+    def get_ledger_amount(self, obj):
+        """Отримати фактичний баланс користувача"""
+        return from_kopecks(obj.ledger_amount_kopecks)
+    get_ledger_amount.short_description = "Баланс"  # Назва колонки у списку
+
+    def get_ledger_held_amount(self, obj):
+        """Отримати фактичну заблоковану суму"""
+        return from_kopecks(obj.ledger_held_kopecks)
+    get_ledger_held_amount.short_description = "Заблоковано"  # Назва колонки у списку
+
+class BalanceLedgerEntryAdmin(admin.ModelAdmin):
+    """Адмін-панель для журналу змін балансу"""
+
+    # Поля для відображення у списку
+    list_display = ("user", "amount", "held_amount", "description", "compacted", "created_at")
+    list_filter = ("compacted",)  # Фільтри для списку
+    search_fields = ("user__username", "user__email")  # Поля для пошуку
+    readonly_fields = ("created_at",)  # Поля лише для читання
 
 # Реєстрація моделей у панелі адміністратора
 admin.site.register(User, CustomUserAdmin)
 admin.site.register(DriverLicenseVerification, DriverLicenseVerificationAdmin)
 admin.site.register(UserBalance, UserBalanceAdmin)
+admin.site.register(BalanceLedgerEntry, BalanceLedgerEntryAdmin)
@@ -0,0 +1,114 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import BigIntegerField, Case, F, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import BalanceLedgerEntry, UserBalance
+
+
+def ledger_tail(field, user_field="user_id"):
+    """
+    Вираз для анотації суми неущільнених записів журналу користувача.
+
+    Args:
+        field: Поле запису журналу, яке підсумовується ("amount_kopecks" або "held_kopecks").
+        user_field: Поле зовнішнього запиту з id користувача.
+
+    Returns:
+        Expression: Сума неущільнених записів журналу в копійках або 0, якщо їх немає.
+    """
+    tail = (
+        BalanceLedgerEntry.objects.filter(user_id=OuterRef(user_field), compacted=False)
+        .order_by()
+        .values("user_id")
+        .annotate(total=Sum(field))
+        .values("total")
+    )
+    return Coalesce(Subquery(tail, output_field=BigIntegerField()), Value(0), output_field=BigIntegerField())
+
+def record_balance_change(user_id, amount_kopecks=0, held_kopecks=0, description=""):
+    """
+    Записує зміну балансу користувача в журнал.
+
+    Args:
+        user_id: Ідентифікатор користувача.
+        amount_kopecks: Зміна балансу в копійках (додатна - поповнення, від'ємна - списання).
+        held_kopecks: Зміна заблокованої суми в копійках.
+        description: Опис зміни.
+
+    Returns:
+        BalanceLedgerEntry: Створений запис журналу.
+    """
+    return BalanceLedgerEntry.objects.create(
+        user_id=user_id,
+        amount_kopecks=amount_kopecks,
+        held_kopecks=held_kopecks,
+        description=description
+    )
+
+def record_balance_changes(entries):
+    """
+    Записує кілька змін балансу одним запитом.
+
+    Args:
+        entries: Ітерабельний об'єкт незбережених екземплярів BalanceLedgerEntry.
+
+    Returns:
+        list: Створені записи журналу.
+    """
+    return BalanceLedgerEntry.objects.bulk_create(entries)
+
+def compact_ledger(batch_size=None):
+    """
+    Переносить неущільнені записи журналу в знімки балансів користувачів.
+
+    Записи обробляються пакетами: для кожного пакета суми записів групуються за користувачами, знімки
+    оновлюються одним запитом, а записи позначаються ущільненими. Записи, які заблоковані іншим
+    ущільненням, пропускаються, тому записувачі журналу не чекають на ущільнення.
+
+    Args:
+        batch_size: Кількість записів у пакеті (за замовчуванням - LEDGER_COMPACTION_BATCH_SIZE).
+
+    Returns:
+        dict: Кількість ущільнених записів та оновлених балансів.
+    """
+    batch_size = batch_size or settings.LEDGER_COMPACTION_BATCH_SIZE
+    stats = {"entries": 0, "balances": 0}
+
+    while True:
+        with transaction.atomic():
+            entry_ids = list(
+                BalanceLedgerEntry.objects.select_for_update(skip_locked=True)
+                .filter(compacted=False, user__balance__isnull=False)
+                .order_by("id")
+                .values_list("id", flat=True)[:batch_size]
+            )
+            if not entry_ids:
+                return stats
+
+            totals = list(
+                BalanceLedgerEntry.objects.filter(id__in=entry_ids)
+                .order_by()
+                .values("user_id")
+                .annotate(amount_total=Sum("amount_kopecks"), held_total=Sum("held_kopecks"))
+            )
+            UserBalance.objects.filter(user_id__in=[row["user_id"] for row in totals]).update(
+                amount_kopecks=F("amount_kopecks") + Case(
+                    *[When(user_id=row["user_id"], then=Value(row["amount_total"])) for row in totals],
+                    default=Value(0),
+                    output_field=BigIntegerField(),
+                ),
+                held_kopecks=F("held_kopecks") + Case(
+                    *[When(user_id=row["user_id"], then=Value(row["held_total"])) for row in totals],
+                    default=Value(0),
+                    output_field=BigIntegerField(),
+                ),
+                last_updated=timezone.now(),
+            )
+            BalanceLedgerEntry.objects.filter(id__in=entry_ids).update(compacted=True)
+
+        stats["entries"] += len(entry_ids)
+        stats["balances"] += len(totals)
+        if len(entry_ids) < batch_size:
+            return stats
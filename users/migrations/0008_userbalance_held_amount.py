@@ -0,0 +1,19 @@
+# Generated by Django 5.2 on 2026-10-18 12:22
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0007_user_email_verification_token_user_is_email_verified_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userbalance',
+            name='held_amount',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=10),
+        ),
+    ]
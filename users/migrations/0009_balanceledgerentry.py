@@ -0,0 +1,31 @@
+# Generated by Django 5.2 on 2026-10-18 12:25
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0008_userbalance_held_amount'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BalanceLedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=10)),
+                ('held_amount', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=10)),
+                ('description', models.CharField(blank=True, max_length=255)),
+                ('compacted', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ledger_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('compacted', False)), fields=['user'], name='ledger_uncompacted_user_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 5.2 on 2026-10-18 12:33
+
+from django.db import migrations, models
+from django.db.models.functions import Cast, Round
+
+
+def amounts_to_kopecks(apps, schema_editor):
+    """Переносить суми в гривнях у поля в копійках"""
+    for model_name in ("UserBalance", "BalanceLedgerEntry"):
+        apps.get_model("users", model_name).objects.update(
+            amount_kopecks=Cast(Round(models.F("amount") * 100), models.BigIntegerField()),
+            held_kopecks=Cast(Round(models.F("held_amount") * 100), models.BigIntegerField()),
+        )
+
+def kopecks_to_amounts(apps, schema_editor):
+    """Переносить суми в копійках назад у поля в гривнях"""
+    for model_name in ("UserBalance", "BalanceLedgerEntry"):
+        apps.get_model("users", model_name).objects.update(
+            amount=models.F("amount_kopecks") / 100.0,
+            held_amount=models.F("held_kopecks") / 100.0,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0009_balanceledgerentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userbalance',
+            name='amount_kopecks',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userbalance',
+            name='held_kopecks',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='balanceledgerentry',
+            name='amount_kopecks',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='balanceledgerentry',
+            name='held_kopecks',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.RunPython(amounts_to_kopecks, kopecks_to_amounts),
+        migrations.RemoveField(
+            model_name='userbalance',
+            name='amount',
+        ),
+        migrations.RemoveField(
+            model_name='userbalance',
+            name='held_amount',
+        ),
+        migrations.RemoveField(
+            model_name='balanceledgerentry',
+            name='amount',
+        ),
+        migrations.RemoveField(
+            model_name='balanceledgerentry',
+            name='held_amount',
+        ),
+    ]
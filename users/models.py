@@ -1,11 +1,11 @@
 import os
 import uuid
-from decimal import Decimal
 
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 
 from utils.data_validation import validate_phone_number
+from utils.money import from_kopecks, money_property
 
 
 # Функція для генерації унікального шляху для фото профілю
@@ -82,11 +82,106 @@ class DriverLicenseVerification(models.Model):
         return f"{self.user.username} - {self.status}"
 
 class UserBalance(models.Model):
-    """Модель для зберігання балансу користувача"""
+    """
+    Модель для зберігання балансу користувача.
+
+    Суми зберігаються в копійках (цілі числа). Поля amount_kopecks та held_kopecks - це знімок балансу
+    на момент останнього ущільнення журналу. Зміни балансу записуються в журнал BalanceLedgerEntry, тому
+    фактичний баланс - це знімок плюс сума ще не ущільнених записів журналу (див. get_amount та get_held_amount).
+    """
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name="balance")  # Зв'язок із користувачем
-    amount = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal("0.00"))  # Баланс користувача
-    last_updated = models.DateTimeField(auto_now=True)  # Дата останнього оновлення балансу
+    amount_kopecks = models.BigIntegerField(default=0)  # Знімок балансу в копійках
+    held_kopecks = models.BigIntegerField(
+        default=0
+    )  # Знімок суми в копійках, заблокованої під активні оренди в режимі накопичення
+    last_updated = models.DateTimeField(auto_now=True)  # Дата останнього ущільнення журналу
+
+    amount = money_property("amount_kopecks")  # Знімок балансу в гривнях
+    held_amount = money_property("held_kopecks")  # Знімок заблокованої суми в гривнях
 
     def __str__(self):
         """Повертає інформацію про баланс як рядок"""
         return f"Баланс для {self.user.username}: {self.amount}"
+
+    def get_ledger_totals(self):
+        """
+        Повертає фактичний баланс і заблоковану суму в копійках (знімок плюс неущільнені записи журналу).
+
+        Знімок і записи журналу читаються одним запитом, тому результат узгоджений навіть під час ущільнення.
+
+        Returns:
+            tuple: Фактичний баланс та фактична заблокована сума в копійках.
+        """
+        from .ledger import ledger_tail
+
+        return UserBalance.objects.filter(pk=self.pk).values_list(
+            models.F("amount_kopecks") + ledger_tail("amount_kopecks"),
+            models.F("held_kopecks") + ledger_tail("held_kopecks"),
+        ).get()
+
+    def get_amount(self):
+        """Повертає фактичний баланс користувача"""
+        return from_kopecks(self.get_ledger_totals()[0])
+
+    def get_held_amount(self):
+        """Повертає фактичну суму, заблоковану під активні оренди"""
+        return from_kopecks(self.get_ledger_totals()[1])
+
+    def get_available_kopecks(self):
+        """Повертає суму в копійках, яку можна заблокувати під нову оренду (баланс без заблокованих сум)"""
+        amount_kopecks, held_kopecks = self.get_ledger_totals()
+        return amount_kopecks - held_kopecks
+
+    def get_available_amount(self):
+        """Повертає суму, яку можна заблокувати під нову оренду (баланс без заблокованих сум)"""
+        return from_kopecks(self.get_available_kopecks())
+
+    def get_current_amount(self, now=None):
+        """
+        Повертає фактичний баланс користувача з урахуванням вартості активних оренд у режимі накопичення,
+        яка ще не списана з балансу.
+
+        Args:
+            now: Момент, на який розраховується баланс (за замовчуванням - поточний час).
+
+        Returns:
+            Decimal: Фактичний баланс користувача.
+        """
+        from bookings.billing import accrued_kopecks
+
+        return from_kopecks(self.get_ledger_totals()[0] - accrued_kopecks(self.user_id, now))
+
+class BalanceLedgerEntry(models.Model):
+    """
+    Запис журналу змін балансу користувача.
+
+    Журнал лише доповнюється: кожна зміна балансу - це новий запис, тому записувачі не конкурують
+    за рядок UserBalance. Періодичне ущільнення переносить записи в знімок UserBalance і позначає їх ущільненими.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="ledger_entries"
+    )  # Зв'язок із користувачем
+    # Зміна балансу в копійках (додатна - поповнення, від'ємна - списання)
+    amount_kopecks = models.BigIntegerField(default=0)
+    held_kopecks = models.BigIntegerField(default=0)  # Зміна заблокованої суми в копійках
+    description = models.CharField(max_length=255, blank=True)  # Опис зміни
+    compacted = models.BooleanField(default=False)  # Чи перенесено запис у знімок балансу
+    created_at = models.DateTimeField(auto_now_add=True)  # Дата створення запису
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["user"],
+                condition=models.Q(compacted=False),
+                name="ledger_uncompacted_user_idx"
+            ),  # Швидкий підрахунок неущільненого хвоста журналу користувача
+        ]
+
+    amount = money_property("amount_kopecks")  # Зміна балансу в гривнях
+    held_amount = money_property("held_kopecks")  # Зміна заблокованої суми в гривнях
+
+    def __str__(self):
+        """Повертає інформацію про запис журналу як рядок"""
+        return f"{self.user.username}: {self.amount} ({self.description})"
@@ -0,0 +1,17 @@
+from carsharing.celery import app
+
+from .ledger import compact_ledger
+
+
+@app.task
+def compact_balance_ledger():
+    """
+    Ущільнення журналу змін балансу.
+
+    Переносить неущільнені записи журналу в знімки балансів користувачів, тому хвіст журналу,
+    який підсумовується під час читання балансу, залишається коротким.
+
+    Returns:
+        dict: Кількість ущільнених записів та оновлених балансів.
+    """
+    return compact_ledger()
@@ -6,7 +6,9 @@ from decimal import Decimal
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import TestCase
 
+from users.ledger import compact_ledger, record_balance_change
 from users.models import (
+    BalanceLedgerEntry,
     DriverLicenseVerification,
     User,
     UserBalance,
@@ -206,3 +208,57 @@ class UserBalanceModelTest(TestCase):
         """Test default amount value"""
         balance = UserBalance.objects.create(user=self.test_user)
         self.assertEqual(balance.amount, Decimal("0.00"))
+
+
+class BalanceLedgerTest(TestCase):
+    """Balance ledger tests"""
+
+    def setUp(self):
+        """Set up test environment"""
+        self.test_user = User.objects.create_user(
+            username="ledgeruser",
+            email="ledger@example.com",
+            password="testpassword123"
+        )
+        self.balance = UserBalance.objects.create(user=self.test_user, amount=Decimal("100.00"))
+
+    def test_balance_includes_uncompacted_entries(self):
+        """Test that the actual balance is the snapshot plus the ledger tail"""
+        record_balance_change(self.test_user.id, amount_kopecks=5000, description="Top-up")
+        record_balance_change(self.test_user.id, amount_kopecks=-2000, held_kopecks=3000)
+
+        self.balance.refresh_from_db()
+        self.assertEqual(self.balance.amount, Decimal("100.00"))
+        self.assertEqual(self.balance.get_amount(), Decimal("130.00"))
+        self.assertEqual(self.balance.get_held_amount(), Decimal("30.00"))
+        self.assertEqual(self.balance.get_available_amount(), Decimal("100.00"))
+
+    def test_compaction_folds_entries_into_snapshot(self):
+        """Test that compaction moves the ledger tail into the snapshot"""
+        record_balance_change(self.test_user.id, amount_kopecks=5000)
+        record_balance_change(self.test_user.id, amount_kopecks=-2000, held_kopecks=3000)
+        record_balance_change(self.test_user.id, amount_kopecks=500)
+
+        stats = compact_ledger(batch_size=2)
+
+        self.balance.refresh_from_db()
+        self.assertEqual(stats, {"entries": 3, "balances": 2})
+        self.assertEqual(self.balance.amount, Decimal("135.00"))
+        self.assertEqual(self.balance.held_amount, Decimal("30.00"))
+        self.assertEqual(self.balance.get_amount(), Decimal("135.00"))
+        self.assertFalse(BalanceLedgerEntry.objects.filter(compacted=False).exists())
+        self.assertEqual(BalanceLedgerEntry.objects.count(), 3)
+
+    def test_compaction_skips_users_without_balance(self):
+        """Test that entries of users without a balance stay in the tail"""
+        other_user = User.objects.create_user(
+            username="nobalance",
+            email="nobalance@example.com",
+            password="testpassword123"
+        )
+        record_balance_change(other_user.id, amount_kopecks=1000)
+
+        stats = compact_ledger()
+
+        self.assertEqual(stats, {"entries": 0, "balances": 0})
+        self.assertTrue(BalanceLedgerEntry.objects.filter(user=other_user, compacted=False).exists())
@@ -10,6 +10,7 @@ from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 from PIL import Image
 
+from users.ledger import record_balance_change
 from users.models import DriverLicenseVerification, User, UserBalance
 
 
@@ -468,7 +469,22 @@ class UserBalanceViewTest(TestCase):
 
         # Перевіряємо, що баланс оновився
         updated_balance = UserBalance.objects.get(user=self.user)
-        self.assertEqual(updated_balance.amount, Decimal("100.50"))
+        self.assertEqual(updated_balance.get_amount(), Decimal("100.50"))
+
+class UserBalanceAdminTest(TestCase):
+    """Тести адмін-панелі балансів користувачів"""
+
+    def test_changelist_shows_ledger_balance(self):
+        """Тест показу фактичного балансу за журналом, а не знімка"""
+        user = User.objects.create_user(username="ledgeruser", email="ledger@example.com", password="pass12345")
+        UserBalance.objects.create(user=user, amount=Decimal("10.00"))
+        record_balance_change(user.id, amount_kopecks=2550, held_kopecks=500)
+        User.objects.create_superuser(username="balanceadmin", email="ba@example.com", password="adminpass")
+        self.client.login(username="balanceadmin", password="adminpass")
+
+        response = self.client.get(reverse("admin:users_userbalance_changelist"))
+        self.assertContains(response, "35,50")
+        self.assertContains(response, "5,00")
 
 
 # Видаляємо всі тимчасові файли після виконання тестів
@@ -11,6 +11,9 @@ from django.utils.decorators import method_decorator
 from django.views.generic import CreateView, ListView, UpdateView, View
 from django_ratelimit.decorators import ratelimit
 
+from bookings.billing import refresh_runway
+from utils.money import to_kopecks
+
 from .forms import (
     AdminVerificationForm,
     BalanceAddForm,
@@ -19,6 +22,7 @@ from .forms import (
     UserProfileUpdateForm,
     UserRegistrationForm,
 )
+from .ledger import record_balance_change
 from .models import DriverLicenseVerification, User, UserBalance
 
 
@@ -312,8 +316,8 @@ def user_balance_view(request):
         form = BalanceAddForm(request.POST)
         if form.is_valid():
             amount = form.cleaned_data["amount"]
-            balance.amount += amount
-            balance.save()
+            record_balance_change(request.user.id, amount_kopecks=to_kopecks(amount), description="Поповнення балансу")
+            refresh_runway([request.user.id])
             messages.success(request, f"Успішно додано {amount} до вашого балансу!")
             return redirect("balance")
     else:
@@ -321,6 +325,8 @@ def user_balance_view(request):
 
     return render(request, "balance.html", {
         "balance": balance,
+        "current_amount": balance.get_current_amount(),
+        "held_amount": balance.get_held_amount(),
         "form": form
     })
 
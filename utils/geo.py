@@ -0,0 +1,404 @@
+import bisect
+import math
+
+import numpy as np
+
+
+# Алфавіт base32 для кодування геохешів
+GEOHASH_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+# Точність геохешу, який зберігається для автомобіля (клітинка приблизно 4.8 x 4.8 м)
+GEOHASH_PRECISION = 9
+
+# Найбільша кількість клітинок, якими покривається прямокутна область у запиті
+BBOX_MAX_CELLS = 32
+
+# Середній радіус Землі в кілометрах
+EARTH_RADIUS_KM = 6371.0088
+
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    """
+    Кодує координати у геохеш заданої точності.
+
+    Args:
+        latitude: Широта в градусах.
+        longitude: Довгота в градусах.
+        precision: Кількість символів геохешу.
+
+    Returns:
+        str: Геохеш клітинки, яка містить точку.
+    """
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    geohash = []
+    bits = 0
+    bit_count = 0
+    even = True
+
+    while len(geohash) < precision:
+        value, value_range = (longitude, lng_range) if even else (latitude, lat_range)
+        middle = (value_range[0] + value_range[1]) / 2
+        bits <<= 1
+        if value >= middle:
+            bits |= 1
+            value_range[0] = middle
+        else:
+            value_range[1] = middle
+        even = not even
+        bit_count += 1
+
+        if bit_count == 5:
+            geohash.append(GEOHASH_BASE32[bits])
+            bits = 0
+            bit_count = 0
+
+    return "".join(geohash)
+
+def haversine_km(start_latitudes, start_longitudes, end_latitudes, end_longitudes):
+    """
+    Обчислює відстані між точками за формулою гаверсинуса векторизовано.
+
+    Аргументи можуть бути числами або масивами однакової форми та транслюються за правилами NumPy,
+    тому та сама функція рахує і відстані між парами точок, і відстані від однієї точки до масиву точок.
+
+    Args:
+        start_latitudes: Широти початкових точок у градусах.
+        start_longitudes: Довготи початкових точок у градусах.
+        end_latitudes: Широти кінцевих точок у градусах.
+        end_longitudes: Довготи кінцевих точок у градусах.
+
+    Returns:
+        numpy.ndarray: Відстані в кілометрах (NaN, якщо одна з точок невідома).
+    """
+    start_latitudes, start_longitudes, end_latitudes, end_longitudes = (
+        np.radians(np.asarray(values, dtype=float))
+        for values in (start_latitudes, start_longitudes, end_latitudes, end_longitudes)
+    )
+    a = (
+        np.sin((end_latitudes - start_latitudes) / 2) ** 2
+        + np.cos(start_latitudes) * np.cos(end_latitudes) * np.sin((end_longitudes - start_longitudes) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+def encode_geohashes(latitudes, longitudes, precision):
+    """
+    Кодує масиви координат у геохеші заданої точності векторизовано.
+
+    Координати переводяться в номери рядка та стовпця клітинки, біти яких чергуються так само,
+    як в encode_geohash (перший біт - довгота).
+
+    Args:
+        latitudes: Масив широт у градусах.
+        longitudes: Масив довгот у градусах.
+        precision: Кількість символів геохешу (не більше 12).
+
+    Returns:
+        numpy.ndarray: Масив геохешів.
+    """
+    bit_count = precision * 5
+    lat_bits = bit_count // 2
+    lng_bits = bit_count - lat_bits
+    rows = np.clip(
+        np.floor((np.asarray(latitudes, dtype=float) + 90.0) / 180.0 * 2 ** lat_bits), 0, 2 ** lat_bits - 1
+    ).astype(np.uint64)
+    columns = np.clip(
+        np.floor((np.asarray(longitudes, dtype=float) + 180.0) / 360.0 * 2 ** lng_bits), 0, 2 ** lng_bits - 1
+    ).astype(np.uint64)
+
+    codes = np.zeros(len(rows), dtype=np.uint64)
+    for bit in range(bit_count):
+        # Парні біти від старшого - довгота, непарні - широта
+        if bit % 2 == 0:
+            value = (columns >> np.uint64(lng_bits - 1 - bit // 2)) & np.uint64(1)
+        else:
+            value = (rows >> np.uint64(lat_bits - 1 - bit // 2)) & np.uint64(1)
+        codes = (codes << np.uint64(1)) | value
+
+    alphabet = np.array(list(GEOHASH_BASE32))
+    geohashes = np.full(len(codes), "", dtype=f"<U{precision}")
+    for index in range(precision):
+        digits = (codes >> np.uint64(5 * (precision - 1 - index))) & np.uint64(31)
+        geohashes = np.char.add(geohashes, alphabet[digits.astype(np.int64)])
+    return geohashes
+
+def geohash_bounds(geohash):
+    """
+    Повертає межі клітинки геохешу.
+
+    Args:
+        geohash: Геохеш клітинки.
+
+    Returns:
+        tuple: Південна, західна, північна та східна межі клітинки в градусах.
+    """
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    even = True
+
+    for char in geohash:
+        bits = GEOHASH_BASE32.index(char)
+        for shift in range(4, -1, -1):
+            value_range = lng_range if even else lat_range
+            middle = (value_range[0] + value_range[1]) / 2
+            if bits >> shift & 1:
+                value_range[0] = middle
+            else:
+                value_range[1] = middle
+            even = not even
+
+    return lat_range[0], lng_range[0], lat_range[1], lng_range[1]
+
+def geohash_cell_size(precision):
+    """
+    Повертає розмір клітинки геохешу заданої точності.
+
+    Args:
+        precision: Кількість символів геохешу.
+
+    Returns:
+        tuple: Висота та ширина клітинки в градусах.
+    """
+    lat_bits = precision * 5 // 2
+    lng_bits = precision * 5 - lat_bits
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lng_bits
+
+def cluster_precision(zoom):
+    """
+    Підбирає точність геохешу для кластеризації автомобілів на карті заданого масштабу.
+
+    Клітинка кластера приблизно в чотири рази вужча за тайл карти (256 пікселів), тому кластери
+    не зливаються в один маркер і не дробляться до окремих автомобілів.
+
+    Args:
+        zoom: Масштаб карти (0 - весь світ).
+
+    Returns:
+        int: Кількість символів геохешу для групування.
+    """
+    tile_width = 360.0 / 2 ** zoom
+    precision = 1
+    while precision < GEOHASH_PRECISION and geohash_cell_size(precision + 1)[1] >= tile_width / 4:
+        precision += 1
+    return precision
+
+def bbox_geohashes(south, west, north, east, max_cells=BBOX_MAX_CELLS):
+    """
+    Покриває прямокутну область найдрібнішими клітинками геохешу, кількість яких не перевищує max_cells.
+
+    Args:
+        south: Південна межа області.
+        west: Західна межа області.
+        north: Північна межа області.
+        east: Східна межа області.
+        max_cells: Найбільша кількість клітинок.
+
+    Returns:
+        list: Геохеші клітинок, які разом покривають область (порожній список для всієї Землі).
+    """
+    cells = []
+    for precision in range(1, GEOHASH_PRECISION + 1):
+        height, width = geohash_cell_size(precision)
+        rows = math.floor((north + 90.0) / height) - math.floor((south + 90.0) / height) + 1
+        columns = math.floor((east + 180.0) / width) - math.floor((west + 180.0) / width) + 1
+        if rows * columns > max_cells:
+            break
+
+        cells = sorted({
+            encode_geohash(
+                min(south + row * height, north),
+                min(west + column * width, east),
+                precision
+            )
+            for row in range(rows + 1)
+            for column in range(columns + 1)
+        })
+    return cells
+
+def parse_bbox(value):
+    """
+    Розбирає прямокутну область у форматі "захід,південь,схід,північ".
+
+    Args:
+        value: Рядок з межами області.
+
+    Returns:
+        tuple: Південна, західна, північна та східна межі області.
+
+    Raises:
+        ValueError: Якщо рядок має неправильний формат або межі виходять за допустимі значення.
+    """
+    try:
+        west, south, east, north = (float(part) for part in value.split(","))
+    except (AttributeError, TypeError, ValueError):
+        raise ValueError("Область має бути у форматі захід,південь,схід,північ")
+
+    if not (-90 <= south <= north <= 90 and -180 <= west <= east <= 180):
+        raise ValueError("Некоректні межі області")
+    return south, west, north, east
+
+def tile_bounds(zoom, x, y):
+    """
+    Повертає межі тайла карти (схема XYZ у проєкції Web Mercator, як у тайлах OpenStreetMap).
+
+    Args:
+        zoom: Масштаб тайла.
+        x: Номер стовпця тайла.
+        y: Номер рядка тайла.
+
+    Returns:
+        tuple: Південна, західна, північна та східна межі тайла в градусах.
+    """
+    count = 2 ** zoom
+
+    def latitude(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / count))))
+
+    return latitude(y + 1), x / count * 360.0 - 180.0, latitude(y), (x + 1) / count * 360.0 - 180.0
+
+def point_tile(latitude, longitude, zoom):
+    """
+    Повертає тайл карти заданого масштабу, який містить точку.
+
+    Args:
+        latitude: Широта в градусах.
+        longitude: Довгота в градусах.
+        zoom: Масштаб тайла.
+
+    Returns:
+        tuple: Номер стовпця та рядка тайла.
+    """
+    count = 2 ** zoom
+    # Проєкція Web Mercator не визначена на полюсах
+    latitude = max(min(latitude, 85.0511), -85.0511)
+    x = int((longitude + 180.0) / 360.0 * count)
+    y = int((1 - math.asinh(math.tan(math.radians(latitude))) / math.pi) / 2 * count)
+    return min(max(x, 0), count - 1), min(max(y, 0), count - 1)
+
+def normalize_polygon(rings):
+    """
+    Перевіряє та нормалізує координати багатокутника у форматі GeoJSON Polygon.
+
+    Args:
+        rings: Список кілець [[довгота, широта], ...]; перше кільце - зовнішня межа, решта - вирізи.
+
+    Returns:
+        list: Кільця з координатами float, кожне замкнене (остання точка збігається з першою).
+
+    Raises:
+        ValueError: Якщо координати мають неправильний формат або виходять за допустимі межі.
+    """
+    if not isinstance(rings, list) or not rings:
+        raise ValueError("Багатокутник має бути списком кілець координат")
+
+    normalized = []
+    for ring in rings:
+        try:
+            points = [(float(longitude), float(latitude)) for longitude, latitude in ring]
+        except (TypeError, ValueError):
+            raise ValueError("Кожна точка кільця має бути парою [довгота, широта]")
+        if any(not (-180 <= longitude <= 180 and -90 <= latitude <= 90) for longitude, latitude in points):
+            raise ValueError("Координати поза допустимими межами")
+
+        if points and points[0] != points[-1]:
+            points.append(points[0])
+        if len(set(points)) < 3:
+            raise ValueError("Кільце має містити щонайменше три різні точки")
+        normalized.append([list(point) for point in points])
+    return normalized
+
+def polygon_edges(rings):
+    """
+    Повертає відрізки меж багатокутника.
+
+    Args:
+        rings: Замкнені кільця [[довгота, широта], ...].
+
+    Returns:
+        list: Відрізки (довгота1, широта1, довгота2, широта2).
+    """
+    return [
+        (start[0], start[1], end[0], end[1])
+        for ring in rings
+        for start, end in zip(ring, ring[1:])
+    ]
+
+def point_in_polygon(latitude, longitude, rings):
+    """
+    Перевіряє, чи лежить точка всередині багатокутника (метод променя, правило парності).
+
+    Вирізи не потребують окремої обробки: промінь з точки у вирізі перетинає межі парну кількість разів.
+
+    Args:
+        latitude: Широта точки в градусах.
+        longitude: Довгота точки в градусах.
+        rings: Замкнені кільця [[довгота, широта], ...].
+
+    Returns:
+        bool: True, якщо точка всередині багатокутника.
+    """
+    inside = False
+    for x1, y1, x2, y2 in polygon_edges(rings):
+        if (y1 > latitude) != (y2 > latitude) and longitude < x1 + (latitude - y1) * (x2 - x1) / (y2 - y1):
+            inside = not inside
+    return inside
+
+def polygon_cells(rings, precision):
+    """
+    Розкладає багатокутник на клітинки геохешу заданої точності.
+
+    Клітинки обробляються рядками однакової широти. Клітинки, через які проходить межа багатокутника,
+    позначаються граничними. Решта клітинок рядка лежать цілком з одного боку межі, тому для них
+    достатньо перевірити центр: кількість перетинів межі з паралеллю центру лівіше від нього.
+
+    Args:
+        rings: Замкнені кільця [[довгота, широта], ...].
+        precision: Кількість символів геохешу.
+
+    Returns:
+        tuple: Множини геохешів клітинок, які лежать цілком усередині багатокутника, та граничних клітинок.
+    """
+    height, width = geohash_cell_size(precision)
+    edges = polygon_edges(rings)
+    longitudes = [point[0] for ring in rings for point in ring]
+    latitudes = [point[1] for ring in rings for point in ring]
+    first_row, last_row = (math.floor((latitude + 90.0) / height) for latitude in (min(latitudes), max(latitudes)))
+    first_column, last_column = (
+        math.floor((longitude + 180.0) / width) for longitude in (min(longitudes), max(longitudes))
+    )
+
+    def column(longitude):
+        return min(max(math.floor((longitude + 180.0) / width), first_column), last_column)
+
+    inside = set()
+    boundary = set()
+    for row in range(first_row, last_row + 1):
+        south = row * height - 90.0
+        north = south + height
+
+        # Стовпці клітинок, через які проходять частини відрізків у межах рядка
+        boundary_columns = set()
+        for x1, y1, x2, y2 in edges:
+            if max(y1, y2) < south or min(y1, y2) > north:
+                continue
+            if y1 == y2:
+                left, right = min(x1, x2), max(x1, x2)
+            else:
+                t1, t2 = sorted(((south - y1) / (y2 - y1), (north - y1) / (y2 - y1)))
+                t1, t2 = max(t1, 0.0), min(t2, 1.0)
+                left, right = sorted((x1 + t1 * (x2 - x1), x1 + t2 * (x2 - x1)))
+            boundary_columns.update(range(column(left), column(right) + 1))
+
+        center_latitude = south + height / 2
+        crossings = sorted(
+            x1 + (center_latitude - y1) * (x2 - x1) / (y2 - y1)
+            for x1, y1, x2, y2 in edges
+            if (y1 > center_latitude) != (y2 > center_latitude)
+        )
+        for cell_column in range(first_column, last_column + 1):
+            center_longitude = cell_column * width - 180.0 + width / 2
+            if cell_column in boundary_columns:
+                boundary.add(encode_geohash(center_latitude, center_longitude, precision))
+            elif bisect.bisect_left(crossings, center_longitude) % 2:
+                inside.add(encode_geohash(center_latitude, center_longitude, precision))
+    return inside, boundary
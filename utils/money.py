@@ -0,0 +1,84 @@
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import models
+from django.db.models.functions import Cast, Round
+
+
+# Кількість копійок у гривні
+KOPECKS_PER_UAH = 100
+
+
+def to_kopecks(value):
+    """
+    Перетворює грошову суму в гривнях на ціле число копійок.
+
+    Args:
+        value: Сума в гривнях (Decimal, рядок, int або float).
+
+    Returns:
+        int: Сума в копійках, округлена до найближчої копійки.
+    """
+    if value is None:
+        return 0
+    amount = Decimal(str(value)) * KOPECKS_PER_UAH
+    return int(amount.quantize(Decimal("1"), rounding=ROUND_HALF_UP))
+
+def from_kopecks(kopecks):
+    """
+    Перетворює ціле число копійок на суму в гривнях.
+
+    Args:
+        kopecks: Сума в копійках.
+
+    Returns:
+        Decimal: Сума в гривнях з двома знаками після коми.
+    """
+    return Decimal(kopecks or 0).scaleb(-2).quantize(Decimal("0.01"))
+
+def format_kopecks(kopecks):
+    """
+    Форматує суму в копійках як рядок у гривнях без арифметики Decimal (наприклад, для JSON).
+
+    Args:
+        kopecks: Сума в копійках.
+
+    Returns:
+        str: Сума в гривнях, наприклад "-12.05".
+    """
+    kopecks = kopecks or 0
+    sign = "-" if kopecks < 0 else ""
+    units, cents = divmod(abs(kopecks), KOPECKS_PER_UAH)
+    return f"{sign}{units}.{cents:02d}"
+
+def kopecks_expression(field):
+    """
+    Вираз для читання десяткового грошового поля в копійках на боці бази даних.
+
+    Args:
+        field: Назва десяткового поля (наприклад, "car__price_per_minute").
+
+    Returns:
+        Expression: Ціле число копійок.
+    """
+    return Cast(Round(models.F(field) * KOPECKS_PER_UAH), models.BigIntegerField())
+
+def money_property(field_name):
+    """
+    Створює властивість моделі, яка показує поле в копійках як суму в гривнях (Decimal).
+
+    Властивість можна читати в шаблонах і формах та передавати в конструктор моделі,
+    а в запитах ORM і обчисленнях використовується саме поле в копійках.
+
+    Args:
+        field_name: Назва поля моделі з сумою в копійках.
+
+    Returns:
+        property: Властивість для читання та запису суми в гривнях.
+    """
+    def getter(instance):
+        return from_kopecks(getattr(instance, field_name))
+
+    def setter(instance, value):
+        setattr(instance, field_name, to_kopecks(value))
+
+    return property(getter, setter)
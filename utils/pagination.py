@@ -0,0 +1,207 @@
+import base64
+import binascii
+import json
+from functools import reduce
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.http import Http404
+
+
+# Параметри запиту з курсором: сторінка після курсора, перед курсором та остання сторінка
+CURSOR_PARAMS = ("after", "before", "last")
+
+
+def encode_cursor(values):
+    """
+    Кодує значення полів сортування запису в рядок курсора для URL.
+
+    Args:
+        values: Список рядкових значень полів сортування.
+
+    Returns:
+        str: Курсор у форматі base64 без вирівнювання.
+    """
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor):
+    """
+    Розкодовує рядок курсора.
+
+    Args:
+        cursor: Курсор з параметра запиту.
+
+    Returns:
+        list: Рядкові значення полів сортування.
+
+    Raises:
+        ValueError: Якщо курсор пошкоджений.
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise ValueError("Некоректний курсор") from e
+    if not isinstance(values, list) or not all(isinstance(value, str) for value in values):
+        raise ValueError("Некоректний курсор")
+    return values
+
+def keyset_filter(ordering, values, *, reverse=False):
+    """
+    Будує умову для записів, які йдуть після запису зі значеннями values при сортуванні ordering.
+
+    Для сортування (a, b) умова має вигляд a > x OR (a = x AND b > y), тому база даних починає
+    читати індекс з потрібного місця замість того, щоб пропускати OFFSET записів.
+
+    Args:
+        ordering: Поля сортування ("-" на початку - за спаданням).
+        values: Значення полів сортування запису-курсора.
+        reverse: Умова для записів, які йдуть перед курсором.
+
+    Returns:
+        Q: Умова фільтрації.
+    """
+    conditions = []
+    for index, field in enumerate(ordering):
+        name = field.lstrip("-")
+        descending = field.startswith("-") != reverse
+        condition = Q(**{f"{name}__{'lt' if descending else 'gt'}": values[index]})
+        for previous, value in zip(ordering[:index], values):
+            condition &= Q(**{previous.lstrip("-"): value})
+        conditions.append(condition)
+    return reduce(lambda left, right: left | right, conditions)
+
+class CursorPage:
+    """
+    Сторінка курсорної пагінації.
+
+    На відміну від сторінки Paginator не знає номера та кількості сторінок, зате має курсори
+    для переходу на наступну та попередню сторінку.
+    """
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list  # Записи сторінки
+        self.next_cursor = next_cursor  # Курсор наступної сторінки (None, якщо сторінка остання)
+        self.previous_cursor = previous_cursor  # Курсор попередньої сторінки (None, якщо сторінка перша)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+class CursorPaginationMixin:
+    """
+    Домішка для ListView з курсорною (keyset) пагінацією замість пагінації за номером сторінки.
+
+    Сторінка вибирається умовою на поля сортування відносно першого або останнього запису сусідньої
+    сторінки, а не OFFSET, і без підрахунку всіх записів, тому будь-яка сторінка коштує як перша
+    (за наявності індексу за полями сортування). Поля сортування мають бути не NULL і разом унікальні.
+    """
+    cursor_ordering = ("id",)  # Поля сортування, останнє - унікальне
+
+    def cursor_values(self, obj):
+        """Повертає рядкові значення полів сортування запису"""
+        return [
+            obj._meta.get_field(field.lstrip("-")).value_to_string(obj) for field in self.cursor_ordering
+        ]
+
+    def parse_cursor(self, queryset, cursor):
+        """
+        Перетворює курсор на значення полів сортування.
+
+        Args:
+            queryset: QuerySet списку.
+            cursor: Курсор з параметра запиту.
+
+        Returns:
+            list: Значення полів сортування.
+
+        Raises:
+            Http404: Якщо курсор некоректний.
+        """
+        try:
+            values = decode_cursor(cursor)
+            if len(values) != len(self.cursor_ordering):
+                raise ValueError("Некоректний курсор")
+            return [
+                queryset.model._meta.get_field(field.lstrip("-")).to_python(value)
+                for field, value in zip(self.cursor_ordering, values)
+            ]
+        except (ValueError, ValidationError) as e:
+            raise Http404("Некоректний курсор сторінки") from e
+
+    def paginate_queryset(self, queryset, page_size):
+        """
+        Вибирає сторінку записів за курсором з параметрів запиту after, before або last.
+
+        Вибирається на один запис більше за розмір сторінки, щоб дізнатися, чи є наступна сторінка,
+        без окремого запиту.
+
+        Args:
+            queryset: QuerySet списку.
+            page_size: Кількість записів на сторінці.
+
+        Returns:
+            tuple: (None, сторінка, записи сторінки, чи є інші сторінки) - як у ListView.
+        """
+        after = self.request.GET.get("after")
+        before = self.request.GET.get("before")
+        last = bool(self.request.GET.get("last"))
+        backwards = bool(before) or last
+
+        ordering = self.cursor_ordering
+        if backwards:
+            ordering = tuple(field[1:] if field.startswith("-") else f"-{field}" for field in ordering)
+        queryset = queryset.order_by(*ordering)
+
+        if after:
+            queryset = queryset.filter(keyset_filter(self.cursor_ordering, self.parse_cursor(queryset, after)))
+        elif before:
+            queryset = queryset.filter(
+                keyset_filter(self.cursor_ordering, self.parse_cursor(queryset, before), reverse=True)
+            )
+
+        object_list = list(queryset[:page_size + 1])
+        has_more = len(object_list) > page_size
+        object_list = object_list[:page_size]
+        if backwards:
+            object_list.reverse()
+
+        next_cursor = previous_cursor = None
+        if object_list:
+            first, last_object = object_list[0], object_list[-1]
+            # Зайвий запис означає продовження в напрямку вибірки, а курсор - записи з протилежного боку
+            if (bool(before) if backwards else has_more):
+                next_cursor = encode_cursor(self.cursor_values(last_object))
+            if (has_more if backwards else bool(after)):
+                previous_cursor = encode_cursor(self.cursor_values(first))
+
+        page = CursorPage(object_list, next_cursor, previous_cursor)
+        return None, page, object_list, page.has_other_pages()
+
+    def get_context_data(self, **kwargs):
+        """
+        Додає до контексту параметри запиту без курсора для посилань на сусідні сторінки.
+
+        Args:
+            self: Екземпляр класу.
+            **kwargs: Додаткові іменовані аргументи.
+
+        Returns:
+            dict: Контекст з доданим рядком cursor_query.
+        """
+        context = super().get_context_data(**kwargs)
+        query = self.request.GET.copy()
+        for param in CURSOR_PARAMS + ("page",):
+            query.pop(param, None)
+        context["cursor_query"] = query.urlencode()
+        return context
@@ -0,0 +1,18 @@
+import redis
+from django.conf import settings
+
+
+_client = None
+
+
+def get_redis():
+    """
+    Повертає спільний клієнт Redis для службових структур даних (черги, блокування, буфери).
+
+    Returns:
+        redis.Redis: Клієнт Redis, підключений до REDIS_URL.
+    """
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+    return _client
@@ -0,0 +1,62 @@
+import uuid
+
+from .redis_client import get_redis
+
+
+# Продовжити блокування, лише якщо ним досі володіє власник токена
+HEARTBEAT_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("pexpire", KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+# Зняти блокування, лише якщо ним досі володіє власник токена
+RELEASE_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+class RedisLease:
+    """
+    Розподілене блокування (оренда) в Redis з обмеженим часом життя.
+
+    Власник блокування ідентифікується випадковим токеном, тому продовжити чи зняти блокування може лише той,
+    хто його отримав. Якщо власник зупиниться, не знявши блокування, воно автоматично зникне після закінчення TTL.
+    Токен можна передати іншим процесам (наприклад, підзадачам Celery), щоб вони продовжували блокування.
+    """
+
+    def __init__(self, name, ttl, token=None):
+        self.name = name  # Ключ блокування в Redis
+        self.ttl = ttl  # Час життя блокування в секундах
+        self.token = token or uuid.uuid4().hex  # Токен власника блокування
+
+    def acquire(self):
+        """
+        Отримати блокування, якщо воно вільне.
+
+        Returns:
+            bool: True, якщо блокування отримано.
+        """
+        return bool(get_redis().set(self.name, self.token, nx=True, ex=self.ttl))
+
+    def heartbeat(self):
+        """
+        Продовжити час життя блокування на TTL.
+
+        Returns:
+            bool: True, якщо блокування досі належить власнику токена.
+        """
+        return bool(get_redis().eval(HEARTBEAT_SCRIPT, 1, self.name, self.token, self.ttl * 1000))
+
+    def release(self):
+        """
+        Зняти блокування.
+
+        Returns:
+            bool: True, якщо блокування належало власнику токена і було зняте.
+        """
+        return bool(get_redis().eval(RELEASE_SCRIPT, 1, self.name, self.token))